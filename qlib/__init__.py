@@ -24,10 +24,11 @@ def init(default_conf="client", **kwargs):
         return
 
     clear_mem_cache = kwargs.pop("clear_mem_cache", True)
-    if clear_mem_cache:
-        H.clear()
-    
+
     C.set(default_conf, **kwargs)
+    if clear_mem_cache:
+        # the units are rebuilt with the memory cache settings of C
+        H.reset()
     get_module_logger.setLevel(C.logging_level)
 
     # mount nfs
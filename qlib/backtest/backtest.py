@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Generator, Optional
+
+import pandas as pd
+
+from ..utils.time import Freq
+from .decision import BaseTradeDecision
+from .executor import BaseExecutor
+
+if TYPE_CHECKING:
+    from ..strategy.base import BaseStrategy
+
+
+def backtest_loop(
+    start_time: pd.Timestamp | str,
+    end_time: pd.Timestamp | str,
+    trade_strategy: BaseStrategy,
+    trade_executor: BaseExecutor,
+) -> Dict[str, dict]:
+    """backtest function for the interaction of the outermost strategy and executor in the nested decision execution
+
+    please refer to the docs of `collect_data_loop`
+
+    Returns
+    -------
+    portfolio_dict: Dict[str, dict]
+        it records the trading history of each level whose portfolio metrics are enabled
+    """
+    return_value: dict = {}
+    for _decision in collect_data_loop(start_time, end_time, trade_strategy, trade_executor, return_value):
+        pass
+
+    return return_value.get("portfolio_dict", {})
+
+
+def collect_data_loop(
+    start_time: pd.Timestamp | str,
+    end_time: pd.Timestamp | str,
+    trade_strategy: BaseStrategy,
+    trade_executor: BaseExecutor,
+    return_value: dict | None = None,
+) -> Generator[BaseTradeDecision, Optional[BaseTradeDecision], None]:
+    """Generator for collecting the trade decision data for rl training
+
+    Parameters
+    ----------
+    start_time : pd.Timestamp|str
+        closed start time for backtest
+        **NOTE**: This will be applied to the outmost executor's calendar.
+    end_time : pd.Timestamp|str
+        closed end time for backtest
+        **NOTE**: This will be applied to the outmost executor's calendar.
+        E.g. Executor[day](Executor[1min]), setting `end_time == 20XX0301` will include all the minutes on 20XX0301
+    trade_strategy : BaseStrategy
+        the outermost portfolio strategy
+    trade_executor : BaseExecutor
+        the outermost executor
+    return_value : dict
+        used for backtest_loop
+
+    Yields
+    -------
+    object
+        trade decision
+    """
+    trade_executor.reset(start_time=start_time, end_time=end_time)
+    trade_strategy.reset(level_infra=trade_executor.get_level_infra())
+
+    _execute_result = None
+    while not trade_executor.finished():
+        _trade_decision: BaseTradeDecision = trade_strategy.generate_trade_decision(_execute_result)
+        _execute_result = yield from trade_executor.collect_data(_trade_decision, level=0)
+        trade_strategy.post_exe_step(_execute_result)
+
+    if return_value is not None:
+        all_executors = trade_executor.get_all_executors()
+
+        portfolio_dict: Dict[str, dict] = {}
+        for executor in all_executors:
+            key = "{}{}".format(*Freq.parse(executor.time_per_step))
+            if executor.trade_account.is_port_metr_enabled():
+                portfolio_metrics, positions = executor.trade_account.get_portfolio_metrics()
+                portfolio_dict[key] = {
+                    "portfolio_metrics": portfolio_metrics,
+                    "risk_metrics": executor.trade_account.portfolio_metrics.get_risk_metrics(),
+                    "positions": positions,
+                }
+
+        return_value.update({"portfolio_dict": portfolio_dict})
@@ -0,0 +1,706 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Type, Union, cast
+
+import numpy as np
+import pandas as pd
+
+from ..config import C
+from ..constant import REG_CN
+from ..data.data import D
+from ..log import get_module_logger
+from ..utils import hash_args
+from ..utils.time import Freq, epsilon_change
+from .decision import Order, OrderDir
+from .high_performance_ds import BaseQuote, NumpyQuote
+from .position import BasePosition
+
+if TYPE_CHECKING:
+    from .account import Account
+
+
+class Exchange:
+    # `limit_threshold` types
+    LT_TP_EXP = "(exp)"  # Tuple[str, str]: the limitation is calculated by a Qlib expression.
+    LT_FLT = "float"  # float: the trading limitation is based on `abs($close / Ref($close, 1) - 1) >= limit_threshold`
+    LT_NONE = "none"  # none: there is no trading limitation
+
+    def __init__(
+        self,
+        freq: str = "day",
+        start_time: Union[pd.Timestamp, str] = None,
+        end_time: Union[pd.Timestamp, str] = None,
+        codes: Union[list, str, dict] = "all",
+        deal_price: Union[str, Tuple[str, str], List[str], None] = None,
+        subscribe_fields: list = [],
+        limit_threshold: Union[Tuple[str, str], float, None] = None,
+        volume_threshold: Optional[float] = None,
+        open_cost: float = 0.0015,
+        close_cost: float = 0.0025,
+        min_cost: float = 5.0,
+        impact_cost: float = 0.0,
+        trade_unit: Optional[int] = None,
+        quote_cls: Type[BaseQuote] = NumpyQuote,
+        quote_cache_dir: Union[str, Path, None] = None,
+        **kwargs,
+    ) -> None:
+        """__init__
+        :param freq:             frequency of data
+        :param start_time:       closed start time for backtest
+        :param end_time:         closed end time for backtest
+        :param codes:            list stock_id list or a string of instruments(i.e. all, csi500, sse50)
+        :param deal_price:      Union[str, Tuple[str, str], List[str]]
+                                The `deal_price` supports following two types of input
+                                - <deal_price> : str
+                                - (<buy_price>, <sell_price>): Tuple[str] or List[str]
+                                <deal_price>, <buy_price> or <sell_price> := <price>
+                                <price> := str
+                                - for example '$close', '$open', '$vwap' ("close" is OK. `Exchange` will help to prepend
+                                  "$" to the expression)
+        :param subscribe_fields: list, subscribe fields. This expressions will be added to the query and `self.quote`.
+                                 It is useful when users want more fields to be queried
+        :param limit_threshold: Union[Tuple[str, str], float, None]
+                                1) `None`: no limitation
+                                2) float, 0.1 for example, default None
+                                3) Tuple[str, str]: (<the expression for buying stock limitation>,
+                                                     <the expression for sell stock limitation>)
+                                                    `False` value indicates the stock is tradable
+                                                    `True` value indicates the stock is limited and not tradable
+        :param volume_threshold: float, optional
+                                the ratio of the total volume of the order range that can be dealt at most;
+                                the amount already dealt in the day (`dealt_order_amount`) is subtracted.
+                                `None` means no volume limitation
+        :param open_cost:        cost rate for open, default 0.0015
+        :param close_cost:       cost rate for close, default 0.0025
+        :param trade_unit:       trade unit, 100 for China A market.
+                                 None for disable trade unit.
+                                 **NOTE**: `trade_unit` is included in the `kwargs`. It is necessary because we must
+                                 distinguish `not set` and `disable trade_unit`
+        :param min_cost:         min cost, default 5
+        :param impact_cost:     market impact cost rate (a.k.a. slippage). A recommended value is 0.1.
+        :param quote_cls:       the class keeping the quote
+        :param quote_cache_dir: the directory to persist the quote. The quote is keyed by the provider, the universe,
+                                the window and the fields; the later exchanges with the same key memory-map it
+                                instead of loading it from the provider again. None for disabling it
+        """
+        self.logger = get_module_logger("online operator")
+
+        if trade_unit is None:
+            trade_unit = C.trade_unit
+        if limit_threshold is None:
+            limit_threshold = C.limit_threshold
+        if deal_price is None:
+            deal_price = C.deal_price
+
+        # TODO: the quote, trade_dates, codes are not necessary.
+        # It is just for performance consideration.
+        self.limit_type = self._get_limit_type(limit_threshold)
+        if limit_threshold is None:
+            if C.region in [REG_CN]:
+                self.logger.warning(f"limit_threshold not set. The stocks hit the limit may be bought/sold")
+        elif self.limit_type == self.LT_FLT and abs(cast(float, limit_threshold)) > 0.1:
+            if C.region in [REG_CN]:
+                self.logger.warning(f"limit_threshold may not be set to a reasonable value")
+
+        if isinstance(deal_price, str):
+            buy_price, sell_price = deal_price, deal_price
+        elif isinstance(deal_price, (tuple, list)):
+            buy_price, sell_price = cast(Tuple[str, str], deal_price)
+        else:
+            raise NotImplementedError(f"This type of input is not supported")
+        self.buy_price = buy_price if buy_price.startswith("$") or "(" in buy_price else "$" + buy_price
+        self.sell_price = sell_price if sell_price.startswith("$") or "(" in sell_price else "$" + sell_price
+
+        if isinstance(codes, str):
+            codes = D.instruments(codes)
+        self.codes = codes
+        self.freq = freq
+        self.start_time = start_time
+        if end_time is not None and Freq(freq).base == Freq.NORM_FREQ_MINUTE:
+            end_time = pd.Timestamp(end_time)
+            if end_time == end_time.normalize():
+                # like the executors, a date-only end_time includes all the minutes of that day
+                end_time = epsilon_change(end_time + pd.Timedelta(days=1))
+        self.end_time = end_time
+
+        self.trade_unit = trade_unit
+        self.limit_threshold = limit_threshold
+        self.volume_threshold = volume_threshold
+        self.open_cost = open_cost
+        self.close_cost = close_cost
+        self.min_cost = min_cost
+        self.impact_cost = impact_cost
+
+        # $close is may be used by report, so we add it by default
+        self.all_fields = list(
+            dict.fromkeys(
+                ["$close", "$open", "$volume", "$factor", self.buy_price, self.sell_price, *subscribe_fields]
+            )
+        )
+        self.limit_exprs = self._get_limit_exprs()
+        if self.limit_exprs is not None:
+            self.all_fields.extend(expr for expr in self.limit_exprs if expr not in self.all_fields)
+
+        self.quote_cls = quote_cls
+        self.quote_cache_dir = quote_cache_dir
+        if quote_cache_dir is not None and issubclass(quote_cls, NumpyQuote):
+            self.get_quote_from_cache(Path(quote_cache_dir).expanduser())
+        else:
+            self.get_quote_from_qlib()
+
+    def _get_quote_cache_key(self) -> str:
+        calendar = D.calendar(freq=self.freq, future=False)
+        return hash_args(
+            str(C.dpm.get_data_uri(self.freq)),
+            # the last bar of the calendar makes the cache invalid after the data is updated
+            str(calendar[-1]) if len(calendar) > 0 else None,
+            self.codes,
+            self.all_fields,
+            self.limit_exprs,
+            str(self.start_time),
+            str(self.end_time),
+            self.freq,
+            self.quote_cls.__name__,
+        )
+
+    def get_quote_from_cache(self, cache_dir: Path) -> None:
+        path = cache_dir.joinpath(self._get_quote_cache_key())
+        if self.quote_cls.exists(path):
+            self.quote = self.quote_cls.load(path)
+            self.trade_w_adj_price = bool(np.isnan(self.quote.get_field_data("$factor")).all())
+            return
+        self.get_quote_from_qlib()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.quote.save(path)
+        # memory-map the saved quote, so the pages are shared with the other processes using it
+        self.quote = self.quote_cls.load(path)
+
+    def get_quote_from_qlib(self) -> None:
+        # get stock data from qlib
+        if len(self.codes) == 0:
+            self.codes = D.instruments()
+        # all the fields, including the limitation, are evaluated by the expression engine in one query
+        quote_df = D.features(self.codes, self.all_fields, self.start_time, self.end_time, freq=self.freq)
+        quote_df.columns = self.all_fields
+
+        # check buy_price data and sell_price data
+        for attr in ("buy_price", "sell_price"):
+            pstr = getattr(self, attr)  # price string
+            if quote_df[pstr].isna().any():
+                self.logger.warning("{} field data contains nan.".format(pstr))
+
+        # update trade_w_adj_price
+        if quote_df["$factor"].isna().all():
+            # The 'factor.day.bin' file not exists, and `factor` field contains `nan`
+            # Use adjusted price
+            self.trade_w_adj_price = True
+            self.logger.warning("factor.day.bin file not exists or factor contains `nan`. Order using adjusted_price.")
+            if self.trade_unit is not None:
+                self.logger.warning(f"trade unit {self.trade_unit} is not supported in adjusted_price mode.")
+        else:
+            # The `factor.day.bin` file exists and all data `close` and `factor` are not `nan`
+            # Use normal price
+            self.trade_w_adj_price = False
+
+        # update limit
+        self._update_limit(quote_df)
+
+        self.quote: BaseQuote = self.quote_cls(quote_df, self.freq)
+
+    def _get_limit_type(self, limit_threshold: Union[tuple, float, None]) -> str:
+        """get limit type"""
+        if isinstance(limit_threshold, tuple):
+            return self.LT_TP_EXP
+        elif isinstance(limit_threshold, float):
+            return self.LT_FLT
+        elif limit_threshold is None:
+            return self.LT_NONE
+        else:
+            raise NotImplementedError(f"This type of `limit_threshold` is not supported")
+
+    def _get_limit_exprs(self) -> Optional[Tuple[str, str]]:
+        """the expressions of (limit_buy, limit_sell)"""
+        if self.limit_type == self.LT_FLT:
+            threshold = abs(cast(float, self.limit_threshold))
+            return f"$close / Ref($close, 1) - 1 >= {threshold}", f"$close / Ref($close, 1) - 1 <= {-threshold}"
+        elif self.limit_type == self.LT_TP_EXP:
+            return cast(Tuple[str, str], self.limit_threshold)
+        return None
+
+    def _update_limit(self, quote_df: pd.DataFrame) -> None:
+        # The limitation is kept as 0/1 float columns, so they can be stored in the dense quote block
+        if self.limit_exprs is None:
+            quote_df["limit_buy"] = 0.0
+            quote_df["limit_sell"] = 0.0
+        else:
+            buy_limit, sell_limit = self.limit_exprs
+            limit_buy = quote_df[buy_limit].fillna(0).astype(bool).astype(float)
+            limit_sell = quote_df[sell_limit].fillna(0).astype(bool).astype(float)
+            if self.limit_type == self.LT_FLT:
+                # the generated expressions are not subscribed by users
+                quote_df.drop(columns=[buy_limit, sell_limit], inplace=True)
+            quote_df["limit_buy"] = limit_buy
+            quote_df["limit_sell"] = limit_sell
+        # a stock without close price in a bar is suspended in that bar
+        suspended = quote_df["$close"].isna()
+        quote_df.loc[suspended, ["limit_buy", "limit_sell"]] = 1.0
+
+    def _inst_idx(self, stock_ids: List[str]) -> np.ndarray:
+        return cast(NumpyQuote, self.quote).get_inst_idx(stock_ids)
+
+    def check_stock_limit(
+        self,
+        stock_id: str,
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+        direction: int | None = None,
+    ) -> bool:
+        """
+        Parameters
+        ----------
+        stock_id : str
+        start_time: pd.Timestamp
+        end_time: pd.Timestamp
+        direction : int, optional
+            trade direction, by default None
+            - if direction is None, check if tradable for buying and selling.
+            - if direction == Order.BUY, check the if tradable for buying
+            - if direction == Order.SELL, check the sell limit for selling.
+
+        Returns
+        -------
+        True: the trading of the stock is limited (maybe hit the highest/lowest price), hence the stock is not tradable
+        False: the trading of the stock is not limited, hence the stock may be tradable
+        """
+        # NOTE:
+        # **all** is used when checking limitation.
+        # For example, the stock trading is limited in a day if every minute is limited in a day if every minute is
+        # limited.
+        if direction is None:
+            # The trading limitation is related to the trading direction
+            # if the direction is not provided, then any limitation from buy or sell will result in trading limitation
+            buy_limit = self.quote.get_data(stock_id, start_time, end_time, field="limit_buy", method="all")
+            sell_limit = self.quote.get_data(stock_id, start_time, end_time, field="limit_sell", method="all")
+            return bool(buy_limit or sell_limit)
+        elif direction == Order.BUY:
+            return cast(bool, self.quote.get_data(stock_id, start_time, end_time, field="limit_buy", method="all"))
+        elif direction == Order.SELL:
+            return cast(bool, self.quote.get_data(stock_id, start_time, end_time, field="limit_sell", method="all"))
+        else:
+            raise ValueError(f"direction {direction} is not supported!")
+
+    def check_stock_suspended(
+        self,
+        stock_id: str,
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+    ) -> bool:
+        """if stock is suspended(hence not tradable), True will be returned"""
+        # is suspended
+        return self.quote.get_data(stock_id, start_time, end_time, "$close", method="ts_data_last") is None
+
+    def check_stock_suspended_array(
+        self,
+        stock_ids: List[str],
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+    ) -> np.ndarray:
+        """the batch version of `check_stock_suspended`"""
+        return np.isnan(self.get_close_array(stock_ids, start_time, end_time))
+
+    def is_stock_tradable(
+        self,
+        stock_id: str,
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+        direction: int | None = None,
+    ) -> bool:
+        # check if stock can be traded
+        return not (
+            self.check_stock_suspended(stock_id, start_time, end_time)
+            or self.check_stock_limit(stock_id, start_time, end_time, direction)
+        )
+
+    def check_order(self, order: Order) -> bool:
+        # check limit and suspended
+        return self.is_stock_tradable(
+            stock_id=order.stock_id,
+            start_time=order.start_time,
+            end_time=order.end_time,
+            direction=order.direction,
+        )
+
+    def deal_order(
+        self,
+        order: Order,
+        trade_account: Account | None = None,
+        position: BasePosition | None = None,
+        dealt_order_amount: Dict[str, float] = defaultdict(float),
+    ) -> Tuple[float, float, float]:
+        """
+        Deal order when the actual transaction
+        the results section in `Order` will be changed.
+        :param order:  Deal the order.
+        :param trade_account: Trade account to be updated after dealing the order.
+        :param position: position to be updated after dealing the order.
+        :param dealt_order_amount: the dealt order amount dict with the format of {stock_id: float}
+        :return: trade_val, trade_cost, trade_price
+        """
+        return self.deal_orders(
+            [order],
+            trade_account=trade_account,
+            position=position,
+            dealt_order_amount=dealt_order_amount,
+        )[0]
+
+    def deal_orders(
+        self,
+        orders: List[Order],
+        trade_account: Account | None = None,
+        position: BasePosition | None = None,
+        dealt_order_amount: Dict[str, float] = defaultdict(float),
+    ) -> List[Tuple[float, float, float]]:
+        """
+        Deal all the orders of a trading step in order
+
+        The quote related values (tradability, deal price, factor, volume limitation and impact cost) of all the
+        orders are evaluated in one vectorized pass. Only the cash and position related clipping, and the volume
+        limitation of a stock already dealt by the previous orders of the batch, are done order by order, so the
+        results are the same as dealing the orders one by one.
+
+        Parameters
+        ----------
+        orders : List[Order]
+            the orders will be dealt serially; the results section in each `Order` will be changed
+        Please refer to the docs of `deal_order` for the other parameters
+
+        Returns
+        -------
+        List[Tuple[float, float, float]]:
+            (trade_val, trade_cost, trade_price) of each order
+        """
+        if trade_account is not None and position is not None:
+            raise ValueError("trade_account and position can only choose one")
+        if len(orders) == 0:
+            return []
+
+        trade_price, deal_amount, cost_ratio, factor = self._calc_quote_info_by_orders(orders, dealt_order_amount)
+        position = trade_account.current_position if trade_account else position
+
+        results = []
+        # the amount dealt by the previous orders of the batch, {stock_id: amount}
+        batch_dealt: Dict[str, float] = defaultdict(float)
+        for i, order in enumerate(orders):
+            if self.volume_threshold is not None and batch_dealt.get(order.stock_id, 0.0) > 0:
+                # the volume limitation of a stock dealt by the previous orders of the batch is evaluated again with
+                # their deal amount, like dealing the orders one by one
+                dealt = {order.stock_id: dealt_order_amount[order.stock_id] + batch_dealt[order.stock_id]}
+                _price, _amount, _cost, _factor = self._calc_quote_info_by_orders([order], dealt)
+                trade_price[i], deal_amount[i], cost_ratio[i], factor[i] = _price[0], _amount[0], _cost[0], _factor[0]
+
+            if np.isnan(trade_price[i]):
+                order.deal_amount = 0.0
+                # using np.nan instead of None to make it more convenient to show the value in format string
+                self.logger.debug(f"Order failed due to trading limitation: {order}")
+                results.append((0.0, 0.0, np.nan))
+                continue
+
+            order.factor = None if np.isnan(factor[i]) else float(factor[i])
+            order.deal_amount = float(deal_amount[i])
+            trade_val, trade_cost = self._clip_by_position(order, float(trade_price[i]), float(cost_ratio[i]), position)
+
+            if trade_val > 1e-5:
+                # If the order can only be deal 0 value. Nothing to be updated
+                # Otherwise, it will result in
+                # 1) some stock with 0 value in the position
+                # 2) `trade_unit` of trade_cost will be lost in user account
+                price = float(trade_price[i])
+                if trade_account:
+                    trade_account.update_order(order=order, trade_val=trade_val, cost=trade_cost, trade_price=price)
+                elif position:
+                    position.update_order(order=order, trade_val=trade_val, cost=trade_cost, trade_price=price)
+
+            batch_dealt[order.stock_id] += order.deal_amount
+            results.append((trade_val, trade_cost, float(trade_price[i])))
+        return results
+
+    def _calc_quote_info_by_orders(
+        self,
+        orders: List[Order],
+        dealt_order_amount: Dict[str, float],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+            trade price (NaN for the orders which can't be dealt), the deal amount clipped by volume, the cost ratio
+            and the factor of each order
+        """
+        n = len(orders)
+        is_buy = np.fromiter((order.direction == OrderDir.BUY for order in orders), dtype=bool, count=n)
+        amount = np.fromiter((order.amount for order in orders), dtype=np.float64, count=n)
+        inst_idx = self._inst_idx([order.stock_id for order in orders])
+
+        trade_price = np.full(n, np.nan)
+        volume = np.full(n, np.nan)
+        factor = np.full(n, np.nan)
+        limited = np.ones(n, dtype=bool)
+        # orders of a step almost always share the same range, so there is usually only one group
+        groups: Dict[Tuple[pd.Timestamp, pd.Timestamp], List[int]] = defaultdict(list)
+        for i, order in enumerate(orders):
+            groups[(order.start_time, order.end_time)].append(i)
+        for (start_time, end_time), _idx in groups.items():
+            idx = np.asarray(_idx)
+            _inst, _buy = inst_idx[idx], is_buy[idx]
+            _get = lambda field, method: self.quote.get_data_array(_inst, start_time, end_time, field, method)
+            limited[idx] = np.where(_buy, _get("limit_buy", "all"), _get("limit_sell", "all"))
+            if self.buy_price == self.sell_price:
+                trade_price[idx] = _get(self.buy_price, "ts_data_last")
+            else:
+                trade_price[idx] = np.where(
+                    _buy, _get(self.buy_price, "ts_data_last"), _get(self.sell_price, "ts_data_last")
+                )
+            volume[idx] = _get("$volume", "sum")
+            factor[idx] = _get("$factor", "ts_data_last")
+            # the same fallback as `get_deal_price`
+            invalid = (np.isnan(trade_price[idx]) | (trade_price[idx] <= 1e-08)) & ~limited[idx]
+            if invalid.any():
+                stock_ids = [orders[i].stock_id for i in idx[invalid]]
+                self.logger.warning(f"(stock_id:{stock_ids}, trade_time:{(start_time, end_time)}): invalid price!!!")
+                self.logger.warning(f"setting deal_price to close price")
+                trade_price[idx[invalid]] = _get("$close", "ts_data_last")[invalid]
+
+        invalid_price = np.isnan(trade_price) | (trade_price <= 1e-08)
+        trade_price[limited | invalid_price] = np.nan
+
+        # Clipping amount first
+        # - It simulates that the order is rejected directly by the exchange due to large order
+        # Another choice is placing it after rounding the order
+        # - It simulates that the large order is submitted, but partial is dealt regardless of rounding by trading unit.
+        deal_amount = amount
+        if self.volume_threshold is not None:
+            dealt = np.fromiter((dealt_order_amount[order.stock_id] for order in orders), dtype=np.float64, count=n)
+            vol_limit = np.nan_to_num(volume) * self.volume_threshold - dealt
+            deal_amount = np.clip(np.minimum(deal_amount, vol_limit), 0, None)
+
+        # TODO: the adjusted cost ratio can be overestimated as deal_amount will be clipped in the next steps
+        total_trade_val = volume * trade_price
+        with np.errstate(invalid="ignore", divide="ignore"):
+            adj_cost_ratio = np.where(
+                (total_trade_val > 0) & ~np.isnan(total_trade_val),
+                self.impact_cost * (deal_amount * trade_price / total_trade_val) ** 2,
+                self.impact_cost,
+            )
+        cost_ratio = np.where(is_buy, self.open_cost, self.close_cost) + adj_cost_ratio
+        return trade_price, deal_amount, cost_ratio, factor
+
+    def _clip_by_position(
+        self,
+        order: Order,
+        trade_price: float,
+        cost_ratio: float,
+        position: Optional[BasePosition],
+    ) -> Tuple[float, float]:
+        """clip the deal amount of the order by the cash and the amount in position"""
+        if order.direction == Order.SELL:
+            # sell
+            # if we don't know current position, we choose to sell all
+            # Otherwise, we clip the amount based on current position
+            if position is not None:
+                current_amount = position.get_stock_amount(order.stock_id) if position.check_stock(order.stock_id) else 0
+                if not np.isclose(order.deal_amount, current_amount):
+                    # when not selling last stock. rounding is necessary
+                    order.deal_amount = self.round_amount_by_trade_unit(
+                        min(current_amount, order.deal_amount),
+                        order.factor,
+                    )
+
+                # in case of negative value of cash
+                if position.get_cash() + order.deal_amount * trade_price < max(
+                    order.deal_amount * trade_price * cost_ratio,
+                    self.min_cost,
+                ):
+                    order.deal_amount = 0
+                    self.logger.debug(f"Order clipped due to cash limitation: {order}")
+
+        elif order.direction == Order.BUY:
+            # buy
+            if position is not None:
+                cash = position.get_cash()
+                trade_val = order.deal_amount * trade_price
+                if cash < max(trade_val * cost_ratio, self.min_cost):
+                    # cash cannot cover cost
+                    order.deal_amount = 0
+                    self.logger.debug(f"Order clipped due to cost higher than cash: {order}")
+                elif cash < trade_val + max(trade_val * cost_ratio, self.min_cost):
+                    # The money is not enough
+                    max_buy_amount = self._get_buy_amount_by_cash_limit(trade_price, cash, cost_ratio)
+                    order.deal_amount = self.round_amount_by_trade_unit(
+                        min(max_buy_amount, order.deal_amount),
+                        order.factor,
+                    )
+                    self.logger.debug(f"Order clipped due to cash limitation: {order}")
+                else:
+                    # The money is enough
+                    order.deal_amount = self.round_amount_by_trade_unit(order.deal_amount, order.factor)
+            else:
+                # Unknown amount of money. Just round the amount
+                order.deal_amount = self.round_amount_by_trade_unit(order.deal_amount, order.factor)
+
+        else:
+            raise NotImplementedError("order direction {} error".format(order.direction))
+
+        trade_val = order.deal_amount * trade_price
+        trade_cost = max(trade_val * cost_ratio, self.min_cost)
+        if trade_val <= 1e-5:
+            # if dealing is not successful, the cost will not be counted.
+            trade_cost = 0
+        return trade_val, trade_cost
+
+    def _get_buy_amount_by_cash_limit(self, trade_price: float, cash: float, cost_ratio: float) -> float:
+        """return the real order amount after cash limit for buying.
+        Parameters
+        ----------
+        trade_price : float
+        cash : float
+        cost_ratio : float
+
+        Return
+        ----------
+        float
+            the real order amount after cash limit for buying.
+        """
+        max_trade_amount = 0.0
+        if cash >= self.min_cost:
+            # critical_price means the stock transaction price when the service fee is equal to min_cost.
+            critical_price = self.min_cost / cost_ratio + self.min_cost
+            if cash >= critical_price:
+                # the service fee is equal to cost_ratio * trade_amount
+                max_trade_amount = cash / (1 + cost_ratio) / trade_price
+            else:
+                # the service fee is equal to min_cost
+                max_trade_amount = (cash - self.min_cost) / trade_price
+        return max_trade_amount
+
+    def get_quote_info(
+        self,
+        stock_id: str,
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+        field: str,
+        method: str = "ts_data_last",
+    ) -> Union[None, int, float, bool, np.ndarray]:
+        return self.quote.get_data(stock_id, start_time, end_time, field=field, method=method)
+
+    def get_close(
+        self,
+        stock_id: str,
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+        method: str = "ts_data_last",
+    ) -> Union[None, int, float, bool, np.ndarray]:
+        return self.quote.get_data(stock_id, start_time, end_time, field="$close", method=method)
+
+    def get_close_array(
+        self,
+        stock_ids: List[str],
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+        method: str = "ts_data_last",
+    ) -> np.ndarray:
+        """the batch version of `get_close`, NaN for the suspended stocks"""
+        return self.quote.get_data_array(self._inst_idx(stock_ids), start_time, end_time, "$close", method)
+
+    def get_volume(
+        self,
+        stock_id: str,
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+        method: Optional[str] = "sum",
+    ) -> Union[None, int, float, bool, np.ndarray]:
+        """get the total deal volume of stock with `stock_id` between the time interval [start_time, end_time)"""
+        return self.quote.get_data(stock_id, start_time, end_time, field="$volume", method=method)
+
+    def get_deal_price(
+        self,
+        stock_id: str,
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+        direction: OrderDir,
+        method: Optional[str] = "ts_data_last",
+    ) -> Union[None, int, float, bool, np.ndarray]:
+        if direction == OrderDir.SELL:
+            pstr = self.sell_price
+        elif direction == OrderDir.BUY:
+            pstr = self.buy_price
+        else:
+            raise NotImplementedError(f"This type of input is not supported")
+
+        deal_price = self.quote.get_data(stock_id, start_time, end_time, field=pstr, method=method)
+        if method is not None and (deal_price is None or np.isnan(deal_price) or deal_price <= 1e-08):
+            self.logger.warning(f"(stock_id:{stock_id}, trade_time:{(start_time, end_time)}, {pstr}): {deal_price}!!!")
+            self.logger.warning(f"setting deal_price to close price")
+            deal_price = self.get_close(stock_id, start_time, end_time, method)
+        return deal_price
+
+    def get_factor(
+        self,
+        stock_id: str,
+        start_time: pd.Timestamp,
+        end_time: pd.Timestamp,
+    ) -> Optional[float]:
+        """
+        Returns
+        -------
+        Optional[float]:
+            `None`: if the stock is suspended `None` may be returned
+            `float`: return factor if the factor exists
+        """
+        assert start_time is not None and end_time is not None, "the time range must be given"
+        return self.quote.get_data(stock_id, start_time, end_time, field="$factor", method="ts_data_last")
+
+    def get_amount_of_trade_unit(
+        self,
+        factor: float | None = None,
+        stock_id: str | None = None,
+        start_time: pd.Timestamp = None,
+        end_time: pd.Timestamp = None,
+    ) -> Optional[float]:
+        """
+        get the trade unit of amount based on **factor**
+        the factor can be given directly or calculated in given time range and stock id.
+        `factor` has higher priority than `stock_id`, `start_time` and `end_time`
+        Parameters
+        ----------
+        factor : float
+            the adjusted factor
+        stock_id : str
+            the id of the stock
+        start_time :
+            the start time of trading range
+        end_time :
+            the end time of trading range
+        """
+        if not self.trade_w_adj_price and self.trade_unit is not None:
+            if stock_id is not None and start_time is not None and end_time is not None:
+                factor = self.get_factor(stock_id=stock_id, start_time=start_time, end_time=end_time)
+            elif factor is None:
+                raise ValueError(f"`factor` and (`stock_id`, `start_time`, `end_time`) can't both be None")
+            assert factor is not None
+            return self.trade_unit / factor
+        else:
+            return None
+
+    def round_amount_by_trade_unit(self, deal_amount: float, factor: float | None = None) -> float:
+        """Parameter
+        Please refer to the docs of get_amount_of_trade_unit
+        deal_amount : float, adjusted amount
+        factor : float, adjusted factor
+        return : float, real amount
+        """
+        if not self.trade_w_adj_price and self.trade_unit is not None and factor is not None:
+            # the minimal amount is 1. Add 0.1 for solving precision problem.
+            return (deal_amount * factor + 0.1) // self.trade_unit * self.trade_unit / factor
+        return deal_amount
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import json
+import logging
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from ..log import get_module_logger
+
+TimeLike = Union[str, pd.Timestamp, np.datetime64]
+
+
+def _to_dt64(t: TimeLike) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(t).to_datetime64(), "ns")
+
+
+def reduce_ts_data(block: np.ndarray, method: Optional[str]) -> np.ndarray:
+    """
+    Aggregate the quote data along the last axis (the time axis)
+
+    Parameters
+    ----------
+    block : np.ndarray
+        data with shape (..., time); NaN means missing
+    method : str
+        - "ts_data_last": the last valid value
+        - "last": the last value, regardless of whether it is valid
+        - "sum" / "mean": NaN is ignored; NaN when there is no valid value
+        - "all" / "any": NaN is regarded as False
+
+    Returns
+    -------
+    np.ndarray:
+        the aggregated data with shape (...)
+    """
+    if method == "ts_data_last":
+        valid = ~np.isnan(block)
+        pos = block.shape[-1] - 1 - np.argmax(valid[..., ::-1], axis=-1)
+        res = np.take_along_axis(block, pos[..., None], axis=-1)[..., 0]
+        return np.where(valid.any(axis=-1), res, np.nan)
+    if method == "last":
+        return block[..., -1]
+    if method in ("sum", "mean"):
+        valid = ~np.isnan(block)
+        res = np.where(valid, block, 0.0).sum(axis=-1)
+        cnt = valid.sum(axis=-1)
+        if method == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                res = res / cnt
+        return np.where(cnt > 0, res, np.nan)
+    if method == "all":
+        return (np.nan_to_num(block) != 0).all(axis=-1)
+    if method == "any":
+        return (np.nan_to_num(block) != 0).any(axis=-1)
+    raise ValueError(f"{method} is not supported")
+
+
+class BaseQuote:
+    def __init__(self, quote_df: pd.DataFrame, freq: str) -> None:
+        self.logger = get_module_logger("online operator", level=logging.INFO)
+
+    def get_all_stock(self) -> Iterable:
+        """return all stock codes
+
+        Return
+        ------
+        Iterable
+            all stock codes
+        """
+
+        raise NotImplementedError(f"Please implement the `get_all_stock` method")
+
+    def get_data(
+        self,
+        stock_id: str,
+        start_time: TimeLike,
+        end_time: TimeLike,
+        field: str,
+        method: Optional[str] = None,
+    ) -> Union[None, int, float, bool, np.ndarray]:
+        """get the specific field of stock data during start time and end_time,
+           and apply method to the data.
+
+        Parameters
+        ----------
+        stock_id : str
+        start_time : Union[pd.Timestamp, str]
+            closed start time for backtest
+        end_time : Union[pd.Timestamp, str]
+            closed end time for backtest
+        field : str
+            the columns of data to fetch
+        method : Union[str, None]
+            the method apply to data.
+            e.g ["ts_data_last", "last", "sum", "mean", "all", "any", None]
+
+        Return
+        ----------
+        Union[None, int, float, bool, np.ndarray]
+            it will return None in following cases
+            - There is no stock data which meet the query criterion from data source.
+            - The `method` returns None
+        """
+
+        raise NotImplementedError(f"Please implement the `get_data` method")
+
+
+class NumpyQuote(BaseQuote):
+    """
+    The quote of all the stocks is kept as one dense float32 block with shape (field, instrument, time).
+
+    The lookups of a time range are two `searchsorted` calls on the calendar, so querying the quote of all the
+    orders in a trading step costs a single fancy-indexing on the block instead of one DataFrame query per order.
+
+    The block can be saved to a directory and loaded back as a read-only memory map (see `save` and `load`), so
+    the runs over the same universe and window share the quote without loading it from the provider again.
+    """
+
+    DATA_FILE = "data.npy"
+    CALENDAR_FILE = "calendar.npy"
+    META_FILE = "meta.json"
+
+    def __init__(self, quote_df: pd.DataFrame, freq: str) -> None:
+        """
+        Parameters
+        ----------
+        quote_df : pd.DataFrame
+            the init dataframe from qlib, the index is (instrument, datetime), the columns are the fields
+        freq : str
+            the frequency of the quote
+        """
+        super().__init__(quote_df=quote_df, freq=freq)
+        self.freq = freq
+        quote_df = quote_df.sort_index()
+        inst = quote_df.index.get_level_values("instrument")
+        dt = quote_df.index.get_level_values("datetime")
+
+        self._codes: List[str] = list(pd.unique(inst))
+        self._inst_index: Dict[str, int] = {code: i for i, code in enumerate(self._codes)}
+        self._calendar = np.unique(dt.values.astype("datetime64[ns]"))
+        self._fields: List[str] = list(quote_df.columns)
+        self._field_index: Dict[str, int] = {field: i for i, field in enumerate(self._fields)}
+
+        inst_idx = pd.Index(self._codes).get_indexer(inst)
+        time_idx = np.searchsorted(self._calendar, dt.values.astype("datetime64[ns]"))
+        self._data = np.full((len(self._fields), len(self._codes), len(self._calendar)), np.nan, dtype=np.float32)
+        self._data[:, inst_idx, time_idx] = quote_df.values.astype(np.float32).T
+
+    @classmethod
+    def from_arrays(
+        cls, data: np.ndarray, codes: List[str], calendar: np.ndarray, fields: List[str], freq: str
+    ) -> "NumpyQuote":
+        """
+        Create the quote from the dense block directly
+
+        Parameters
+        ----------
+        data : np.ndarray
+            block with shape (field, instrument, time); it can be a memory map
+        """
+        if data.shape != (len(fields), len(codes), len(calendar)):
+            raise ValueError(f"the shape of data {data.shape} doesn't match the fields, codes and calendar")
+        obj = cls.__new__(cls)
+        BaseQuote.__init__(obj, quote_df=None, freq=freq)
+        obj.freq = freq
+        obj._codes = list(codes)
+        obj._inst_index = {code: i for i, code in enumerate(obj._codes)}
+        obj._calendar = np.asarray(calendar, dtype="datetime64[ns]")
+        obj._fields = list(fields)
+        obj._field_index = {field: i for i, field in enumerate(obj._fields)}
+        obj._data = data
+        return obj
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Save the quote into the directory `path`
+
+        The files are written into a temporary directory which is renamed to `path` at last, so a concurrent
+        `load` never sees a partially written quote.
+        """
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        tmp_path.mkdir(parents=True)
+        try:
+            np.save(tmp_path / self.DATA_FILE, np.ascontiguousarray(self._data))
+            np.save(tmp_path / self.CALENDAR_FILE, self._calendar)
+            meta = {"codes": self._codes, "fields": self._fields, "freq": self.freq}
+            (tmp_path / self.META_FILE).write_text(json.dumps(meta))
+            try:
+                tmp_path.rename(path)
+            except OSError:
+                # `path` has been saved by another process
+                if not path.joinpath(self.META_FILE).exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "NumpyQuote":
+        """
+        Load the quote saved by `save`
+
+        Parameters
+        ----------
+        mmap : bool
+            map the block into memory read-only instead of reading it, the pages are shared by all the processes
+            loading the same quote
+        """
+        path = Path(path)
+        meta = json.loads((path / cls.META_FILE).read_text())
+        data = np.load(path / cls.DATA_FILE, mmap_mode="r" if mmap else None)
+        calendar = np.load(path / cls.CALENDAR_FILE)
+        return cls.from_arrays(data, meta["codes"], calendar, meta["fields"], meta["freq"])
+
+    @staticmethod
+    def exists(path: Union[str, Path]) -> bool:
+        return Path(path).joinpath(NumpyQuote.META_FILE).exists()
+
+    def get_all_stock(self) -> Iterable:
+        return list(self._codes)
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self._fields)
+
+    @property
+    def calendar(self) -> np.ndarray:
+        return self._calendar
+
+    def get_field_data(self, field: str) -> np.ndarray:
+        """the (instrument, time) block of `field`"""
+        return self._data[self._field_index[field]]
+
+    def get_stock_idx(self, stock_id: str) -> int:
+        """the index of the stock in the quote, -1 for the stock without quote"""
+        return self._inst_index.get(stock_id, -1)
+
+    def get_time_idx(self, time: TimeLike) -> int:
+        """the index of the last bar starting at or before `time`, -1 if `time` is before the quote"""
+        return int(np.searchsorted(self._calendar, _to_dt64(time), side="right")) - 1
+
+    def get_data_by_idx(self, inst_idx: Union[int, np.ndarray], time_idx: Union[int, np.ndarray], field: str):
+        """O(1) lookup of `field` by the index of the instrument and of the bar"""
+        return self._data[self._field_index[field], inst_idx, time_idx]
+
+    def get_inst_idx(self, stock_ids: Iterable[str]) -> np.ndarray:
+        """the index of the stocks in the quote, -1 for the stocks without quote"""
+        return np.fromiter((self._inst_index.get(code, -1) for code in stock_ids), dtype=np.int64)
+
+    def get_time_slice(self, start_time: TimeLike, end_time: TimeLike) -> slice:
+        """the slice of the quote calendar in [start_time, end_time]"""
+        start = np.searchsorted(self._calendar, _to_dt64(start_time), side="left")
+        end = np.searchsorted(self._calendar, _to_dt64(end_time), side="right")
+        return slice(int(start), int(end))
+
+    def get_data(
+        self,
+        stock_id: str,
+        start_time: TimeLike,
+        end_time: TimeLike,
+        field: str,
+        method: Optional[str] = None,
+    ) -> Union[None, int, float, bool, np.ndarray]:
+        inst_idx = self._inst_index.get(stock_id)
+        if inst_idx is None:
+            return None
+        block = self._data[self._field_index[field], inst_idx, self.get_time_slice(start_time, end_time)]
+        if len(block) == 0:
+            return None
+        if method is None:
+            return block[0].item() if len(block) == 1 else block.astype(np.float64)
+        res = reduce_ts_data(block.astype(np.float64), method)
+        if not isinstance(res, np.bool_) and np.isnan(res):
+            return None
+        return res.item()
+
+    def get_data_array(
+        self,
+        inst_idx: np.ndarray,
+        start_time: TimeLike,
+        end_time: TimeLike,
+        field: str,
+        method: str,
+    ) -> np.ndarray:
+        """
+        The batch version of `get_data`
+
+        Parameters
+        ----------
+        inst_idx : np.ndarray
+            the result of `get_inst_idx`
+
+        Returns
+        -------
+        np.ndarray:
+            the aggregated data aligned to `inst_idx`; NaN (or False for "all"/"any") for the missing data
+        """
+        sl = self.get_time_slice(start_time, end_time)
+        block = self._data[self._field_index[field]][np.maximum(inst_idx, 0), sl].astype(np.float64)
+        block[inst_idx < 0] = np.nan
+        if block.shape[1] == 0:
+            block = np.full((len(inst_idx), 1), np.nan)
+        return reduce_ts_data(block, method)
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import copy
 from datetime import timedelta
 from typing import Any, Dict, List, Union
 
 import numpy as np
 import pandas as pd 
 
+from .decision import Order
+
 class BasePosition:
     """
     The Position wants to maintain the position like a dictionary
@@ -19,6 +22,17 @@ class BasePosition:
     def fill_stock_value(self, start_time: Union[str, pd.Timestamp], freq: str, last_days: int = 30) -> None:
         pass
 
+    def fork(self) -> BasePosition:
+        """
+        Create an independent copy of the position, e.g. for a what-if branch of the trading which may be discarded
+
+        Returns
+        -------
+        BasePosition:
+            the updates on the copy don't affect the original position and vice versa
+        """
+        return copy.deepcopy(self)
+
     def skip_update(self) -> bool:
         """
         Should we skip updating operation for this position
@@ -47,17 +61,578 @@ class BasePosition:
         """
         raise NotImplementedError(f"Please implement the `check_stock` method")
     
-    # def update_order(self, order: Order, trade_val: float, cost: float, trade_price: float) -> None:
-    #     """
-    #     Parameters
-    #     ----------
-    #     order : Order
-    #         the order to update the position
-    #     trade_val : float
-    #         the trade value(money) of dealing results
-    #     cost : float
-    #         the trade cost of the dealing results
-    #     trade_price : float
-    #         the trade price of the dealing results
-    #     """
-    #     raise NotImplementedError(f"Please implement the `update_order` method")
\ No newline at end of file
+    def update_order(self, order: Order, trade_val: float, cost: float, trade_price: float) -> None:
+        """
+        Parameters
+        ----------
+        order : Order
+            the order to update the position
+        trade_val : float
+            the trade value(money) of dealing results
+        cost : float
+            the trade cost of the dealing results
+        trade_price : float
+            the trade price of the dealing results
+        """
+        raise NotImplementedError(f"Please implement the `update_order` method")
+
+    def update_stock_price(self, stock_id: str, price: float) -> None:
+        """
+        Updating the latest price of the order
+        The useful when clearing balance at each bar end
+
+        Parameters
+        ----------
+        stock_id :
+            the id of the stock
+        price : float
+            the price to be updated
+        """
+        raise NotImplementedError(f"Please implement the `update stock price` method")
+
+    def calculate_stock_value(self) -> float:
+        """
+        calculate the value of the all assets except cash in the position
+
+        Returns
+        -------
+        float:
+            the value(money) of all the stock
+        """
+        raise NotImplementedError(f"Please implement the `calculate_stock_value` method")
+
+    def calculate_value(self) -> float:
+        raise NotImplementedError(f"Please implement the `calculate_value` method")
+
+    def get_stock_list(self) -> List[str]:
+        """
+        Get the list of stocks in the position.
+        """
+        raise NotImplementedError(f"Please implement the `get_stock_list` method")
+
+    def get_stock_price(self, code: str) -> float:
+        """
+        get the latest price of the stock
+
+        Parameters
+        ----------
+        code :
+            the code of the stock
+        """
+        raise NotImplementedError(f"Please implement the `get_stock_price` method")
+
+    def get_stock_amount(self, code: str) -> float:
+        """
+        get the amount of the stock
+
+        Parameters
+        ----------
+        code :
+            the code of the stock
+
+        Returns
+        -------
+        float:
+            the amount of the stock
+        """
+        raise NotImplementedError(f"Please implement the `get_stock_amount` method")
+
+    def get_cash(self, include_settle: bool = False) -> float:
+        """
+        Parameters
+        ----------
+        include_settle:
+            will the unsettled(delayed) cash included
+            Default: not include those unavailable cash
+
+        Returns
+        -------
+        float:
+            the available(tradable) money in position
+        """
+        raise NotImplementedError(f"Please implement the `get_cash` method")
+
+    def get_stock_amount_dict(self) -> dict:
+        """
+        generate stock amount dict {stock_id : amount of stock}
+
+        Returns
+        -------
+        Dict:
+            {stock_id : amount of stock}
+        """
+        raise NotImplementedError(f"Please implement the `get_stock_amount_dict` method")
+
+    def get_stock_weight_dict(self, only_stock: bool = False) -> dict:
+        """
+        generate stock weight dict {stock_id : value weight of stock in the position}
+        it is meaningful in the beginning or the end of each trade step
+        - During execution of each trading step, the weight may be not consistent with the portfolio value
+
+        Parameters
+        ----------
+        only_stock : bool
+            If only_stock=True, the weight of each stock in total stock will be returned
+            If only_stock=False, the weight of each stock in total assets(stock + cash) will be returned
+
+        Returns
+        -------
+        Dict:
+            {stock_id : value weight of stock in the position}
+        """
+        raise NotImplementedError(f"Please implement the `get_stock_weight_dict` method")
+
+    def add_count_all(self, bar: str) -> None:
+        """
+        Will be called at the end of each bar on each level
+
+        Parameters
+        ----------
+        bar :
+            The level to be updated
+        """
+        raise NotImplementedError(f"Please implement the `add_count_all` method")
+
+    def update_weight_all(self) -> None:
+        """
+        Updating the position weight;
+
+        # TODO: this function is a little weird. The weight data in the position is in a wrong state after dealing order
+        # and before updating weight.
+        """
+        raise NotImplementedError(f"Please implement the `add_count_all` method")
+
+    ST_CASH = "cash"
+    ST_NO = "None"  # String is more typehint friendly than None
+
+    def settle_start(self, settle_type: str) -> None:
+        """
+        settlement start
+        It will act like start and commit a transaction
+
+        Parameters
+        ----------
+        settle_type : str
+            Should we make delay the settlement in each execution (each execution will make the executor a step forward)
+            - "cash": make the cash settlement delayed.
+                - The cash you get can't be used in current step (e.g. you can't sell a stock to get cash to buy another
+                  stock)
+            - None: not settlement mechanism
+            - TODO: other assets will be supported in the future.
+        """
+        raise NotImplementedError(f"Please implement the `settle_conf` method")
+
+    def settle_commit(self) -> None:
+        """
+        settlement commit
+        """
+        raise NotImplementedError(f"Please implement the `settle_commit` method")
+
+    def __str__(self) -> str:
+        return self.__dict__.__str__()
+
+    def __repr__(self) -> str:
+        return self.__dict__.__repr__()
+
+
+class Position(BasePosition):
+    """Position
+
+    The stocks are stored as parallel NumPy arrays over a stock-id index, so the mark-to-market of the whole
+    portfolio is a single vectorized operation.
+
+    - `self.position` only keeps the account level values: "cash", "cash_delay" and "now_account_value"
+    - the i-th item of `_amount`, `_price`, `_weight` and of each array in `_count` belongs to `_codes[i]`
+    - a sold out stock is swapped with the last one, so the first `_n` items are always the holding stocks
+
+    `fork` is copy-on-write: the forked positions share the arrays until one of them is updated, then the updated
+    one copies the arrays (a few memcpy) before its first update. So a branch which is only read costs O(1).
+    """
+
+    _INIT_CAPACITY = 16
+
+    def __init__(self, cash: float = 0, position_dict: Dict[str, Union[Dict[str, float], float]] = {}) -> None:
+        """Init position by cash and position_dict.
+
+        Parameters
+        ----------
+        cash : float, optional
+            initial cash in account, by default 0
+        position_dict : Dict[
+                            stock_id,
+                            Union[
+                                int,  # it is equal to {"amount": int}
+                                {"amount": int, "price"(optional): float},
+                            ]
+                        ]
+            initial stocks with parameters amount and price,
+            if there is no price key in the dict of stocks, it will be filled by _fill_stock_value.
+            by default {}.
+        """
+        super().__init__()
+
+        self.init_cash = cash
+        self._codes: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._n = 0
+        capacity = max(self._INIT_CAPACITY, len(position_dict))
+        self._amount = np.zeros(capacity)
+        self._price = np.full(capacity, np.nan)
+        self._weight = np.zeros(capacity)
+        self._count: Dict[str, np.ndarray] = {}
+        # whether the arrays may be shared with a forked position
+        self._cow = False
+
+        for stock_id, value in position_dict.items():
+            if isinstance(value, dict):
+                self._init_stock(stock_id, value["amount"], value.get("price"))
+            else:
+                self._init_stock(stock_id, value)
+        self.position["cash"] = cash
+
+        # If the stock price information is missing, the account value will not be calculated temporarily
+        if not np.isnan(self._price[: self._n]).any():
+            self.position["now_account_value"] = self.calculate_value()
+
+    def fill_stock_value(self, start_time: Union[str, pd.Timestamp], freq: str, last_days: int = 30) -> None:
+        """fill the price of the stocks without price information by their latest close price before `start_time`"""
+        missing = np.flatnonzero(np.isnan(self._price[: self._n]))
+        if len(missing) == 0:
+            return
+        from ..data import D  # pylint: disable=C0415
+
+        self._detach()
+        stock_list = [self._codes[i] for i in missing]
+        start_time = pd.Timestamp(start_time)
+        # note that start time is 2020-01-01 00:00:00 if raw start time is "2020-01-01"
+        price_end_time = start_time
+        price_start_time = start_time - timedelta(days=last_days)
+        price_df = D.features(stock_list, ["$close"], price_start_time, price_end_time, freq=freq).dropna()
+        price = price_df.groupby(level="instrument", group_keys=False).tail(1)["$close"].droplevel("datetime")
+        price = price.reindex(stock_list)
+        if price.isna().any():
+            lack_stock = set(price.index[price.isna()])
+            raise ValueError(f"{lack_stock} doesn't have close price in qlib in the latest {last_days} days")
+
+        self._price[missing] = price.values
+        self.position["now_account_value"] = self.calculate_value()
+
+    def fork(self) -> Position:
+        # `copy.copy` would go through `__getstate__`, which copies the arrays
+        pos = object.__new__(type(self))
+        pos.__dict__.update(self.__dict__)
+        pos.position = self.position.copy()
+        pos._cow = self._cow = True
+        return pos
+
+    def _detach(self) -> None:
+        """copy the arrays shared with the forked positions before updating them"""
+        if not self._cow:
+            return
+        self._amount = self._amount.copy()
+        self._price = self._price.copy()
+        self._weight = self._weight.copy()
+        self._count = {bar: count.copy() for bar, count in self._count.items()}
+        self._codes = list(self._codes)
+        self._index = dict(self._index)
+        self._cow = False
+
+    def _grow(self) -> None:
+        capacity = max(2 * len(self._amount), self._INIT_CAPACITY)
+        for name, fill in (("_amount", 0.0), ("_price", np.nan), ("_weight", 0.0)):
+            arr = np.full(capacity, fill)
+            arr[: self._n] = getattr(self, name)[: self._n]
+            setattr(self, name, arr)
+        for bar, count in self._count.items():
+            arr = np.zeros(capacity, dtype=count.dtype)
+            arr[: self._n] = count[: self._n]
+            self._count[bar] = arr
+
+    def _init_stock(self, stock_id: str, amount: float, price: float | None = None) -> None:
+        """
+        initialization the stock in current position
+
+        Parameters
+        ----------
+        stock_id :
+            the id of the stock
+        amount : float
+            the amount of the stock
+        price :
+             the price when buying the init stock
+        """
+        self._detach()
+        if self._n == len(self._amount):
+            self._grow()
+        i = self._n
+        self._codes.append(stock_id)
+        self._index[stock_id] = i
+        self._amount[i] = amount
+        self._price[i] = np.nan if price is None else price
+        self._weight[i] = 0  # update the weight in the end of the trade date
+        for count in self._count.values():
+            count[i] = 0
+        self._n += 1
+
+    def _del_stock(self, stock_id: str) -> None:
+        self._detach()
+        i = self._index.pop(stock_id)
+        last = self._n - 1
+        if i != last:
+            # move the last stock into the hole
+            last_id = self._codes[last]
+            self._codes[i] = last_id
+            self._index[last_id] = i
+            for arr in (self._amount, self._price, self._weight, *self._count.values()):
+                arr[i] = arr[last]
+        self._codes.pop()
+        self._n = last
+
+    def _buy_stock(self, stock_id: str, trade_val: float, cost: float, trade_price: float) -> None:
+        self._detach()
+        trade_amount = trade_val / trade_price
+        if stock_id not in self._index:
+            self._init_stock(stock_id=stock_id, amount=trade_amount, price=trade_price)
+        else:
+            # exist, add amount
+            self._amount[self._index[stock_id]] += trade_amount
+
+        self.position["cash"] -= trade_val + cost
+
+    def _sell_stock(self, stock_id: str, trade_val: float, cost: float, trade_price: float) -> None:
+        trade_amount = trade_val / trade_price
+        if stock_id not in self._index:
+            raise KeyError("{} not in current position".format(stock_id))
+        self._detach()
+        i = self._index[stock_id]
+        if np.isclose(self._amount[i], trade_amount):
+            # Selling all the stocks
+            # we use np.isclose instead of abs(<the final amount>) <= 1e-5  because `np.isclose` consider both
+            # relative amount and absolute amount
+            # Using abs(<the final amount>) <= 1e-4 will result in error when the amount is large
+            self._del_stock(stock_id)
+        else:
+            # decrease the amount of stock
+            self._amount[i] -= trade_amount
+            # check if to delete
+            if self._amount[i] < -1e-5:
+                raise ValueError(
+                    "only have {} {}, require {}".format(self._amount[i] + trade_amount, stock_id, trade_amount),
+                )
+
+        new_cash = trade_val - cost
+        if self._settle_type == self.ST_CASH:
+            self.position["cash_delay"] += new_cash
+        elif self._settle_type == self.ST_NO:
+            self.position["cash"] += new_cash
+        else:
+            raise NotImplementedError(f"This type of input is not supported")
+
+    def check_stock(self, stock_id: str) -> bool:
+        return stock_id in self._index
+
+    def update_order(self, order: Order, trade_val: float, cost: float, trade_price: float) -> None:
+        # handle order, order is a order class, defined in exchange.py
+        if order.direction == Order.BUY:
+            # BUY
+            self._buy_stock(order.stock_id, trade_val, cost, trade_price)
+        elif order.direction == Order.SELL:
+            # SELL
+            self._sell_stock(order.stock_id, trade_val, cost, trade_price)
+        else:
+            raise NotImplementedError("do not support order direction {}".format(order.direction))
+
+    def update_stock_price(self, stock_id: str, price: float) -> None:
+        self._detach()
+        self._price[self._index[stock_id]] = price
+
+    def update_stock_price_array(self, price: np.ndarray, mask: np.ndarray | None = None) -> None:
+        """
+        Update the price of all the holding stocks at once
+
+        Parameters
+        ----------
+        price : np.ndarray
+            the latest price aligned to `get_stock_list()`
+        mask : np.ndarray, optional
+            only the stocks with True are updated (e.g. the suspended stocks keep their price)
+        """
+        self._detach()
+        if mask is None:
+            self._price[: self._n] = price
+        else:
+            self._price[: self._n] = np.where(mask, price, self._price[: self._n])
+
+    def update_stock_count(self, stock_id: str, bar: str, count: float) -> None:
+        self._get_count(bar)[self._index[stock_id]] = count
+
+    def update_stock_weight(self, stock_id: str, weight: float) -> None:
+        self._detach()
+        self._weight[self._index[stock_id]] = weight
+
+    def calculate_stock_value(self) -> float:
+        return float(np.dot(self._amount[: self._n], self._price[: self._n]))
+
+    def calculate_value(self) -> float:
+        value = self.calculate_stock_value()
+        value += self.position["cash"] + self.position.get("cash_delay", 0.0)
+        return value
+
+    def get_stock_list(self) -> List[str]:
+        return list(self._codes)
+
+    def get_stock_price(self, code: str) -> float:
+        return float(self._price[self._index[code]])
+
+    def get_stock_amount(self, code: str) -> float:
+        return float(self._amount[self._index[code]]) if code in self._index else 0
+
+    def get_stock_count(self, code: str, bar: str) -> float:
+        """the days the account has been hold, it may be used in some special strategies"""
+        if bar in self._count:
+            return int(self._count[bar][self._index[code]])
+        return 0
+
+    def get_stock_weight(self, code: str) -> float:
+        return float(self._weight[self._index[code]])
+
+    def get_stock_price_array(self) -> np.ndarray:
+        """the latest price of the holding stocks aligned to `get_stock_list()`"""
+        return self._price[: self._n].copy()
+
+    def get_stock_amount_array(self) -> np.ndarray:
+        """the amount of the holding stocks aligned to `get_stock_list()`"""
+        return self._amount[: self._n].copy()
+
+    def get_cash(self, include_settle: bool = False) -> float:
+        cash = self.position["cash"]
+        if include_settle:
+            cash += self.position.get("cash_delay", 0.0)
+        return cash
+
+    def get_stock_amount_dict(self) -> dict:
+        """generate stock amount dict {stock_id : amount of stock}"""
+        return dict(zip(self._codes, self._amount[: self._n].tolist()))
+
+    def _get_weight_array(self, only_stock: bool = False) -> np.ndarray:
+        position_value = self.calculate_stock_value() if only_stock else self.calculate_value()
+        return self._amount[: self._n] * self._price[: self._n] / position_value
+
+    def get_stock_weight_dict(self, only_stock: bool = False) -> dict:
+        """get_stock_weight_dict
+        generate stock weight dict {stock_id : value weight of stock in the position}
+        it is meaningful in the beginning or the end of each trade date
+
+        :param only_stock: If only_stock=True, the weight of each stock in total stock will be returned
+                           If only_stock=False, the weight of each stock in total assets(stock + cash) will be returned
+        """
+        return dict(zip(self._codes, self._get_weight_array(only_stock).tolist()))
+
+    def _get_count(self, bar: str) -> np.ndarray:
+        self._detach()
+        if bar not in self._count:
+            self._count[bar] = np.zeros(len(self._amount), dtype=np.int64)
+        return self._count[bar]
+
+    def add_count_all(self, bar: str) -> None:
+        self._get_count(bar)[: self._n] += 1
+
+    def update_weight_all(self) -> None:
+        weight = self._get_weight_array()
+        self._detach()
+        self._weight[: self._n] = weight
+
+    def settle_start(self, settle_type: str) -> None:
+        assert self._settle_type == self.ST_NO, "Currently, settlement can't be nested!!!!!"
+        self._settle_type = settle_type
+        if settle_type == self.ST_CASH:
+            self.position["cash_delay"] = 0.0
+
+    def settle_commit(self) -> None:
+        if self._settle_type != self.ST_NO:
+            if self._settle_type == self.ST_CASH:
+                self.position["cash"] += self.position["cash_delay"]
+                del self.position["cash_delay"]
+            else:
+                raise NotImplementedError(f"This type of input is not supported")
+            self._settle_type = self.ST_NO
+
+    def __getstate__(self) -> dict:
+        # only the holding part of the arrays is kept, e.g. in the deepcopy of `Account.hist_positions`
+        state = self.__dict__.copy()
+        for name in ("_amount", "_price", "_weight"):
+            state[name] = state[name][: self._n].copy()
+        state["_count"] = {bar: count[: self._n].copy() for bar, count in self._count.items()}
+        state["_codes"] = list(self._codes)
+        state["_index"] = dict(self._index)
+        state["_cow"] = False
+        return state
+
+
+class InfPosition(BasePosition):
+    """
+    Position with infinite cash and amount.
+
+    This is useful for generating random orders.
+    """
+
+    def fork(self) -> InfPosition:
+        # InfPosition has no state to be updated
+        return copy.copy(self)
+
+    def skip_update(self) -> bool:
+        """Updating state is meaningless for InfPosition"""
+        return True
+
+    def check_stock(self, stock_id: str) -> bool:
+        # InfPosition always have any stocks
+        return True
+
+    def update_order(self, order: Order, trade_val: float, cost: float, trade_price: float) -> None:
+        pass
+
+    def update_stock_price(self, stock_id: str, price: float) -> None:
+        pass
+
+    def calculate_stock_value(self) -> float:
+        """
+        Returns
+        -------
+        float:
+            infinity stock value
+        """
+        return np.inf
+
+    def calculate_value(self) -> float:
+        raise NotImplementedError(f"InfPosition doesn't support calculating value")
+
+    def get_stock_list(self) -> List[str]:
+        raise NotImplementedError(f"InfPosition doesn't support stock list position")
+
+    def get_stock_price(self, code: str) -> float:
+        """the price of the inf position is meaningless"""
+        return np.nan
+
+    def get_stock_amount(self, code: str) -> float:
+        return np.inf
+
+    def get_cash(self, include_settle: bool = False) -> float:
+        return np.inf
+
+    def get_stock_amount_dict(self) -> dict:
+        raise NotImplementedError(f"InfPosition doesn't support get_stock_amount_dict")
+
+    def get_stock_weight_dict(self, only_stock: bool = False) -> dict:
+        raise NotImplementedError(f"InfPosition doesn't support get_stock_weight_dict")
+
+    def add_count_all(self, bar: str) -> None:
+        raise NotImplementedError(f"InfPosition doesn't support add_count_all")
+
+    def update_weight_all(self) -> None:
+        raise NotImplementedError(f"InfPosition doesn't support update_weight_all")
+
+    def settle_start(self, settle_type: str) -> None:
+        pass
+
+    def settle_commit(self) -> None:
+        pass
@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import copy
+import pathlib
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from ..utils.time import Freq, epsilon_change
+
+
+def get_annual_scaler(freq: str) -> float:
+    """the number of the bars of `freq` in a year, used to annualize the risk metrics"""
+    _freq = Freq(freq)
+    if _freq.base == Freq.NORM_FREQ_MINUTE:
+        return 238 * 240 / _freq.count
+    return {Freq.NORM_FREQ_DAY: 238, Freq.NORM_FREQ_WEEK: 50, Freq.NORM_FREQ_MONTH: 12}[_freq.base] / _freq.count
+
+
+class BenchmarkReturn:
+    """
+    The return of the benchmark on each bar
+
+    The returns are kept as the cumulative product of (1 + return) over the calendar, so the return over any trading
+    step is two binary searches instead of a query to the provider.
+    """
+
+    def __init__(self, bench: pd.Series) -> None:
+        """
+        Parameters
+        ----------
+        bench : pd.Series
+            the index is the start time of the bars; the value T is the change from T-1 to T
+        """
+        bench = bench.sort_index()
+        self.times = pd.DatetimeIndex(bench.index).values.astype("datetime64[ns]")
+        self.cum = np.concatenate([[1.0], np.cumprod(1 + np.nan_to_num(bench.values.astype(np.float64)))])
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def get_return(self, start_time: Union[str, pd.Timestamp], end_time: Union[str, pd.Timestamp]) -> float:
+        """the compounded return of the bars in [start_time, end_time], 0 if there is no bar"""
+        start = np.searchsorted(self.times, pd.Timestamp(start_time).to_datetime64(), side="left")
+        end = np.searchsorted(self.times, pd.Timestamp(end_time).to_datetime64(), side="right")
+        if end <= start:
+            return 0.0
+        return float(self.cum[end] / self.cum[start] - 1)
+
+    def to_series(self) -> pd.Series:
+        return pd.Series(self.cum[1:] / self.cum[:-1] - 1, index=pd.DatetimeIndex(self.times, name="datetime"))
+
+
+def load_benchmark_return(
+    benchmark: Union[str, list, dict],
+    freq: str,
+    start_time: Union[str, pd.Timestamp, None] = None,
+    end_time: Union[str, pd.Timestamp, None] = None,
+) -> BenchmarkReturn:
+    """
+    Load the return of the benchmark on the whole calendar in [start_time, end_time] at once
+
+    The result is cached in the memory cache `H["f"]` by (benchmark, freq, window), so the accounts of all the
+    levels and all the runs of the same backtest share it.
+
+    Parameters
+    ----------
+    benchmark : Union[str, list, dict]
+        - str: the code of an index (or a stock)
+        - list: the codes of an equal weighted basket
+        - dict: {code: weight} of a weighted basket
+        The weights of a basket are normalized on each bar over the codes with data on that bar.
+    """
+    from ..data import D  # pylint: disable=C0415
+    from ..data.cache import H  # pylint: disable=C0415
+
+    if end_time is not None and Freq(freq).base == Freq.NORM_FREQ_MINUTE:
+        end_time = pd.Timestamp(end_time)
+        if end_time == end_time.normalize():
+            # a date-only end_time includes all the minutes of that day
+            end_time = epsilon_change(end_time + pd.Timedelta(days=1))
+
+    if isinstance(benchmark, str):
+        weights = {benchmark: 1.0}
+    elif isinstance(benchmark, dict):
+        weights = {code: float(w) for code, w in benchmark.items()}
+    else:
+        weights = {code: 1.0 for code in benchmark}
+    cache_key = (
+        "benchmark",
+        tuple(sorted(weights.items())),
+        str(Freq(freq)),
+        None if start_time is None else str(pd.Timestamp(start_time)),
+        None if end_time is None else str(pd.Timestamp(end_time)),
+    )
+    res = H["f"].get(cache_key)
+    if res is not None:
+        return res
+
+    field = "$close / Ref($close, 1) - 1"
+    df = D.features(list(weights), [field], start_time, end_time, freq=freq)
+    if len(df) == 0:
+        raise ValueError(f"The benchmark {benchmark} does not exist. Please provide the right benchmark")
+    ret = df[field].unstack(level="instrument")
+    values = ret.values
+    w = np.array([weights[code] for code in ret.columns])
+    valid = ~np.isnan(values)
+    total_w = valid @ w
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bench = np.where(valid, values, 0.0) @ w / total_w
+    res = BenchmarkReturn(pd.Series(np.where(total_w > 0, bench, 0.0), index=ret.index))
+    H["f"][cache_key] = res
+    return res
+
+
+class PortfolioMetrics:
+    """
+    Motivation:
+        PortfolioMetrics is for supporting portfolio related metrics.
+
+    Implementation:
+
+        daily portfolio metrics of the account
+        contain those followings: return, cost, turnover, account, cash, bench, value
+        For each step(bar/day/minute), each column represents
+        - return: the return of the portfolio generated by strategy **without transaction fee**.
+        - cost: the transaction fee and slippage.
+        - account: the total value of assets(cash and securities are both included) in user account based on the
+          close price of each step.
+        - cash: the amount of cash in user's account.
+        - bench: the return of the benchmark
+        - value: the total value of securities/stocks/instruments (cash is excluded).
+
+        The records are kept in preallocated arrays which grow geometrically, and the risk metrics (sharpe,
+        information ratio and drawdown) are updated in O(1) per step from prefix sums, so neither the recording nor
+        the report is quadratic in the length of the backtest.
+
+        - sharpe: the annualized sharpe ratio of the return after cost
+        - information_ratio: the annualized information ratio of the excess return after cost
+        - drawdown: the drawdown of the account value from its peak
+        - max_drawdown: the max drawdown until the step
+
+        If `window` is given, sharpe and information_ratio are calculated over the latest `window` steps instead of
+        all the steps so far.
+    """
+
+    _INIT_CAPACITY = 256
+
+    RECORD_FIELDS = ("account", "return", "total_turnover", "turnover", "total_cost", "cost", "value", "cash", "bench")
+    RISK_FIELDS = ("sharpe", "information_ratio", "drawdown", "max_drawdown")
+
+    def __init__(self, freq: str = "day", benchmark_config: dict = {}, window: Optional[int] = None) -> None:
+        """
+        benchmark_config
+        benchmark_config : dict
+            config of benchmark, may including the following arguments:
+            - benchmark : Union[str, list, dict, pd.Series]
+                - If `benchmark` is str, list or dict, it is an index or a basket, please refer to
+                  `load_benchmark_return` for details
+                - If `benchmark` is pd.Series, `index` is trading date; the value T is the change from T-1 to T.
+                    example:
+                        print(D.features(D.instruments('csi500'), ['$close/Ref($close, 1)-1'])['$close/Ref($close, 1)-1'].head())
+                            2017-01-04    0.011693
+                            2017-01-05    0.000721
+                            2017-01-06   -0.004322
+                            2017-01-09    0.006874
+                            2017-01-10   -0.003350
+                - If `benchmark` is None, the return of the benchmark is 0
+            - start_time : Union[str, pd.Timestamp], optional
+                - If `benchmark` is pd.Series, it will be ignored
+                - Else, it represent start time of benchmark, by default None
+            - end_time : Union[str, pd.Timestamp], optional
+                - If `benchmark` is pd.Series, it will be ignored
+                - Else, it represent end time of benchmark, by default None
+        window : int, optional
+            the number of the latest steps used by the rolling sharpe and information ratio, all the steps by default
+        """
+        self.freq = freq
+        self.window = window
+        self.annual_scaler = get_annual_scaler(freq)
+        self.init_vars()
+        self.init_bench(freq=freq, benchmark_config=benchmark_config)
+
+    def init_vars(self) -> None:
+        self._n = 0
+        self._times = np.empty(self._INIT_CAPACITY, dtype="datetime64[ns]")
+        self._records: Dict[str, np.ndarray] = {
+            field: np.zeros(self._INIT_CAPACITY) for field in self.RECORD_FIELDS + self.RISK_FIELDS
+        }
+        # prefix sums of the net return, the excess return and their squares; the item i is the sum of the first i
+        self._prefix: Dict[str, np.ndarray] = {
+            name: np.zeros(self._INIT_CAPACITY + 1) for name in ("net", "net_sq", "excess", "excess_sq")
+        }
+        self._peak = -np.inf
+        self.latest_pm_time: Optional[pd.Timestamp] = None
+
+    def init_bench(self, freq: str | None = None, benchmark_config: dict | None = None) -> None:
+        if freq is not None:
+            self.freq = freq
+        self.benchmark_config = benchmark_config
+        self.bench = self._cal_benchmark(self.benchmark_config, self.freq)
+
+    @staticmethod
+    def _cal_benchmark(benchmark_config: Optional[dict], freq: str) -> Optional[BenchmarkReturn]:
+        if benchmark_config is None:
+            return None
+        benchmark = benchmark_config.get("benchmark", None)
+        if benchmark is None:
+            return None
+        if isinstance(benchmark, pd.Series):
+            return BenchmarkReturn(benchmark)
+        return load_benchmark_return(
+            benchmark, freq, benchmark_config.get("start_time", None), benchmark_config.get("end_time", None)
+        )
+
+    def _sample_benchmark(
+        self,
+        bench: Optional[BenchmarkReturn],
+        trade_start_time: Union[str, pd.Timestamp],
+        trade_end_time: Union[str, pd.Timestamp],
+    ) -> float:
+        if bench is None:
+            return 0.0
+        return bench.get_return(trade_start_time, trade_end_time)
+
+    def fork(self) -> PortfolioMetrics:
+        """an independent copy of the records; the benchmark is read-only and shared"""
+        pm = copy.copy(self)
+        pm._times = self._times.copy()
+        pm._records = {field: arr.copy() for field, arr in self._records.items()}
+        pm._prefix = {name: arr.copy() for name, arr in self._prefix.items()}
+        return pm
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._times)
+        times = np.empty(capacity, dtype="datetime64[ns]")
+        times[: self._n] = self._times[: self._n]
+        self._times = times
+        for name, arr in self._records.items():
+            self._records[name] = np.resize(arr, capacity)
+        for name, arr in self._prefix.items():
+            self._prefix[name] = np.resize(arr, capacity + 1)
+
+    def is_empty(self) -> bool:
+        return self._n == 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def get_latest_date(self) -> pd.Timestamp:
+        return self.latest_pm_time
+
+    def get_latest_account_value(self) -> float:
+        return float(self._records["account"][self._n - 1])
+
+    def get_latest_total_cost(self) -> float:
+        return float(self._records["total_cost"][self._n - 1])
+
+    def get_latest_total_turnover(self) -> float:
+        return float(self._records["total_turnover"][self._n - 1])
+
+    def update_portfolio_metrics_record(
+        self,
+        trade_start_time: Union[str, pd.Timestamp] = None,
+        trade_end_time: Union[str, pd.Timestamp] = None,
+        account_value: float | None = None,
+        cash: float | None = None,
+        return_rate: float | None = None,
+        total_turnover: float | None = None,
+        turnover_rate: float | None = None,
+        total_cost: float | None = None,
+        cost_rate: float | None = None,
+        stock_value: float | None = None,
+        bench_value: float | None = None,
+    ) -> None:
+        # check data
+        if None in [
+            trade_start_time,
+            account_value,
+            cash,
+            return_rate,
+            total_turnover,
+            turnover_rate,
+            total_cost,
+            cost_rate,
+            stock_value,
+        ]:
+            raise ValueError(
+                "None in [trade_start_time, account_value, cash, return_rate, total_turnover, turnover_rate, "
+                "total_cost, cost_rate, stock_value]",
+            )
+
+        if trade_end_time is None and bench_value is None:
+            raise ValueError("Both trade_end_time and bench_value is None, benchmark is not usable.")
+        elif bench_value is None:
+            bench_value = self._sample_benchmark(self.bench, trade_start_time, trade_end_time)
+
+        if self._n == len(self._times):
+            self._grow()
+        i = self._n
+        trade_start_time = pd.Timestamp(trade_start_time)
+        self._times[i] = trade_start_time.to_datetime64()
+        for field, value in zip(
+            self.RECORD_FIELDS,
+            (
+                account_value,
+                return_rate,
+                total_turnover,
+                turnover_rate,
+                total_cost,
+                cost_rate,
+                stock_value,
+                cash,
+                bench_value,
+            ),
+        ):
+            self._records[field][i] = value
+        self._update_risk(i, return_rate - cost_rate, return_rate - cost_rate - bench_value, account_value)
+
+        # update pm
+        self._n += 1
+        self.latest_pm_time = trade_start_time
+        # finish pm update in each step
+
+    def _update_risk(self, i: int, net: float, excess: float, account_value: float) -> None:
+        prefix = self._prefix
+        for name, value in (("net", net), ("net_sq", net * net), ("excess", excess), ("excess_sq", excess * excess)):
+            prefix[name][i + 1] = prefix[name][i] + value
+
+        start = 0 if self.window is None else max(0, i + 1 - self.window)
+        n = i + 1 - start
+
+        def _annual_ratio(name: str) -> float:
+            if n < 2:
+                return np.nan
+            total = prefix[name][i + 1] - prefix[name][start]
+            total_sq = prefix[f"{name}_sq"][i + 1] - prefix[f"{name}_sq"][start]
+            mean = total / n
+            var = max(total_sq - n * mean * mean, 0.0) / (n - 1)
+            if var <= 0:
+                return np.nan
+            return mean / np.sqrt(var) * np.sqrt(self.annual_scaler)
+
+        self._records["sharpe"][i] = _annual_ratio("net")
+        self._records["information_ratio"][i] = _annual_ratio("excess")
+        self._peak = max(self._peak, account_value)
+        drawdown = account_value / self._peak - 1 if self._peak > 0 else 0.0
+        self._records["drawdown"][i] = drawdown
+        self._records["max_drawdown"][i] = min(drawdown, self._records["max_drawdown"][i - 1]) if i > 0 else drawdown
+
+    def get_risk_metrics(self) -> Dict[str, float]:
+        """the latest risk metrics, they are NaN before the first step"""
+        if self.is_empty():
+            return {field: np.nan for field in self.RISK_FIELDS}
+        return {field: float(self._records[field][self._n - 1]) for field in self.RISK_FIELDS}
+
+    def get_record_array(self, field: str) -> np.ndarray:
+        """the read-only view of the records of `field` (one of `RECORD_FIELDS` and `RISK_FIELDS`)"""
+        arr = self._records[field][: self._n]
+        arr.flags.writeable = False
+        return arr
+
+    def get_time_array(self) -> np.ndarray:
+        """the read-only view of the start time of the recorded steps"""
+        arr = self._times[: self._n]
+        arr.flags.writeable = False
+        return arr
+
+    def generate_portfolio_metrics_dataframe(self, with_risk: bool = False) -> pd.DataFrame:
+        fields = self.RECORD_FIELDS + (self.RISK_FIELDS if with_risk else ())
+        pm = pd.DataFrame(
+            {field: self._records[field][: self._n].copy() for field in fields},
+            index=pd.DatetimeIndex(self._times[: self._n], name="datetime"),
+        )
+        return pm
+
+    def save_portfolio_metrics(self, path: Union[str, pathlib.Path]) -> None:
+        r = self.generate_portfolio_metrics_dataframe()
+        r.to_csv(path)
+
+    def load_portfolio_metrics(self, path: Union[str, pathlib.Path]) -> None:
+        """load pm from a file
+        should have format like
+        columns = ['account', 'return', 'total_turnover', 'turnover', 'cost', 'total_cost', 'value', 'cash', 'bench']
+            :param
+                path: str/ pathlib.Path()
+        """
+        path = pathlib.Path(path)
+        r = pd.read_csv(open(path, "rb"), index_col=0)
+        r.index = pd.DatetimeIndex(r.index)
+
+        self.init_vars()
+        for trade_start_time, row in r.iterrows():
+            self.update_portfolio_metrics_record(
+                trade_start_time=trade_start_time,
+                account_value=row["account"],
+                cash=row["cash"],
+                return_rate=row["return"],
+                total_turnover=row["total_turnover"],
+                turnover_rate=row["turnover"],
+                total_cost=row["total_cost"],
+                cost_rate=row["cost"],
+                stock_value=row["value"],
+                bench_value=row["bench"],
+            )
@@ -0,0 +1,171 @@
+"""
+Run the backtests of many strategy configurations over the same universe and window
+
+The market data is loaded once in the parent process:
+
+- the quote of the exchange is persisted and memory-mapped (see `NumpyQuote.save`), so its pages are shared by all
+  the workers instead of being copied into each of them
+- the calendars and instruments are kept in the memory cache `H`
+- the returns of the benchmark are loaded into `H["f"]` for the frequencies of all the levels
+
+The workers are forked from the parent, so they inherit the initialized qlib, the caches and the exchange without
+initializing or loading anything again (including the workers which replace the retired ones when
+`maxtasksperchild` is set). Only the index of the configuration is sent to a worker and only the metric arrays are
+sent back.
+"""
+from __future__ import annotations
+
+import copy
+import multiprocessing
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from ..config import C
+from ..log import get_module_logger
+from ..utils import init_instance_by_config
+from .backtest import backtest_loop
+from .executor import BaseExecutor
+from .report import PortfolioMetrics
+from .utils import CommonInfrastructure
+
+logger = get_module_logger("backtest sweep")
+
+# the state shared with the forked workers; it is only set in the parent during `backtest_sweep`
+_SWEEP_STATE: Dict[str, Any] = {}
+
+
+def _collect_metrics(trade_executor) -> Dict[str, Dict[str, np.ndarray]]:
+    """the compact metric arrays of each level whose portfolio metrics are enabled"""
+    from ..utils.time import Freq  # pylint: disable=C0415
+
+    res = {}
+    for executor in trade_executor.get_all_executors():
+        account = executor.trade_account
+        if not account.is_port_metr_enabled():
+            continue
+        pm = account.portfolio_metrics
+        key = "{}{}".format(*Freq.parse(executor.time_per_step))
+        res[key] = {"datetime": pm.get_time_array().copy()}
+        for field in PortfolioMetrics.RECORD_FIELDS + PortfolioMetrics.RISK_FIELDS:
+            res[key][field] = pm.get_record_array(field).copy()
+    return res
+
+
+def _load_benchmarks(state: Dict[str, Any]) -> None:
+    """create the accounts of all the levels once, so the returns of the benchmark are loaded in this process"""
+    from . import create_account_instance  # pylint: disable=C0415
+
+    trade_account = create_account_instance(
+        start_time=state["start_time"],
+        end_time=state["end_time"],
+        benchmark=state["benchmark"],
+        account=state["account"],
+        pos_type=state["pos_type"],
+    )
+    executor = state["executor"] if isinstance(state["executor"], dict) else copy.deepcopy(state["executor"])
+    trade_executor = init_instance_by_config(executor, accept_types=BaseExecutor)
+    trade_executor.reset_common_infra(
+        CommonInfrastructure(trade_account=trade_account, trade_exchange=state["exchange"])
+    )
+
+
+def _run_sweep_task(idx: int) -> Dict[str, Any]:
+    from . import get_strategy_executor  # pylint: disable=C0415
+
+    state = _SWEEP_STATE
+    strategy = state["strategy_configs"][idx]
+    # the instances are copied, so the tasks in the same worker don't share the states
+    executor = state["executor"] if isinstance(state["executor"], dict) else copy.deepcopy(state["executor"])
+    strategy = strategy if isinstance(strategy, dict) else copy.deepcopy(strategy)
+    trade_strategy, trade_executor = get_strategy_executor(
+        state["start_time"],
+        state["end_time"],
+        strategy,
+        executor,
+        benchmark=state["benchmark"],
+        account=state["account"],
+        exchange_kwargs={"exchange": state["exchange"]},
+        pos_type=state["pos_type"],
+    )
+    backtest_loop(state["start_time"], state["end_time"], trade_strategy, trade_executor)
+    return {"index": idx, "metrics": _collect_metrics(trade_executor)}
+
+
+def backtest_sweep(
+    start_time: Union[pd.Timestamp, str],
+    end_time: Union[pd.Timestamp, str],
+    strategy_configs: List[Union[dict, object]],
+    executor: Union[dict, object],
+    benchmark: Optional[str] = "SH000300",
+    account: Union[float, int, dict] = 1e9,
+    exchange_kwargs: dict = {},
+    pos_type: str = "Position",
+    n_jobs: Optional[int] = None,
+    maxtasksperchild: Optional[int] = None,
+) -> List[Dict[str, Dict[str, np.ndarray]]]:
+    """
+    Backtest each of `strategy_configs` with the same executor, account and exchange in parallel
+
+    Parameters
+    ----------
+    strategy_configs : List[Union[dict, object]]
+        the configs (or instances) of the outermost strategies, one backtest for each of them
+    n_jobs : int, optional
+        the number of the workers, `C.kernels` by default; the backtests are run in the current process if it is 1
+        or the platform can't fork
+    maxtasksperchild : int, optional
+        the number of the backtests a worker runs before it is replaced, `C.maxtasksperchild` by default
+    Please refer to the docs of `backtest` for the other parameters
+
+    Returns
+    -------
+    List[Dict[str, Dict[str, np.ndarray]]]:
+        the metrics of each config in the same order, {<freq of the level>: {<field>: <array over the steps>}}
+        the fields are "datetime", `PortfolioMetrics.RECORD_FIELDS` and `PortfolioMetrics.RISK_FIELDS`
+    """
+    from . import get_exchange  # pylint: disable=C0415
+
+    n_jobs = C.kernels if n_jobs is None else n_jobs
+    maxtasksperchild = C.maxtasksperchild if maxtasksperchild is None else maxtasksperchild
+    n_jobs = max(min(n_jobs, len(strategy_configs)), 1)
+
+    exchange_kwargs = copy.copy(exchange_kwargs)
+    exchange_kwargs.setdefault("start_time", start_time)
+    exchange_kwargs.setdefault("end_time", end_time)
+    tmp_dir = None
+    if "exchange" not in exchange_kwargs and exchange_kwargs.get("quote_cache_dir") is None:
+        # memory-map the quote to share it with the workers
+        tmp_dir = tempfile.mkdtemp(prefix="qlib_sweep_quote_")
+        exchange_kwargs["quote_cache_dir"] = tmp_dir
+
+    try:
+        _SWEEP_STATE.update(
+            start_time=start_time,
+            end_time=end_time,
+            strategy_configs=strategy_configs,
+            executor=executor,
+            benchmark=benchmark,
+            account=account,
+            exchange=get_exchange(**exchange_kwargs),
+            pos_type=pos_type,
+        )
+        if benchmark is not None:
+            _load_benchmarks(_SWEEP_STATE)
+        if n_jobs == 1 or "fork" not in multiprocessing.get_all_start_methods():
+            results = [_run_sweep_task(i) for i in range(len(strategy_configs))]
+        else:
+            ctx = multiprocessing.get_context("fork")
+            with ctx.Pool(processes=n_jobs, maxtasksperchild=maxtasksperchild) as pool:
+                results = list(pool.imap_unordered(_run_sweep_task, range(len(strategy_configs))))
+    finally:
+        _SWEEP_STATE.clear()
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    results.sort(key=lambda res: res["index"])
+    logger.info(f"{len(results)} backtests are finished with {n_jobs} workers")
+    return [res["metrics"] for res in results]
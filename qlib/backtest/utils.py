@@ -1,13 +1,22 @@
 from __future__ import annotations
-from typing import Union, Any, Set
+from typing import TYPE_CHECKING, Union, Any, Set, Tuple
+import numpy as np
 import pandas as pd
 import warnings
 from abc import abstractmethod
 
+from qlib.data.data import Cal
+from qlib.utils.time import Freq, epsilon_change
+
+if TYPE_CHECKING:
+    from qlib.backtest.decision import BaseTradeDecision
+
 class TradeCalendarManager:
     """
     Manager for trading calendar
         - BaseStrategy and BaseExecutor will use it
+
+    The trading steps are backed by NumPy slices of the calendar, so `get_step_time` of any step is O(1)
     """
 
     def __init__(self, freq: str, start_time: Union[str, pd.Timestamp] = None, end_time: Union[str, pd.Timestamp] = None,
@@ -39,8 +48,158 @@ class TradeCalendarManager:
         self.freq = freq
         self.start_time = pd.Timestamp(start_time) if start_time else None
         self.end_time = pd.Timestamp(end_time) if end_time else None
-        
-        
+
+        _calendar = Cal.calendar(freq=freq, future=True)
+        assert isinstance(_calendar, np.ndarray)
+        self._calendar = _calendar
+        self.trade_step = 0
+        if self.start_time is None or self.end_time is None:
+            # it must be reset before trading
+            self.start_index = self.end_index = None
+            self.trade_len = 0
+            self._step_start = self._step_end = np.array([], dtype="datetime64[ns]")
+            return
+
+        _, _, _start_index, _end_index = Cal.locate_index(start_time, end_time, freq=freq, future=True)
+        self.start_index = _start_index
+        self.end_index = _end_index
+        self.trade_len = _end_index - _start_index + 1
+
+        # only the slice of the calendar used by this manager is converted to datetime64, so resetting the inner
+        # calendar at every outer step costs O(trade_len) instead of O(len(calendar))
+        step_start = pd.DatetimeIndex(_calendar[_start_index : _end_index + 2]).values
+        if len(step_start) == self.trade_len:
+            # the end of the last step is unknown without the future calendar
+            step_start = np.append(step_start, step_start[-1] + np.timedelta64(Freq(freq).minutes, "m"))
+        self._step_start = step_start[:-1]
+        self._step_end = step_start[1:] - np.timedelta64(1, "s")
+
+    def finished(self) -> bool:
+        """
+        Check if the trading finished
+        - Should check before calling strategy.generate_decisions and executor.execute
+        - If self.trade_step >= self.self.trade_len, it means the trading is finished
+        - If self.trade_step < self.self.trade_len, it means the number of trading step finished is self.trade_step
+        """
+        return self.trade_step >= self.trade_len
+
+    def step(self) -> None:
+        if self.finished():
+            raise RuntimeError(f"The calendar is finished, please reset it if you want to call it!")
+        self.trade_step += 1
+
+    def get_freq(self) -> str:
+        return self.freq
+
+    def get_trade_len(self) -> int:
+        """get the total step length"""
+        return self.trade_len
+
+    def get_trade_step(self) -> int:
+        return self.trade_step
+
+    def get_step_time(self, trade_step: int | None = None, shift: int = 0) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """
+        Get the left and right endpoints of the trade_step'th trading interval
+
+        About the endpoints:
+            - Qlib uses the closed interval in time-series data selection, which has the same performance as
+            pandas.Series.loc
+            # - The returned right endpoints should minus 1 seconds because of the closed interval representation in
+            #   Qlib.
+            # Note: Qlib supports up to minutely decision execution, so 1 seconds is less than any trading time
+            #   interval.
+
+        Parameters
+        ----------
+        trade_step : int, optional
+            the number of trading step finished, by default None to indicate current step
+        shift : int, optional
+            shift bars , by default 0
+
+        Returns
+        -------
+        Tuple[pd.Timestamp, pd.Timestamp]
+            - If shift == 0, return the trading time range
+            - If shift > 0, return the trading time range of the earlier shift bars
+            - If shift < 0, return the trading time range of the later shift bar
+        """
+        if trade_step is None:
+            trade_step = self.get_trade_step()
+        step_idx = trade_step - shift
+        if 0 <= step_idx < self.trade_len:
+            return pd.Timestamp(self._step_start[step_idx]), pd.Timestamp(self._step_end[step_idx])
+        # the steps out of the range of this manager, e.g. the previous step of the first step
+        calendar_index = self.start_index + step_idx
+        return self._calendar[calendar_index], epsilon_change(self._calendar[calendar_index + 1])
+
+    def get_data_cal_range(self, rtype: str = "full") -> Tuple[int, int]:
+        """
+        get the calendar range
+        The following assumptions are made
+        1) The frequency of the exchange in common_infra is the same as the data calendar
+        2) Users want the **data index** mod by **day** (i.e. 240 min)
+
+        Parameters
+        ----------
+        rtype: str
+            - "full": return the full limitation of the decision in the day
+            - "step": return the limitation of current step
+
+        Returns
+        -------
+        Tuple[int, int]:
+        """
+        # potential performance issue
+        assert self.start_time is not None
+        day_start = pd.Timestamp(self.start_time.date())
+        day_end = epsilon_change(day_start + pd.Timedelta(days=1))
+        freq = self.level_infra.get("common_infra").get("trade_exchange").freq
+        _, _, day_start_idx, _ = Cal.locate_index(day_start, day_end, freq=freq)
+
+        if rtype == "full":
+            _, _, start_idx, end_index = Cal.locate_index(self.start_time, self.end_time, freq=freq)
+        elif rtype == "step":
+            _, _, start_idx, end_index = Cal.locate_index(*self.get_step_time(), freq=freq)
+        else:
+            raise ValueError(f"This type of input {rtype} is not supported")
+
+        return start_idx - day_start_idx, end_index - day_start_idx
+
+    def get_all_time(self) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """Get the start_time and end_time for trading"""
+        return self.start_time, self.end_time
+
+    # helper functions
+    def get_range_idx(self, start_time: pd.Timestamp, end_time: pd.Timestamp) -> Tuple[int, int]:
+        """
+        get the range index which involve start_time~end_time  (both sides are closed)
+
+        Parameters
+        ----------
+        start_time : pd.Timestamp
+        end_time : pd.Timestamp
+
+        Returns
+        -------
+        Tuple[int, int]:
+            the index of the range.  **the left and right are closed**
+        """
+        left = int(np.searchsorted(self._step_start, np.datetime64(pd.Timestamp(start_time)), side="right")) - 1
+        right = int(np.searchsorted(self._step_start, np.datetime64(pd.Timestamp(end_time)), side="right")) - 1
+
+        def clip(idx):
+            return min(max(0, idx), self.trade_len - 1)
+
+        return clip(left), clip(right)
+
+    def __repr__(self) -> str:
+        return (
+            f"class: {self.__class__.__name__}; "
+            f"{self.start_time}[{self.start_index}]~{self.end_time}[{self.end_index}]: "
+            f"[{self.trade_step}/{self.trade_len}]"
+        )
+
 
 class BaseInfrastructure:
     def __init__(self, **kwargs: Any) -> None:
@@ -93,24 +252,24 @@ class LevelInfrastructure(BaseInfrastructure):
         """this will make the calendar access easier when crossing multi-levels"""
         self.reset_infra(sub_level_infra=sub_level_infra)
     
-# def get_start_end_idx(trade_calendar: TradeCalendarManager, outer_trade_decision: BaseTradeDecision) -> Tuple[int, int]:
-#     """
-#     A helper function for getting the decision-level index range limitation for inner strategy
-#     - NOTE: this function is not applicable to order-level
-
-#     Parameters
-#     ----------
-#     trade_calendar : TradeCalendarManager
-#     outer_trade_decision : BaseTradeDecision
-#         the trade decision made by outer strategy
-
-#     Returns
-#     -------
-#     Union[int, int]:
-#         start index and end index
-#     """
-#     try:
-#         return outer_trade_decision.get_range_limit(inner_calendar=trade_calendar)
-#     except NotImplementedError:
-#         return 0, trade_calendar.get_trade_len() - 1
+def get_start_end_idx(trade_calendar: TradeCalendarManager, outer_trade_decision: BaseTradeDecision) -> Tuple[int, int]:
+    """
+    A helper function for getting the decision-level index range limitation for inner strategy
+    - NOTE: this function is not applicable to order-level
+
+    Parameters
+    ----------
+    trade_calendar : TradeCalendarManager
+    outer_trade_decision : BaseTradeDecision
+        the trade decision made by outer strategy
+
+    Returns
+    -------
+    Union[int, int]:
+        start index and end index
+    """
+    try:
+        return outer_trade_decision.get_range_limit(inner_calendar=trade_calendar)
+    except NotImplementedError:
+        return 0, trade_calendar.get_trade_len() - 1
     
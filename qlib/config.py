@@ -110,6 +110,10 @@ _default_config = {
     "default_disk_cache": 1,  # 0:skip/1:use
     "mem_cache_size_limit": 500,
     "mem_cache_limit_type": "length",
+    # the eviction policy of the memory cache: "lru", "lfu", "2q" (scan resistant) or "cost" (cost-aware)
+    "mem_cache_policy": "lru",
+    # the bytes of the local disk tier of the feature memory cache (under local_cache_path), 0 to disable it
+    "mem_cache_spill_size_limit": 0,
     "mem_cache_expire": 60 * 60,
     "dataset_cache_dir_name": "dataset_cache",
     "features_cache_dir_name": "features_cache",
@@ -180,6 +184,12 @@ MODE_CONF = {
         "dataset_cache": DISK_DATASET_CACHE,
         "local_cache_path": Path("~/.cache/qlib_simple_cache").expanduser().resolve(),
         "mount_path": None,
+        "auto_mount": False,
+        "region": REG_CN,
+        "data_server_host": "127.0.0.1",
+        "data_server_port": 9710,
+        # the data server refuses to listen on the non-loopback addresses unless it is enabled
+        "data_server_allow_remote": False,
     },
     "client": {
         "provider_uri": "~/.qlib/qlib_data/cn_data",
@@ -193,6 +203,19 @@ MODE_CONF = {
         "custom_ops": [],
     },
 }
+# the client of the data server (`qlib.data.server`), the data is not read locally
+MODE_CONF["remote"] = {
+    **MODE_CONF["client"],
+    "calendar_provider": "ClientCalendarProvider",
+    "instrument_provider": "ClientInstrumentProvider",
+    "feature_provider": None,
+    "pit_provider": None,
+    "expression_provider": None,
+    "dataset_provider": "ClientDatasetProvider",
+    "provider": "ClientProvider",
+    "data_server_host": "127.0.0.1",
+    "data_server_port": 9710,
+}
 
 HIGH_FREQ_CONFIG = {
     "provider_uri": "~/.qlib/qlib_data/cn_data_1min",
@@ -321,7 +344,6 @@ class QlibConfig(Config):
     def set(self, default_conf: str = "client", **kwargs):
         from .utils import set_log_with_config, get_module_logger, can_use_cache
 
-        print("test")
         self.reset()
 
         _logging_config = kwargs.get("logging_config", self.logging_config)
@@ -357,10 +379,11 @@ class QlibConfig(Config):
                         f"{log_str} will not be used!"
                     )
     def register(self):
-        from .utils import init_instance_by_conifg
+        from .data.ops import register_all_ops
+        from .data.data import register_all_wrappers
 
-        #register_all_ops(self)
-        #register_all_wrappers(self)
+        register_all_ops(self)
+        register_all_wrappers(self)
         self._registered = True
     
     @property
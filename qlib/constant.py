@@ -1,8 +1,5 @@
 from typing import TypeVar
 
-import numpy as np
-import pandas as pd
-
 REG_CN = "cn"
 REG_US = "us"
 REG_TW = "tw"
\ No newline at end of file
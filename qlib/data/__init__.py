@@ -1 +1,24 @@
 
+from __future__ import division
+from __future__ import print_function
+
+from .data import (
+    D,
+    CalendarProvider,
+    InstrumentProvider,
+    FeatureProvider,
+    PITProvider,
+    ExpressionProvider,
+    DatasetProvider,
+    LocalCalendarProvider,
+    LocalInstrumentProvider,
+    LocalFeatureProvider,
+    LocalPITProvider,
+    LocalExpressionProvider,
+    LocalDatasetProvider,
+    LocalProvider,
+    ClientCalendarProvider,
+    ClientInstrumentProvider,
+    ClientDatasetProvider,
+    ClientProvider,
+)
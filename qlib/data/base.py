@@ -3,8 +3,10 @@ from __future__ import division
 from __future__ import print_function
 
 import abc 
+import time
 import pandas as pd
 from ..log import get_module_logger
+from . import profiler
 
 class Expression(abc.ABC):
     def __str__(self):
@@ -121,6 +123,108 @@ class Expression(abc.ABC):
         from .ops import Or 
 
         return Or(other, self)
+
+    def load(self, instrument, start_index, end_index, *args):
+        """load  feature
+        This function is responsible for loading feature/expression based on the expression engine.
+
+        The concrete implementation will be separated into two parts:
+
+        1) caching data, handle errors.
+
+            - This part is shared by all the expressions and implemented in Expression
+        2) processing and calculating data based on the specific expression.
+
+            - This part is different in each expression and implemented in each expression
+
+        Expression Engine is shared by different data.
+        Different data will have different extra information for `args`.
+
+        Parameters
+        ----------
+        instrument : str
+            instrument code.
+        start_index : str
+            feature start index [in calendar].
+        end_index : str
+            feature end  index  [in calendar].
+
+        *args may contain following information:
+        1) if it is used in basic expression engine data, it contains following arguments
+            freq: str
+                feature frequency.
+
+        2) if is used in PIT data, it contains following arguments
+            cur_pit:
+                it is designed for the point-in-time data.
+            period: int
+                This is used for query specific period.
+                The period is represented with int in Qlib. (e.g. 202001 may represent the first quarter in 2020)
+
+        Returns
+        ----------
+        pd.Series
+            feature series: The index of the series is the calendar index
+        """
+        from .cache import H
+
+        # cache
+        cache_key = str(self), instrument, start_index, end_index, *args
+        with profiler.node("expression", cache_key[0], type(self).__name__, instrument) as _node:
+            series = H["f"].get(cache_key)
+            profiler.record_cache("f", series is not None)
+            if series is None:
+                if start_index is not None and end_index is not None and start_index > end_index:
+                    raise ValueError("Invalid index range: {} {}".format(start_index, end_index))
+                try:
+                    start = time.perf_counter()
+                    series = self._load_internal(instrument, start_index, end_index, *args)
+                    # the cost to compute the series again, used by the cost-aware eviction policy
+                    cost = time.perf_counter() - start
+                except Exception as e:
+                    get_module_logger("data").debug(
+                        f"Loading data error: instrument={instrument}, expression={str(self)}, "
+                        f"start_index={start_index}, end_index={end_index}, args={args}. "
+                        f"error info: {str(e)}"
+                    )
+                    raise
+                series.name = str(self)
+                H["f"].set(cache_key, series, cost=cost)
+            if _node is not None:
+                _node.result(series)
+        return series
+
+    @abc.abstractmethod
+    def _load_internal(self, instrument, start_index, end_index, *args) -> pd.Series:
+        raise NotImplementedError("This function must be implemented in your newly defined feature")
+
+    @abc.abstractmethod
+    def get_longest_back_rolling(self):
+        """Get the longest length of historical data the feature has accessed
+
+        This is designed for getting the needed range of the data to calculate
+        the features in specific range at first.  However, situations like
+        Ref(Ref($close, -1), 1) can not be handled rightly.
+
+        So this will only used for detecting the length of historical data needed.
+        """
+        # TODO: forward operator like Ref($close, -1) is not supported yet.
+        raise NotImplementedError("This function must be implemented in your newly defined feature")
+
+    @abc.abstractmethod
+    def get_extended_window_size(self):
+        """get_extend_window_size
+
+        For to calculate this Operator in range[start_index, end_index]
+        We have to get the *leaf feature* in
+        range[start_index - lft_etd, end_index + rght_etd].
+
+        Returns
+        ----------
+        (int, int)
+            lft_etd, rght_etd
+        """
+        raise NotImplementedError("This function must be implemented in your newly defined feature")
     
 
 class Feature(Expression):
@@ -141,7 +245,7 @@ class Feature(Expression):
         return 0
     
     def get_extended_window_size(self):
-        return 0
+        return 0, 0
     
 class PFeature(Feature):
     def __str__(self):
@@ -152,5 +256,8 @@ class PFeature(Feature):
         return PITD.period_feature(instrument, str(self), start_index, end_index, cur_time, period)
     
 class ExpressionOps(Expression):
-    """
+    """Operator Expression
+
+    This kind of feature will use operator for feature
+    construction on the fly.
     """
\ No newline at end of file
@@ -1,50 +1,556 @@
 from __future__ import division
 from __future__ import print_function   
 
+import os
 import sys
 import abc
+import atexit
+import heapq
+import shutil
+import hashlib
+import itertools
+import threading
+import weakref
 
+from pathlib import Path
 from collections import OrderedDict
 
+import numpy as np
+import pandas as pd
+
 from ..log import get_module_logger
 from ..config import C
 
 class QlibCacheException(RuntimeError):
     pass
 
+
+class EvictionPolicy(abc.ABC):
+    """
+    The policy choosing the item evicted from a `MemCacheUnit` when it is beyond its size limit
+
+    The unit keeps the items in an OrderedDict from the least to the most recently used one, and tells the policy
+    about the changes.
+    """
+
+    def on_set(self, key, size, cost=None):
+        """`key` is set, `cost` is the cost to compute the value again (e.g. seconds), None if it is unknown"""
+
+    def on_access(self, key):
+        """`key` is read"""
+
+    def on_evict(self, key):
+        """`key` is chosen by `victim` and will be removed"""
+
+    def on_remove(self, key):
+        """`key` is removed"""
+
+    def clear(self):
+        pass
+
+    @abc.abstractmethod
+    def victim(self, od: OrderedDict):
+        """the key to evict, `od` is the items of the unit"""
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    """evict the least recently used item"""
+
+    def victim(self, od):
+        return next(iter(od))
+
+
+class LFUPolicy(EvictionPolicy):
+    """evict the least frequently used item, the least recently used one of them if there is a tie"""
+
+    def __init__(self):
+        self.freq = {}
+        # {frequency: the keys of the frequency from the least to the most recently used}
+        self.buckets = {}
+        self.min_freq = 0
+
+    def _move(self, key, freq):
+        bucket = self.buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[freq]
+
+    def on_set(self, key, size, cost=None):
+        if key in self.freq:
+            self.on_access(key)
+            return
+        self.freq[key] = 1
+        self.buckets.setdefault(1, OrderedDict())[key] = None
+        self.min_freq = 1
+
+    def on_access(self, key):
+        freq = self.freq[key]
+        self._move(key, freq)
+        if self.min_freq == freq and freq not in self.buckets:
+            self.min_freq = freq + 1
+        self.freq[key] = freq + 1
+        self.buckets.setdefault(freq + 1, OrderedDict())[key] = None
+
+    def on_remove(self, key):
+        self._move(key, self.freq.pop(key))
+
+    def clear(self):
+        self.freq.clear()
+        self.buckets.clear()
+        self.min_freq = 0
+
+    def victim(self, od):
+        if self.min_freq not in self.buckets:
+            self.min_freq = min(self.buckets)
+        return next(iter(self.buckets[self.min_freq]))
+
+
+class TwoQueuePolicy(EvictionPolicy):
+    """
+    The scan resistant 2Q policy
+
+    The new items are put in the probation queue, they are promoted to the protected (LRU) queue on their first hit,
+    or when they are set again soon after being evicted (the keys of the items evicted from probation are remembered
+    in the ghost queue). The probation queue is evicted first once it holds more than `kin` of the items, so a scan
+    of one-off items does not flush the hot items.
+    """
+
+    def __init__(self, kin: float = 0.25, kout: float = 0.5):
+        self.kin = kin
+        self.kout = kout
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+        self.ghost = OrderedDict()
+
+    def on_set(self, key, size, cost=None):
+        if key in self.protected:
+            self.protected.move_to_end(key)
+        elif key in self.probation:
+            pass
+        elif key in self.ghost:
+            del self.ghost[key]
+            self.protected[key] = None
+        else:
+            self.probation[key] = None
+
+    def on_access(self, key):
+        if key in self.probation:
+            del self.probation[key]
+            self.protected[key] = None
+        else:
+            self.protected.move_to_end(key)
+
+    def on_evict(self, key):
+        if key in self.probation:
+            self.ghost[key] = None
+            while len(self.ghost) > max(1, int(self.kout * (len(self.probation) + len(self.protected)))):
+                self.ghost.popitem(last=False)
+
+    def on_remove(self, key):
+        self.probation.pop(key, None)
+        self.protected.pop(key, None)
+
+    def clear(self):
+        self.probation.clear()
+        self.protected.clear()
+        self.ghost.clear()
+
+    def victim(self, od):
+        n = len(self.probation) + len(self.protected)
+        if self.probation and (len(self.probation) > self.kin * n or not self.protected):
+            return next(iter(self.probation))
+        return next(iter(self.protected))
+
+
+class CostAwarePolicy(EvictionPolicy):
+    """
+    The GreedyDual-Size-Frequency policy: evict the item with the lowest `L + frequency * cost / size`
+
+    `cost` is the cost to compute the value again given by `MemCacheUnit.set` (1 if it is unknown) and `size` is the
+    size of the value in the unit of the limit type. `L` is the priority of the last evicted item, so the items which
+    are not used for a long time are evicted at last even if they are expensive.
+    """
+
+    def __init__(self):
+        self.L = 0.0
+        # {key: [cost, size, frequency, priority, entry id]}
+        self.meta = {}
+        self.heap = []
+        self._counter = itertools.count()
+
+    def _push(self, key):
+        meta = self.meta[key]
+        meta[3] = self.L + meta[2] * meta[0] / max(meta[1], 1)
+        meta[4] = next(self._counter)
+        heapq.heappush(self.heap, (meta[3], meta[4], key))
+        if len(self.heap) > 4 * len(self.meta) + 64:
+            # drop the stale entries
+            self.heap = [(m[3], m[4], k) for k, m in self.meta.items()]
+            heapq.heapify(self.heap)
+
+    def on_set(self, key, size, cost=None):
+        meta = self.meta.get(key)
+        if meta is None:
+            self.meta[key] = [1.0 if cost is None else cost, size, 1, 0.0, 0]
+        else:
+            meta[0] = meta[0] if cost is None else cost
+            meta[1] = size
+            meta[2] += 1
+        self._push(key)
+
+    def on_access(self, key):
+        self.meta[key][2] += 1
+        self._push(key)
+
+    def on_evict(self, key):
+        self.L = self.meta[key][3]
+
+    def on_remove(self, key):
+        del self.meta[key]
+
+    def clear(self):
+        self.L = 0.0
+        self.meta.clear()
+        self.heap.clear()
+
+    def victim(self, od):
+        while True:
+            priority, entry_id, key = self.heap[0]
+            meta = self.meta.get(key)
+            if meta is not None and meta[4] == entry_id:
+                return key
+            heapq.heappop(self.heap)
+
+
+EVICTION_POLICIES = {
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+    "2q": TwoQueuePolicy,
+    "cost": CostAwarePolicy,
+}
+
+
+def get_eviction_policy(policy) -> EvictionPolicy:
+    """a new policy from its name in `EVICTION_POLICIES`, a subclass of `EvictionPolicy` or a policy"""
+    if isinstance(policy, EvictionPolicy):
+        return policy
+    if isinstance(policy, str):
+        if policy.lower() not in EVICTION_POLICIES:
+            raise ValueError(f"policy must be one of {list(EVICTION_POLICIES)}, your policy is {policy}")
+        policy = EVICTION_POLICIES[policy.lower()]
+    return policy()
+
+class SpillCache:
+    """
+    The local disk tier of a `MemCacheUnit`
+
+    The items evicted from the memory are saved as `.npy` files in `<path>/<pid>` and loaded memory-mapped when they
+    are looked up again, which is much faster than loading them from the provider (e.g. on NFS). Only the `pd.Series`
+    with a numeric dtype are spilled, the others are dropped as usual. When the total bytes of the files are beyond
+    `size_limit`, the least recently used ones are removed.
+
+    The files of a process are removed when it exits, a forked process gets its own empty tier.
+    """
+
+    def __init__(self, path, size_limit: int):
+        self.root = Path(path).expanduser()
+        self.size_limit = size_limit
+        self._lock = threading.Lock()
+        self._init_process()
+
+    def _init_process(self):
+        self.pid = os.getpid()
+        self.path = self.root.joinpath(str(self.pid))
+        # {key: (file stem, bytes, name of the series, dtype of the index)}
+        self.od = OrderedDict()
+        self._size = 0
+        self._remove_dead()
+        if self.path.exists():
+            shutil.rmtree(self.path, ignore_errors=True)
+        atexit.register(shutil.rmtree, self.path, ignore_errors=True)
+
+    def _remove_dead(self):
+        """remove the files left by the processes which have exited"""
+        if not self.root.exists():
+            return
+        for _dir in self.root.iterdir():
+            if not _dir.name.isdigit() or int(_dir.name) == self.pid:
+                continue
+            try:
+                os.kill(int(_dir.name), 0)
+            except ProcessLookupError:
+                shutil.rmtree(_dir, ignore_errors=True)
+            except OSError:
+                pass
+
+    def _check_process(self):
+        if os.getpid() != self.pid:
+            self._init_process()
+
+    @staticmethod
+    def spillable(value) -> bool:
+        return (
+            isinstance(value, pd.Series)
+            and value.dtype.kind in "biuf"
+            and value.index.dtype.kind in "iuM"
+        )
+
+    def __len__(self):
+        return len(self.od)
+
+    def __contains__(self, key):
+        self._check_process()
+        return key in self.od
+
+    @property
+    def total_size(self):
+        return self._size
+
+    def put(self, key, value) -> bool:
+        """spill `value`, return False if it is not spillable"""
+        if self.size_limit <= 0 or not self.spillable(value):
+            return False
+        with self._lock:
+            self._check_process()
+            if key in self.od:
+                self.od.move_to_end(key)
+                return True
+            values = np.ascontiguousarray(value.values)
+            index = np.ascontiguousarray(value.index.values)
+            nbytes = values.nbytes + index.nbytes
+            if nbytes > self.size_limit:
+                return False
+            stem = hashlib.md5(repr(key).encode()).hexdigest()
+            self.path.mkdir(parents=True, exist_ok=True)
+            for suffix, arr in ((".npy", values), (".index.npy", index)):
+                tmp = self.path.joinpath(f"{stem}{suffix}.tmp")
+                with tmp.open("wb") as f:
+                    np.save(f, arr)
+                os.replace(tmp, self.path.joinpath(f"{stem}{suffix}"))
+            self.od[key] = (stem, nbytes, value.name, value.index.dtype)
+            self._size += nbytes
+            while self._size > self.size_limit:
+                self._remove(next(iter(self.od)))
+        return True
+
+    def get(self, key):
+        """the memory-mapped series, None if it is not spilled"""
+        with self._lock:
+            self._check_process()
+            if key not in self.od:
+                return None
+            stem, _, name, index_dtype = self.od[key]
+            try:
+                values = np.load(self.path.joinpath(f"{stem}.npy"), mmap_mode="r")
+                index = np.load(self.path.joinpath(f"{stem}.index.npy"), mmap_mode="r")
+            except OSError:
+                self._remove(key)
+                return None
+            self.od.move_to_end(key)
+        return pd.Series(values, index=pd.Index(index, dtype=index_dtype), name=name)
+
+    def keys(self) -> list:
+        with self._lock:
+            self._check_process()
+            return list(self.od)
+
+    def discard(self, key):
+        with self._lock:
+            self._check_process()
+            if key in self.od:
+                self._remove(key)
+
+    def _remove(self, key):
+        stem, nbytes, _, _ = self.od.pop(key)
+        self._size -= nbytes
+        for suffix in (".npy", ".index.npy"):
+            try:
+                self.path.joinpath(f"{stem}{suffix}").unlink()
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self.od.clear()
+            self._size = 0
+            if os.getpid() == self.pid:
+                shutil.rmtree(self.path, ignore_errors=True)
+            else:
+                self._init_process()
+
+
 class MemCacheUnit(abc.ABC):
+    """
+    The memory cache unit
+
+    Besides the size, the unit counts its lookups and changes, see `stats`:
+
+    - a hit is a successful `__getitem__`, a miss is a `__contains__` returning False or a failed `__getitem__`;
+      so the usual `if key in unit: return unit[key]` is counted once
+    - an insertion is a new key set, an eviction is an item popped because of the size limit
+
+    The evicted items are chosen by the eviction policy (LRU by default), see `EVICTION_POLICIES`. If the unit has a
+    `SpillCache`, they are spilled to it and looked up there before being counted as misses.
+
+    The unit is thread-safe (e.g. the threads of `DataServer` share `H`). `key in unit` followed by `unit[key]` is two
+    steps and the item may be evicted by another thread between them, so the threads should use `get` instead.
+    """
+
     def __init__(self, *args, **kwargs):
         self.size_limit = kwargs.pop("size_limit", 0)
+        self.name = kwargs.pop("name", None)
+        self.policy = get_eviction_policy(kwargs.pop("policy", "lru"))
+        self.spill = kwargs.pop("spill", None)
         self._size = 0
         self.od = OrderedDict()
+        # callback(name, event, key) called on the "hit", "miss", "insert" and "evict" events
+        self.callbacks = []
+        self._lock = threading.RLock()
+        _UNITS.add(self)
+        self.reset_stats()
+
+    def _reset_lock(self):
+        # the lock may be held by a thread of the parent, which does not exist in the forked child
+        self._lock = threading.RLock()
 
     def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, cost=None):
+        """set the item, `cost` is the cost to compute the value again (e.g. seconds), it is used by some policies"""
+        with self._lock:
+            if self.spill is not None:
+                # the spilled value is out of date
+                self.spill.discard(key)
+            self._set(key, value, cost)
+
+    def _set(self, key, value, cost=None):
+        if key not in self.od:
+            self.insertions += 1
+            if self.callbacks:
+                self._notify("insert", key)
         # precalculate the size after od.__setitem__
-        self._adjust_size(key, value)
+        size = self._get_value_size(value)
+        if key in self.od:
+            self._size -= self._get_value_size(self.od[key])
+        self._size += size
 
         self.od.__setitem__(key, value)
 
         # move the key to end,make it latest
         self.od.move_to_end(key)
+        self.policy.on_set(key, size, cost)
 
         if self.limited:
-            # pop the oldest items beyond size limit
+            # pop the items chosen by the policy beyond size limit
             while self._size > self.size_limit:
-                self.popitem(last=False)
-    
+                k = self.policy.victim(self.od)
+                self.policy.on_evict(k)
+                v = self.pop(k)
+                self.evictions += 1
+                self.evicted_size += self._get_value_size(v)
+                if self.spill is not None and self.spill.put(k, v):
+                    self.spills += 1
+                if self.callbacks:
+                    self._notify("evict", k)
+
+    def _restore(self, key) -> bool:
+        """move the spilled item back to the memory"""
+        v = self.spill.get(key)
+        if v is None:
+            return False
+        self.spill_hits += 1
+        self._set(key, v)
+        return True
+
     def __getitem__(self, key):
-        v = self.od.__getitem__(key)
-        self.od.move_to_end(key)
-        return v
+        with self._lock:
+            try:
+                v = self.od.__getitem__(key)
+            except KeyError:
+                if self.spill is not None and self._restore(key):
+                    return self.__getitem__(key)
+                self.misses += 1
+                if self.callbacks:
+                    self._notify("miss", key)
+                raise
+            self.od.move_to_end(key)
+            self.policy.on_access(key)
+            self.hits += 1
+            if self.callbacks:
+                self._notify("hit", key)
+            return v
+
+    def get(self, key, default=None):
+        """the item or `default` in one step, a hit or a miss is counted"""
+        with self._lock:
+            try:
+                return self.__getitem__(key)
+            except KeyError:
+                return default
 
     def __contains__(self, key):
-        return key in self.od
+        with self._lock:
+            res = key in self.od
+            if not res and self.spill is not None:
+                res = self._restore(key)
+            if not res:
+                self.misses += 1
+                if self.callbacks:
+                    self._notify("miss", key)
+            return res
 
     def __len__(self):
         return self.od.__len__()
-    
+
     def __repr__(self):
-        return f"{self.__class__.__name__}<size_limit:{self.size_limit if self.limited else 'no limit'} total_size:{self._size}>\n{self.od.__repr__()}"
+        # the values may be large arrays, only the summary is shown
+        return (
+            f"{self.__class__.__name__}<size_limit:{self.size_limit if self.limited else 'no limit'} "
+            f"total_size:{self._size} length:{len(self)} hits:{self.hits} misses:{self.misses} "
+            f"evictions:{self.evictions}>"
+        )
+
+    def _notify(self, event, key):
+        for callback in self.callbacks:
+            callback(self.name, event, key)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.insertions = 0
+        self.evictions = 0
+        self.evicted_size = 0
+        self.spills = 0
+        self.spill_hits = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def eviction_rate(self) -> float:
+        """the evictions per insertion"""
+        return self.evictions / self.insertions if self.insertions else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "insertions": self.insertions,
+            "evictions": self.evictions,
+            "evicted_size": self.evicted_size,
+            "spills": self.spills,
+            "spill_hits": self.spill_hits,
+            "spill_size": 0 if self.spill is None else self.spill.total_size,
+            "length": len(self),
+            "total_size": self._size,
+            "size_limit": self.size_limit,
+            "hit_ratio": self.hit_ratio,
+            "eviction_rate": self.eviction_rate,
+        }
 
     def set_limit_size(self, limit):
         self.size_limit = limit
@@ -59,59 +565,105 @@ class MemCacheUnit(abc.ABC):
         return self._size
     
     def clear(self):
-        self._size = 0
-        self.od.clear()
+        with self._lock:
+            self._size = 0
+            self.od.clear()
+            self.policy.clear()
+            if self.spill is not None:
+                self.spill.clear()
+
+    def invalidate(self, predicate) -> int:
+        """remove the items (and the spilled ones) whose keys satisfy `predicate(key)`, return the number of them"""
+        with self._lock:
+            keys = {k for k in self.od if predicate(k)}
+            for k in keys:
+                self.pop(k)
+            if self.spill is not None:
+                for k in self.spill.keys():
+                    if predicate(k):
+                        self.spill.discard(k)
+                        keys.add(k)
+            return len(keys)
 
     def popitem(self, last=True):
-        k, v = self.od.popitem(last=last)
-        self._size -= self._get_value_size(v)
+        with self._lock:
+            k, v = self.od.popitem(last=last)
+            self._size -= self._get_value_size(v)
+            self.policy.on_remove(k)
 
         return k, v
 
     def pop(self, key):
-        v = self.od.pop(key)
-        self._size -= self._get_value_size(v)
+        with self._lock:
+            v = self.od.pop(key)
+            self._size -= self._get_value_size(v)
+            self.policy.on_remove(key)
 
         return v
-    
-    def _adjust_size(self, key, value):
-        if key in self.od:
-            self._size -= self._get_value_size(self.od[key])
-        self._size += self._get_value_size(value)
-    
+
     @abc.abstractmethod
     def _get_value_size(self, value):
         raise NotImplementedError
 
+
+# the units of the process, their locks are reset in the forked children
+_UNITS = weakref.WeakSet()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: [unit._reset_lock() for unit in list(_UNITS)])  # pylint: disable=W0212
+
 class MemCacheLengthUnit(MemCacheUnit):
-    def __init__(self, size_limit=0):
-        super().__init__(size_limit=size_limit)
+    def __init__(self, size_limit=0, name=None, policy="lru", spill=None):
+        super().__init__(size_limit=size_limit, name=name, policy=policy, spill=spill)
     
     def _get_value_size(self, value):
         return 1
 
 class MemCacheSizeofUnit(MemCacheUnit):
-    def __init__(self, size_limit=0):
-        super().__init__(size_limit=size_limit)
+    def __init__(self, size_limit=0, name=None, policy="lru", spill=None):
+        super().__init__(size_limit=size_limit, name=name, policy=policy, spill=spill)
     
     def _get_value_size(self, value):
         return sys.getsizeof(value)
 
 class MemCache:
-    def __init__(self, mem_cache_size_limit=None, limit_type="length"):
+    def __init__(self, mem_cache_size_limit=None, limit_type="length", policy=None, spill_size_limit=None):
+        self._callbacks = []
+        self.__feature_mem_cache = None
+        self.reset(mem_cache_size_limit, limit_type, policy, spill_size_limit)
+
+    def reset(self, mem_cache_size_limit=None, limit_type=None, policy=None, spill_size_limit=None):
+        """
+        Rebuild the (empty) units, the settings default to `C.mem_cache_size_limit`, `C.mem_cache_limit_type`,
+        `C.mem_cache_policy` and `C.mem_cache_spill_size_limit`; the callbacks are kept
+
+        The feature unit spills its evicted items to `C.local_cache_path` if `spill_size_limit` (bytes) is positive.
+        """
         size_limit = C.mem_cache_size_limit if mem_cache_size_limit is None else mem_cache_size_limit
         limit_type = C.mem_cache_limit_type if limit_type is None else limit_type
+        policy = C.mem_cache_policy if policy is None else policy
+        spill_size_limit = C.mem_cache_spill_size_limit if spill_size_limit is None else spill_size_limit
 
         if limit_type == "length":
             klass = MemCacheLengthUnit
         elif limit_type == "sizeof":
-            klass = MemCacheSizeofUnit 
+            klass = MemCacheSizeofUnit
         else:
             raise ValueError(f"limit_type must be length or sizeof, your limit_type is {limit_type}")
-        
-        self.__calendar_mem_cache = klass(size_limit)
-        self.__instrument_mem_cache = klass(size_limit)
-        self.__feature_mem_cache = klass(size_limit)
+
+        if self.__feature_mem_cache is not None:
+            # remove the spilled files
+            self.__feature_mem_cache.clear()
+        spill = None
+        if spill_size_limit > 0:
+            if C.local_cache_path is None:
+                raise QlibCacheException("local_cache_path must be set to spill the memory cache")
+            spill = SpillCache(Path(C.local_cache_path).joinpath("mem_cache_spill"), spill_size_limit)
+
+        self.__calendar_mem_cache = klass(size_limit, name="c", policy=policy)
+        self.__instrument_mem_cache = klass(size_limit, name="i", policy=policy)
+        self.__feature_mem_cache = klass(size_limit, name="f", policy=policy, spill=spill)
+        for unit in self.units.values():
+            unit.callbacks.extend(self._callbacks)
 
     def __getitem__(self, key):
         if key == "c":
@@ -128,4 +680,59 @@ class MemCache:
         self.__instrument_mem_cache.clear()
         self.__feature_mem_cache.clear()
 
+    @property
+    def units(self):
+        return {"c": self.__calendar_mem_cache, "i": self.__instrument_mem_cache, "f": self.__feature_mem_cache}
+
+    def __repr__(self):
+        return "\n".join(f"{k}: {v!r}" for k, v in self.units.items())
+
+    def stats(self) -> dict:
+        """{unit name: the stats of the unit}"""
+        return {k: v.stats() for k, v in self.units.items()}
+
+    def reset_stats(self):
+        for unit in self.units.values():
+            unit.reset_stats()
+
+    def add_callback(self, callback):
+        """call `callback(unit name, event, key)` on the "hit", "miss", "insert" and "evict" events of all units"""
+        self._callbacks.append(callback)
+        for unit in self.units.values():
+            unit.callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+        for unit in self.units.values():
+            if callback in unit.callbacks:
+                unit.callbacks.remove(callback)
+
+    def to_prometheus(self, prefix: str = "qlib_mem_cache") -> str:
+        """the stats in the Prometheus text exposition format"""
+        metrics = [
+            ("hits", "counter", "the successful lookups"),
+            ("misses", "counter", "the failed lookups"),
+            ("insertions", "counter", "the new keys set"),
+            ("evictions", "counter", "the items popped because of the size limit"),
+            ("evicted_size", "counter", "the total size of the evicted items"),
+            ("spills", "counter", "the evicted items saved in the spill tier"),
+            ("spill_hits", "counter", "the items restored from the spill tier"),
+            ("spill_size", "gauge", "the bytes of the spill tier"),
+            ("length", "gauge", "the number of the items"),
+            ("total_size", "gauge", "the total size of the items, in the unit of the limit type"),
+            ("size_limit", "gauge", "the size limit, 0 for no limit"),
+            ("hit_ratio", "gauge", "hits / (hits + misses)"),
+            ("eviction_rate", "gauge", "evictions / insertions"),
+        ]
+        stats = self.stats()
+        lines = []
+        for key, _type, _help in metrics:
+            name = f"{prefix}_{key}_total" if _type == "counter" else f"{prefix}_{key}"
+            lines.append(f"# HELP {name} {_help}")
+            lines.append(f"# TYPE {name} {_type}")
+            for unit, stat in stats.items():
+                lines.append(f'{name}{{unit="{unit}"}} {stat[key]}')
+        return "\n".join(lines) + "\n"
+
 H = MemCache()
\ No newline at end of file
@@ -0,0 +1,95 @@
+from __future__ import division
+from __future__ import print_function
+
+import socket
+import threading
+
+import pandas as pd
+
+from ..log import get_module_logger
+from .protocol import (
+    FRAME_REQUEST,
+    decode_calendar,
+    decode_dataframe,
+    decode_instruments,
+    recv_response,
+    send_json,
+    to_json_args,
+)
+
+
+class Client:
+    """A client to the data server (`qlib.data.server.DataServer`)
+
+    The connection is kept open and shared by the threads, the requests are sent one by one.
+    """
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.logger = get_module_logger(self.__class__.__name__)
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.logger.debug(f"connected to the data server {self.host}:{self.port}")
+
+    def disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def send_request(self, request_type, request_content):
+        """send the request and return the response as (meta, arrays)
+
+        The connection is closed if anything goes wrong, it is reopened by the next request.
+        """
+        request = {"type": request_type, "args": to_json_args(request_content)}
+        with self._lock:
+            if self._sock is None:
+                self.connect()
+            try:
+                send_json(self._sock, FRAME_REQUEST, request)
+                return recv_response(self._sock)
+            except BaseException:
+                self.disconnect()
+                raise
+
+    def calendar(self, freq, future):
+        meta, arrays = self.send_request("calendar", {"freq": freq, "future": future})
+        return list(pd.DatetimeIndex(decode_calendar(meta, arrays)))
+
+    def list_instruments(self, instruments, start_time=None, end_time=None, freq="day", as_list=False):
+        meta, arrays = self.send_request(
+            "list_instruments",
+            {
+                "instruments": instruments,
+                "start_time": start_time,
+                "end_time": end_time,
+                "freq": freq,
+                "as_list": as_list,
+            },
+        )
+        return decode_instruments(meta, arrays)
+
+    def features(
+        self, instruments, fields, start_time=None, end_time=None, freq="day", disk_cache=1, inst_processors=[]
+    ):
+        meta, arrays = self.send_request(
+            "features",
+            {
+                "instruments": instruments,
+                "fields": list(fields),
+                "start_time": start_time,
+                "end_time": end_time,
+                "freq": freq,
+                "disk_cache": disk_cache,
+                "inst_processors": inst_processors,
+            },
+        )
+        return decode_dataframe(meta, arrays)
@@ -3,7 +3,6 @@ from __future__ import print_function
 
 import re
 import abc
-import copy
 import queue
 import bisect
 import numpy as np
@@ -11,13 +10,20 @@ import pandas as pd
 from typing import List, Union, Optional
 
 from .cache import H
-
-# For supporting multiprocessing in outer code, joblib is used
-from joblib import delayed
+from . import profiler
 
 from ..config import C
-
-from ..utils import init_instance_by_config
+from ..log import get_module_logger
+from ..utils import (
+    init_instance_by_config,
+    get_module_by_module_path,
+    parse_field,
+    code_to_fname,
+    get_period_list,
+)
+from ..utils.time import Freq, epsilon_change
+from .base import Feature, PFeature
+from .ops import Operators  # pylint: disable=W0611  # noqa: F401
 
 class ProviderBackendMixin:
     def get_default_backend(self):
@@ -29,8 +35,9 @@ class ProviderBackendMixin:
     
     def backend_obj(self, **kwargs):
         backend = self.backend if self.backend else self.get_default_backend()
-        backend = copy.deepcopy(backend)
-        backend.setdefault("kwargs", {}).update(**kwargs)
+        if kwargs:
+            # the config is not modified, so merging the kwargs into a shallow copy is enough
+            backend = {**backend, "kwargs": {**backend.get("kwargs", {}), **kwargs}}
         return init_instance_by_config(backend)
     
 class CalendarProvider(abc.ABC):
@@ -75,11 +82,14 @@ class CalendarProvider(abc.ABC):
 
     def _get_calendar(self, freq, future):
         flag = f"{freq}_future_{future}"
-        if flag not in H["c"]:
-            _calendar = np.array(self.load_calendar(freq, future))
-            _calendar_index = {x: i for i, x in enumerate(_calendar)}
-            H["c"][flag] = _calendar, _calendar_index
-        return H["c"][flag]
+        cached = H["c"].get(flag)
+        profiler.record_cache("c", cached is not None)
+        if cached is not None:
+            return cached
+        _calendar = np.array(self.load_calendar(freq, future))
+        _calendar_index = {x: i for i, x in enumerate(_calendar)}
+        H["c"][flag] = _calendar, _calendar_index
+        return _calendar, _calendar_index
     
     def load_calendar(self, freq, future):
         raise NotImplementedError("Subclass of CalendarProvider must implement load_calendar method")
@@ -87,7 +97,880 @@ class CalendarProvider(abc.ABC):
 class InstrumentProvider(abc.ABC):
     @staticmethod
     def instruments(market: Union[List, str] = "all", filter_pipe: Union[List, None] = None):
+        """Get the general config dictionary for a base market adding several dynamic filters.
+
+        Parameters
+        ----------
+        market : Union[List, str]
+            str:
+                market/industry/index shortname, e.g. all/sse/szse/sse50/csi300/csi500.
+            list:
+                ["ID1", "ID2"]. A list of stocks
+        filter_pipe : list
+            the list of dynamic filters.
+
+        Returns
+        ----------
+        dict: if isinstance(market, str)
+            dict of stockpool config.
+
+            {`market` => base market name, `filter_pipe` => list of filters}
+
+        list: if isinstance(market, list)
+            just return the original list directly.
+        """
         if isinstance(market, list):
             return market
         from .filter import SeriesDFilter
-        
\ No newline at end of file
+
+        if filter_pipe is None:
+            filter_pipe = []
+        config = {"market": market, "filter_pipe": []}
+        # the order of the filters will affect the result, so we need to keep
+        # the order
+        for filter_t in filter_pipe:
+            if isinstance(filter_t, dict):
+                _config = filter_t
+            elif isinstance(filter_t, SeriesDFilter):
+                _config = filter_t.to_config()
+            else:
+                raise TypeError(f"Unsupported filter types: {type(filter_t)}! Filter only supports dict or BaseDFilter")
+            config["filter_pipe"].append(_config)
+        return config
+
+    @abc.abstractmethod
+    def list_instruments(self, instruments, start_time=None, end_time=None, freq="day", as_list=False):
+        """List the instruments based on a certain stockpool config.
+
+        Parameters
+        ----------
+        instruments : dict
+            stockpool config.
+        start_time : str
+            start of the time range.
+        end_time : str
+            end of the time range.
+        as_list : bool
+            return instruments as list or dict.
+
+        Returns
+        -------
+        dict or list
+            instruments list or dictionary with time spans
+        """
+        raise NotImplementedError("Subclass of InstrumentProvider must implement `list_instruments` method")
+
+    # instruments type
+    LIST = "LIST"
+    DICT = "DICT"
+    CONF = "CONF"
+
+    @classmethod
+    def get_inst_type(cls, inst):
+        if "market" in inst:
+            return cls.CONF
+        if isinstance(inst, dict):
+            return cls.DICT
+        if isinstance(inst, (list, tuple, pd.Index, np.ndarray)):
+            return cls.LIST
+        raise ValueError(f"Unknown instrument type {inst}")
+
+
+class FeatureProvider(abc.ABC):
+    """Feature provider class
+
+    Provide feature data.
+    """
+
+    @abc.abstractmethod
+    def feature(self, instrument, field, start_time, end_time, freq):
+        """Get feature data.
+
+        Parameters
+        ----------
+        instrument : str
+            a certain instrument.
+        field : str
+            a certain field of feature.
+        start_time : str
+            start of the time range.
+        end_time : str
+            end of the time range.
+        freq : str
+            time frequency, available: year/quarter/month/week/day.
+
+        Returns
+        -------
+        pd.Series
+            data of a certain feature
+        """
+        raise NotImplementedError("Subclass of FeatureProvider must implement `feature` method")
+
+
+class PITProvider(abc.ABC):
+    @abc.abstractmethod
+    def period_feature(
+        self,
+        instrument,
+        field,
+        start_index: int,
+        end_index: int,
+        cur_time: pd.Timestamp,
+        period: Optional[int] = None,
+    ) -> pd.Series:
+        """
+        get the historical periods data series between `start_index` and `end_index`
+
+        Parameters
+        ----------
+        start_index: int
+            start_index is a relative index to the latest period to cur_time
+
+        end_index: int
+            end_index is a relative index to the latest period to cur_time
+            in most cases, the start_index and end_index will be a non-positive values
+            For example, start_index == -3 end_index == 0 and current period index is cur_idx,
+            then the data between [start_index + cur_idx, end_index + cur_idx] will be retrieved.
+
+        period: int
+            This is used for query specific period.
+            The period is represented with int in Qlib. (e.g. 202001 may represent the first quarter in 2020)
+            NOTE: `period`  will override `start_index` and `end_index`
+
+        Returns
+        -------
+        pd.Series
+            The index will be integers to indicate the periods of the data
+            An typical examples will be
+            TODO
+
+        Raises
+        ------
+        FileNotFoundError
+            This exception will be raised if the queried data do not exist.
+        """
+        raise NotImplementedError(f"Please implement the `period_feature` method")
+
+    def as_of(self, instrument, field, cur_times, period: Optional[int] = None) -> np.ndarray:
+        """
+        The value of the latest period (or of `period`) known at each of `cur_times`
+
+        It is the vectorized version of taking the last value of `period_feature(..., 0, 0, cur_time, period)` for
+        each `cur_time`.
+        """
+        res = np.full(len(cur_times), np.nan)
+        for i, cur_time in enumerate(cur_times):
+            s = self.period_feature(instrument, field, 0, 0, pd.Timestamp(cur_time), period)
+            if len(s) > 0:
+                res[i] = s.iloc[-1]
+        return res
+
+
+class ExpressionProvider(abc.ABC):
+    """Expression provider class
+
+    Provide Expression data.
+    """
+
+    def __init__(self):
+        self.expression_instance_cache = {}
+
+    def get_expression_instance(self, field):
+        try:
+            if field in self.expression_instance_cache:
+                expression = self.expression_instance_cache[field]
+            else:
+                expression = eval(parse_field(field))
+                self.expression_instance_cache[field] = expression
+        except NameError as e:
+            get_module_logger("data").exception(
+                "ERROR: field [%s] contains invalid operator/variable [%s]" % (str(field), str(e).split()[1])
+            )
+            raise
+        except SyntaxError:
+            get_module_logger("data").exception("ERROR: field [%s] contains invalid syntax" % str(field))
+            raise
+        return expression
+
+    @abc.abstractmethod
+    def expression(self, instrument, field, start_time=None, end_time=None, freq="day") -> pd.Series:
+        """Get Expression data.
+
+        The responsibility of `expression`
+        - parse the `field` and `load` the according data.
+        - When loading the data, it should handle the time dependency of the data. `get_expression_instance` is
+          commonly used in this method
+
+        Parameters
+        ----------
+        instrument : str
+            a certain instrument.
+        field : str
+            a certain field of feature.
+        start_time : str
+            start of the time range.
+        end_time : str
+            end of the time range.
+        freq : str
+            time frequency, available: year/quarter/month/week/day.
+
+        Returns
+        -------
+        pd.Series
+            data of a certain expression
+
+            The data has two types of format
+
+            1) expression with datetime index
+
+            2) expression with integer index
+
+                - because the datetime is not as good as
+        """
+        raise NotImplementedError("Subclass of ExpressionProvider must implement `Expression` method")
+
+
+class DatasetProvider(abc.ABC):
+    """Dataset provider class
+
+    Provide Dataset data.
+    """
+
+    @abc.abstractmethod
+    def dataset(self, instruments, fields, start_time=None, end_time=None, freq="day", inst_processors=[]):
+        """Get dataset data.
+
+        Parameters
+        ----------
+        instruments : list or dict
+            list/dict of instruments or dict of stockpool config.
+        fields : list
+            list of feature instances.
+        start_time : str
+            start of the time range.
+        end_time : str
+            end of the time range.
+        freq : str
+            time frequency.
+        inst_processors:  Iterable[Union[dict, InstProcessor]]
+            the operations performed on each instrument
+
+        Returns
+        ----------
+        pd.DataFrame
+            a pandas dataframe with <instrument, datetime> index.
+        """
+        raise NotImplementedError("Subclass of DatasetProvider must implement `Dataset` method")
+
+    @staticmethod
+    def get_instruments_d(instruments, freq):
+        """
+        Parse different types of input instruments to output instruments_d
+        Wrong format of input instruments will lead to exception.
+
+        """
+        if isinstance(instruments, dict):
+            if "market" in instruments:
+                # dict of stockpool config
+                instruments_d = Inst.list_instruments(instruments=instruments, freq=freq, as_list=False)
+            else:
+                # dict of instruments and timestamp
+                instruments_d = instruments
+        elif isinstance(instruments, (list, tuple, pd.Index, np.ndarray)):
+            # list or tuple of a group of instruments
+            instruments_d = list(instruments)
+        else:
+            raise ValueError("Unsupported input type for param `instrument`")
+        return instruments_d
+
+    @staticmethod
+    def get_column_names(fields):
+        """
+        Get column names from input fields
+
+        """
+        if len(fields) == 0:
+            raise ValueError("fields cannot be empty")
+        column_names = [str(f) for f in fields]
+        return column_names
+
+    @staticmethod
+    def parse_fields(fields):
+        # parse and check the input fields
+        return [ExpressionD.get_expression_instance(f) for f in fields]
+
+    @staticmethod
+    def dataset_processor(instruments_d, column_names, start_time, end_time, freq, inst_processors=[]):
+        """
+        Load and process the data, return the data set.
+        - default using multi-kernel method.
+
+        """
+        # For supporting multiprocessing in outer code, joblib is used
+        # it is imported here to keep `import qlib` light
+        from joblib import delayed, Parallel  # pylint: disable=C0415
+
+        # One process for one task, so that the memory will be freed quicker.
+        workers = max(min(C.kernels, len(instruments_d)), 1)
+
+        # create iterator
+        if isinstance(instruments_d, dict):
+            it = instruments_d.items()
+        else:
+            it = zip(instruments_d, [None] * len(instruments_d))
+
+        # the loads in the worker processes are profiled there and sent back with the results
+        _profiler = profiler.get_profiler()
+        calculator = DatasetProvider.inst_calculator
+        if _profiler is not None:
+            calculator = profiler.ProfiledTask(calculator)
+
+        inst_l = []
+        task_l = []
+        for inst, spans in it:
+            inst_l.append(inst)
+            task_l.append(
+                delayed(calculator)(inst, start_time, end_time, freq, column_names, spans, C, inst_processors)
+            )
+
+        res_l = Parallel(n_jobs=workers, backend=C.joblib_backend)(task_l)
+        if _profiler is not None:
+            for i, (res, state) in enumerate(res_l):
+                if state is not None:
+                    _profiler.merge(state)
+                res_l[i] = res
+        data = dict(zip(inst_l, res_l))
+
+        new_data = dict()
+        for inst in sorted(data.keys()):
+            if len(data[inst]) > 0:
+                # NOTE: Python version >= 3.6; in versions after python3.6, dict will always guarantee the insertion order
+                new_data[inst] = data[inst]
+
+        if len(new_data) > 0:
+            data = pd.concat(new_data, names=["instrument"], sort=False)
+        else:
+            data = pd.DataFrame(
+                index=pd.MultiIndex.from_arrays([[], []], names=("instrument", "datetime")),
+                columns=column_names,
+                dtype=np.float32,
+            )
+
+        return data
+
+    @staticmethod
+    def inst_calculator(inst, start_time, end_time, freq, column_names, spans=None, g_config=None, inst_processors=[]):
+        """
+        Calculate the expressions for **one** instrument, return a df result.
+        If the expression has been calculated before, load from cache.
+
+        return value: A data frame with index 'datetime' and other data columns.
+
+        """
+        # NOTE: This place is compatible with windows, windows multi-process is spawn
+        C.register_from_C(g_config)
+
+        with profiler.node("provider", "inst_calculator", "DatasetProvider", inst) as _node:
+            obj = dict()
+            for field in column_names:
+                #  The client does not have expression provider, the data will be loaded from cache using static method.
+                obj[field] = ExpressionD.expression(inst, field, start_time, end_time, freq)
+
+            data = pd.DataFrame(obj)
+            if not data.empty and not np.issubdtype(data.index.dtype, np.dtype("M")):
+                # If the underlaying provides the data not in datetime format, we'll convert it into datetime format
+                _calendar = Cal.calendar(freq=freq)
+                data.index = _calendar[data.index.values.astype(int)]
+            data.index.names = ["datetime"]
+
+            if not data.empty and spans is not None:
+                mask = np.zeros(len(data), dtype=bool)
+                for begin, end in spans:
+                    mask |= (data.index >= begin) & (data.index <= end)
+                data = data[mask]
+
+            for _processor in inst_processors:
+                if _processor:
+                    _processor_obj = init_instance_by_config(_processor, accept_types=object)
+                    data = _processor_obj(data, instrument=inst)
+            if _node is not None:
+                _node.result(data)
+        return data
+
+
+class LocalCalendarProvider(CalendarProvider, ProviderBackendMixin):
+    """Local calendar data provider class
+
+    Provide calendar data from local data source.
+    """
+
+    def __init__(self, remote=False, backend={}):
+        super().__init__()
+        self.remote = remote
+        self.backend = backend
+
+    def load_calendar(self, freq, future):
+        """Load original calendar timestamp from file.
+
+        Parameters
+        ----------
+        freq : str
+            frequency of read calendar file.
+        future: bool
+        Returns
+        ----------
+        list
+            list of timestamps
+        """
+        try:
+            backend_obj = self.backend_obj(freq=freq, future=future).data
+        except ValueError:
+            if future:
+                get_module_logger("data").warning(
+                    f"load calendar error: freq={freq}, future={future}; return current calendar!"
+                )
+                backend_obj = self.backend_obj(freq=freq, future=False).data
+            else:
+                raise
+
+        return [pd.Timestamp(x) for x in backend_obj]
+
+
+class LocalInstrumentProvider(InstrumentProvider, ProviderBackendMixin):
+    """Local instrument data provider class
+
+    Provide instrument data from local data source.
+    """
+
+    def __init__(self, backend={}) -> None:
+        super().__init__()
+        self.backend = backend
+
+    def _load_instruments(self, market, freq):
+        return self.backend_obj(market=market, freq=freq).data
+
+    def list_instruments(self, instruments, start_time=None, end_time=None, freq="day", as_list=False):
+        market = instruments["market"]
+        _instruments = H["i"].get(market)
+        profiler.record_cache("i", _instruments is not None)
+        if _instruments is None:
+            _instruments = self._load_instruments(market, freq=freq)
+            H["i"][market] = _instruments
+        # strip
+        # use calendar boundary
+        cal = Cal.calendar(freq=freq)
+        start_time = pd.Timestamp(start_time or cal[0])
+        end_time = pd.Timestamp(end_time or cal[-1])
+        if Freq(freq).base == Freq.NORM_FREQ_MINUTE:
+            # the spans are recorded by date, so the end date of a span includes all the minutes of that day
+            _span_end = lambda x: epsilon_change(pd.Timestamp(x).normalize() + pd.Timedelta(days=1))
+        else:
+            _span_end = pd.Timestamp
+        _instruments_filtered = {
+            inst: list(
+                filter(
+                    lambda x: x[0] <= x[1],
+                    [(max(start_time, pd.Timestamp(x[0])), min(end_time, _span_end(x[1]))) for x in spans],
+                )
+            )
+            for inst, spans in _instruments.items()
+        }
+        _instruments_filtered = {key: value for key, value in _instruments_filtered.items() if value}
+        # filter
+        filter_pipe = instruments["filter_pipe"]
+        for filter_config in filter_pipe:
+            from . import filter as F  # pylint: disable=C0415
+
+            filter_t = getattr(F, filter_config["filter_type"]).from_config(filter_config)
+            _instruments_filtered = filter_t(_instruments_filtered, start_time, end_time, freq)
+        # as list
+        if as_list:
+            return list(_instruments_filtered)
+        return _instruments_filtered
+
+
+class LocalFeatureProvider(FeatureProvider, ProviderBackendMixin):
+    """Local feature data provider class
+
+    Provide feature data from local data source.
+    """
+
+    def __init__(self, remote=False, backend={}):
+        super().__init__()
+        self.remote = remote
+        self.backend = backend
+
+    def feature(self, instrument, field, start_index, end_index, freq):
+        # validate
+        field = str(field)[1:]
+        instrument = code_to_fname(instrument)
+        series = self.backend_obj(instrument=instrument, field=field, freq=freq)[start_index : end_index + 1]
+        profiler.record_read(series.nbytes)
+        return series
+
+
+class LocalPITProvider(PITProvider, ProviderBackendMixin):
+    """Local PIT data provider class
+
+    Provide PIT data from the memory-mapped PIT storage.
+    """
+
+    def __init__(self, backend={}):
+        super().__init__()
+        self.backend = backend
+
+    def get_default_backend(self):
+        return {"class": "FilePITStorage", "module_path": "qlib.data.storage.file_storage"}
+
+    def _get_storage(self, instrument, field):
+        field = str(field).lower()[2:]
+        if not field.endswith("_q") and not field.endswith("_a"):
+            raise ValueError("period field must ends with '_q' or '_a'")
+        storage = self.backend_obj(instrument=code_to_fname(instrument), field=field)
+        storage.check()
+        return storage
+
+    @staticmethod
+    def _to_date_int(cur_times) -> np.ndarray:
+        cur_times = pd.DatetimeIndex(cur_times)
+        return cur_times.year.values * 10000 + cur_times.month.values * 100 + cur_times.day.values
+
+    def period_feature(self, instrument, field, start_index, end_index, cur_time, period=None):
+        if not isinstance(cur_time, pd.Timestamp):
+            raise ValueError(
+                f"Expected pd.Timestamp for `cur_time`, got '{cur_time}'. Advices: you can't query PIT data "
+                "directly(e.g. '$$roewa_q'), you must use `P` operator to convert data to each day "
+                "(e.g. 'P($$roewa_q)')"
+            )
+        assert end_index <= 0  # PIT don't support querying future data
+        storage = self._get_storage(instrument, field)
+        data = storage.data
+        value_dtype = data.dtype["value"]
+
+        # the records known at `cur_time`
+        loc = np.searchsorted(data["date"], self._to_date_int([cur_time])[0], side="right")
+        if loc <= 0:
+            return pd.Series(dtype=value_dtype)
+        known = data[:loc]
+        profiler.record_read(known.nbytes)
+        period_list = get_period_list(int(known["period"].min()), int(known["period"].max()), storage.quarterly)
+        if period is not None:
+            # NOTE: `period` has higher priority than `start_index` & `end_index`
+            if period not in period_list:
+                return pd.Series(dtype=value_dtype)
+            period_list = [period]
+        else:
+            period_list = period_list[max(0, len(period_list) + start_index - 1) : len(period_list) + end_index]
+
+        # the latest revision of each period is the last record of the period
+        rev_periods = known["period"][::-1]
+        periods, last = np.unique(rev_periods, return_index=True)
+        values = pd.Series(known["value"][loc - 1 - last], index=periods)
+        # NOTE: the index is period_list; So it may result in unexpected values(e.g. nan)
+        # when calculation between different features and only part of its financial indicator is published
+        return values.reindex(period_list).astype(value_dtype)
+
+    def as_of(self, instrument, field, cur_times, period=None):
+        storage = self._get_storage(instrument, field)
+        profiler.record_read(storage.data.nbytes)
+        return storage.as_of(self._to_date_int(cur_times), period)
+
+
+class LocalExpressionProvider(ExpressionProvider):
+    """Local expression data provider class
+
+    Provide expression data from local data source.
+    """
+
+    def __init__(self, time2idx=True):
+        super().__init__()
+        self.time2idx = time2idx
+
+    def expression(self, instrument, field, start_time=None, end_time=None, freq="day"):
+        expression = self.get_expression_instance(field)
+        start_time = pd.Timestamp(start_time) if start_time is not None else None
+        end_time = pd.Timestamp(end_time) if end_time is not None else None
+        # Two kinds of queries are supported
+        # - Index-based expression: this may take a little more time because it has to convert time to index
+        # - Time-based expression: this will be used in the PIT data
+        if self.time2idx:
+            _, _, start_index, end_index = Cal.locate_index(start_time, end_time, freq=freq, future=False)
+            lft_etd, rght_etd = expression.get_extended_window_size()
+            query_start, query_end = max(0, start_index - lft_etd), end_index + rght_etd
+        else:
+            start_index, end_index = query_start, query_end = start_time, end_time
+        try:
+            series = expression.load(instrument, query_start, query_end, freq)
+        except Exception as e:
+            get_module_logger("data").debug(
+                f"Loading expression error: "
+                f"instrument={instrument}, field=({field}), start_time={start_time}, end_time={end_time}, freq={freq}. "
+                f"error info: {str(e)}"
+            )
+            raise
+        # Ensure that each column type is consistent
+        # FIXME:
+        # 1) The stock data is currently float. If there is other types of data, this part needs to be re-implemented.
+        # 2) The precision should be configurable
+        try:
+            series = series.astype(np.float32)
+        except ValueError:
+            pass
+        except TypeError:
+            pass
+        if not series.empty:
+            series = series.loc[start_index:end_index]
+        return series
+
+
+class LocalDatasetProvider(DatasetProvider):
+    """Local dataset data provider class
+
+    Provide dataset data from local data source.
+    """
+
+    def __init__(self, align_time: bool = True):
+        """
+        Parameters
+        ----------
+        align_time : bool
+            Will we align the time to calendar
+            the frequency is flexible in some dataset and can't be aligned.
+            For the data with fixed frequency with a shared calendar, the align data to the calendar will provides
+            following benefits
+
+            - Align queries to the same parameters, so the cache can be shared.
+        """
+        super().__init__()
+        self.align_time = align_time
+
+    def dataset(self, instruments, fields, start_time=None, end_time=None, freq="day", inst_processors=[]):
+        with profiler.node("provider", "dataset", self.__class__.__name__) as _node:
+            instruments_d = self.get_instruments_d(instruments, freq)
+            column_names = self.get_column_names(fields)
+            if self.align_time:
+                # NOTE: if the frequency is a fixed value.
+                # align the data to fixed calendar point
+                cal = Cal.calendar(start_time, end_time, freq)
+                if len(cal) == 0:
+                    return pd.DataFrame(
+                        index=pd.MultiIndex.from_arrays([[], []], names=("instrument", "datetime")),
+                        columns=column_names,
+                    )
+                start_time = cal[0]
+                end_time = cal[-1]
+            data = self.dataset_processor(
+                instruments_d, column_names, start_time, end_time, freq, inst_processors=inst_processors
+            )
+            if _node is not None:
+                _node.result(data)
+
+        return data
+
+
+class ClientCalendarProvider(CalendarProvider):
+    """Client calendar data provider class
+
+    Provide calendar data by requesting data from server as a client.
+    The whole calendar of a freq is requested once and cached, it is sliced locally.
+    """
+
+    def __init__(self):
+        self.conn = None
+
+    def set_conn(self, conn):
+        self.conn = conn
+
+    def load_calendar(self, freq, future):
+        return self.conn.calendar(freq, future)
+
+
+class ClientInstrumentProvider(InstrumentProvider):
+    """Client instrument data provider class
+
+    Provide instrument data by requesting data from server as a client.
+    """
+
+    def __init__(self):
+        self.conn = None
+
+    def set_conn(self, conn):
+        self.conn = conn
+
+    def list_instruments(self, instruments, start_time=None, end_time=None, freq="day", as_list=False):
+        return self.conn.list_instruments(instruments, start_time, end_time, freq, as_list)
+
+
+class ClientDatasetProvider(DatasetProvider):
+    """Client dataset data provider class
+
+    Provide dataset data by requesting data from server as a client.
+    The expressions are computed and cached by the server, `inst_processors` must be given as configs.
+    """
+
+    def __init__(self):
+        self.conn = None
+
+    def set_conn(self, conn):
+        self.conn = conn
+
+    def dataset(
+        self, instruments, fields, start_time=None, end_time=None, freq="day", disk_cache=0, inst_processors=[]
+    ):
+        self.get_column_names(fields)
+        return self.conn.features(instruments, fields, start_time, end_time, freq, disk_cache, inst_processors)
+
+
+class BaseProvider:
+    """Local provider class
+    It is a set of interface that allow users to access data.
+    Because PITD is not exposed publicly to users, so it is not included in the interface.
+
+    To keep compatible with old qlib provider.
+    """
+
+    def calendar(self, start_time=None, end_time=None, freq="day", future=False):
+        return Cal.calendar(start_time, end_time, freq, future=future)
+
+    def instruments(self, market="all", filter_pipe=None, start_time=None, end_time=None):
+        if start_time is not None or end_time is not None:
+            get_module_logger("Provider").warning(
+                "The instruments corresponds to a stock pool. "
+                "Parameters `start_time` and `end_time` does not take effect now."
+            )
+        return InstrumentProvider.instruments(market, filter_pipe)
+
+    def list_instruments(self, instruments, start_time=None, end_time=None, freq="day", as_list=False):
+        return Inst.list_instruments(instruments, start_time, end_time, freq, as_list)
+
+    def features(
+        self,
+        instruments,
+        fields,
+        start_time=None,
+        end_time=None,
+        freq="day",
+        disk_cache=None,
+        inst_processors=[],
+    ):
+        """
+        Parameters
+        ----------
+        disk_cache : int
+            whether to skip(0)/use(1)/replace(2) disk_cache
+
+        This function will try to use cache method which has a keyword `disk_cache`,
+        and will use provider method if a type error is raised because the DatasetD instance
+        is a provider class.
+        """
+        disk_cache = C.default_disk_cache if disk_cache is None else disk_cache
+        fields = list(fields)  # In case of tuple.
+        try:
+            return DatasetD.dataset(
+                instruments, fields, start_time, end_time, freq, disk_cache, inst_processors=inst_processors
+            )
+        except TypeError:
+            return DatasetD.dataset(instruments, fields, start_time, end_time, freq, inst_processors=inst_processors)
+
+
+class LocalProvider(BaseProvider):
+    pass
+
+
+class ClientProvider(BaseProvider):
+    """Client Provider
+
+    Requesting data from server as a client. Can propose requests:
+
+        - Calendar : Directly respond a list of calendars
+        - Instruments (without filter): Directly respond a list/dict of instruments
+        - Instruments (with filters):  Respond a list/dict of instruments
+        - Features : Respond a DataFrame, sent as NumPy buffers
+    """
+
+    def __init__(self):
+        from .client import Client  # pylint: disable=C0415
+
+        self.client = Client(C.data_server_host, C.data_server_port, timeout=C.timeout)
+        self.logger = get_module_logger(self.__class__.__name__)
+        for wrapper in [Cal, Inst, DatasetD]:
+            provider = wrapper.__dict__.get("_provider")
+            if isinstance(provider, (ClientCalendarProvider, ClientInstrumentProvider, ClientDatasetProvider)):
+                provider.set_conn(self.client)
+
+
+class Wrapper:
+    """Wrapper of the providers, the provider is registered when `qlib.init` is called"""
+
+    def __init__(self):
+        self._provider = None
+
+    def register(self, provider):
+        self._provider = provider
+
+    def __repr__(self):
+        return "{name}(provider={provider})".format(name=self.__class__.__name__, provider=self._provider)
+
+    def __getattr__(self, key):
+        if self.__dict__.get("_provider", None) is None:
+            raise AttributeError("Please run qlib.init() first using qlib")
+        return getattr(self._provider, key)
+
+
+def register_wrapper(wrapper, cls_or_obj, module_path=None):
+    """register_wrapper
+
+    :param wrapper: A wrapper.
+    :param cls_or_obj:  A class or class name or object instance.
+    """
+    if isinstance(cls_or_obj, str):
+        module = get_module_by_module_path(module_path)
+        cls_or_obj = getattr(module, cls_or_obj)
+    obj = cls_or_obj() if isinstance(cls_or_obj, type) else cls_or_obj
+    wrapper.register(obj)
+
+
+Cal: CalendarProvider = Wrapper()
+Inst: InstrumentProvider = Wrapper()
+FeatureD: FeatureProvider = Wrapper()
+PITD: PITProvider = Wrapper()
+ExpressionD: ExpressionProvider = Wrapper()
+DatasetD: DatasetProvider = Wrapper()
+D: BaseProvider = Wrapper()
+
+
+def register_all_wrappers(C):
+    """register_all_wrappers"""
+    logger = get_module_logger("data")
+    module = get_module_by_module_path("qlib.data")
+
+    _calendar_provider = init_instance_by_config(C.calendar_provider, module)
+    register_wrapper(Cal, _calendar_provider, "qlib.data")
+    logger.debug(f"registering Cal {C.calendar_provider}")
+
+    _instrument_provider = init_instance_by_config(C.instrument_provider, module)
+    register_wrapper(Inst, _instrument_provider, "qlib.data")
+    logger.debug(f"registering Inst {C.instrument_provider}")
+
+    if getattr(C, "feature_provider", None) is not None:
+        feature_provider = init_instance_by_config(C.feature_provider, module)
+        register_wrapper(FeatureD, feature_provider, "qlib.data")
+        logger.debug(f"registering FeatureD {C.feature_provider}")
+
+    if getattr(C, "pit_provider", None) is not None:
+        pprovider = init_instance_by_config(C.pit_provider, module)
+        register_wrapper(PITD, pprovider, "qlib.data")
+        logger.debug(f"registering PITD {C.pit_provider}")
+
+    if getattr(C, "expression_provider", None) is not None:
+        # This provider is unnecessary in client provider
+        _eprovider = init_instance_by_config(C.expression_provider, module)
+        register_wrapper(ExpressionD, _eprovider, "qlib.data")
+        logger.debug(f"registering ExpressionD {C.expression_provider}")
+
+    _dprovider = init_instance_by_config(C.dataset_provider, module)
+    register_wrapper(DatasetD, _dprovider, "qlib.data")
+    logger.debug(f"registering DatasetD {C.dataset_provider}")
+
+    register_wrapper(D, C.provider, "qlib.data")
+    logger.debug(f"registering D {C.provider}")
@@ -5,10 +5,27 @@ from __future__ import print_function
 import numpy as np 
 import pandas as pd
 
+from typing import Union, List, Type
+
 from .base import Expression, ExpressionOps, Feature, PFeature
+from ..log import get_module_logger
+from ..utils import get_callable_kwargs
 
 ################################## Element-wise Operator ##################################
 class ElemOperator(ExpressionOps):
+    """Element-wise Operator
+
+    Parameters
+    ----------
+    feature : Expression
+        feature instance
+
+    Returns
+    ----------
+    Expression
+        feature operation output
+    """
+
     def __init__(self, feature):
         self.feature = feature
     
@@ -22,8 +39,601 @@ class ElemOperator(ExpressionOps):
         return self.feature.get_extended_window_size()
     
 class ChangeInstrument(ElemOperator):
+    """Change Instrument Operator
+    In some case, one may want to change to another instrument when calculating, for example, to
+    calculate beta of a stock with respect to a market index.
+    This would require changing the calculation of features from the stock (original instrument) to
+    the index (reference instrument)
+
+    Parameters
+    ----------
+    instrument: new instrument for which the downstream operations should be performed upon.
+                i.e., SH000300 (CSI300 index), or ^GPSC (SP500 index).
+
+    feature: the feature to be calculated for the new instrument.
+    """
+
     def __init__(self, instrument, feature):
         self.instrument = instrument
         self.feature = feature
-    
-    
\ No newline at end of file
+
+    def __str__(self):
+        return "{}('{}',{})".format(type(self).__name__, self.instrument, self.feature)
+
+    def load(self, instrument, start_index, end_index, *args):
+        # the first `instrument` is ignored
+        return super().load(self.instrument, start_index, end_index, *args)
+
+    def _load_internal(self, instrument, start_index, end_index, *args):
+        return self.feature.load(instrument, start_index, end_index, *args)
+
+
+class NpElemOperator(ElemOperator):
+    """Numpy Element-wise Operator
+
+    Parameters
+    ----------
+    feature : Expression
+        feature instance
+    func : str
+        numpy feature operation method
+
+    Returns
+    ----------
+    Expression
+        feature operation output
+    """
+
+    def __init__(self, feature, func):
+        self.func = func
+        super(NpElemOperator, self).__init__(feature)
+
+    def _load_internal(self, instrument, start_index, end_index, *args):
+        series = self.feature.load(instrument, start_index, end_index, *args)
+        return getattr(np, self.func)(series)
+
+
+class Abs(NpElemOperator):
+    """Feature Absolute Value"""
+
+    def __init__(self, feature):
+        super(Abs, self).__init__(feature, "abs")
+
+
+class Sign(NpElemOperator):
+    """Feature Sign"""
+
+    def __init__(self, feature):
+        super(Sign, self).__init__(feature, "sign")
+
+    def _load_internal(self, instrument, start_index, end_index, *args):
+        """
+        To avoid error raised by bool type input, we transform the data into float32.
+        """
+        series = self.feature.load(instrument, start_index, end_index, *args)
+        # TODO:  More precision types should be configurable
+        series = series.astype(np.float32)
+        return getattr(np, self.func)(series)
+
+
+class Log(NpElemOperator):
+    """Feature Log"""
+
+    def __init__(self, feature):
+        super(Log, self).__init__(feature, "log")
+
+
+class Not(NpElemOperator):
+    """Not Operator"""
+
+    def __init__(self, feature):
+        super(Not, self).__init__(feature, "bitwise_not")
+
+
+#################### Pair-Wise Operator ####################
+class PairOperator(ExpressionOps):
+    """Pair-wise operator
+
+    Parameters
+    ----------
+    feature_left : Expression
+        feature instance or numeric value
+    feature_right : Expression
+        feature instance or numeric value
+
+    Returns
+    ----------
+    Feature:
+        two features' operation output
+    """
+
+    def __init__(self, feature_left, feature_right):
+        self.feature_left = feature_left
+        self.feature_right = feature_right
+
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self.feature_left, self.feature_right)
+
+    def get_longest_back_rolling(self):
+        if isinstance(self.feature_left, Expression):
+            left_br = self.feature_left.get_longest_back_rolling()
+        else:
+            left_br = 0
+
+        if isinstance(self.feature_right, Expression):
+            right_br = self.feature_right.get_longest_back_rolling()
+        else:
+            right_br = 0
+        return max(left_br, right_br)
+
+    def get_extended_window_size(self):
+        if isinstance(self.feature_left, Expression):
+            ll, lr = self.feature_left.get_extended_window_size()
+        else:
+            ll, lr = 0, 0
+
+        if isinstance(self.feature_right, Expression):
+            rl, rr = self.feature_right.get_extended_window_size()
+        else:
+            rl, rr = 0, 0
+        return max(ll, rl), max(lr, rr)
+
+
+class NpPairOperator(PairOperator):
+    """Numpy Pair-wise operator
+
+    Parameters
+    ----------
+    feature_left : Expression
+        feature instance or numeric value
+    feature_right : Expression
+        feature instance or numeric value
+    func : str
+        operator function
+
+    Returns
+    ----------
+    Feature:
+        two features' operation output
+    """
+
+    def __init__(self, feature_left, feature_right, func):
+        self.func = func
+        super(NpPairOperator, self).__init__(feature_left, feature_right)
+
+    def _load_internal(self, instrument, start_index, end_index, *args):
+        assert any(
+            [isinstance(self.feature_left, Expression), isinstance(self.feature_right, Expression)]
+        ), "at least one of two inputs is Expression instance"
+        if isinstance(self.feature_left, Expression):
+            series_left = self.feature_left.load(instrument, start_index, end_index, *args)
+        else:
+            series_left = self.feature_left  # numeric value
+        if isinstance(self.feature_right, Expression):
+            series_right = self.feature_right.load(instrument, start_index, end_index, *args)
+        else:
+            series_right = self.feature_right
+        check_length = isinstance(series_left, (np.ndarray, pd.Series)) and isinstance(
+            series_right, (np.ndarray, pd.Series)
+        )
+        if check_length and len(series_left) != len(series_right):
+            get_module_logger("ops").debug(
+                f"The length of LHS and RHS is not the same, may cause error when calculating {self}"
+            )
+        return getattr(np, self.func)(series_left, series_right)
+
+
+class Power(NpPairOperator):
+    """Power Operator"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Power, self).__init__(feature_left, feature_right, "power")
+
+
+class Add(NpPairOperator):
+    """Add Operator"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Add, self).__init__(feature_left, feature_right, "add")
+
+
+class Sub(NpPairOperator):
+    """Subtract Operator"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Sub, self).__init__(feature_left, feature_right, "subtract")
+
+
+class Mul(NpPairOperator):
+    """Multiply Operator"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Mul, self).__init__(feature_left, feature_right, "multiply")
+
+
+class Div(NpPairOperator):
+    """Division Operator"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Div, self).__init__(feature_left, feature_right, "divide")
+
+
+class Greater(NpPairOperator):
+    """Greater Operator, the element-wise maximum of two features"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Greater, self).__init__(feature_left, feature_right, "maximum")
+
+
+class Less(NpPairOperator):
+    """Less Operator, the element-wise minimum of two features"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Less, self).__init__(feature_left, feature_right, "minimum")
+
+
+class Gt(NpPairOperator):
+    """Greater Than Operator, `left > right`"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Gt, self).__init__(feature_left, feature_right, "greater")
+
+
+class Ge(NpPairOperator):
+    """Greater Equal Than Operator, `left >= right`"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Ge, self).__init__(feature_left, feature_right, "greater_equal")
+
+
+class Lt(NpPairOperator):
+    """Less Than Operator, `left < right`"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Lt, self).__init__(feature_left, feature_right, "less")
+
+
+class Le(NpPairOperator):
+    """Less Equal Than Operator, `left <= right`"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Le, self).__init__(feature_left, feature_right, "less_equal")
+
+
+class Eq(NpPairOperator):
+    """Equal Operator, `left == right`"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Eq, self).__init__(feature_left, feature_right, "equal")
+
+
+class Ne(NpPairOperator):
+    """Not Equal Operator, `left != right`"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Ne, self).__init__(feature_left, feature_right, "not_equal")
+
+
+class And(NpPairOperator):
+    """And Operator"""
+
+    def __init__(self, feature_left, feature_right):
+        super(And, self).__init__(feature_left, feature_right, "bitwise_and")
+
+
+class Or(NpPairOperator):
+    """Or Operator"""
+
+    def __init__(self, feature_left, feature_right):
+        super(Or, self).__init__(feature_left, feature_right, "bitwise_or")
+
+
+#################### Triple-wise Operator ####################
+class If(ExpressionOps):
+    """If Operator
+
+    Parameters
+    ----------
+    condition : Expression
+        feature instance with bool values as condition
+    feature_left : Expression
+        feature instance
+    feature_right : Expression
+        feature instance
+    """
+
+    def __init__(self, condition, feature_left, feature_right):
+        self.condition = condition
+        self.feature_left = feature_left
+        self.feature_right = feature_right
+
+    def __str__(self):
+        return "If({},{},{})".format(self.condition, self.feature_left, self.feature_right)
+
+    def _load_internal(self, instrument, start_index, end_index, *args):
+        series_cond = self.condition.load(instrument, start_index, end_index, *args)
+        if isinstance(self.feature_left, Expression):
+            series_left = self.feature_left.load(instrument, start_index, end_index, *args)
+        else:
+            series_left = self.feature_left
+        if isinstance(self.feature_right, Expression):
+            series_right = self.feature_right.load(instrument, start_index, end_index, *args)
+        else:
+            series_right = self.feature_right
+        series = pd.Series(np.where(series_cond, series_left, series_right), index=series_cond.index)
+        return series
+
+    def get_longest_back_rolling(self):
+        return max(
+            e.get_longest_back_rolling()
+            for e in (self.condition, self.feature_left, self.feature_right)
+            if isinstance(e, Expression)
+        )
+
+    def get_extended_window_size(self):
+        windows = [
+            e.get_extended_window_size()
+            for e in (self.condition, self.feature_left, self.feature_right)
+            if isinstance(e, Expression)
+        ]
+        return max(w[0] for w in windows), max(w[1] for w in windows)
+
+
+#################### Rolling ####################
+# NOTE: methods like `rolling.mean` are optimized with cython,
+# and are super faster than `rolling.apply(np.mean)`
+
+
+class Rolling(ExpressionOps):
+    """Rolling Operator
+    The meaning of rolling and expanding is the same in pandas.
+    When the window is set to 0, the behaviour of the operator should follow `expanding`
+    Otherwise, it follows `rolling`
+
+    Parameters
+    ----------
+    feature : Expression
+        feature instance
+    N : int
+        rolling window size
+    func : str
+        rolling method
+
+    Returns
+    ----------
+    Expression
+        rolling outputs
+    """
+
+    def __init__(self, feature, N, func):
+        self.feature = feature
+        self.N = N
+        self.func = func
+
+    def __str__(self):
+        return "{}({},{})".format(type(self).__name__, self.feature, self.N)
+
+    def _load_internal(self, instrument, start_index, end_index, *args):
+        series = self.feature.load(instrument, start_index, end_index, *args)
+        # NOTE: remove all null check,
+        # now it's user's responsibility to decide whether use features in null days
+        # isnull = series.isnull() # NOTE: isnull = NaN, inf is not null
+        if isinstance(self.N, int) and self.N == 0:
+            series = getattr(series.expanding(min_periods=1), self.func)()
+        elif isinstance(self.N, float) and 0 < self.N < 1:
+            series = series.ewm(alpha=self.N, min_periods=1).mean()
+        else:
+            series = getattr(series.rolling(self.N, min_periods=1), self.func)()
+        return series
+
+    def get_longest_back_rolling(self):
+        if self.N == 0:
+            return np.inf
+        if 0 < self.N < 1:
+            return int(np.log(1e-6) / np.log(1 - self.N))  # (1 - N)**window == 1e-6
+        return self.feature.get_longest_back_rolling() + self.N - 1
+
+    def get_extended_window_size(self):
+        if self.N == 0:
+            # FIXME: How to make this accurate and efficiently? Or  should we
+            # remove such support for N == 0?
+            get_module_logger(self.__class__.__name__).warning("The Rolling(ATTR, 0) will not be accurately calculated")
+            return self.feature.get_extended_window_size()
+        elif 0 < self.N < 1:
+            lft_etd, rght_etd = self.feature.get_extended_window_size()
+            size = int(np.log(1e-6) / np.log(1 - self.N))
+            lft_etd = max(lft_etd + size - 1, lft_etd)
+            return lft_etd, rght_etd
+        else:
+            lft_etd, rght_etd = self.feature.get_extended_window_size()
+            lft_etd = max(lft_etd + self.N - 1, lft_etd)
+            return lft_etd, rght_etd
+
+
+class Ref(Rolling):
+    """Feature Reference
+
+    Parameters
+    ----------
+    feature : Expression
+        feature instance
+    N : int
+        N = 0, retrieve the first data; N > 0, retrieve data of N periods ago; N < 0, future data
+
+    Returns
+    ----------
+    Expression
+        a feature instance with target reference
+    """
+
+    def __init__(self, feature, N):
+        super(Ref, self).__init__(feature, N, "ref")
+
+    def _load_internal(self, instrument, start_index, end_index, *args):
+        series = self.feature.load(instrument, start_index, end_index, *args)
+        # N = 0, return first day
+        if series.empty:
+            return series  # Pandas bug, see: https://github.com/pandas-dev/pandas/issues/21049
+        elif self.N == 0:
+            series = pd.Series(series.iloc[0], index=series.index)
+        else:
+            series = series.shift(self.N)  # copy
+        return series
+
+    def get_longest_back_rolling(self):
+        if self.N == 0:
+            return np.inf
+        return self.feature.get_longest_back_rolling() + self.N
+
+    def get_extended_window_size(self):
+        if self.N == 0:
+            get_module_logger(self.__class__.__name__).warning("The Ref(ATTR, 0) will not be accurately calculated")
+            return self.feature.get_extended_window_size()
+        else:
+            lft_etd, rght_etd = self.feature.get_extended_window_size()
+            lft_etd = max(lft_etd + self.N, lft_etd)
+            rght_etd = max(rght_etd - self.N, rght_etd)
+            return lft_etd, rght_etd
+
+
+class Mean(Rolling):
+    """Rolling Mean (MA)"""
+
+    def __init__(self, feature, N):
+        super(Mean, self).__init__(feature, N, "mean")
+
+
+class Sum(Rolling):
+    """Rolling Sum"""
+
+    def __init__(self, feature, N):
+        super(Sum, self).__init__(feature, N, "sum")
+
+
+class Std(Rolling):
+    """Rolling Std"""
+
+    def __init__(self, feature, N):
+        super(Std, self).__init__(feature, N, "std")
+
+
+class Max(Rolling):
+    """Rolling Max"""
+
+    def __init__(self, feature, N):
+        super(Max, self).__init__(feature, N, "max")
+
+
+class Min(Rolling):
+    """Rolling Min"""
+
+    def __init__(self, feature, N):
+        super(Min, self).__init__(feature, N, "min")
+
+
+from .pit import P, PRef  # pylint: disable=C0413
+
+OpsList = [
+    ChangeInstrument,
+    Rolling,
+    Ref,
+    Max,
+    Min,
+    Sum,
+    Mean,
+    Std,
+    Abs,
+    Sign,
+    Log,
+    Power,
+    Add,
+    Sub,
+    Mul,
+    Div,
+    Greater,
+    Less,
+    And,
+    Or,
+    Not,
+    Gt,
+    Ge,
+    Lt,
+    Le,
+    Eq,
+    Ne,
+    If,
+    Feature,
+    PFeature,
+    P,
+    PRef,
+]
+
+
+class OpsWrapper:
+    """Ops Wrapper"""
+
+    def __init__(self):
+        self._ops = {}
+
+    def reset(self):
+        self._ops = {}
+
+    def register(self, ops_list: List[Union[Type[ExpressionOps], dict]]):
+        """register operator
+
+        Parameters
+        ----------
+        ops_list : List[Union[Type[ExpressionOps], dict]]
+            - if type(ops_list) is List[Type[ExpressionOps]], each element of ops_list represents the operator class,
+              which should be the subclass of `ExpressionOps`.
+            - if type(ops_list) is List[dict], each element of ops_list represents the config of operator,
+              which has the following format:
+
+                .. code-block:: text
+
+                    {
+                        "class": class_name,
+                        "module_path": path,
+                    }
+
+                Note: `class` should be the class name of operator, `module_path` should be a python module or path
+                of file.
+        """
+        for _operator in ops_list:
+            if isinstance(_operator, dict):
+                _ops_class, _ = get_callable_kwargs(_operator)
+            else:
+                _ops_class = _operator
+
+            if not issubclass(_ops_class, (Expression,)):
+                raise TypeError("operator must be subclass of ExpressionOps, not {}".format(_ops_class))
+
+            if _ops_class.__name__ in self._ops:
+                get_module_logger(self.__class__.__name__).warning(
+                    "The custom operator [{}] will override the qlib default definition".format(_ops_class.__name__)
+                )
+            self._ops[_ops_class.__name__] = _ops_class
+
+    def __contains__(self, key):
+        """whether the operator `key` is registered"""
+        return key in self._ops
+
+    def __getattr__(self, key):
+        if key not in self._ops:
+            raise AttributeError("The operator [{0}] is not registered".format(key))
+        return self._ops[key]
+
+
+Operators = OpsWrapper()
+
+
+def register_all_ops(C):
+    """register all operator"""
+    logger = get_module_logger("ops")
+
+    Operators.reset()
+    Operators.register(OpsList)
+
+    if getattr(C, "custom_ops", None) is not None:
+        Operators.register(C.custom_ops)
+        logger.debug("register custom operator {}".format(C.custom_ops))
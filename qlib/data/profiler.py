@@ -0,0 +1,259 @@
+"""
+The profiler of the expression engine
+
+The profiling is opt-in, nothing is recorded unless a profiler is activated with `profile`
+
+    .. code-block:: python
+
+        from qlib.data import D
+        from qlib.data.profiler import profile
+
+        with profile() as prof:
+            D.features(D.instruments("csi300"), ["Mean($close, 5) / $close", "Ref($volume, 1)"])
+        print(prof.report(by="operator"))
+        print(prof.cache_report())
+        prof.to_chrome_trace("trace.json")  # open it in chrome://tracing or https://ui.perfetto.dev
+
+Each loaded expression node (`Expression.load`) and each instrumented provider call is recorded with its wall time
+(including and excluding its children), the bytes read from the storage, the result size and the cache hits/misses
+("c", "i", "f", or any other cache reporting to the profiler) that happened in it. The loads of the worker processes
+of `DatasetProvider.dataset_processor` are sent back to the profiler of the main process.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+_profiler: Optional["Profiler"] = None
+_NULL_CONTEXT = nullcontext()
+
+
+def get_profiler() -> Optional["Profiler"]:
+    """the active profiler, None if the profiling is not enabled"""
+    return _profiler
+
+
+def _size(obj) -> tuple:
+    """the rows and the bytes of a result"""
+    if isinstance(obj, pd.DataFrame):
+        return len(obj), int(obj.memory_usage(index=False).sum())
+    if isinstance(obj, pd.Series):
+        return len(obj), int(obj.nbytes)
+    try:
+        return len(obj), int(getattr(obj, "nbytes", 0))
+    except TypeError:
+        return 0, 0
+
+
+class _Node:
+    __slots__ = ("kind", "name", "cat", "instrument", "start", "children", "caches", "bytes_read", "size")
+
+    def __init__(self, kind, name, cat, instrument):
+        self.kind = kind
+        self.name = name
+        self.cat = cat
+        self.instrument = instrument
+        self.start = time.perf_counter()
+        self.children = 0.0
+        self.caches = {}
+        self.bytes_read = 0
+        self.size = (0, 0)
+
+    def result(self, obj):
+        self.size = _size(obj)
+
+
+class Profiler:
+    """The records of the profiled loads, see the module doc"""
+
+    def __init__(self):
+        self.events: List[dict] = []
+        # {cache name: [hits, misses]}
+        self.caches: Dict[str, List[int]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[_Node]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def node(self, kind: str, name: str, cat: str, instrument: Optional[str] = None):
+        stack = self._stack()
+        node = _Node(kind, name, cat, instrument)
+        stack.append(node)
+        try:
+            yield node
+        finally:
+            stack.pop()
+            dur = time.perf_counter() - node.start
+            if stack:
+                stack[-1].children += dur
+            self.events.append(
+                {
+                    "kind": node.kind,
+                    "name": node.name,
+                    "cat": node.cat,
+                    "instrument": node.instrument,
+                    "start": node.start,
+                    "dur": dur,
+                    "self_time": dur - node.children,
+                    "bytes_read": node.bytes_read,
+                    "rows": node.size[0],
+                    "nbytes": node.size[1],
+                    "hits": sum(v[0] for v in node.caches.values()),
+                    "misses": sum(v[1] for v in node.caches.values()),
+                    "caches": node.caches,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                }
+            )
+
+    def record_cache(self, cache: str, hit: bool):
+        with self._lock:
+            stat = self.caches.setdefault(cache, [0, 0])
+            stat[0 if hit else 1] += 1
+        stack = self._stack()
+        if stack:
+            stat = stack[-1].caches.setdefault(cache, [0, 0])
+            stat[0 if hit else 1] += 1
+
+    def record_read(self, nbytes: int):
+        stack = self._stack()
+        if stack:
+            stack[-1].bytes_read += int(nbytes)
+
+    def merge(self, state: dict):
+        """merge the records of another profiler (e.g. in a worker process)"""
+        self.events.extend(state["events"])
+        with self._lock:
+            for cache, (hits, misses) in state["caches"].items():
+                stat = self.caches.setdefault(cache, [0, 0])
+                stat[0] += hits
+                stat[1] += misses
+
+    def state(self) -> dict:
+        return {"events": self.events, "caches": self.caches}
+
+    def report(self, by: str = "operator", kind: str = "expression") -> pd.DataFrame:
+        """
+        Aggregate the records
+
+        Parameters
+        ----------
+        by : str
+            "operator" (the class of the expression nodes or the provider), "expression" or "instrument"
+        kind : str
+            "expression" for the expression nodes, "provider" for the provider calls, None for all
+
+        Returns
+        -------
+        pd.DataFrame
+            count, hits, misses, total_time, self_time, bytes_read, rows and nbytes of each group, sorted by self_time
+        """
+        key = {"operator": "cat", "expression": "name", "instrument": "instrument"}[by]
+        columns = ["count", "hits", "misses", "total_time", "self_time", "bytes_read", "rows", "nbytes"]
+        events = [e for e in self.events if kind is None or e["kind"] == kind]
+        if not events:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name=by))
+        df = pd.DataFrame(events)
+        df["count"] = 1
+        df["total_time"] = df["dur"]
+        res = df.groupby(df[key].fillna("")).agg({c: "sum" for c in columns})
+        res.index.name = by
+        return res.sort_values("self_time", ascending=False)
+
+    def cache_report(self) -> pd.DataFrame:
+        """the hits, misses and hit rate of each cache"""
+        res = pd.DataFrame.from_dict(self.caches, orient="index", columns=["hits", "misses"])
+        res.index.name = "cache"
+        res["hit_rate"] = res["hits"] / (res["hits"] + res["misses"]).clip(lower=1)
+        return res
+
+    def to_chrome_trace(self, path: Union[str, Path] = None) -> dict:
+        """export the records in the chrome trace event format, and write it to `path` if it is given"""
+        t0 = min((e["start"] for e in self.events), default=0.0)
+        trace_events = []
+        for e in self.events:
+            trace_events.append(
+                {
+                    "name": e["name"],
+                    "cat": f"{e['kind']},{e['cat']}",
+                    "ph": "X",
+                    "ts": (e["start"] - t0) * 1e6,
+                    "dur": e["dur"] * 1e6,
+                    "pid": e["pid"],
+                    "tid": e["tid"],
+                    "args": {
+                        "instrument": e["instrument"],
+                        "self_time_us": e["self_time"] * 1e6,
+                        "bytes_read": e["bytes_read"],
+                        "rows": e["rows"],
+                        "nbytes": e["nbytes"],
+                        "caches": e["caches"],
+                    },
+                }
+            )
+        trace = {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+        if path is not None:
+            Path(path).write_text(json.dumps(trace))
+        return trace
+
+
+@contextmanager
+def profile(profiler: Optional[Profiler] = None):
+    """activate a profiler in the block"""
+    global _profiler  # pylint: disable=W0603
+
+    profiler = Profiler() if profiler is None else profiler
+    _prev, _profiler = _profiler, profiler
+    try:
+        yield profiler
+    finally:
+        _profiler = _prev
+
+
+def node(kind: str, name: str, cat: str, instrument: Optional[str] = None):
+    """a profiled node of the active profiler, a null context if the profiling is not enabled"""
+    if _profiler is None:
+        return _NULL_CONTEXT
+    return _profiler.node(kind, name, cat, instrument)
+
+
+def record_cache(cache: str, hit: bool):
+    if _profiler is not None:
+        _profiler.record_cache(cache, hit)
+
+
+def record_read(nbytes: int):
+    if _profiler is not None:
+        _profiler.record_read(nbytes)
+
+
+class ProfiledTask:
+    """
+    Profile `func` in the worker processes, the records are returned with the result
+
+    It returns (result, state of the profiler of the worker) in a worker process and (result, None) in the process
+    creating it, where the active profiler records the loads directly.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.pid = os.getpid()
+
+    def __call__(self, *args, **kwargs):
+        if os.getpid() == self.pid:
+            return self.func(*args, **kwargs), None
+        with profile() as profiler:
+            res = self.func(*args, **kwargs)
+        return res, profiler.state()
@@ -0,0 +1,178 @@
+"""
+The binary protocol between the data server and the clients
+
+A message is a sequence of frames, each frame is a fixed size header followed by the payload:
+
+    | magic (4 bytes) | version (1 byte) | frame type (1 byte) | payload length (8 bytes) | payload |
+
+- a request is a REQUEST frame with a JSON payload {"type": <request type>, "args": {...}}
+- a response is a HEADER frame with a JSON payload describing the result and its arrays, then the raw buffers of the
+  arrays in ARRAY frames of at most `CHUNK_SIZE` bytes, and an END frame at last; or an ERROR frame
+- DataFrames are sent as NumPy buffers (the instrument codes, the datetime and the values), they are never pickled
+"""
+from __future__ import annotations
+
+import json
+import socket
+import struct
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"QLIB"
+VERSION = 1
+HEADER = struct.Struct("!4sBBQ")
+CHUNK_SIZE = 4 * 1024 * 1024
+
+FRAME_REQUEST = 1
+FRAME_HEADER = 2
+FRAME_ARRAY = 3
+FRAME_END = 4
+FRAME_ERROR = 5
+
+
+class QlibServerException(RuntimeError):
+    pass
+
+
+def _recv_into(sock: socket.socket, buf: memoryview) -> None:
+    while len(buf):
+        n = sock.recv_into(buf)
+        if n == 0:
+            raise ConnectionError("the connection is closed")
+        buf = buf[n:]
+
+
+def send_frame(sock: socket.socket, frame_type: int, payload: bytes | memoryview = b"") -> None:
+    sock.sendall(HEADER.pack(MAGIC, VERSION, frame_type, len(payload)))
+    if len(payload):
+        sock.sendall(payload)
+
+
+def recv_frame_header(sock: socket.socket) -> Tuple[int, int]:
+    """the type and the payload length of the next frame"""
+    buf = bytearray(HEADER.size)
+    _recv_into(sock, memoryview(buf))
+    magic, version, frame_type, length = HEADER.unpack(buf)
+    if magic != MAGIC or version != VERSION:
+        raise QlibServerException(f"unknown frame: magic={magic!r}, version={version}")
+    return frame_type, length
+
+
+def recv_payload(sock: socket.socket, length: int) -> bytes:
+    buf = bytearray(length)
+    _recv_into(sock, memoryview(buf))
+    return bytes(buf)
+
+
+def send_json(sock: socket.socket, frame_type: int, obj: Any) -> None:
+    send_frame(sock, frame_type, json.dumps(obj, default=str).encode())
+
+
+def recv_json(sock: socket.socket, expected: int) -> Any:
+    frame_type, length = recv_frame_header(sock)
+    payload = recv_payload(sock, length)
+    if frame_type == FRAME_ERROR:
+        raise QlibServerException(json.loads(payload)["error"])
+    if frame_type != expected:
+        raise QlibServerException(f"frame {expected} is expected, but {frame_type} is received")
+    return json.loads(payload)
+
+
+def send_response(sock: socket.socket, meta: dict, arrays: List[np.ndarray] = []) -> None:
+    """send the JSON `meta` and stream the buffers of `arrays` in chunks"""
+    arrays = [np.ascontiguousarray(arr) for arr in arrays]
+    meta = {**meta, "arrays": [{"dtype": arr.dtype.str, "shape": list(arr.shape)} for arr in arrays]}
+    send_json(sock, FRAME_HEADER, meta)
+    for arr in arrays:
+        buf = memoryview(arr.reshape(-1).view(np.uint8))
+        for start in range(0, len(buf), CHUNK_SIZE):
+            send_frame(sock, FRAME_ARRAY, buf[start : start + CHUNK_SIZE])
+    send_frame(sock, FRAME_END)
+
+
+def recv_response(sock: socket.socket) -> Tuple[dict, List[np.ndarray]]:
+    """receive the response sent by `send_response`, the chunks are written into the arrays directly"""
+    meta = recv_json(sock, FRAME_HEADER)
+    arrays = []
+    for desc in meta.pop("arrays"):
+        arr = np.empty(desc["shape"], dtype=np.dtype(desc["dtype"]))
+        buf = memoryview(arr.reshape(-1).view(np.uint8))
+        while len(buf):
+            frame_type, length = recv_frame_header(sock)
+            if frame_type != FRAME_ARRAY or length > len(buf):
+                raise QlibServerException("the array frames are broken")
+            _recv_into(sock, buf[:length])
+            buf = buf[length:]
+        arrays.append(arr)
+    frame_type, length = recv_frame_header(sock)
+    if frame_type != FRAME_END:
+        raise QlibServerException("the end of the response is missing")
+    return meta, arrays
+
+
+def encode_calendar(calendar) -> Tuple[dict, List[np.ndarray]]:
+    return {"kind": "calendar"}, [pd.DatetimeIndex(calendar).values]
+
+
+def decode_calendar(meta: dict, arrays: List[np.ndarray]) -> np.ndarray:
+    return arrays[0]
+
+
+def encode_dataframe(df: pd.DataFrame) -> Tuple[dict, List[np.ndarray]]:
+    """
+    Encode the result of `D.features`, the index is (instrument, datetime)
+
+    The instruments are sent as the unique codes (in the JSON meta) and the int32 position of each row.
+    """
+    inst = df.index.get_level_values("instrument")
+    codes, uniques = pd.factorize(inst)
+    dt = pd.DatetimeIndex(df.index.get_level_values("datetime")).values
+    meta = {"kind": "dataframe", "columns": [str(c) for c in df.columns], "instruments": [str(c) for c in uniques]}
+    values = df.values
+    if values.dtype == object:
+        # the empty result is not typed
+        values = values.astype(np.float32)
+    return meta, [codes.astype(np.int32), dt, values]
+
+
+def decode_dataframe(meta: dict, arrays: List[np.ndarray]) -> pd.DataFrame:
+    codes, dt, values = arrays
+    inst = pd.Index(meta["instruments"]).take(codes)
+    index = pd.MultiIndex.from_arrays([inst, pd.DatetimeIndex(dt)], names=("instrument", "datetime"))
+    return pd.DataFrame(values.reshape(len(codes), len(meta["columns"])), index=index, columns=meta["columns"])
+
+
+def encode_instruments(instruments) -> Tuple[dict, List[np.ndarray]]:
+    """the result of `list_instruments`, a list of codes or {code: [(start, end), ...]}"""
+    if isinstance(instruments, dict):
+        value = {k: [[str(s), str(e)] for s, e in v] for k, v in instruments.items()}
+        return {"kind": "instruments", "value": value}, []
+    return {"kind": "instruments", "value": list(instruments)}, []
+
+
+def decode_instruments(meta: dict, arrays: List[np.ndarray]):
+    value = meta["value"]
+    if isinstance(value, dict):
+        return {k: [(pd.Timestamp(s), pd.Timestamp(e)) for s, e in v] for k, v in value.items()}
+    return value
+
+
+def to_json_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    """the arguments of a request; the timestamps are sent as strings"""
+
+    def _convert(v):
+        if isinstance(v, (pd.Timestamp, np.datetime64)):
+            return str(pd.Timestamp(v))
+        if isinstance(v, dict):
+            return {str(k): _convert(x) for k, x in v.items()}
+        if isinstance(v, (list, tuple, pd.Index, np.ndarray)):
+            return [_convert(x) for x in v]
+        if isinstance(v, np.generic):
+            return v.item()
+        if v is None or isinstance(v, (str, int, float, bool)):
+            return v
+        raise TypeError(f"{type(v)} can not be sent to the data server, please use its config instead")
+
+    return _convert(args)
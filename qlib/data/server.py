@@ -0,0 +1,194 @@
+"""
+The data server for the "server" mode
+
+The server is a single process which owns the data and the caches (e.g. the memory cache `H` of the expressions), it
+answers the calendar, instrument and feature requests of many clients over TCP, so the same expressions are loaded
+and computed once instead of once per client. The protocol is described in `qlib.data.protocol`.
+
+Start a server
+
+    python -m qlib.data.server --provider_uri ~/.qlib/qlib_data/cn_data --port 9710
+
+and use it in the clients
+
+    qlib.init(default_conf="remote", data_server_host="127.0.0.1", data_server_port=9710)
+
+The trust boundary: the clients are trusted. There is no authentication, and the configs in the requests (e.g. the
+`inst_processors`) are instantiated as given, so the server only listens on the loopback addresses unless
+`data_server_allow_remote` (or `--allow_remote`) is set, which must only be done inside a trusted network. The fields
+are evaluated as expressions, so they are checked to be made of the registered operators, `$` features and literals
+only before being evaluated.
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import ast
+import ipaddress
+import socket
+import socketserver
+
+from ..config import C
+from ..log import get_module_logger
+from ..utils import parse_field
+from .data import Cal, D
+from .ops import Operators
+from .protocol import (
+    FRAME_ERROR,
+    FRAME_REQUEST,
+    encode_calendar,
+    encode_dataframe,
+    encode_instruments,
+    recv_json,
+    send_json,
+    send_response,
+)
+
+
+# the nodes of the parsed fields besides the operators and the features
+_FIELD_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.BoolOp,
+    ast.Compare,
+    ast.Call,
+    ast.keyword,
+    ast.Load,
+    ast.operator,
+    ast.unaryop,
+    ast.boolop,
+    ast.cmpop,
+)
+
+
+def check_field(field: str) -> None:
+    """
+    Check that the parsed field is made of the registered operators (including `Feature` and `PFeature`) and the
+    literals only
+
+    Raises
+    ------
+    ValueError
+        the field contains the other names, attributes or syntax
+    """
+    try:
+        tree = ast.parse(parse_field(field), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"invalid field {field!r}: {e}") from e
+    ops = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            if not (isinstance(node.value, ast.Name) and node.value.id == "Operators"):
+                raise ValueError(f"invalid field {field!r}: only the attributes of `Operators` are allowed")
+            if node.attr.startswith("_") or node.attr not in Operators:
+                raise ValueError(f"invalid field {field!r}: the operator [{node.attr}] is not registered")
+            ops.add(id(node.value))
+        elif isinstance(node, ast.Name):
+            if id(node) not in ops:
+                raise ValueError(f"invalid field {field!r}: the name [{node.id}] is not allowed")
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float, str)):
+                raise ValueError(f"invalid field {field!r}: the literal {node.value!r} is not allowed")
+        elif not isinstance(node, _FIELD_NODES):
+            raise ValueError(f"invalid field {field!r}: {type(node).__name__} is not allowed")
+
+
+def is_loopback(host: str) -> bool:
+    """whether all the addresses of `host` are loopback ones"""
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback for info in socket.getaddrinfo(host, None))
+    except (socket.gaierror, ValueError):
+        return False
+
+
+class DataRequestHandler(socketserver.BaseRequestHandler):
+    """handle the requests of one connection until the client closes it"""
+
+    def handle(self):
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            try:
+                request = recv_json(sock, FRAME_REQUEST)
+            except (ConnectionError, OSError):
+                return
+            try:
+                meta, arrays = self.server.process(request)
+            except Exception as e:  # pylint: disable=W0703
+                self.server.logger.exception(f"failed to process the request {request}")
+                send_json(sock, FRAME_ERROR, {"error": f"{type(e).__name__}: {e}"})
+                continue
+            send_response(sock, meta, arrays)
+
+
+class DataServer(socketserver.ThreadingTCPServer):
+    """
+    A threaded TCP server answering the requests with the providers registered by `qlib.init`
+
+    The requests:
+
+    - calendar: the whole calendar of a freq, the clients slice it locally
+    - list_instruments: the arguments of `D.list_instruments`
+    - features: the arguments of `D.features`, the instruments and the inst_processors must be configs, the fields
+      are checked by `check_field`
+
+    The server refuses to listen on a non-loopback `host` unless `allow_remote` (`C.data_server_allow_remote` by
+    default) is set.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host=None, port=None, allow_remote=None):
+        host = C.data_server_host if host is None else host
+        port = C.data_server_port if port is None else port
+        allow_remote = C.get("data_server_allow_remote", False) if allow_remote is None else allow_remote
+        if not allow_remote and not is_loopback(host):
+            raise ValueError(
+                f"refuse to listen on the non-loopback address {host!r}, the server has no authentication. "
+                "Please set `data_server_allow_remote` if all the clients which can reach it are trusted"
+            )
+        self.logger = get_module_logger(self.__class__.__name__)
+        super().__init__((host, port), DataRequestHandler)
+
+    def process(self, request):
+        args = request["args"]
+        if request["type"] == "calendar":
+            return encode_calendar(Cal.calendar(freq=args["freq"], future=args["future"]))
+        elif request["type"] == "list_instruments":
+            return encode_instruments(D.list_instruments(**args))
+        elif request["type"] == "features":
+            for field in args["fields"]:
+                check_field(field)
+            return encode_dataframe(D.features(**args))
+        else:
+            raise ValueError(f"unknown request type: {request['type']}")
+
+
+def main():
+    import qlib  # pylint: disable=C0415
+
+    parser = argparse.ArgumentParser(description="the qlib data server")
+    parser.add_argument("--provider_uri", required=True)
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None, help="0 for a free port")
+    parser.add_argument("--kernels", type=int, default=None)
+    parser.add_argument(
+        "--allow_remote", action="store_true", help="listen on a non-loopback host, all its clients must be trusted"
+    )
+    args = parser.parse_args()
+
+    kwargs = {"provider_uri": args.provider_uri}
+    if args.kernels is not None:
+        kwargs["kernels"] = args.kernels
+    qlib.init(default_conf="server", **kwargs)
+    with DataServer(args.host, args.port, allow_remote=args.allow_remote or None) as server:
+        host, port = server.server_address[:2]
+        # the address is printed for the scripts starting the server with a free port
+        print(f"serving on {host}:{port}", flush=True)
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from .storage import CalendarStorage, InstrumentStorage, FeatureStorage, PITStorage, CalVT, InstVT, InstKT
+
+__all__ = [
+    "CalendarStorage",
+    "InstrumentStorage",
+    "FeatureStorage",
+    "PITStorage",
+    "CalVT",
+    "InstVT",
+    "InstKT",
+]
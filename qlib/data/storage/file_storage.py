@@ -0,0 +1,1270 @@
+import os
+import glob
+import json
+import struct
+from pathlib import Path
+from typing import Iterable, Union, Dict, Mapping, Tuple, List
+
+import numpy as np
+import pandas as pd
+
+from ...utils import get_period_offset, fname_to_code
+from ...utils.time import Freq
+from ...utils.resam import get_resam_bar_index, resam_calendar
+from ...config import C
+from ...log import get_module_logger
+from .storage import CalendarStorage, InstrumentStorage, FeatureStorage, PITStorage, CalVT, InstKT, InstVT
+
+logger = get_module_logger("file_storage")
+
+
+class FileStorageMixin:
+    """FileStorageMixin, applicable to FileXXXStorage
+    Subclasses need to have provider_uri, freq, storage_name, file_name attributes
+
+    """
+
+    # NOTE: provider_uri priority:
+    #   1. self._provider_uri : if provider_uri is provided.
+    #   2. provider_uri in qlib.config.C
+
+    @property
+    def provider_uri(self):
+        return C["provider_uri"] if getattr(self, "_provider_uri", None) is None else self._provider_uri
+
+    @property
+    def dpm(self):
+        return (
+            C.dpm
+            if getattr(self, "_provider_uri", None) is None
+            else C.DataPathManager(self._provider_uri, C.mount_path)
+        )
+
+    @property
+    def support_freq(self) -> List[str]:
+        _v = "_support_freq"
+        if hasattr(self, _v):
+            return getattr(self, _v)
+        if len(self.provider_uri) == 1 and C.DEFAULT_FREQ in self.provider_uri:
+            freq_l = filter(
+                lambda _freq: not _freq.endswith("_future"),
+                map(lambda x: x.stem, self.dpm.get_data_uri(C.DEFAULT_FREQ).joinpath("calendars").glob("*.txt")),
+            )
+        else:
+            freq_l = self.provider_uri.keys()
+        freq_l = [Freq(freq) for freq in freq_l]
+        setattr(self, _v, freq_l)
+        return freq_l
+
+    @property
+    def uri(self) -> Path:
+        if self.freq not in self.support_freq:
+            raise ValueError(f"{self.storage_name}: {self.provider_uri} does not contain data for {self.freq}")
+        return self.dpm.get_data_uri(self.freq).joinpath(f"{self.storage_name}s", self.file_name)
+
+    def check(self):
+        """check self.uri
+
+        Raises
+        -------
+        ValueError
+        """
+        if not self.uri.exists():
+            raise ValueError(f"{self.storage_name} not exists: {self.uri}")
+
+
+class FileCalendarStorage(FileStorageMixin, CalendarStorage):
+    def __init__(self, freq: str, future: bool, provider_uri: dict = None, **kwargs):
+        super(FileCalendarStorage, self).__init__(freq, future, **kwargs)
+        self.future = future
+        self._provider_uri = None if provider_uri is None else C.DataPathManager.format_provider_uri(provider_uri)
+        self.enable_read_cache = True  # TODO: make it configurable
+        self.region = C["region"]
+
+    @property
+    def file_name(self) -> str:
+        return f"{self._freq_file}_future.txt" if self.future else f"{self._freq_file}.txt".lower()
+
+    @property
+    def _freq_file(self) -> str:
+        """the freq to read from file"""
+        if not hasattr(self, "_freq_file_cache"):
+            freq = Freq(self.freq)
+            if freq not in self.support_freq:
+                # NOTE: uri
+                #   1. If `uri` does not exist
+                #       - Get the `min_uri` of the closest `freq` under the same "directory" as the `uri`
+                #       - Read data from `min_uri` and resample to `freq`
+                freq = Freq.get_recent_freq(freq, self.support_freq)
+                if freq is None:
+                    raise ValueError(f"can't find a freq from {self.support_freq} that can resample to {self.freq}!")
+            self._freq_file_cache = freq
+        return self._freq_file_cache
+
+    def _read_calendar(self) -> List[CalVT]:
+        # NOTE:
+        # if we want to accelerate partial reading calendar
+        # we can add parameters like `skip_rows: int = 0, n_rows: int = None` to the interface.
+        # Currently, it is not supported for the txt-based calendar
+
+        if not self.uri.exists():
+            self._write_calendar(values=[])
+
+        with self.uri.open("r") as fp:
+            res = []
+            for line in fp.readlines():
+                line = line.strip()
+                if len(line) > 0:
+                    res.append(line)
+            return res
+
+    def _write_calendar(self, values: Iterable[CalVT], mode: str = "wb"):
+        if mode == "ab":
+            with self.uri.open(mode=mode) as fp:
+                np.savetxt(fp, values, fmt="%s", encoding="utf-8")
+            return
+        # the readers never see a partially written calendar
+        tmp = self.uri.with_name(f".{self.uri.name}.{os.getpid()}")
+        with tmp.open(mode=mode) as fp:
+            np.savetxt(fp, values, fmt="%s", encoding="utf-8")
+        os.replace(tmp, self.uri)
+
+    @property
+    def uri(self) -> Path:
+        return self.dpm.get_data_uri(self._freq_file).joinpath(f"{self.storage_name}s", self.file_name)
+
+    @property
+    def data(self) -> List[CalVT]:
+        self.check()
+        # If cache is enabled, then return cache directly
+        if self.enable_read_cache:
+            from ..cache import H
+
+            key = "orig_file" + str(self.uri)
+            _calendar = H["c"].get(key)
+            if _calendar is None:
+                _calendar = H["c"][key] = self._read_calendar()
+        else:
+            _calendar = self._read_calendar()
+        if Freq(self._freq_file) != Freq(self.freq):
+            _calendar = pd.DatetimeIndex(_calendar)
+            bar_index = get_resam_bar_index(_calendar, self._freq_file, self.freq, self.region)
+            _calendar = resam_calendar(_calendar, bar_index, self.freq)
+        return _calendar
+
+    def clear(self) -> None:
+        self._write_calendar(values=[])
+
+    def extend(self, values: Iterable[CalVT]) -> None:
+        self._write_calendar(values, mode="ab")
+
+    def index(self, value: CalVT) -> int:
+        self.check()
+        calendar = self._read_calendar()
+        return int(np.argwhere(np.array(calendar) == value)[0])
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[CalVT, List[CalVT]]:
+        self.check()
+        return self._read_calendar()[i]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class FileInstrumentStorage(FileStorageMixin, InstrumentStorage):
+    INSTRUMENT_SEP = "\t"
+    INSTRUMENT_START_FIELD = "start_datetime"
+    INSTRUMENT_END_FIELD = "end_datetime"
+    SYMBOL_FIELD_NAME = "instrument"
+
+    def __init__(self, market: str, freq: str, provider_uri: dict = None, **kwargs):
+        super(FileInstrumentStorage, self).__init__(market, freq, **kwargs)
+        self._provider_uri = None if provider_uri is None else C.DataPathManager.format_provider_uri(provider_uri)
+        self.file_name = f"{market.lower()}.txt"
+
+    def _read_instrument(self) -> Dict[InstKT, InstVT]:
+        if not self.uri.exists():
+            self._write_instrument()
+
+        _instruments = dict()
+        df = pd.read_csv(
+            self.uri,
+            sep="\t",
+            usecols=[0, 1, 2],
+            names=[self.SYMBOL_FIELD_NAME, self.INSTRUMENT_START_FIELD, self.INSTRUMENT_END_FIELD],
+            dtype={self.SYMBOL_FIELD_NAME: str},
+            parse_dates=[self.INSTRUMENT_START_FIELD, self.INSTRUMENT_END_FIELD],
+        )
+        for row in df.itertuples(index=False):
+            _instruments.setdefault(row[0], []).append((row[1], row[2]))
+        return _instruments
+
+    def _write_instrument(self, data: Dict[InstKT, InstVT] = None) -> None:
+        if not data:
+            with self.uri.open("w") as _:
+                pass
+            return
+
+        # the readers never see a partially written file
+        tmp = self.uri.with_name(f".{self.uri.name}.{os.getpid()}")
+        res = []
+        for inst, v_list in data.items():
+            _df = pd.DataFrame(v_list, columns=[self.INSTRUMENT_START_FIELD, self.INSTRUMENT_END_FIELD])
+            _df[self.SYMBOL_FIELD_NAME] = inst
+            res.append(_df)
+
+        df = pd.concat(res, sort=False)
+        df.loc[:, [self.SYMBOL_FIELD_NAME, self.INSTRUMENT_START_FIELD, self.INSTRUMENT_END_FIELD]].to_csv(
+            tmp, header=False, sep=self.INSTRUMENT_SEP, index=False, date_format="%Y-%m-%d"
+        )
+        os.replace(tmp, self.uri)
+
+    def clear(self) -> None:
+        self._write_instrument(data={})
+
+    @property
+    def data(self) -> Dict[InstKT, InstVT]:
+        self.check()
+        return self._read_instrument()
+
+    def __getitem__(self, k: InstKT) -> InstVT:
+        self.check()
+        return self._read_instrument()[k]
+
+    def update(self, *args, **kwargs) -> None:
+        if len(args) > 1:
+            raise TypeError(f"update expected at most 1 arguments, got {len(args)}")
+        inst = self._read_instrument()
+        if args:
+            other = args[0]  # type: dict
+            if isinstance(other, Mapping):
+                for key in other:
+                    inst[key] = other[key]
+            elif hasattr(other, "keys"):
+                for key in other.keys():
+                    inst[key] = other[key]
+            else:
+                for key, value in other:
+                    inst[key] = value
+        for key, value in kwargs.items():
+            inst[key] = value
+
+        self._write_instrument(inst)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class FileFeatureStorage(FileStorageMixin, FeatureStorage):
+    def __init__(self, instrument: str, field: str, freq: str, provider_uri: dict = None, **kwargs):
+        super(FileFeatureStorage, self).__init__(instrument, field, freq, **kwargs)
+        self._provider_uri = None if provider_uri is None else C.DataPathManager.format_provider_uri(provider_uri)
+        self.file_name = f"{instrument.lower()}/{field.lower()}.{freq.lower()}.bin"
+
+    def clear(self):
+        with self.uri.open("wb") as _:
+            pass
+
+    @property
+    def data(self) -> pd.Series:
+        return self[:]
+
+    def write(self, data_array: Union[List, np.ndarray], index: int = None) -> None:
+        if len(data_array) == 0:
+            logger.info(
+                "len(data_array) == 0, write"
+                "if you need to clear the FeatureStorage, please execute: FeatureStorage.clear"
+            )
+            return
+        if not self.uri.exists():
+            # write
+            index = 0 if index is None else index
+            self.uri.parent.mkdir(parents=True, exist_ok=True)
+            with self.uri.open("wb") as fp:
+                np.hstack([index, data_array]).astype("<f").tofile(fp)
+        else:
+            if index is None or index > self.end_index:
+                # append
+                index = self.end_index + 1 if index is None else index
+                with self.uri.open("ab+") as fp:
+                    np.hstack([[np.nan] * (index - self.end_index - 1), data_array]).astype("<f").tofile(fp)
+            else:
+                # rewrite
+                with self.uri.open("rb+") as fp:
+                    _old_data = np.fromfile(fp, dtype="<f")
+                    _old_index = int(_old_data[0])
+                    _old_df = pd.DataFrame(
+                        _old_data[1:], index=range(_old_index, _old_index + len(_old_data) - 1), columns=["old"]
+                    )
+                    fp.seek(0)
+                    _new_df = pd.DataFrame(data_array, index=range(index, index + len(data_array)), columns=["new"])
+                    _df = pd.concat([_old_df, _new_df], sort=False, axis=1)
+                    _df = _df.reindex(range(_df.index.min(), _df.index.max() + 1))
+                    # the start index is kept in the header
+                    np.hstack([_df.index.min(), _df["new"].fillna(_df["old"]).values]).astype("<f").tofile(fp)
+
+    @property
+    def start_index(self) -> Union[int, None]:
+        if not self.uri.exists():
+            return None
+        with self.uri.open("rb") as fp:
+            index = int(np.frombuffer(fp.read(4), dtype="<f")[0])
+        return index
+
+    @property
+    def end_index(self) -> Union[int, None]:
+        if not self.uri.exists():
+            return None
+        # The next  data appending point will be  `end_index + 1`
+        return self.start_index + len(self) - 1
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Tuple[int, float], pd.Series]:
+        if not self.uri.exists():
+            if isinstance(i, int):
+                return None, None
+            elif isinstance(i, slice):
+                return pd.Series(dtype=np.float32)
+            else:
+                raise TypeError(f"type(i) = {type(i)}")
+
+        storage_start_index = self.start_index
+        storage_end_index = self.end_index
+        with self.uri.open("rb") as fp:
+            if isinstance(i, int):
+                if storage_start_index > i:
+                    raise IndexError(f"{i}: start index is {storage_start_index}")
+                fp.seek(4 * (i - storage_start_index) + 4)
+                return i, struct.unpack("f", fp.read(4))[0]
+            elif isinstance(i, slice):
+                start_index = storage_start_index if i.start is None else i.start
+                end_index = storage_end_index if i.stop is None else i.stop - 1
+                si = max(start_index, storage_start_index)
+                if si > end_index:
+                    return pd.Series(dtype=np.float32)
+                fp.seek(4 * (si - storage_start_index) + 4)
+                # read n bytes
+                count = end_index - si + 1
+                data = np.frombuffer(fp.read(4 * count), dtype="<f")
+                return pd.Series(data, index=pd.RangeIndex(si, si + len(data)))
+            else:
+                raise TypeError(f"type(i) = {type(i)}")
+
+    def __len__(self) -> int:
+        self.check()
+        return self.uri.stat().st_size // 4 - 1
+
+
+def _get_codec(codec: str):
+    """(compress(bytes, level), decompress(bytes)) of `codec`, lz4 and zstd need the `lz4` and `zstandard` packages"""
+    if codec == "none":
+        return (lambda b, level: b), (lambda b: b)
+    if codec == "zlib":
+        import zlib  # pylint: disable=C0415
+
+        return zlib.compress, zlib.decompress
+    if codec == "lz4":
+        import lz4.frame  # pylint: disable=C0415
+
+        return (lambda b, level: lz4.frame.compress(b, compression_level=level)), lz4.frame.decompress
+    if codec == "zstd":
+        import zstandard  # pylint: disable=C0415
+
+        return (
+            lambda b, level: zstandard.ZstdCompressor(level=level).compress(b)
+        ), zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"codec must be one of {list(CompressedFileFeatureStorage.CODECS)}, your codec is {codec}")
+
+
+class CompressedFileFeatureStorage(FileFeatureStorage):
+    """
+    The feature storage compressing the data in chunks of `chunk_size` calendar steps
+
+    `features/<instrument>/<field>.<freq>.cbin` is
+
+        header: magic, version, codec, chunk size, start index, length, offset of the chunk table
+        chunks: the byte-shuffled float32 values of each chunk, compressed by the codec
+        chunk table: the (chunks + 1) uint64 offsets of the chunks
+
+    Only the chunks overlapping the read range are read and decompressed. An append copies the compressed chunks
+    and only compresses the last chunk again. The file is written to a temporary file and replaced, so a crash or a
+    reader never sees a file partly written. Select it with the backend of the feature provider
+
+        .. code-block:: python
+
+            qlib.init(
+                provider_uri=provider_uri,
+                feature_provider={
+                    "class": "LocalFeatureProvider",
+                    "kwargs": {
+                        "backend": {
+                            "class": "CompressedFileFeatureStorage",
+                            "module_path": "qlib.data.storage.file_storage",
+                            "kwargs": {"codec": "zstd"},
+                        }
+                    },
+                },
+            )
+
+    `codec` and `chunk_size` are only used to create the files, the existing ones keep their settings.
+    See `convert_to_compressed_feature_storage` to convert the `.bin` files.
+    """
+
+    MAGIC = b"QCBF"
+    VERSION = 1
+    # codec: (id, default level)
+    CODECS = {"none": (0, 0), "zlib": (1, 1), "lz4": (2, 0), "zstd": (3, 3)}
+    HEADER = struct.Struct("<4sBBxxIqqq")
+
+    def __init__(
+        self,
+        instrument: str,
+        field: str,
+        freq: str,
+        provider_uri: dict = None,
+        codec: str = "zlib",
+        chunk_size: int = 2048,
+        level: int = None,
+        **kwargs,
+    ):
+        super(CompressedFileFeatureStorage, self).__init__(instrument, field, freq, provider_uri, **kwargs)
+        if codec not in self.CODECS:
+            raise ValueError(f"codec must be one of {list(self.CODECS)}, your codec is {codec}")
+        self.file_name = f"{instrument.lower()}/{field.lower()}.{freq.lower()}.cbin"
+        self.codec = codec
+        self.chunk_size = chunk_size
+        self.level = self.CODECS[codec][1] if level is None else level
+
+    def _read_header(self, fp) -> dict:
+        magic, version, codec_id, chunk_size, start_index, length, table_offset = self.HEADER.unpack(
+            fp.read(self.HEADER.size)
+        )
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(f"{self.uri} is not a compressed feature file of version {self.VERSION}")
+        codec = {v[0]: k for k, v in self.CODECS.items()}[codec_id]
+        return {
+            "codec": codec,
+            "chunk_size": chunk_size,
+            "start_index": start_index,
+            "length": length,
+            "table_offset": table_offset,
+        }
+
+    def _header(self) -> Union[dict, None]:
+        if not self.uri.exists():
+            return None
+        with self.uri.open("rb") as fp:
+            return self._read_header(fp)
+
+    def _write_chunks(self, fp, data: np.ndarray, header: dict, offsets: List[int]):
+        """
+        write the chunks of `data` at the position of `fp`, then the chunk table and the header
+
+        `offsets` are the offsets of the chunks before and the position of `fp`
+        """
+        compress, _ = _get_codec(header["codec"])
+        chunk_size = header["chunk_size"]
+        offsets = list(offsets)
+        for i in range(0, len(data), chunk_size):
+            chunk = np.ascontiguousarray(data[i : i + chunk_size], dtype="<f")
+            # byte-shuffle: the same bytes of the float32 values are together, they compress much better
+            fp.write(compress(chunk.view(np.uint8).reshape(-1, 4).T.tobytes(), self.level))
+            offsets.append(fp.tell())
+        header["table_offset"] = offsets[-1]
+        np.asarray(offsets, dtype="<u8").tofile(fp)
+        fp.truncate()
+        fp.seek(0)
+        fp.write(
+            self.HEADER.pack(
+                self.MAGIC,
+                self.VERSION,
+                self.CODECS[header["codec"]][0],
+                chunk_size,
+                header["start_index"],
+                header["length"],
+                header["table_offset"],
+            )
+        )
+
+    def _rewrite(self, data: np.ndarray, start_index: int, offsets: List[int] = None, header: dict = None):
+        """
+        write the file of `data` to a temporary file and replace the file with it
+
+        If `offsets` is given, the chunks before `offsets[-1]` are copied from the current file without being
+        decompressed and `data` is appended to them (`header` is the header of the new file)
+        """
+        if offsets is None:
+            offsets = [self.HEADER.size]
+            header = {
+                "codec": self.codec,
+                "chunk_size": self.chunk_size,
+                "start_index": start_index,
+                "length": len(data),
+                "table_offset": 0,
+            }
+        self.uri.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.uri.with_name(f".{self.uri.name}.{os.getpid()}")
+        with tmp.open("wb+") as fp:
+            fp.seek(self.HEADER.size)
+            if offsets[-1] > self.HEADER.size:
+                with self.uri.open("rb") as src:
+                    src.seek(self.HEADER.size)
+                    remaining = offsets[-1] - self.HEADER.size
+                    while remaining > 0:
+                        buffer = src.read(min(remaining, 1 << 20))
+                        if not buffer:
+                            raise ValueError(f"{self.uri} is truncated")
+                        fp.write(buffer)
+                        remaining -= len(buffer)
+            self._write_chunks(fp, data, header, offsets)
+        os.replace(tmp, self.uri)
+
+    def _read_chunks(self, fp, header: dict, first: int, last: int) -> np.ndarray:
+        """the values of the chunks first..last"""
+        _, decompress = _get_codec(header["codec"])
+        fp.seek(header["table_offset"] + 8 * first)
+        offsets = np.frombuffer(fp.read(8 * (last - first + 2)), dtype="<u8").astype(np.int64)
+        fp.seek(offsets[0])
+        buffer = fp.read(offsets[-1] - offsets[0])
+        offsets -= offsets[0]
+        values = []
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            chunk = np.frombuffer(decompress(buffer[start:end]), dtype=np.uint8)
+            values.append(np.ascontiguousarray(chunk.reshape(4, -1).T).view("<f").ravel())
+        return np.concatenate(values) if values else np.array([], dtype="<f")
+
+    def clear(self):
+        self._rewrite(np.array([], dtype="<f"), 0)
+
+    def write(self, data_array: Union[List, np.ndarray], index: int = None) -> None:
+        if len(data_array) == 0:
+            logger.info(
+                "len(data_array) == 0, write"
+                "if you need to clear the FeatureStorage, please execute: FeatureStorage.clear"
+            )
+            return
+        data_array = np.asarray(data_array, dtype="<f")
+        header = self._header()
+        if header is None or header["length"] == 0:
+            # write
+            self._rewrite(data_array, 0 if index is None else index)
+            return
+        end_index = header["start_index"] + header["length"] - 1
+        if index is None or index > end_index:
+            # append: the full chunks are copied, only the last chunk is compressed again
+            index = end_index + 1 if index is None else index
+            data_array = np.hstack([np.full(index - end_index - 1, np.nan, dtype="<f"), data_array])
+            chunk_size = header["chunk_size"]
+            last = (header["length"] - 1) // chunk_size
+            with self.uri.open("rb") as fp:
+                fp.seek(header["table_offset"])
+                # the offsets of the kept chunks and the position to write the new ones
+                offsets = np.fromfile(fp, dtype="<u8", count=last + 1).tolist()
+                length = header["length"] + len(data_array)
+                if header["length"] % chunk_size:
+                    data_array = np.hstack([self._read_chunks(fp, header, last, last), data_array])
+                else:
+                    offsets.append(header["table_offset"])
+                header["length"] = length
+            self._rewrite(data_array, header["start_index"], offsets=offsets, header=header)
+        else:
+            # rewrite: the new values override the old ones
+            old = self[:].values
+            start_index = min(index, header["start_index"])
+            end_index = max(end_index, index + len(data_array) - 1)
+            data = np.full(end_index - start_index + 1, np.nan, dtype="<f")
+            data[header["start_index"] - start_index : header["start_index"] - start_index + len(old)] = old
+            new = data[index - start_index : index - start_index + len(data_array)]
+            new[:] = np.where(np.isnan(data_array), new, data_array)
+            self._rewrite(data, start_index)
+
+    @property
+    def start_index(self) -> Union[int, None]:
+        header = self._header()
+        if header is None or header["length"] == 0:
+            return None
+        return header["start_index"]
+
+    @property
+    def end_index(self) -> Union[int, None]:
+        header = self._header()
+        if header is None or header["length"] == 0:
+            return None
+        return header["start_index"] + header["length"] - 1
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Tuple[int, float], pd.Series]:
+        if not self.uri.exists():
+            if isinstance(i, int):
+                return None, None
+            elif isinstance(i, slice):
+                return pd.Series(dtype=np.float32)
+            else:
+                raise TypeError(f"type(i) = {type(i)}")
+
+        with self.uri.open("rb") as fp:
+            header = self._read_header(fp)
+            storage_start_index = header["start_index"]
+            storage_end_index = storage_start_index + header["length"] - 1
+            chunk_size = header["chunk_size"]
+            if isinstance(i, int):
+                if storage_start_index > i:
+                    raise IndexError(f"{i}: start index is {storage_start_index}")
+                if i > storage_end_index:
+                    raise IndexError(f"{i}: end index is {storage_end_index}")
+                chunk = (i - storage_start_index) // chunk_size
+                return i, float(self._read_chunks(fp, header, chunk, chunk)[(i - storage_start_index) % chunk_size])
+            elif isinstance(i, slice):
+                start_index = storage_start_index if i.start is None else i.start
+                end_index = storage_end_index if i.stop is None else min(i.stop - 1, storage_end_index)
+                si = max(start_index, storage_start_index)
+                if si > end_index:
+                    return pd.Series(dtype=np.float32)
+                first = (si - storage_start_index) // chunk_size
+                last = (end_index - storage_start_index) // chunk_size
+                data = self._read_chunks(fp, header, first, last)
+                offset = si - storage_start_index - first * chunk_size
+                data = data[offset : offset + end_index - si + 1]
+                return pd.Series(data, index=pd.RangeIndex(si, si + len(data)))
+            else:
+                raise TypeError(f"type(i) = {type(i)}")
+
+    def __len__(self) -> int:
+        self.check()
+        return self._header()["length"]
+
+
+def convert_to_compressed_feature_storage(
+    provider_uri: Union[str, Path, dict] = None,
+    freq: str = "day",
+    codec: str = "zlib",
+    chunk_size: int = 2048,
+    level: int = None,
+    remove_source: bool = False,
+) -> int:
+    """
+    Convert the `.bin` feature files of `freq` to `CompressedFileFeatureStorage`
+
+    Parameters
+    ----------
+    provider_uri : Union[str, Path, dict]
+        the data to convert, `C.provider_uri` by default
+    codec, chunk_size, level :
+        the settings of the compressed files, see `CompressedFileFeatureStorage`
+    remove_source : bool
+        remove the `.bin` files after they are converted
+
+    Returns
+    -------
+    int
+        the number of the converted files
+    """
+    if provider_uri is not None:
+        provider_uri = C.DataPathManager.format_provider_uri(provider_uri)
+        features_dir = C.DataPathManager(provider_uri, C.mount_path).get_data_uri(freq).joinpath("features")
+    else:
+        features_dir = C.dpm.get_data_uri(freq).joinpath("features")
+    count = 0
+    for path in sorted(features_dir.glob(f"*/*.{freq.lower()}.bin")):
+        instrument, field = path.parent.name, path.name[: -len(f".{freq.lower()}.bin")]
+        source = FileFeatureStorage(instrument, field, freq, provider_uri=provider_uri)
+        target = CompressedFileFeatureStorage(
+            instrument, field, freq, provider_uri=provider_uri, codec=codec, chunk_size=chunk_size, level=level
+        )
+        data = source.data
+        if len(data) == 0:
+            target.clear()
+        else:
+            target._rewrite(data.values, data.index[0])  # pylint: disable=W0212
+        if remove_source:
+            path.unlink()
+        count += 1
+    return count
+
+
+def get_pit_record_dtype() -> np.dtype:
+    """the packed little-endian structured dtype of the PIT records defined by `C.pit_record_type`"""
+    return np.dtype([(k, f"<{C.pit_record_type[k]}") for k in ["date", "period", "value", "index"]])
+
+
+# {path: (mtime_ns, size, mmap)}, the files are mapped once per process and mapped again after they are rewritten
+_MMAP_CACHE: Dict[str, Tuple[int, int, np.ndarray]] = {}
+
+
+def _mmap_file(path: Path, dtype: np.dtype) -> np.ndarray:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return np.empty(0, dtype=dtype)
+    key = str(path)
+    cached = _MMAP_CACHE.get(key)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    # an empty file can not be mapped
+    arr = np.memmap(path, dtype=dtype, mode="r") if st.st_size else np.empty(0, dtype=dtype)
+    _MMAP_CACHE[key] = (st.st_mtime_ns, st.st_size, arr)
+    return arr
+
+
+def _unlink_mmap_file(path: Path) -> None:
+    """remove the file and its mapping in `_MMAP_CACHE`, so the disk space is freed once the readers release it"""
+    _MMAP_CACHE.pop(str(path), None)
+    path.unlink()
+
+
+class FilePITStorage(FileStorageMixin, PITStorage):
+    """
+    The PIT records of `<provider_uri>/financial/<instrument>/<field>.data` and the period index
+    `<field>.index` (the first year and then the byte offsets, uint32), both are memory-mapped
+    """
+
+    def __init__(self, instrument: str, field: str, freq: str = "day", provider_uri: dict = None, **kwargs):
+        super(FilePITStorage, self).__init__(instrument, field, **kwargs)
+        # the PIT data is not split by freq, it is in the data directory of `freq`
+        self.freq = freq
+        self._provider_uri = None if provider_uri is None else C.DataPathManager.format_provider_uri(provider_uri)
+        self.file_name = f"{instrument.lower()}/{field.lower()}"
+
+    @property
+    def uri(self) -> Path:
+        return self.dpm.get_data_uri(self.freq).joinpath("financial", self.file_name)
+
+    @property
+    def data_uri(self) -> Path:
+        return self.uri.with_name(f"{self.uri.name}.data")
+
+    @property
+    def index_uri(self) -> Path:
+        return self.uri.with_name(f"{self.uri.name}.index")
+
+    def check(self):
+        if not (self.data_uri.exists() and self.index_uri.exists()):
+            raise FileNotFoundError(f"PIT data not exists: {self.uri}")
+
+    @property
+    def data(self) -> np.ndarray:
+        return _mmap_file(self.data_uri, get_pit_record_dtype())
+
+    @property
+    def period_index(self) -> Tuple[int, np.ndarray]:
+        index = _mmap_file(self.index_uri, np.dtype(f"<{C.pit_record_type['index']}"))
+        if len(index) == 0:
+            return 0, index
+        return int(index[0]), index[1:]
+
+    def clear(self) -> None:
+        for _path in [self.data_uri, self.index_uri]:
+            if _path.exists():
+                _path.unlink()
+
+    def write(self, data_array: Union[np.ndarray, pd.DataFrame]) -> None:
+        dtype = get_pit_record_dtype()
+        new = np.empty(len(data_array), dtype=dtype)
+        for k in ["date", "period", "value"]:
+            new[k] = np.asarray(data_array[k])
+        if len(new) == 0:
+            logger.info("len(data_array) == 0, write")
+            return
+        records = np.concatenate([np.array(self.data), new])
+        records = records[np.argsort(records["date"], kind="stable")]
+
+        # chain the revisions of each period in the order of date
+        nan_index = C.pit_record_nan["index"]
+        pos = np.arange(len(records))
+        order = np.lexsort((pos, records["period"]))
+        same = records["period"][order[1:]] == records["period"][order[:-1]]
+        records["index"] = nan_index
+        records["index"][order[:-1][same]] = order[1:][same] * dtype.itemsize
+
+        periods = records["period"].astype(np.int64)
+        first_year = int(periods.min() // 100 if self.quarterly else periods.min())
+        offsets = get_period_offset(first_year, periods, self.quarterly)
+        period_index = np.full(int(offsets.max()) + 1, nan_index, dtype=np.int64)
+        # the first revision of each period
+        _offsets, _first = np.unique(offsets, return_index=True)
+        period_index[_offsets] = _first * dtype.itemsize
+
+        self.uri.parent.mkdir(parents=True, exist_ok=True)
+        index_dtype = f"<{C.pit_record_type['index']}"
+        for _path, _data in [
+            (self.data_uri, records),
+            (self.index_uri, np.hstack([first_year, period_index]).astype(index_dtype)),
+        ]:
+            tmp_path = _path.with_name(f".{_path.name}.{os.getpid()}")
+            _data.tofile(tmp_path)
+            os.replace(tmp_path, _path)
+
+    def revisions(self, period: int) -> np.ndarray:
+        data = self.data
+        first_year, index = self.period_index
+        offset = get_period_offset(first_year, period, self.quarterly)
+        if not 0 <= offset < len(index):
+            return np.empty(0, dtype=np.int64)
+        nan_index = C.pit_record_nan["index"]
+        res = []
+        _next = int(index[offset])
+        while _next != nan_index:
+            _pos = _next // data.dtype.itemsize
+            res.append(_pos)
+            _next = int(data["index"][_pos])
+        return np.array(res, dtype=np.int64)
+
+    def as_of(self, cur_dates: Iterable[int], period: int = None) -> np.ndarray:
+        data = self.data
+        cur_dates = np.asarray(cur_dates, dtype=np.int64)
+        res = np.full(len(cur_dates), C.pit_record_nan["value"], dtype=data.dtype["value"])
+        if period is None:
+            if len(data) == 0:
+                return res
+            # the latest period known after each record, and the position of its latest revision
+            periods = data["period"]
+            latest = np.maximum.accumulate(periods)
+            last = np.maximum.accumulate(np.where(periods == latest, np.arange(len(data)), -1))
+            loc = np.searchsorted(data["date"], cur_dates, side="right") - 1
+            valid = loc >= 0
+            res[valid] = data["value"][last[loc[valid]]]
+        else:
+            revisions = self.revisions(period)
+            if len(revisions) == 0:
+                return res
+            loc = np.searchsorted(data["date"][revisions], cur_dates, side="right") - 1
+            valid = loc >= 0
+            res[valid] = data["value"][revisions[loc[valid]]]
+        return res
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+# {path: ((inode, mtime_ns, size), meta)}
+_PANEL_META_CACHE: Dict[str, Tuple[Tuple[int, int, int], dict]] = {}
+# {metadata path: [matrix path]}, the matrices of each panel mapped in `_MMAP_CACHE`, the latest last
+_PANEL_MAPPED: Dict[str, List[str]] = {}
+
+
+class FilePanelStorage(FileStorageMixin):
+    """
+    All the instruments of a field in one (time x instrument) float32 matrix
+
+    `<provider_uri>/panels/<field>.<freq>.json` is the metadata: the file of the matrix, the shape, the instrument
+    of each column, the valid range (the first and the last index of the non-NaN values, null if the column is
+    empty) and the span (the first and the last index written, as the range of a `.bin` feature file including its
+    NaN values, null if the column is empty) of each column. The matrix is the row-major
+    `<field>.<freq>.<generation>.bin`, the rows are the calendar indices from `start_index`, so the cross section of
+    a date is contiguous. The matrix is memory-mapped.
+
+    A write creates the matrix of the next generation and then replaces the metadata, which is the only step seen by
+    the readers, so they never see a matrix with the shape of another generation. The matrix of the previous
+    generation is kept for the readers which have just read the old metadata, the older ones are removed.
+
+    Use `FilePanelFeatureStorage` to load the features of an instrument from the panels, and
+    `convert_to_panel_storage` to convert the `.bin` feature files.
+    """
+
+    VERSION = 1
+
+    def __init__(self, field: str, freq: str, provider_uri: dict = None, **kwargs):
+        self.field = field
+        self.freq = freq
+        self.storage_name = "panel"
+        self._provider_uri = None if provider_uri is None else C.DataPathManager.format_provider_uri(provider_uri)
+        self.file_name = f"{field.lower()}.{freq.lower()}.bin"
+
+    @property
+    def meta_uri(self) -> Path:
+        return self.uri.with_suffix(".json")
+
+    def data_uri(self, meta: dict = None) -> Path:
+        """the matrix of `meta` (the current metadata by default)"""
+        meta = self.meta if meta is None else meta
+        # the panels of version 1 have only one matrix, `self.uri`
+        return self.uri.with_name(meta["file"]) if "file" in meta else self.uri
+
+    def check(self):
+        if not (self.meta_uri.exists() and self.data_uri().exists()):
+            raise ValueError(f"{self.storage_name} not exists: {self.meta_uri}")
+
+    @property
+    def meta(self) -> dict:
+        """the metadata with the column of each instrument in `columns`, an empty panel if the files do not exist"""
+        try:
+            st = self.meta_uri.stat()
+        except FileNotFoundError:
+            return {
+                "version": self.VERSION,
+                "start_index": 0,
+                "shape": [0, 0],
+                "instruments": [],
+                "ranges": [],
+                "spans": [],
+                "columns": {},
+            }
+        key, stamp = str(self.meta_uri), (st.st_ino, st.st_mtime_ns, st.st_size)
+        cached = _PANEL_META_CACHE.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        meta = json.loads(self.meta_uri.read_text())
+        meta["columns"] = {inst: i for i, inst in enumerate(meta["instruments"])}
+        _PANEL_META_CACHE[key] = (stamp, meta)
+        return meta
+
+    @property
+    def instruments(self) -> List[str]:
+        return self.meta["instruments"]
+
+    @property
+    def start_index(self) -> Union[int, None]:
+        meta = self.meta
+        return meta["start_index"] if meta["shape"][0] else None
+
+    @property
+    def end_index(self) -> Union[int, None]:
+        meta = self.meta
+        return meta["start_index"] + meta["shape"][0] - 1 if meta["shape"][0] else None
+
+    def column(self, instrument: str) -> Union[int, None]:
+        return self.meta["columns"].get(instrument.upper())
+
+    def valid_range(self, instrument: str) -> Tuple[Union[int, None], Union[int, None]]:
+        """the first and the last index of the non-NaN values of `instrument`"""
+        column = self.column(instrument)
+        if column is None or self.meta["ranges"][column] is None:
+            return None, None
+        return tuple(self.meta["ranges"][column])
+
+    def get_spans(self, meta: dict = None) -> list:
+        """the span of each column of `meta` (the current metadata by default)"""
+        meta = self.meta if meta is None else meta
+        # the panels written before the spans were added
+        return meta.get("spans", meta["ranges"])
+
+    def span(self, instrument: str) -> Tuple[Union[int, None], Union[int, None]]:
+        """the first and the last index written of `instrument`, the next value is appended after the span"""
+        meta = self.meta
+        column = meta["columns"].get(instrument.upper())
+        if column is None or self.get_spans(meta)[column] is None:
+            return None, None
+        return tuple(self.get_spans(meta)[column])
+
+    def matrix(self, meta: dict = None) -> np.ndarray:
+        """
+        The memory-mapped (time x instrument) matrix of `meta` (the current metadata by default)
+
+        The readers use the same `meta` for the columns and the matrix, which may be written again between two reads
+        of the metadata.
+        """
+        meta = self.meta if meta is None else meta
+        path = self.data_uri(meta)
+        arr = _mmap_file(path, np.dtype("<f"))
+        # only the mappings of the latest two matrices are kept, the panel may be written by other processes, whose
+        # removed matrices would be kept mapped by this process
+        mapped = _PANEL_MAPPED.setdefault(str(self.meta_uri), [])
+        if str(path) not in mapped:
+            mapped.append(str(path))
+            while len(mapped) > 2:
+                _MMAP_CACHE.pop(mapped.pop(0), None)
+        if arr.size == 0 and meta["shape"][0] * meta["shape"][1]:
+            if path.exists():
+                raise ValueError(f"the matrix {path} does not match its metadata")
+            # the panel has been written twice since `meta` was read, and the matrix of `meta` has been removed
+            return self.matrix(self._read_meta_again(meta))
+        return arr.reshape(meta["shape"]) if arr.size else np.empty(meta["shape"], dtype="<f")
+
+    def _read_meta_again(self, meta: dict) -> dict:
+        new_meta = self.meta
+        if new_meta.get("generation") == meta.get("generation"):
+            raise ValueError(f"the matrix of {self.meta_uri} does not exist")
+        return new_meta
+
+    @property
+    def data(self) -> np.ndarray:
+        """the memory-mapped (time x instrument) matrix"""
+        return self.matrix()
+
+    def cross_section(self, start_index: int, end_index: int = None, instruments: List[str] = None) -> pd.DataFrame:
+        """
+        The values of `instruments` (all by default) from `start_index` to `end_index` (both included)
+
+        The rows are the calendar indices and the columns are the instruments, the instruments not in the panel are
+        NaN.
+        """
+        end_index = start_index if end_index is None else end_index
+        meta = self.meta
+        si = max(start_index, meta["start_index"])
+        ei = min(end_index, meta["start_index"] + meta["shape"][0] - 1)
+        rows = self.matrix(meta)[si - meta["start_index"] : ei - meta["start_index"] + 1]
+        if instruments is None:
+            columns = meta["instruments"]
+            values = np.array(rows)
+        else:
+            columns = [inst.upper() for inst in instruments]
+            loc = np.array([meta["columns"].get(inst, -1) for inst in columns], dtype=np.int64)
+            values = rows[:, np.maximum(loc, 0)] if len(rows) and len(loc) else np.empty((len(rows), len(loc)), "<f")
+            values[:, loc < 0] = np.nan
+        return pd.DataFrame(values, index=pd.RangeIndex(si, si + len(values)), columns=pd.Index(columns))
+
+    def _matrix_files(self) -> List[Path]:
+        """the matrices of all the generations"""
+        files = sorted(self.uri.parent.glob(f"{glob.escape(self.uri.stem)}.*.bin"))
+        return files + [self.uri] if self.uri.exists() else files
+
+    def clear(self) -> None:
+        # the metadata first, the readers never see a metadata without its matrix
+        if self.meta_uri.exists():
+            self.meta_uri.unlink()
+        for _path in self._matrix_files():
+            _unlink_mmap_file(_path)
+
+    def _write(self, start_index: int, rows: int, instruments: List[str], fill, spans: list = None) -> None:
+        """
+        write the panel atomically, `fill(matrix)` fills the NaN (rows x instruments) matrix; `spans` are the spans
+        of the instruments, the valid ranges by default
+        """
+        shape = (rows, len(instruments))
+        self.uri.parent.mkdir(parents=True, exist_ok=True)
+        old_meta = self.meta
+        generation = old_meta.get("generation", 0) + 1
+        path = self.uri.with_name(f"{self.uri.stem}.{generation}.bin")
+        tmp = path.with_name(f".{path.name}.{os.getpid()}")
+        has_value = np.zeros(shape[1], dtype=bool)
+        first = np.zeros(shape[1], dtype=np.int64)
+        last = np.zeros(shape[1], dtype=np.int64)
+        if shape[0] * shape[1]:
+            matrix = np.memmap(tmp, dtype="<f", mode="w+", shape=shape)
+            matrix[:] = np.nan
+            fill(matrix)
+            # the valid ranges, by blocks of rows to bound the memory
+            block = max(1, (1 << 24) // shape[1])
+            for i in range(0, shape[0], block):
+                valid = ~np.isnan(matrix[i : i + block])
+                found = valid.any(axis=0)
+                first[found & ~has_value] = i + valid.argmax(axis=0)[found & ~has_value]
+                last[found] = i + len(valid) - 1 - valid[::-1].argmax(axis=0)[found]
+                has_value |= found
+            matrix.flush()
+            del matrix
+        else:
+            tmp.write_bytes(b"")
+        os.replace(tmp, path)
+        ranges = [
+            [int(start_index + s), int(start_index + e)] if v else None for s, e, v in zip(first, last, has_value)
+        ]
+        meta = {
+            "version": self.VERSION,
+            "generation": generation,
+            "file": path.name,
+            "start_index": int(start_index),
+            "shape": list(shape),
+            "instruments": list(instruments),
+            "ranges": ranges,
+            "spans": ranges if spans is None else [None if span is None else list(map(int, span)) for span in spans],
+        }
+        meta_tmp = self.meta_uri.with_name(f".{self.meta_uri.name}.{os.getpid()}")
+        meta_tmp.write_text(json.dumps(meta))
+        # the only step seen by the readers
+        os.replace(meta_tmp, self.meta_uri)
+        keep = {path, self.data_uri(old_meta)}
+        for _path in self._matrix_files():
+            if _path not in keep:
+                _unlink_mmap_file(_path)
+
+    def write(self, data: pd.DataFrame, spans: Dict[str, Tuple[int, int]] = None) -> None:
+        """
+        Merge `data` (the rows are the calendar indices and the columns are the instruments) into the panel, the new
+        non-NaN values override the old ones
+
+        The span of an instrument is extended by its span in `spans` (the first and the last index of its non-NaN
+        values in `data` by default).
+
+        The whole matrix is written again, so the instruments should be written in one call (see `DataUpdater`).
+        """
+        if data.empty:
+            return
+        data = data.copy()
+        data.columns = [str(inst).upper() for inst in data.columns]
+        meta = self.meta
+        old_start, old_rows = meta["start_index"], meta["shape"][0]
+        instruments = list(meta["instruments"]) + [inst for inst in data.columns if inst not in meta["columns"]]
+        start_index = min(int(data.index.min()), old_start) if old_rows else int(data.index.min())
+        end_index = int(data.index.max())
+        if old_rows:
+            end_index = max(end_index, old_start + old_rows - 1)
+        old = self.matrix(meta)
+        new_spans = list(self.get_spans(meta)) + [None] * (len(instruments) - len(meta["instruments"]))
+        spans = {str(inst).upper(): span for inst, span in (spans or {}).items()}
+        for inst in data.columns:
+            span = spans.get(inst)
+            if span is None:
+                valid = data.index.values[data[inst].notna().values]
+                span = (int(valid.min()), int(valid.max())) if len(valid) else None
+            if span is None:
+                continue
+            column = instruments.index(inst)
+            old_span = new_spans[column]
+            if old_span is not None:
+                span = (min(span[0], old_span[0]), max(span[1], old_span[1]))
+            new_spans[column] = span
+
+        def fill(matrix):
+            if old_rows:
+                matrix[old_start - start_index : old_start - start_index + old_rows, : old.shape[1]] = old
+            loc = [instruments.index(inst) for inst in data.columns]
+            rows = data.index.values.astype(np.int64) - start_index
+            values = data.values.astype("<f")
+            for j, column in enumerate(loc):
+                new = values[:, j]
+                mask = ~np.isnan(new)
+                matrix[rows[mask], column] = new[mask]
+
+        self._write(start_index, end_index - start_index + 1, instruments, fill, new_spans)
+
+    def remove(self, instruments: List[str]) -> None:
+        """remove the columns of `instruments`"""
+        meta = self.meta
+        keep = [i for i, inst in enumerate(meta["instruments"]) if inst not in {x.upper() for x in instruments}]
+        if len(keep) == len(meta["instruments"]):
+            return
+        old = self.matrix(meta)
+
+        def fill(matrix):
+            matrix[:] = old[:, keep]
+
+        spans = self.get_spans(meta)
+        instruments = [meta["instruments"][i] for i in keep]
+        self._write(meta["start_index"], meta["shape"][0], instruments, fill, [spans[i] for i in keep])
+
+    def __len__(self) -> int:
+        return self.meta["shape"][0]
+
+
+class FilePanelFeatureStorage(FileFeatureStorage):
+    """
+    The feature storage reading the column of the instrument in `FilePanelStorage`
+
+    Select it with the backend of the feature provider, see `CompressedFileFeatureStorage`. `write` and `clear`
+    write the whole panel of the field again, so write many instruments with `FilePanelStorage.write` instead (as
+    `DataUpdater` does).
+    """
+
+    def __init__(self, instrument: str, field: str, freq: str, provider_uri: dict = None, **kwargs):
+        super(FilePanelFeatureStorage, self).__init__(instrument, field, freq, provider_uri, **kwargs)
+        self.panel = FilePanelStorage(field, freq, provider_uri=provider_uri)
+        self.code = fname_to_code(instrument)
+
+    @property
+    def uri(self) -> Path:
+        return self.panel.data_uri()
+
+    def check(self):
+        self.panel.check()
+
+    def clear(self):
+        self.panel.remove([self.code])
+
+    def write(self, data_array: Union[List, np.ndarray], index: int = None) -> None:
+        if len(data_array) == 0:
+            logger.info(
+                "len(data_array) == 0, write"
+                "if you need to clear the FeatureStorage, please execute: FeatureStorage.clear"
+            )
+            return
+        if index is None:
+            # append after the span, which includes the trailing NaN values as the `.bin` files do
+            end_index = self.end_index
+            index = 0 if end_index is None else end_index + 1
+        self.panel.write(
+            pd.DataFrame({self.code: np.asarray(data_array, dtype="<f")}, index=range(index, index + len(data_array))),
+            spans={self.code: (index, index + len(data_array) - 1)},
+        )
+
+    @property
+    def start_index(self) -> Union[int, None]:
+        return self.panel.span(self.code)[0]
+
+    @property
+    def end_index(self) -> Union[int, None]:
+        return self.panel.span(self.code)[1]
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Tuple[int, float], pd.Series]:
+        # one metadata for the column and the matrix
+        meta = self.panel.meta
+        column = meta["columns"].get(self.code.upper())
+        if column is None or self.panel.get_spans(meta)[column] is None:
+            storage_start_index, storage_end_index = None, None
+        else:
+            storage_start_index, storage_end_index = self.panel.get_spans(meta)[column]
+        if storage_start_index is None:
+            if isinstance(i, int):
+                return None, None
+            elif isinstance(i, slice):
+                return pd.Series(dtype=np.float32)
+            else:
+                raise TypeError(f"type(i) = {type(i)}")
+
+        panel_start_index = meta["start_index"]
+        if isinstance(i, int):
+            if storage_start_index > i:
+                raise IndexError(f"{i}: start index is {storage_start_index}")
+            return i, float(self.panel.matrix(meta)[i - panel_start_index, column])
+        elif isinstance(i, slice):
+            start_index = storage_start_index if i.start is None else i.start
+            end_index = storage_end_index if i.stop is None else min(i.stop - 1, storage_end_index)
+            si = max(start_index, storage_start_index)
+            if si > end_index:
+                return pd.Series(dtype=np.float32)
+            data = np.array(self.panel.matrix(meta)[si - panel_start_index : end_index - panel_start_index + 1, column])
+            return pd.Series(data, index=pd.RangeIndex(si, si + len(data)))
+        else:
+            raise TypeError(f"type(i) = {type(i)}")
+
+    def __len__(self) -> int:
+        self.check()
+        start_index, end_index = self.panel.span(self.code)
+        return 0 if start_index is None else end_index - start_index + 1
+
+
+def convert_to_panel_storage(provider_uri: Union[str, Path, dict] = None, freq: str = "day", fields=None) -> int:
+    """
+    Convert the `.bin` feature files of `freq` to `FilePanelStorage`, the source files are kept
+
+    Parameters
+    ----------
+    provider_uri : Union[str, Path, dict]
+        the data to convert, `C.provider_uri` by default
+    fields : List[str]
+        the fields to convert, all by default
+
+    Returns
+    -------
+    int
+        the number of the panels
+    """
+    if provider_uri is not None:
+        provider_uri = C.DataPathManager.format_provider_uri(provider_uri)
+        features_dir = C.DataPathManager(provider_uri, C.mount_path).get_data_uri(freq).joinpath("features")
+    else:
+        features_dir = C.dpm.get_data_uri(freq).joinpath("features")
+    suffix = f".{freq.lower()}.bin"
+    # {field: [instrument file name]}
+    field_files = {}
+    for path in sorted(features_dir.glob(f"*/*{suffix}")):
+        field_files.setdefault(path.name[: -len(suffix)], []).append(path.parent.name)
+    if fields is not None:
+        field_files = {k: v for k, v in field_files.items() if k in {f.lower() for f in fields}}
+
+    for field, fnames in field_files.items():
+        sources = [FileFeatureStorage(fname, field, freq, provider_uri=provider_uri) for fname in fnames]
+        # (start index, end index) of each instrument, only the headers are read
+        spans = [(s.start_index, s.end_index) for s in sources]
+        spans = [span if span[0] is not None and span[1] >= span[0] else None for span in spans]
+        valid = [span for span in spans if span is not None]
+        start_index = min((span[0] for span in valid), default=0)
+        end_index = max((span[1] for span in valid), default=-1)
+
+        def fill(matrix):
+            for j, (source, span) in enumerate(zip(sources, spans)):
+                if span is not None:
+                    matrix[span[0] - start_index : span[1] - start_index + 1, j] = source[:].values
+
+        panel = FilePanelStorage(field, freq, provider_uri=provider_uri)
+        instruments = [fname_to_code(fname).upper() for fname in fnames]
+        panel._write(start_index, end_index - start_index + 1, instruments, fill, spans)  # pylint: disable=W0212
+    return len(field_files)
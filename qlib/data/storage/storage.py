@@ -0,0 +1,231 @@
+import re
+from typing import Iterable, Dict, List, Tuple, Union
+
+import pandas as pd
+
+# calendar value type
+CalVT = str
+
+# instrument value
+InstVT = List[Tuple[CalVT, CalVT]]
+# instrument key
+InstKT = str
+
+
+class BaseStorage:
+    @property
+    def storage_name(self) -> str:
+        return re.findall("[A-Z][^A-Z]*", self.__class__.__name__)[-2].lower()
+
+
+class CalendarStorage(BaseStorage):
+    """
+    The behavior of CalendarStorage's methods and List's methods of the same name remain consistent
+    """
+
+    def __init__(self, freq: str, future: bool, **kwargs):
+        self.freq = freq
+        self.future = future
+        self.kwargs = kwargs
+
+    @property
+    def data(self) -> Iterable[CalVT]:
+        """get all data
+
+        Raises
+        ------
+        ValueError
+            If the data(storage) does not exist, raise ValueError
+        """
+        raise NotImplementedError("Subclass of CalendarStorage must implement `data` method")
+
+    def clear(self) -> None:
+        raise NotImplementedError("Subclass of CalendarStorage must implement `clear` method")
+
+    def extend(self, iterable: Iterable[CalVT]) -> None:
+        raise NotImplementedError("Subclass of CalendarStorage must implement `extend` method")
+
+    def index(self, value: CalVT) -> int:
+        raise NotImplementedError("Subclass of CalendarStorage must implement `index` method")
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[CalVT, Iterable[CalVT]]:
+        raise NotImplementedError(
+            "Subclass of CalendarStorage must implement `__getitem__(i: int)`/`__getitem__(s: slice)`  method"
+        )
+
+    def __len__(self) -> int:
+        raise NotImplementedError("Subclass of CalendarStorage must implement `__len__`  method")
+
+
+class InstrumentStorage(BaseStorage):
+    def __init__(self, market: str, freq: str, **kwargs):
+        self.market = market
+        self.freq = freq
+        self.kwargs = kwargs
+
+    @property
+    def data(self) -> Dict[InstKT, InstVT]:
+        """get all data
+
+        Raises
+        ------
+        ValueError
+            If the data(storage) does not exist, raise ValueError
+        """
+        raise NotImplementedError("Subclass of InstrumentStorage must implement `data` method")
+
+    def clear(self) -> None:
+        raise NotImplementedError("Subclass of InstrumentStorage must implement `clear` method")
+
+    def update(self, *args, **kwargs) -> None:
+        """D.update([E, ]**F) -> None.  Update D from mapping/iterable E and F."""
+        raise NotImplementedError("Subclass of InstrumentStorage must implement `update` method")
+
+    def __getitem__(self, k: InstKT) -> InstVT:
+        raise NotImplementedError("Subclass of InstrumentStorage must implement `__getitem__` method")
+
+    def __len__(self) -> int:
+        raise NotImplementedError("Subclass of InstrumentStorage must implement `__len__` method")
+
+
+class FeatureStorage(BaseStorage):
+    def __init__(self, instrument: str, field: str, freq: str, **kwargs):
+        self.instrument = instrument
+        self.field = field
+        self.freq = freq
+        self.kwargs = kwargs
+
+    @property
+    def data(self) -> pd.Series:
+        """get all data
+
+        Notes
+        ------
+        if data(storage) does not exist, return empty pd.Series: `return pd.Series(dtype=np.float32)`
+        """
+        raise NotImplementedError("Subclass of FeatureStorage must implement `data` method")
+
+    @property
+    def start_index(self) -> Union[int, None]:
+        """get FeatureStorage start index
+
+        Notes
+        -----
+        If the data(storage) does not exist, return None
+        """
+        raise NotImplementedError("Subclass of FeatureStorage must implement `start_index` method")
+
+    @property
+    def end_index(self) -> Union[int, None]:
+        """get FeatureStorage end index
+
+        Notes
+        -----
+        The  right index of the data range (both sides are closed)
+
+            The next  data appending point will be  `end_index + 1`
+
+        If the data(storage) does not exist, return None
+        """
+        raise NotImplementedError("Subclass of FeatureStorage must implement `end_index` method")
+
+    def clear(self) -> None:
+        raise NotImplementedError("Subclass of FeatureStorage must implement `clear` method")
+
+    def write(self, data_array: Union[List, "np.ndarray", Tuple], index: int = None):
+        """Write data_array to FeatureStorage starting from index.
+
+        Notes
+        ------
+            If index is None, append data_array to feature.
+
+            If len(data_array) == 0; return
+
+            If (index - self.end_index) >= 1, self[end_index+1: index] will be filled with np.nan
+        """
+        raise NotImplementedError("Subclass of FeatureStorage must implement `write` method")
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Tuple[int, float], pd.Series]:
+        """x.__getitem__(y) <==> x[y]
+
+        Notes
+        -------
+        if data(storage) does not exist:
+            if isinstance(i, int):
+                return (None, None)
+            if isinstance(i,  slice):
+                # return empty pd.Series
+                return pd.Series(dtype=np.float32)
+        """
+        raise NotImplementedError(
+            "Subclass of FeatureStorage must implement `__getitem__(i: int)`/`__getitem__(s: slice)` method"
+        )
+
+    def __len__(self) -> int:
+        raise NotImplementedError("Subclass of FeatureStorage must implement `__len__` method")
+
+
+class PITStorage(BaseStorage):
+    """
+    The point-in-time records of a field of an instrument
+
+    The records are a structured array of `C.pit_record_type`: (date, period, value, index), appended in the order of
+    `date`. The revisions of the same period are chained by `index`: it is the byte offset of the next revision of the
+    period in the data, `C.pit_record_nan["index"]` for the last one. The first revision of each period is located by
+    the period index: the first year of the periods and the byte offset of the first revision of each period.
+    """
+
+    def __init__(self, instrument: str, field: str, **kwargs):
+        self.instrument = instrument
+        self.field = field
+        self.kwargs = kwargs
+
+    @property
+    def quarterly(self) -> bool:
+        """the periods of the fields ending with `_q` are quarters (e.g. 202001), otherwise years (e.g. 2020)"""
+        return self.field.lower().endswith("_q")
+
+    @property
+    def data(self) -> "np.ndarray":
+        """get all the records
+
+        Notes
+        ------
+        if data(storage) does not exist, return an empty structured array
+        """
+        raise NotImplementedError("Subclass of PITStorage must implement `data` method")
+
+    @property
+    def period_index(self) -> Tuple[int, "np.ndarray"]:
+        """the first year of the periods and the byte offsets of the first revision of each period"""
+        raise NotImplementedError("Subclass of PITStorage must implement `period_index` method")
+
+    def clear(self) -> None:
+        raise NotImplementedError("Subclass of PITStorage must implement `clear` method")
+
+    def write(self, data_array: Union["np.ndarray", pd.DataFrame]) -> None:
+        """Write the records (date, period, value) to PITStorage, the records are merged with the existing ones"""
+        raise NotImplementedError("Subclass of PITStorage must implement `write` method")
+
+    def revisions(self, period: int) -> "np.ndarray":
+        """the positions of the revisions of `period` in `data`, following the chain of `index`"""
+        raise NotImplementedError("Subclass of PITStorage must implement `revisions` method")
+
+    def as_of(self, cur_dates: Iterable[int], period: int = None) -> "np.ndarray":
+        """
+        The values known at each of `cur_dates` (int like 20200131)
+
+        Parameters
+        ----------
+        period : int
+            the value of `period`; the value of the latest period known at each date if it is None
+
+        Returns
+        -------
+        np.ndarray
+            the values, `C.pit_record_nan["value"]` if nothing is known at the date
+        """
+        raise NotImplementedError("Subclass of PITStorage must implement `as_of` method")
+
+    def __len__(self) -> int:
+        raise NotImplementedError("Subclass of PITStorage must implement `__len__` method")
@@ -0,0 +1,318 @@
+"""
+The distributed task queue of the expression and dataset jobs, backed by MongoDB (`C["mongo"]`)
+
+A large job is split into tasks, e.g. the (instrument chunk, time chunk) tasks of a dataset job; the tasks are stored
+in a collection of the task database and run by many worker processes on many nodes
+
+    .. code-block:: python
+
+        from qlib.data.task import TaskManager, submit_dataset_job, collect_dataset_job
+
+        tm = TaskManager("dataset")
+        submit_dataset_job(tm, "alpha", D.instruments("csi300"), fields, inst_chunk_size=50, time_chunk_size=250)
+        tm.wait("alpha")
+        df = collect_dataset_job(tm, "alpha")
+
+and on each node
+
+    python -m qlib.data.task --provider_uri ~/.qlib/qlib_data/cn_data --task_pool dataset --job alpha
+
+A worker claims a task with a lease and renews it while the task is running; the task of a worker which dies is
+claimed again when its lease expires. A failed task is retried until it is tried `max_retries` times. The results
+are pickled in the task documents, so a task should be small enough for the document size limit of MongoDB (16MB).
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import pickle
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import List, Optional, Union
+
+import pandas as pd
+
+from ..log import get_module_logger
+from ..utils import get_callable_kwargs, get_mongodb, hash_args
+from .data import D
+
+logger = get_module_logger("task")
+
+
+class TaskManager:
+    """
+    The tasks of a task pool (a collection of the task database)
+
+    A task document is
+
+        - job: the name of the job
+        - key: the hash of `def`, a task is created once in a job
+        - def: {"func": "<module path>.<function name>", "kwargs": {...}}
+        - status: waiting, running, done or failed
+        - attempts: the times the task is claimed, it is also the fencing token of the running worker
+        - worker / lease_until: the worker running the task and the expiry time (epoch seconds) of its lease
+        - res / error: the pickled result or the traceback of the last failure
+    """
+
+    STATUS_WAITING = "waiting"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    def __init__(self, task_pool: str, lease: float = 600, max_retries: int = 3, mongodb=None):
+        """
+        Parameters
+        ----------
+        task_pool : str
+            the collection of the tasks
+        lease : float
+            the seconds a claimed task belongs to its worker without being renewed
+        max_retries : int
+            the times a task is tried before it is failed
+        mongodb :
+            the task database, `get_mongodb()` by default (e.g. a `mongomock` database in the tests)
+        """
+        self.mongodb = get_mongodb() if mongodb is None else mongodb
+        self.task_pool = self.mongodb[task_pool]
+        self.lease = lease
+        self.max_retries = max_retries
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.task_pool.create_index([("job", 1), ("key", 1)], unique=True)
+        self.task_pool.create_index([("job", 1), ("status", 1)])
+
+    def create_task(self, job: str, task_defs: List[dict]) -> int:
+        """add the tasks to `job`, the existing ones are not added again; return the number of the new tasks"""
+        count = 0
+        now = time.time()
+        for task_def in task_defs:
+            res = self.task_pool.update_one(
+                {"job": job, "key": hash_args(task_def)},
+                {
+                    "$setOnInsert": {
+                        "def": task_def,
+                        "status": self.STATUS_WAITING,
+                        "attempts": 0,
+                        "worker": None,
+                        "lease_until": None,
+                        "res": None,
+                        "error": None,
+                        "created_at": now,
+                    }
+                },
+                upsert=True,
+            )
+            count += res.upserted_id is not None
+        return count
+
+    def _query(self, job: Optional[str], **kwargs) -> dict:
+        return {**kwargs, "job": job} if job is not None else kwargs
+
+    def claim(self, job: str = None) -> Optional[dict]:
+        """claim a waiting task or a running task whose lease is expired, None if there is no task to run"""
+        now = time.time()
+        expired = {"status": self.STATUS_RUNNING, "lease_until": {"$lt": now}}
+        # the expired tasks which have been tried too many times
+        self.task_pool.update_many(
+            self._query(job, **expired, attempts={"$gte": self.max_retries}),
+            {"$set": {"status": self.STATUS_FAILED, "error": "the lease is expired", "worker": None}},
+        )
+        return self.task_pool.find_one_and_update(
+            self._query(job, **{"$or": [{"status": self.STATUS_WAITING}, expired]}),
+            {
+                "$set": {"status": self.STATUS_RUNNING, "worker": self.worker, "lease_until": now + self.lease},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1), ("_id", 1)],
+            return_document=True,
+        )
+
+    def _owned(self, task: dict) -> dict:
+        # the worker has lost the task if it is claimed again by another worker
+        return {"_id": task["_id"], "status": self.STATUS_RUNNING, "attempts": task["attempts"]}
+
+    def renew(self, task: dict) -> bool:
+        """extend the lease of the task, False if the task is lost"""
+        res = self.task_pool.update_one(self._owned(task), {"$set": {"lease_until": time.time() + self.lease}})
+        return res.matched_count > 0
+
+    def commit(self, task: dict, res) -> bool:
+        """save the result of the task, False if the task is lost"""
+        res = self.task_pool.update_one(
+            self._owned(task),
+            {"$set": {"status": self.STATUS_DONE, "res": pickle.dumps(res), "lease_until": None}},
+        )
+        return res.matched_count > 0
+
+    def fail(self, task: dict, error: str) -> bool:
+        """the task is retried if it has not been tried `max_retries` times, False if the task is lost"""
+        status = self.STATUS_FAILED if task["attempts"] >= self.max_retries else self.STATUS_WAITING
+        res = self.task_pool.update_one(
+            self._owned(task), {"$set": {"status": status, "error": error, "worker": None, "lease_until": None}}
+        )
+        return res.matched_count > 0
+
+    @contextmanager
+    def heartbeat(self, task: dict):
+        """renew the lease of the task in a thread while the block is running"""
+        stop = threading.Event()
+
+        def _renew():
+            while not stop.wait(self.lease / 3):
+                if not self.renew(task):
+                    logger.warning(f"task {task['_id']} is lost")
+                    return
+
+        thread = threading.Thread(target=_renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def run(self, task: dict):
+        func, kwargs = get_callable_kwargs(task["def"])
+        return func(**kwargs)
+
+    def status(self, job: str) -> dict:
+        """{status: the number of the tasks}"""
+        statuses = [self.STATUS_WAITING, self.STATUS_RUNNING, self.STATUS_DONE, self.STATUS_FAILED]
+        return {s: self.task_pool.count_documents({"job": job, "status": s}) for s in statuses}
+
+    def wait(self, job: str, timeout: float = None, poll_interval: float = 1.0) -> dict:
+        """wait until all the tasks of `job` are done or failed, return the status"""
+        start = time.time()
+        while True:
+            status = self.status(job)
+            if status[self.STATUS_WAITING] + status[self.STATUS_RUNNING] == 0:
+                return status
+            if timeout is not None and time.time() - start > timeout:
+                raise TimeoutError(f"{job} is not finished in {timeout}s: {status}")
+            time.sleep(poll_interval)
+
+    def results(self, job: str) -> list:
+        """[(def, result)] of the done tasks of `job`"""
+        tasks = self.task_pool.find({"job": job, "status": self.STATUS_DONE}, sort=[("created_at", 1), ("_id", 1)])
+        return [(task["def"], pickle.loads(task["res"])) for task in tasks]
+
+    def errors(self, job: str) -> list:
+        """[(def, error)] of the failed tasks of `job`"""
+        tasks = self.task_pool.find({"job": job, "status": self.STATUS_FAILED})
+        return [(task["def"], task["error"]) for task in tasks]
+
+    def reset(self, job: str, status: Union[str, List[str]] = STATUS_FAILED) -> int:
+        """make the tasks of `status` waiting again, return the number of them"""
+        status = [status] if isinstance(status, str) else status
+        res = self.task_pool.update_many(
+            {"job": job, "status": {"$in": status}},
+            {"$set": {"status": self.STATUS_WAITING, "attempts": 0, "worker": None, "lease_until": None}},
+        )
+        return res.modified_count
+
+    def remove(self, job: str) -> int:
+        return self.task_pool.delete_many({"job": job}).deleted_count
+
+
+def run_worker(
+    task_manager: TaskManager, job: str = None, exit_when_empty: bool = True, poll_interval: float = 1.0
+) -> int:
+    """run the tasks until there is no task to run (or forever if `exit_when_empty` is False), return the number of
+    the done tasks"""
+    count = 0
+    while True:
+        task = task_manager.claim(job)
+        if task is None:
+            if exit_when_empty:
+                return count
+            time.sleep(poll_interval)
+            continue
+        with task_manager.heartbeat(task):
+            try:
+                res = task_manager.run(task)
+            except Exception:  # pylint: disable=W0703
+                logger.warning(f"task {task['_id']} of {task['job']} failed")
+                task_manager.fail(task, traceback.format_exc())
+                continue
+        if task_manager.commit(task, res):
+            count += 1
+
+
+def dataset_task(instruments: List[str], fields: List[str], start_time: str, end_time: str, freq: str = "day"):
+    return D.features(instruments, fields, start_time=start_time, end_time=end_time, freq=freq)
+
+
+def submit_dataset_job(
+    task_manager: TaskManager,
+    job: str,
+    instruments,
+    fields: List[str],
+    start_time=None,
+    end_time=None,
+    freq: str = "day",
+    inst_chunk_size: int = 100,
+    time_chunk_size: int = None,
+) -> int:
+    """
+    Split the dataset `D.features(instruments, fields, start_time, end_time, freq)` into the tasks of
+    `inst_chunk_size` instruments and `time_chunk_size` calendar steps (the whole range if it is None)
+
+    The lookback windows of the expressions are loaded by each task, so the chunks give the same values as the whole
+    dataset. Return the number of the new tasks.
+    """
+    if isinstance(instruments, dict):
+        instruments = D.list_instruments(instruments, start_time=start_time, end_time=end_time, freq=freq, as_list=True)
+    instruments = sorted(instruments)
+    calendar = D.calendar(start_time=start_time, end_time=end_time, freq=freq)
+    if len(calendar) == 0:
+        return 0
+    time_chunk_size = len(calendar) if time_chunk_size is None else time_chunk_size
+    task_defs = []
+    for i in range(0, len(instruments), inst_chunk_size):
+        for j in range(0, len(calendar), time_chunk_size):
+            task_defs.append(
+                {
+                    "func": "qlib.data.task.dataset_task",
+                    "kwargs": {
+                        "instruments": instruments[i : i + inst_chunk_size],
+                        "fields": list(fields),
+                        "start_time": str(calendar[j]),
+                        "end_time": str(calendar[min(j + time_chunk_size, len(calendar)) - 1]),
+                        "freq": freq,
+                    },
+                }
+            )
+    return task_manager.create_task(job, task_defs)
+
+
+def collect_dataset_job(task_manager: TaskManager, job: str) -> pd.DataFrame:
+    """the dataset of the done tasks of `job`"""
+    results = [res for _, res in task_manager.results(job) if not res.empty]
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results).sort_index()
+
+
+def main():
+    import qlib  # pylint: disable=C0415
+
+    parser = argparse.ArgumentParser(description="the qlib task worker")
+    parser.add_argument("--provider_uri", required=True)
+    parser.add_argument("--task_pool", required=True)
+    parser.add_argument("--job", default=None)
+    parser.add_argument("--lease", type=float, default=600)
+    parser.add_argument("--max_retries", type=int, default=3)
+    parser.add_argument("--forever", action="store_true", help="wait for the new tasks instead of exiting")
+    args = parser.parse_args()
+
+    qlib.init(provider_uri=args.provider_uri)
+    tm = TaskManager(args.task_pool, lease=args.lease, max_retries=args.max_retries)
+    count = run_worker(tm, job=args.job, exit_when_empty=not args.forever)
+    logger.info(f"{count} tasks done")
+
+
+if __name__ == "__main__":
+    main()
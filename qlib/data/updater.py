@@ -0,0 +1,193 @@
+"""
+Update the qlib data in place with the new bars
+
+    .. code-block:: python
+
+        from qlib.data.updater import DataUpdater
+
+        # df: the index is (instrument, datetime) and the columns are the fields, e.g. the bars of the new day
+        DataUpdater("~/.qlib/qlib_data/cn_data").update(df)
+
+Instead of installing the whole dataset again (`GetData.qlib_data`), the new bars are appended to the feature files,
+the calendar is extended and the spans of the instruments are updated. The files are written in the order of
+features, instruments, calendar and manifest, and each of the calendar, instrument and manifest files is replaced
+atomically, so the readers never see a calendar longer than the features. Only the entries of the updated
+instruments are removed from the memory cache `H` (and its spill tier) of the current process; the calendars and
+the updated markets are reloaded.
+"""
+from pathlib import Path
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+from ..config import C
+from ..log import get_module_logger
+from ..utils import code_to_fname, init_instance_by_config, read_data_manifest, write_data_manifest
+from .cache import H
+from .storage.file_storage import FileCalendarStorage, FileInstrumentStorage, FilePanelFeatureStorage
+
+logger = get_module_logger("updater")
+
+
+class DataUpdater:
+    def __init__(
+        self,
+        provider_uri: Union[str, Path, dict] = None,
+        freq: str = "day",
+        markets: Iterable[str] = ("all",),
+        backend: dict = None,
+        update_manifest: bool = True,
+    ):
+        """
+        Parameters
+        ----------
+        provider_uri : Union[str, Path, dict]
+            the data to update, `C.provider_uri` by default
+        freq : str
+            the freq of the bars
+        markets : Iterable[str]
+            the markets whose spans of the updated instruments are extended, the new instruments are added to them
+        backend : dict
+            the config of the feature storage, `FileFeatureStorage` by default
+        update_manifest : bool
+            write the manifest of the data (see `write_data_manifest`) after the update; the existing manifest is
+            always updated, or it would not match the updated files
+        """
+        self.provider_uri = None if provider_uri is None else C.DataPathManager.format_provider_uri(provider_uri)
+        self.freq = freq
+        self.markets = list(markets)
+        if not backend:
+            backend = {"class": "FileFeatureStorage", "module_path": "qlib.data.storage.file_storage"}
+        self.backend = backend
+        self.update_manifest = update_manifest
+
+    @property
+    def qlib_dir(self) -> Path:
+        dpm = C.dpm if self.provider_uri is None else C.DataPathManager(self.provider_uri, C.mount_path)
+        return dpm.get_data_uri(self.freq)
+
+    @property
+    def datetime_format(self) -> str:
+        return "%Y-%m-%d" if self.freq == "day" else "%Y-%m-%d %H:%M:%S"
+
+    def _feature_storage(self, instrument: str, field: str):
+        backend = {
+            **self.backend,
+            "kwargs": {
+                **self.backend.get("kwargs", {}),
+                "instrument": code_to_fname(instrument),
+                "field": field,
+                "freq": self.freq,
+                "provider_uri": self.provider_uri,
+            },
+        }
+        return init_instance_by_config(backend)
+
+    def update(self, data: pd.DataFrame) -> dict:
+        """
+        Write the bars of `data`
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            the index is (instrument, datetime) and the columns are the fields (with or without "$"); the datetimes
+            must be in the calendar or after its end, the values of the existing bars are overridden by the non-NaN
+            new values
+
+        Returns
+        -------
+        dict
+            the new datetimes of the calendar, the updated instruments and the number of the invalidated cache entries
+        """
+        if data.empty:
+            return {"calendar": [], "instruments": [], "invalidated": 0}
+        data = data.copy()
+        data.columns = [str(field).lstrip("$").lower() for field in data.columns]
+        datetimes = pd.DatetimeIndex(data.index.get_level_values(1))
+
+        # the calendar is extended with the datetimes after its end
+        calendar_storage = FileCalendarStorage(self.freq, future=False, provider_uri=self.provider_uri)
+        old_calendar = pd.DatetimeIndex(calendar_storage._read_calendar())  # pylint: disable=W0212
+        dates = datetimes.unique().sort_values()
+        if len(old_calendar):
+            unknown = dates[(dates <= old_calendar[-1]) & ~dates.isin(old_calendar)]
+            if len(unknown):
+                raise ValueError(f"{list(unknown.astype(str))} are not in the calendar, only new bars can be inserted")
+            new_dates = dates[dates > old_calendar[-1]]
+        else:
+            new_dates = dates
+        calendar = old_calendar.append(new_dates)
+        calendar_index = pd.Series(np.arange(len(calendar)), index=calendar)
+
+        # features
+        indices = calendar_index.loc[datetimes].values
+        instruments = data.index.get_level_values(0)
+        spans = {}
+        # the panel of a field is written again by each write, so all the instruments are written at once
+        panels = set()
+        # the bars given are written as in the `.bin` files, including their NaN values
+        bounds = pd.Series(indices).groupby(instruments.values).agg(["min", "max"])
+        panel_spans = {inst: (int(row["min"]), int(row["max"])) for inst, row in bounds.iterrows()}
+        for field in data.columns:
+            storage = self._feature_storage(instruments[0], field)
+            if isinstance(storage, FilePanelFeatureStorage):
+                values = pd.Series(data[field].values, index=pd.MultiIndex.from_arrays([indices, instruments]))
+                storage.panel.write(values.unstack(), spans=panel_spans)
+                panels.add(field)
+        for instrument, loc in pd.Series(np.arange(len(data))).groupby(instruments.values):
+            loc = loc.values
+            index = indices[loc]
+            start_index, end_index = int(index.min()), int(index.max())
+            for field in data.columns:
+                if field in panels:
+                    continue
+                values = np.full(end_index - start_index + 1, np.nan, dtype="<f")
+                values[index - start_index] = data[field].values[loc]
+                self._feature_storage(instrument, field).write(values, start_index)
+            spans[instrument] = (calendar[start_index], calendar[end_index])
+
+        # instruments
+        for market in self.markets:
+            storage = FileInstrumentStorage(market, self.freq, provider_uri=self.provider_uri)
+            _instruments = storage._read_instrument()  # pylint: disable=W0212
+            for instrument, (start, end) in spans.items():
+                start, end = start.normalize(), end.normalize()
+                if instrument in _instruments and _instruments[instrument]:
+                    last_start, last_end = _instruments[instrument][-1]
+                    _instruments[instrument][-1] = (min(last_start, start), max(last_end, end))
+                else:
+                    _instruments[instrument] = [(start, end)]
+            storage._write_instrument(_instruments)  # pylint: disable=W0212
+
+        # calendar
+        if len(new_dates):
+            calendar_storage._write_calendar(calendar.strftime(self.datetime_format))  # pylint: disable=W0212
+
+        if self.update_manifest or read_data_manifest(self.qlib_dir) is not None:
+            write_data_manifest(self.qlib_dir)
+
+        invalidated = self.invalidate(spans)
+        logger.info(
+            f"{len(new_dates)} new bars of {self.freq}, {len(spans)} instruments updated, "
+            f"{invalidated} cache entries invalidated"
+        )
+        return {"calendar": list(new_dates), "instruments": sorted(spans), "invalidated": invalidated}
+
+    def invalidate(self, instruments: Iterable[str]) -> int:
+        """remove the cache entries of `instruments`, the calendars and the updated markets from `H`"""
+        instruments = set(instruments)
+
+        def _feature(key):
+            if not isinstance(key, tuple) or len(key) < 2:
+                return False
+            if key[0] == "benchmark":
+                # the benchmark returns of `qlib.backtest.report`, (benchmark, weights, ...)
+                return any(inst in instruments for inst, _ in key[1])
+            # the expressions, (expression, instrument, start_index, end_index, freq)
+            return key[1] in instruments
+
+        count = H["f"].invalidate(_feature)
+        count += H["c"].invalidate(lambda key: True)
+        count += H["i"].invalidate(lambda key: key in self.markets)
+        return count
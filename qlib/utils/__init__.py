@@ -3,29 +3,50 @@ from __future__ import division
 from __future__ import print_function  
 
 import os
-import redis
+import re
 import json
 import hashlib
 import pandas as pd
-from packaging import version
 from pathlib import Path
+from typing import List, Optional
 
 from ..config import C 
 from ..log import get_module_logger, set_log_with_config
 
 log = get_module_logger("utils")
-# MultiIndex.is_lexsorted() is a deprecated method in Pandas 1.3.0
-is_deprecated_lexsorted_pandas = version.parse(pd.__version__) > version.parse("1.3.0")
+
+
+def __getattr__(name):
+    # the heavy optional dependencies are only imported when the attributes depending on them are used
+    if name == "is_deprecated_lexsorted_pandas":
+        from packaging import version  # pylint: disable=C0415
+
+        # MultiIndex.is_lexsorted() is a deprecated method in Pandas 1.3.0
+        return version.parse(pd.__version__) > version.parse("1.3.0")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 ####################### Server ######################
 def get_redis_connection():
+    import redis  # pylint: disable=C0415
+
     return redis.StrictRedis(host=C.redis_host, port=C.redis_port, db=C.redis_task_db, password=C.redis_password)
 
+def get_mongodb():
+    """the task database of `C["mongo"]`"""
+    import pymongo  # pylint: disable=C0415
+
+    mongo_conf = C["mongo"]
+    client = pymongo.MongoClient(mongo_conf["task_url"])
+    return client.get_database(name=mongo_conf["task_db_name"])
+
 def hash_args(*args):
     string = json.dumps(args, sort_keys=True, default=str)
     return hashlib.md5(string.encode()).hexdigest()
 
 def can_use_cache():
+    import redis  # pylint: disable=C0415
+
     res = True
     r = get_redis_connection()
     try:
@@ -37,14 +58,248 @@ def can_use_cache():
     return res
 
 from .mod import (
+    get_module_by_module_path,
+    get_callable_kwargs,
     init_instance_by_config,
 )
 
-def exists_qlib_data(qlib_dir):
+#################### Expression ####################
+def parse_field(field):
+    # Following patterns will be matched:
+    # - $close -> Feature("close")
+    # - $close5 -> Feature("close5")
+    # - $open+$close -> Feature("open")+Feature("close")
+    # - $$roewa_q -> PFeature("roewa_q")
+    if not isinstance(field, str):
+        field = str(field)
+    # Chinese punctuation regex:
+    # \u3001 -> 、
+    # \uff1a -> ：
+    # \uff08 -> (
+    # \uff09 -> )
+    chinese_punctuation_regex = r"\u3001\uff1a\uff08\uff09"
+    for pattern, new in [
+        (rf"\$\$([\w{chinese_punctuation_regex}]+)", r'PFeature("\1")'),  # $$ must be before $
+        (rf"\$([\w{chinese_punctuation_regex}]+)", r'Feature("\1")'),
+        (r"(\w+\s*)\(", r"Operators.\1("),
+    ]:  # Features  # Operators
+        field = re.sub(pattern, new, field)
+    return field
+
+
+#################### PIT ####################
+def get_period_list(first: int, last: int, quarterly: bool) -> List[int]:
+    """
+    This method will be used in PIT database.
+    It return all the possible values between `first` and `end`  (first and end is included)
+
+    Parameters
+    ----------
+    quarterly : bool
+        will it return quarterly index or yearly index.
+
+    Returns
+    -------
+    List[int]
+        the possible index between [first, last]
+    """
+
+    if not quarterly:
+        assert all(1900 <= x <= 2099 for x in (first, last)), "invalid arguments"
+        return list(range(first, last + 1))
+    else:
+        assert all(190000 <= x <= 209904 for x in (first, last)), "invalid arguments"
+        res = []
+        for year in range(first // 100, last // 100 + 1):
+            for q in range(1, 5):
+                period = year * 100 + q
+                if first <= period <= last:
+                    res.append(year * 100 + q)
+        return res
+
+
+def get_period_offset(first_year: int, period, quarterly: bool):
+    """the offset of `period` (int or np.ndarray) in the period index starting from `first_year`"""
+    if quarterly:
+        offset = (period // 100 - first_year) * 4 + period % 100 - 1
+    else:
+        offset = period - first_year
+    return offset
+
+
+DATA_MANIFEST_FILE = "manifest.json"
+# the files of the features, only read by `exists_qlib_data(deep_verify=True)`
+DATA_MANIFEST_FILES_FILE = "manifest.files.json"
+DATA_MANIFEST_VERSION = 2
+
+
+def _scan_files(_dir: Path) -> dict:
+    """{file name: [size, mtime_ns]} of the files in `_dir`"""
+    res = {}
+    with os.scandir(_dir) as it:
+        for entry in it:
+            if entry.is_file():
+                st = entry.stat()
+                res[entry.name] = [st.st_size, st.st_mtime_ns]
+    return res
+
+
+def build_data_manifest(qlib_dir) -> dict:
+    """
+    Scan the qlib data directory and build its manifest
+
+    Returns
+    -------
+    dict:
+        - calendars / instruments: {file name: [size, mtime_ns]}
+        - features: {code: {file name: [size, mtime_ns]}}
+        - codes: the codes in instruments/all.txt
+        - freqs / fields: the frequencies and the fields of the features
+    """
+    qlib_dir = Path(qlib_dir).expanduser()
+    features_dir = qlib_dir.joinpath("features")
+    features = {}
+    with os.scandir(features_dir) as it:
+        for entry in it:
+            if entry.is_dir():
+                features[entry.name] = _scan_files(Path(entry.path))
+    freqs, fields = set(), set()
+    for files in features.values():
+        for name in files:
+            # <field>.<freq>.bin
+            parts = name.rsplit(".", 2)
+            if len(parts) == 3 and parts[2] == "bin":
+                fields.add(parts[0])
+                freqs.add(parts[1])
+
+    codes = []
+    _instrument = qlib_dir.joinpath("instruments", "all.txt")
+    if _instrument.exists():
+        with _instrument.open() as f:
+            codes = [line.split("\t", 1)[0].strip() for line in f if line.strip()]
+    return {
+        "version": DATA_MANIFEST_VERSION,
+        "calendars": _scan_files(qlib_dir.joinpath("calendars")),
+        "instruments": _scan_files(qlib_dir.joinpath("instruments")),
+        "features": features,
+        "codes": codes,
+        "freqs": sorted(freqs),
+        "fields": sorted(fields),
+    }
+
+
+def _write_json(_path: Path, obj: dict):
+    tmp_path = _path.with_name(f".{_path.name}.{os.getpid()}")
+    tmp_path.write_text(json.dumps(obj))
+    os.replace(tmp_path, _path)
+
+
+def _read_json(_path: Path) -> Optional[dict]:
+    try:
+        obj = json.loads(_path.read_text())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(obj, dict) or obj.get("version") != DATA_MANIFEST_VERSION:
+        return None
+    return obj
+
+
+def write_data_manifest(qlib_dir) -> dict:
+    """
+    Build the manifest of the qlib data directory and write it atomically; it should be called after the data is
+    installed or updated
+
+    `manifest.json` is the summary read by `exists_qlib_data`: the calendars and instruments as in
+    `build_data_manifest`, the codes, the freqs, the fields and the names of the instrument directories of the
+    features. The files of the features are written to `manifest.files.json`, which is only read by the deep
+    verification.
+
+    Returns
+    -------
+    dict:
+        the summary
+    """
+    qlib_dir = Path(qlib_dir).expanduser()
+    manifest = build_data_manifest(qlib_dir)
+    files = {"version": DATA_MANIFEST_VERSION, "features": manifest["features"]}
+    _write_json(qlib_dir.joinpath(DATA_MANIFEST_FILES_FILE), files)
+    summary = {**manifest, "features": sorted(manifest["features"])}
+    _write_json(qlib_dir.joinpath(DATA_MANIFEST_FILE), summary)
+    return summary
+
+
+def read_data_manifest(qlib_dir) -> Optional[dict]:
+    """the summary manifest of the qlib data directory, None if there is no valid manifest"""
+    return _read_json(Path(qlib_dir).expanduser().joinpath(DATA_MANIFEST_FILE))
+
+
+def read_data_manifest_files(qlib_dir) -> Optional[dict]:
+    """{code: {file name: [size, mtime_ns]}} of the features in the manifest, None if there is no valid listing"""
+    files = _read_json(Path(qlib_dir).expanduser().joinpath(DATA_MANIFEST_FILES_FILE))
+    return None if files is None else files["features"]
+
+
+def _check_manifest(qlib_dir: Path, manifest: dict) -> bool:
+    features = manifest["features"]
+    if not (manifest["calendars"] and manifest["instruments"] and features):
+        return False
+    # check calendar bin
+    feature_freqs = set(manifest["freqs"])
+    for _calendar in manifest["calendars"]:
+        if ("_future" not in _calendar) and _calendar.split(".")[0] not in feature_freqs:
+            return False
+    # check instruments
+    miss_code = set(map(str.lower, manifest["codes"])) - set(map(lambda x: fname_to_code(x.lower()), features))
+    if miss_code and any(map(lambda x: "sht" not in x, miss_code)):
+        return False
+    # the files read by `qlib.init` and the instrument providers are still there and not changed
+    for _dir in ["calendars", "instruments"]:
+        for name, (size, mtime) in manifest[_dir].items():
+            try:
+                st = qlib_dir.joinpath(_dir, name).stat()
+            except OSError:
+                return False
+            if (st.st_size, st.st_mtime_ns) != (size, mtime):
+                return False
+    return True
+
+
+def exists_qlib_data(qlib_dir, deep_verify: bool = False):
+    """
+    Check whether the qlib data in `qlib_dir` is complete
+
+    If the data has a manifest (written by `write_data_manifest` when the data is installed), only the manifest and
+    the calendar and instrument files are read instead of walking the whole features tree.
+
+    Parameters
+    ----------
+    deep_verify : bool
+        scan the whole data directory and check that every file listed in the manifest (`manifest.files.json`)
+        exists with the same size and mtime
+    """
     qlib_dir = Path(qlib_dir).expanduser()
     if not qlib_dir.exists():
         return False
 
+    manifest = read_data_manifest(qlib_dir)
+    if manifest is not None:
+        if not _check_manifest(qlib_dir, manifest):
+            return False
+        if deep_verify:
+            try:
+                actual = build_data_manifest(qlib_dir)
+            except (OSError, ValueError):
+                return False
+            for key in ["calendars", "instruments", "codes", "freqs", "fields"]:
+                if actual[key] != manifest[key]:
+                    return False
+            if sorted(actual["features"]) != manifest["features"]:
+                return False
+            if read_data_manifest_files(qlib_dir) != actual["features"]:
+                return False
+        return True
+
+    # no manifest, scan the data directory
     calendars_dir = qlib_dir.joinpath("calendars")
     instruments_dir = qlib_dir.joinpath("instruments")
     features_dir = qlib_dir.joinpath("features")
@@ -53,9 +308,10 @@ def exists_qlib_data(qlib_dir):
         if not (_dir.exists() and list(_dir.iterdir())):
             return False
     # check calendar bin
+    # the features are stored as features/<code>/<field>.<freq>.bin, stop at the first one instead of listing all
     for _calendar in calendars_dir.iterdir():
         if ("_future" not in _calendar.name) and (
-            not list(features_dir.rglob(f"*.{_calendar.name.split('.')[0]}.bin"))
+            next(features_dir.glob(f"*/*.{_calendar.name.split('.')[0]}.bin"), None) is None
         ):
             return False
 
@@ -69,6 +325,26 @@ def exists_qlib_data(qlib_dir):
     return True
 
 
+def code_to_fname(code: str):
+    """stock code to file name
+
+    Parameters
+    ----------
+    code: str
+    """
+    # NOTE: In windows, the following name is I/O device, and the file with the corresponding name cannot be created
+    # reference: https://superuser.com/questions/86999/why-cant-i-name-a-folder-or-file-con-in-windows
+    replace_names = ["CON", "PRN", "AUX", "NUL"]
+    replace_names += [f"COM{i}" for i in range(10)]
+    replace_names += [f"LPT{i}" for i in range(10)]
+
+    prefix = "_qlib_"
+    if str(code).upper() in replace_names:
+        code = prefix + str(code)
+
+    return code
+
+
 def fname_to_code(fname: str):
     prefix = "_qlib_"
     if fname.startswith(prefix):
@@ -76,5 +352,11 @@ def fname_to_code(fname: str):
     return fname
 
 __all__ = [
+    "get_module_by_module_path",
     "init_instance_by_config",
+    "parse_field",
+    "get_period_list",
+    "get_period_offset",
+    "code_to_fname",
+    "fname_to_code",
 ]
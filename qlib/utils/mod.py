@@ -15,9 +15,18 @@ from types import ModuleType
 from urllib.parse import urlparse 
 from qlib.typehint import InstConf
 
+# the modules loaded from `.py` files, {<absolute path>: (<mtime of the file>, <module>)}
+# a file is executed again only if it is modified
+_PY_MODULE_CACHE: Dict[str, Tuple[int, ModuleType]] = {}
+
+
 def get_module_by_module_path(module_path: Union[str, ModuleType]):
     """
     Load module path
+
+    The modules are resolved once: the imported modules are looked up in `sys.modules` directly, and the modules
+    loaded from `.py` files are cached by the path and the mtime of the file.
+
     :param module_path:
     :return:
     :raises: ModuleNotFoundError
@@ -28,13 +37,21 @@ def get_module_by_module_path(module_path: Union[str, ModuleType]):
         module = module_path
     else:
         if module_path.endswith(".py"):
+            abs_path = os.path.abspath(module_path)
+            mtime = os.stat(abs_path).st_mtime_ns
+            cached = _PY_MODULE_CACHE.get(abs_path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
             module_name = re.sub("^[^a-zA-Z_]+", "", re.sub("[^0-9a-zA-Z_]", "", module_path[:-3].replace("/", "_")))
             module_spec = importlib.util.spec_from_file_location(module_name, module_path)
             module = importlib.util.module_from_spec(module_spec)
             sys.modules[module_name] = module
             module_spec.loader.exec_module(module)
+            _PY_MODULE_CACHE[abs_path] = mtime, module
         else:
-            module = importlib.import_module(module_path)
+            module = sys.modules.get(module_path)
+            if module is None:
+                module = importlib.import_module(module_path)
     return module
 
 def split_module_path(module_path: str) -> Tuple[str, str]:
@@ -43,14 +60,56 @@ def split_module_path(module_path: str) -> Tuple[str, str]:
     return m_path, cls
 
 def get_callable_kwargs(config: InstConf, default_module: Union[str, ModuleType] = None) -> (type, dict):
+    """
+    extract class/func and kwargs from config info
+
+    Parameters
+    ----------
+    config : [dict, str]
+        similar to config
+        please refer to the doc of init_instance_by_config
+
+    default_module : Python module or str
+        It should be a python module to load the class type
+        This function will load class from the config['module_path'] first.
+        If config['module_path'] doesn't exists, it will load the class from default_module.
+
+    Returns
+    -------
+    (type, dict):
+        the class/func object and it's arguments.
+
+    Raises
+    ------
+        ModuleNotFoundError
+    """
     if isinstance(config, dict):
         key = "class" if "class" in config else "func"
         if isinstance(config[key], str):
+            # 1) get module and class
+            # - case 1): "a.b.c.ClassName"
+            # - case 2): {"class": "ClassName", "module_path": "a.b.c"}
             m_path, cls = split_module_path(config[key])
             if m_path == "":
                 m_path = config.get("module_path", default_module)
             module = get_module_by_module_path(m_path)
 
+            # 2) get callable
+            _callable = getattr(module, cls)  # may raise AttributeError
+        else:
+            _callable = config[key]  # the class type itself is passed in
+        kwargs = config.get("kwargs", {})
+    elif isinstance(config, str):
+        # a.b.c.ClassName
+        m_path, cls = split_module_path(config)
+        module = get_module_by_module_path(default_module if m_path == "" else m_path)
+
+        _callable = getattr(module, cls)
+        kwargs = {}
+    else:
+        raise NotImplementedError(f"This type of input is not supported")
+    return _callable, kwargs
+
 def init_instance_by_config(config: InstConf, default_module=None, accept_types: Union[type, Tuple[type]] = (),
         try_kwargs: Dict = {}, **kwargs) -> Any:
     if isinstance(config, accept_types):
@@ -0,0 +1,281 @@
+"""
+Resampling related utils are compiled in this script
+
+Only the highest frequency (e.g. 1min) has to be stored on disk, the lower frequencies (e.g. 5min, 30min, day) are
+built from it. The bar boundaries are precomputed as index arrays, so the aggregation of each field is a single
+vectorized `ufunc.reduceat` call over all the bars (and all the instruments when a panel is given).
+"""
+
+import functools
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from qlib.config import C
+from qlib.constant import REG_CN
+from .time import Freq, get_min_cal_array, get_minute_of_day
+
+# the aggregation method of each field when building a lower frequency bar
+RESAM_AGG_METHOD = {
+    "$open": "first",
+    "$high": "max",
+    "$low": "min",
+    "$close": "last",
+    "$volume": "sum",
+    "$amount": "sum",
+    "$factor": "last",
+}
+
+
+def get_resam_freq(freq: Union[str, Freq], freq_list: Optional[List[Union[str, Freq]]] = None) -> Freq:
+    """
+    Get the stored frequency which `freq` should be resampled from
+
+    Parameters
+    ----------
+    freq : Union[str, Freq]
+        the target frequency, e.g. "5min", "day"
+    freq_list : List[Union[str, Freq]]
+        the stored frequencies, `Freq.SUPPORT_CAL_LIST` is used by default
+
+    Returns
+    -------
+    Freq:
+        the closest stored frequency which is higher than or equal to `freq`
+    """
+    freq_list = Freq.SUPPORT_CAL_LIST if freq_list is None else freq_list
+    _freq = Freq.get_recent_freq(freq, freq_list)
+    if _freq is None:
+        raise ValueError(f"{freq} can not be resampled from any of {freq_list}")
+    return Freq(_freq)
+
+
+@functools.lru_cache(maxsize=64)
+def get_session_bounds(region: str = REG_CN, shift: int = 0) -> np.ndarray:
+    """
+    Get the session layout of a trading day (e.g. CN has a lunch break)
+
+    Returns
+    -------
+    np.ndarray:
+        the start index of each session in `get_min_cal_array(shift, region)`, the length of the calendar is appended
+        e.g. [0, 120, 240] for REG_CN
+    """
+    minutes = get_min_cal_array(shift, region)
+    breaks = np.flatnonzero(np.diff(minutes) != 1) + 1
+    bounds = np.concatenate([[0], breaks, [len(minutes)]])
+    bounds.flags.writeable = False
+    return bounds
+
+
+@functools.lru_cache(maxsize=64)
+def get_in_day_bar_table(count: int, region: str = REG_CN, shift: int = 0) -> np.ndarray:
+    """
+    Get the lookup table from the minute of a day to the index of the `count`min bar in that day
+
+    A bar never crosses the boundary of a session, so the last bar of a session may be shorter than `count` minutes.
+
+    Returns
+    -------
+    np.ndarray:
+        table with 24 * 60 items, -1 for the minutes out of the trading time
+    """
+    minutes = get_min_cal_array(shift, region)
+    bounds = get_session_bounds(region, shift)
+    bar_idx = np.empty(len(minutes), dtype=np.int64)
+    n_bar = 0
+    for s, e in zip(bounds[:-1], bounds[1:]):
+        _idx = np.arange(e - s) // count
+        bar_idx[s:e] = _idx + n_bar
+        n_bar += _idx[-1] + 1
+    table = np.full(24 * 60, -1, dtype=np.int64)
+    table[minutes] = bar_idx
+    table.flags.writeable = False
+    return table
+
+
+def _to_minute_array(calendar) -> np.ndarray:
+    return pd.DatetimeIndex(calendar).values.astype("datetime64[m]")
+
+
+def _ordinal(key: np.ndarray) -> np.ndarray:
+    """the ordinal of each item in a sorted key array, e.g. [3, 3, 5, 8, 8] -> [0, 0, 1, 2, 2]"""
+    return np.concatenate([[0], np.cumsum(key[1:] != key[:-1])])
+
+
+def get_resam_bar_index(
+    calendar, freq_raw: Union[str, Freq], freq_sam: Union[str, Freq], region: str = REG_CN
+) -> np.ndarray:
+    """
+    Get the bar-boundary index array for resampling the data on `calendar` from `freq_raw` to `freq_sam`
+
+    Parameters
+    ----------
+    calendar : array-like of datetime
+        the sorted calendar of the raw data
+    freq_raw : Union[str, Freq]
+        frequency of the raw data
+    freq_sam : Union[str, Freq]
+        target frequency
+
+    Returns
+    -------
+    np.ndarray:
+        the position of the first raw bar of each resampled bar, it can be passed to `np.ufunc.reduceat` directly
+    """
+    freq_raw, freq_sam = Freq(freq_raw), Freq(freq_sam)
+    if Freq.get_min_delta(freq_sam, freq_raw) < 0:
+        raise ValueError(f"can not resample {freq_raw} to a higher frequency {freq_sam}")
+    cal = _to_minute_array(calendar)
+    if len(cal) == 0:
+        return np.array([], dtype=np.int64)
+    day = cal.astype("datetime64[D]")
+    if freq_sam.base == Freq.NORM_FREQ_MINUTE:
+        if freq_raw.base != Freq.NORM_FREQ_MINUTE or freq_sam.count % freq_raw.count != 0:
+            raise ValueError(f"can not resample {freq_raw} to {freq_sam}")
+        table = get_in_day_bar_table(freq_sam.count, region, C.get("min_data_shift", 0))
+        bar = table[get_minute_of_day(cal)]
+        if (bar < 0).any():
+            raise ValueError(f"the calendar contains timestamps out of the trading time of {region}")
+        key = day.astype(np.int64) * 24 * 60 + bar
+    elif freq_sam.base == Freq.NORM_FREQ_DAY:
+        key = _ordinal(day.astype(np.int64)) // freq_sam.count
+    elif freq_sam.base == Freq.NORM_FREQ_WEEK:
+        # 1970-01-01 is Thursday, shift 3 days to make the week start at Monday
+        key = _ordinal((day.astype(np.int64) + 3) // 7) // freq_sam.count
+    elif freq_sam.base == Freq.NORM_FREQ_MONTH:
+        key = _ordinal(cal.astype("datetime64[M]").astype(np.int64)) // freq_sam.count
+    else:
+        raise NotImplementedError(f"resampling to {freq_sam} is not supported")
+    return np.flatnonzero(np.concatenate([[True], key[1:] != key[:-1]]))
+
+
+def resam_calendar(calendar, bar_index: np.ndarray, freq_sam: Union[str, Freq]) -> np.ndarray:
+    """
+    Get the calendar of the resampled data; each bar is labeled by its first raw timestamp (and by its date for
+    the frequencies lower than minute)
+    """
+    cal = pd.DatetimeIndex(calendar)[bar_index]
+    if Freq(freq_sam).base != Freq.NORM_FREQ_MINUTE:
+        cal = cal.normalize()
+    return cal.values
+
+
+def resam_reduce(values: np.ndarray, bar_index: np.ndarray, method: str) -> np.ndarray:
+    """
+    Aggregate the raw bars into the resampled bars along axis 0
+
+    Parameters
+    ----------
+    values : np.ndarray
+        raw data with shape (time,) or (time, instrument); NaN is regarded as missing (e.g. suspended)
+    bar_index : np.ndarray
+        result of `get_resam_bar_index`
+    method : str
+        "first", "last", "max", "min", "sum" or "mean". A bar without any valid raw data is NaN
+
+    Returns
+    -------
+    np.ndarray:
+        the resampled data with shape (len(bar_index),) or (len(bar_index), instrument)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(bar_index) == 0:
+        return np.empty((0,) + values.shape[1:])
+    if method == "max":
+        return np.fmax.reduceat(values, bar_index, axis=0)
+    if method == "min":
+        return np.fmin.reduceat(values, bar_index, axis=0)
+
+    valid = ~np.isnan(values)
+    if method in ("first", "last"):
+        pos = np.arange(len(values)).reshape((-1,) + (1,) * (values.ndim - 1))
+        if method == "first":
+            pos = np.minimum.reduceat(np.where(valid, pos, len(values)), bar_index, axis=0)
+        else:
+            pos = np.maximum.reduceat(np.where(valid, pos, -1), bar_index, axis=0)
+        miss = (pos < 0) | (pos >= len(values))
+        res = np.take_along_axis(values, np.clip(pos, 0, len(values) - 1), axis=0)
+        res[miss] = np.nan
+        return res
+    if method in ("sum", "mean"):
+        res = np.add.reduceat(np.where(valid, values, 0.0), bar_index, axis=0)
+        cnt = np.add.reduceat(valid.astype(np.int64), bar_index, axis=0)
+        if method == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                res = res / cnt
+        res[cnt == 0] = np.nan
+        return res
+    raise ValueError(f"unsupported resample method: {method}")
+
+
+def resam_panel(
+    data: Dict[str, np.ndarray],
+    calendar,
+    freq_raw: Union[str, Freq],
+    freq_sam: Union[str, Freq],
+    region: str = REG_CN,
+    agg: Optional[Dict[str, str]] = None,
+):
+    """
+    Resample the (time x instrument) panel of each field
+
+    Parameters
+    ----------
+    data : Dict[str, np.ndarray]
+        field -> array with shape (time,) or (time, instrument) aligned to `calendar`
+    agg : Dict[str, str]
+        field -> aggregation method, `RESAM_AGG_METHOD` is used for the missing fields and "last" at last
+
+    Returns
+    -------
+    Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        the resampled calendar and the resampled data
+    """
+    agg = {**RESAM_AGG_METHOD, **(agg or {})}
+    bar_index = get_resam_bar_index(calendar, freq_raw, freq_sam, region)
+    res = {field: resam_reduce(values, bar_index, agg.get(field, "last")) for field, values in data.items()}
+    return resam_calendar(calendar, bar_index, freq_sam), res
+
+
+def resam_bars(
+    df: pd.DataFrame,
+    freq_raw: Union[str, Freq],
+    freq_sam: Union[str, Freq],
+    region: str = REG_CN,
+    agg: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """
+    Resample the bars in a DataFrame
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        the columns are fields (e.g. "$open", "$close"); the index is `datetime` or (`instrument`, `datetime`)
+        like the result of `D.features`
+
+    Returns
+    -------
+    pd.DataFrame:
+        the resampled bars with the same index levels as `df`
+    """
+    if isinstance(df.index, pd.MultiIndex):
+        inst_level, dt_level = df.index.names.index("instrument"), df.index.names.index("datetime")
+        panel = {field: df[field].unstack(level=inst_level).sort_index() for field in df.columns}
+        if not panel:
+            return df
+        _any = next(iter(panel.values()))
+        cal, res = resam_panel({k: v.values for k, v in panel.items()}, _any.index, freq_raw, freq_sam, region, agg)
+        res_df = pd.concat(
+            {
+                field: pd.DataFrame(values, index=pd.DatetimeIndex(cal, name="datetime"), columns=_any.columns).stack()
+                for field, values in res.items()
+            },
+            axis=1,
+        )
+        res_df = res_df.swaplevel().sort_index() if inst_level < dt_level else res_df.sort_index()
+        return res_df.dropna(how="all")
+    df = df.sort_index()
+    cal, res = resam_panel({field: df[field].values for field in df.columns}, df.index, freq_raw, freq_sam, region, agg)
+    return pd.DataFrame(res, index=pd.DatetimeIndex(cal, name=df.index.name), columns=df.columns)
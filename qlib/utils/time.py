@@ -2,12 +2,12 @@
 Time related utils are compiled in this script
 """
 
-import bisect
 from datetime import datetime, time, date, timedelta
 from typing import List, Optional, Tuple, Union
 import functools
 import re 
 
+import numpy as np
 import pandas as pd
 
 from qlib.config import C
@@ -23,48 +23,97 @@ CN_TIME = [
 US_TIME = [datetime.strptime("9:30", "%H:%M"), datetime.strptime("16:00", "%H:%M")]
 TW_TIME = [datetime.strptime("9:00", "%H:%M"), datetime.strptime("13:30", "%H:%M")]
 
+_REG_TIME = {REG_CN: CN_TIME, REG_US: US_TIME, REG_TW: TW_TIME}
+
+# the minutes of the last bar of each session, a bar starts from them can only contain a single value
+_REG_SESSION_LAST_MINUTE = {
+    REG_CN: (11 * 60 + 29, 14 * 60 + 59),
+    REG_TW: (13 * 60 + 25,),
+    REG_US: (15 * 60 + 59,),
+}
+
+
+def _to_minute(time_obj: Union[datetime, time]) -> int:
+    return time_obj.hour * 60 + time_obj.minute
+
+
 @functools.lru_cache(maxsize=240)
-def get_min_cal(shift: int = 0, region: str = REG_CN) -> List[time]:
-    cal = []
-
-    if region == REG_CN:
-        for ts in list(pd.date_range(CN_TIME[0], CN_TIME[1] - timedelta(minutes=1), freq="1min") - pd.Timedelta(minutes=shift)
-        )   + list(pd.date_range(CN_TIME[2], CN_TIME[3] - timedelta(minutes=1), freq="1min") - pd.Timedelta(minutes=shift)):
-            cal.append(ts.time())
-    elif region == REG_TW:
-        for ts in list(pd.date_range(TW_TIME[0], TW_TIME[1] - timedelta(minutes=1), freq="1min") - pd.Timedelta(minutes=shift)):
-            cal.append(ts.time())
-    elif region == REG_US:
-        for ts in list(pd.date_range(US_TIME[0], US_TIME[1] - timedelta(minutes=1), freq="1min") - pd.Timedelta(minutes=shift)):
-            cal.append(ts.time())
-    else:
+def get_min_cal_array(shift: int = 0, region: str = REG_CN) -> np.ndarray:
+    """
+    Get the minute calendar of a trading day as the minutes of the day, e.g. [570, 571, ...] for 9:30, 9:31 ...
+
+    The result is cached and read-only.
+    """
+    if region not in _REG_TIME:
         raise ValueError(f"{region} is not supported")
+    _time = _REG_TIME[region]
+    cal = np.concatenate(
+        [np.arange(_to_minute(_time[i]), _to_minute(_time[i + 1])) for i in range(0, len(_time), 2)]
+    )
+    cal = (cal - shift) % (24 * 60)
+    cal.flags.writeable = False
     return cal
 
+
+@functools.lru_cache(maxsize=240)
+def get_min_cal(shift: int = 0, region: str = REG_CN) -> List[time]:
+    return [time(m // 60, m % 60) for m in get_min_cal_array(shift, region)]
+
+
+@functools.lru_cache(maxsize=240)
+def get_day_index_table(region: str = REG_CN, shift: int = 0) -> np.ndarray:
+    """
+    Get the lookup table from the minute of a day to the index of the minute bar in the trading day
+
+    Returns
+    -------
+    np.ndarray:
+        table with 24 * 60 items, -1 for the minutes out of the trading time
+    """
+    cal = get_min_cal_array(shift, region)
+    table = np.full(24 * 60, -1, dtype=np.int64)
+    table[cal] = np.arange(len(cal))
+    table.flags.writeable = False
+    return table
+
+
+def get_minute_of_day(times) -> np.ndarray:
+    """Get the minute of the day for an array-like of timestamps"""
+    times = pd.DatetimeIndex(times).values.astype("datetime64[m]")
+    return (times - times.astype("datetime64[D]")).astype(np.int64)
+
+
 def is_single_value(start_time, end_time, freq, region: str = REG_CN):
-    if region == REG_CN:
-        if end_time - start_time < freq:
-            return True
-        if start_time.hour == 11 and start_time.minute == 29 and start_time.second == 0:
-            return True
-        if start_time.hour == 14 and start_time.minute == 59 and start_time.second == 0:
-            return True
-        return False
-    elif region == REG_TW:
-        if end_time - start_time < freq:
-            return True
-        if start_time.hour == 13 and start_time.minute == 25 and start_time.second == 0:
-            return True
-        return False
-    elif region == REG_US:
-        if end_time - start_time < freq:
-            return True
-        if start_time.hour == 15 and start_time.minute == 59 and start_time.second == 0:
-            return True
-        return False
-    else:
+    if region not in _REG_SESSION_LAST_MINUTE:
         raise NotImplementedError(f"please implement the is_single_value func for {region}")
-    
+    if end_time - start_time < freq:
+        return True
+    return start_time.second == 0 and _to_minute(start_time) in _REG_SESSION_LAST_MINUTE[region]
+
+
+def is_single_value_array(start_time, end_time, freq, region: str = REG_CN) -> np.ndarray:
+    """
+    Vectorized version of `is_single_value`
+
+    Parameters
+    ----------
+    start_time, end_time :
+        array-like of timestamps with the same length
+    freq :
+        the timedelta of a bar
+
+    Returns
+    -------
+    np.ndarray:
+        bool array
+    """
+    if region not in _REG_SESSION_LAST_MINUTE:
+        raise NotImplementedError(f"please implement the is_single_value func for {region}")
+    start_time, end_time = pd.DatetimeIndex(start_time), pd.DatetimeIndex(end_time)
+    res = np.asarray((end_time - start_time) < pd.Timedelta(freq))
+    at_last_bar = np.isin(get_minute_of_day(start_time), _REG_SESSION_LAST_MINUTE[region])
+    return res | (at_last_bar & (np.asarray(start_time.second) == 0))
+
 class Freq:
     NORM_FREQ_MONTH = "month"
     NORM_FREQ_WEEK = "week"
@@ -72,26 +121,77 @@ class Freq:
     NORM_FREQ_MINUTE = "min" # using min instead of minute for align Qlib's data filename
     SUPPORT_CAL_LIST = [NORM_FREQ_MINUTE, NORM_FREQ_DAY] # FIXME: this list should from data
 
-    def __init__(self, freq: Union[str, "Freq"]) -> None:
-        if isinstance(freq, str):
-            self.count, self.base = self.parse(freq)
-        elif isinstance(freq, Freq):
-            self.count, self.base = freq.count, freq.base
-        else:
+    __slots__ = ("count", "base", "minutes", "_name")
+
+    # interned instances, the key is the freq string or the normalized (count, base)
+    _interned = {}
+
+    def __new__(cls, freq: Union[str, "Freq"]) -> "Freq":
+        """
+        Freq is an immutable value type and the instances are interned,
+        so parsing the same string again just returns the cached instance
+
+        A Freq equals the strings of all its spellings (e.g. "day", "1d", "d"), but it has the hash of its
+        normalized string `str(freq)` (e.g. "day") only; so a set or a dict with `str` keys must use the normalized
+        strings, normalize them by `str(Freq(freq))`
+        """
+        if isinstance(freq, Freq):
+            return freq
+        if not isinstance(freq, str):
             raise NotImplementedError(f"This type of input is not supported")
-        
+        obj = cls._interned.get(freq)
+        if obj is None:
+            count, base = cls.parse(freq)
+            obj = cls._interned.get((count, base))
+            if obj is None:
+                obj = super().__new__(cls)
+                object.__setattr__(obj, "count", count)
+                object.__setattr__(obj, "base", base)
+                object.__setattr__(obj, "minutes", count * _FREQ_MINUTES[base])
+                # trying to align to the filename of Qlib: day, 30min, 5min, 1min...
+                object.__setattr__(obj, "_name", f"{count if count != 1 or base != 'day' else ''}{base}")
+                # `setdefault` is atomic, the threads creating the same freq get the same instance
+                obj = cls._interned.setdefault((count, base), obj)
+            obj = cls._interned.setdefault(freq, obj)
+        return obj
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self):
+        # make sure the unpickled instance is interned too
+        return self.__class__, (str(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
     def __eq__(self, freq):
-        freq = Freq(freq)
-        return self.count == freq.count and self.base == freq.base
-    
+        if self is freq:
+            return True
+        if isinstance(freq, str):
+            return (self.count, self.base) == Freq.parse(freq)
+        if isinstance(freq, Freq):
+            return self.count == freq.count and self.base == freq.base
+        return NotImplemented
+
+    def __hash__(self):
+        # the hash of the normalized string only, see `__new__`
+        return hash(self._name)
+
     def __str__(self):
-        # trying to align to the filename of Qlib: day, 30min, 5min, 1min...
-        return f"{self.count if self.count != 1 or self.base != 'day' else ''}{self.base}"
+        return self._name
     
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({str(self)})"
     
     @staticmethod
+    @functools.lru_cache(maxsize=256)
     def parse(freq: str) -> Tuple[int, str]:
         freq = freq.lower()
         match_obj = re.match("^([0-9]*)(month|mon|week|w|day|d|minute|min)$", freq)
@@ -125,17 +225,7 @@ class Freq:
         Returns
         -------
         """
-        minutes_map = {
-            Freq.NORM_FREQ_MINUTE: 1,
-            Freq.NORM_FREQ_DAY: 24 * 60,
-            Freq.NORM_FREQ_WEEK: 7 * 24 * 60,
-            Freq.NORM_FREQ_MONTH: 30 * 24 * 60,
-        }
-        left_freq = Freq(left_freq)
-        left_minutes = left_freq.count * minutes_map[left_freq.base]
-        right_freq = Freq(right_freq)
-        right_minutes = right_freq.count * minutes_map[right_freq.base]
-        return left_minutes - right_minutes
+        return Freq(left_freq).minutes - Freq(right_freq).minutes
     
     @staticmethod
     def get_recent_freq(base_freq: Union[str, "Freq"], freq_list: List[Union[str, "Freq"]]) -> Optional["Freq"]:
@@ -163,29 +253,44 @@ class Freq:
             min_freq = min_freq if min_freq[0] < _min_delta else (_min_delta, str(_freq))
         return min_freq[1] if min_freq else None
     
+_FREQ_MINUTES = {
+    Freq.NORM_FREQ_MINUTE: 1,
+    Freq.NORM_FREQ_DAY: 24 * 60,
+    Freq.NORM_FREQ_WEEK: 7 * 24 * 60,
+    Freq.NORM_FREQ_MONTH: 30 * 24 * 60,
+}
+
+
+@functools.lru_cache(maxsize=1440)
+def _parse_time(time_str: str) -> time:
+    return pd.Timestamp(time_str).time()
+
+
 def time_to_day_index(time_obj: Union[str, datetime], region: str = REG_CN):
     if isinstance(time_obj, str):
-        time_obj = datetime.strptime(time_obj, "%H:%M")
-    if region == REG_CN:
-        if CN_TIME[0] <= time_obj < CN_TIME[1]:
-            return int((time_obj - CN_TIME[0]).total_seconds() / 60)
-        elif CN_TIME[2] <= time_obj < CN_TIME[3]:
-            return int((time_obj - CN_TIME[2]).total_seconds() / 60) + 120
-        else:
-            raise ValueError(f"{time_obj} is not in the trading time")
-    elif region == REG_TW:
-        if TW_TIME[0] <= time_obj < TW_TIME[1]:
-            return int((time_obj - TW_TIME[0]).total_seconds() / 60)
-        else:
-            raise ValueError(f"{time_obj} is not in the trading time")
-    elif region == REG_US:
-        if US_TIME[0] <= time_obj < US_TIME[1]:
-            return int((time_obj - US_TIME[0]).total_seconds() / 60)
-        else:
-            raise ValueError(f"{time_obj} is not in the trading time")
-    else:
+        time_obj = _parse_time(time_obj)
+    if region not in _REG_TIME:
         raise ValueError(f"{region} is not supported")
-    
+    idx = get_day_index_table(region)[_to_minute(time_obj)]
+    if idx < 0:
+        raise ValueError(f"{time_obj} is not in the trading time")
+    return int(idx)
+
+
+def time_to_day_index_array(times, region: str = REG_CN) -> np.ndarray:
+    """
+    Vectorized version of `time_to_day_index`
+
+    Returns
+    -------
+    np.ndarray:
+        the index of each timestamp in the trading day, -1 for the timestamps out of the trading time
+    """
+    if region not in _REG_TIME:
+        raise ValueError(f"{region} is not supported")
+    return get_day_index_table(region)[get_minute_of_day(times)]
+
+
 def get_day_min_idx_range(start: str, end: str, freq: str, region: str) -> Tuple[int, int]:
     """
     get the min-bar index in a day for a time range (both left and right is closed) given a fixed frequency
@@ -201,13 +306,18 @@ def get_day_min_idx_range(start: str, end: str, freq: str, region: str) -> Tuple
     Tuple[int, int]:
         The index of start and end in the calendar. Both left and right are **closed**.
     """
-    start = pd.Timestamp(start).time()
-    end = pd.Timestamp(end).time()
-    freq = Freq(freq)
-    in_day_cal = get_min_cal(region=region)[:: freq.count]
-    left_idx = bisect.bisect_left(in_day_cal, start)
-    right_idx = bisect.bisect_right(in_day_cal, end) - 1
-    return left_idx, right_idx
+    return _get_day_min_idx_range(str(start), str(end), str(Freq(freq)), region)
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_day_min_idx_range(start: str, end: str, freq: str, region: str) -> Tuple[int, int]:
+    start, end = _parse_time(start), _parse_time(end)
+    # compare in seconds to keep the same behaviour as comparing `time` objects
+    in_day_cal = get_min_cal_array(region=region)[:: Freq(freq).count] * 60
+    left_idx = np.searchsorted(in_day_cal, start.hour * 3600 + start.minute * 60 + start.second, side="left")
+    right_idx = np.searchsorted(in_day_cal, end.hour * 3600 + end.minute * 60 + end.second, side="right") - 1
+    return int(left_idx), int(right_idx)
+
 
 def concat_date_time(date_obj: date, time_obj: time) -> pd.Timestamp:
     return pd.Timestamp(
@@ -223,3 +333,30 @@ def concat_date_time(date_obj: date, time_obj: time) -> pd.Timestamp:
     )
 
 
+
+
+def epsilon_change(date_time: pd.Timestamp, direction: str = "backward") -> pd.Timestamp:
+    """
+    change the time by infinitely small quantity.
+
+
+    Parameters
+    ----------
+    date_time : pd.Timestamp
+        the original time
+    direction : str
+        the time are going to
+        - "backward" for going to history
+        - "forward" for going to the future
+
+    Returns
+    -------
+    pd.Timestamp:
+        the shifted time
+    """
+    if direction == "backward":
+        return date_time - pd.Timedelta(seconds=1)
+    elif direction == "forward":
+        return date_time + pd.Timedelta(seconds=1)
+    else:
+        raise ValueError("Wrong input")
@@ -1,6 +1,9 @@
-from cryptography.fernet import Fernet 
-from pathlib import Path
-import datetime
+from cryptography.fernet import Fernet
+from pathlib import Path, PurePosixPath
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+import hashlib
+import json
 import os
 import requests
 import logging
@@ -8,81 +11,329 @@ import zipfile
 import sys
 import shutil
 import re
+import uuid
 import qlib
 
 from tqdm import tqdm
 
 from qlib.log import get_module_logger
 from qlib.config import C
-from qlib.utils import exists_qlib_data
+from qlib.utils import exists_qlib_data, write_data_manifest
 
 
 logger = get_module_logger("GetData", logging.INFO)
 
 class GetData:
+    """
+    Download and install the qlib dataset
+
+    - the zip file is downloaded by chunks (HTTP range requests) in parallel; the finished chunks are recorded in a
+      progress file beside the partial download, so an interrupted download resumes from the missing chunks
+    - the zip file is verified by its sha256 checksum if the checksum is given or published beside the zip file
+    - the members are extracted in parallel into a staging directory in `target_dir`, then the staged directories
+      are moved into `target_dir` by renaming, so the old data is never mixed with a partially extracted dataset
+    - the manifest of the installed data is written at last
+    """
+
     REMOTE_URL = "https://qlibpublic.blob.core.windows.net/data/default/stock_data"
     # "?" is not included in the token.
     TOKEN = b"gAAAAABkmDhojHc0VSCDdNK1MqmRzNLeDFXe5hy8obHpa6SDQh4de6nW5gtzuD-fa6O_WZb0yyqYOL7ndOfJX_751W3xN5YB4-n-P22jK-t6ucoZqhT70KPD0Lf0_P328QPJVZ1gDnjIdjhi2YLOcP4BFTHLNYO0mvzszR8TKm9iT5AKRvuysWnpi8bbYwGU9zAcJK3x9EPL43hOGtxliFHcPNGMBoJW4g_ercdhi0-Qgv5_JLsV-29_MV-_AhuaYvJuN2dEywBy"
     KEY = "EYcA8cgorA8X9OhyMwVfuFxn_1W3jGk6jCbs3L2oPoA="
 
-    def __init__(self, delete_zip_file=False):
-        self.delete_zip_file = delete_zip_file 
+    QLIB_DATA_DIRS = ["features", "calendars", "instruments", "feature_cache", "dataset_cache"]
+    PART_SUFFIX = ".part"
+    PROGRESS_SUFFIX = ".progress.json"
+    CHECKSUM_SUFFIX = ".sha256"
+
+    def __init__(
+        self, delete_zip_file=False, n_jobs: int = 8, chunk_size: int = 16 * 1024 * 1024, max_retries: int = 3
+    ):
+        """
+        Parameters
+        ----------
+        delete_zip_file : bool
+            delete the zip file after it is installed
+        n_jobs : int
+            the number of the threads to download the chunks and to extract the members
+        chunk_size : int
+            the size of each range request in bytes
+        max_retries : int
+            the times to request a chunk before giving up; the finished chunks are kept for resuming
+        """
+        self.delete_zip_file = delete_zip_file
+        self.n_jobs = max(n_jobs, 1)
+        self.chunk_size = chunk_size
+        self.max_retries = max(max_retries, 1)
 
     def merge_remote_url(self, file_name: str):
         fernet = Fernet(self.KEY)
         token = fernet.decrypt(self.TOKEN).decode()
         return f"{self.REMOTE_URL}/{file_name}?{token}"
-    
-    def download_data(self, file_name: str, target_dir: [Path, str], delete_old: bool = True):
+
+    def download_data(
+        self, file_name: str, target_dir: [Path, str], delete_old: bool = True, checksum: Optional[str] = None
+    ):
+        """
+        Parameters
+        ----------
+        checksum : str, optional
+            the sha256 of the zip file; the checksum published at `<file_name>.sha256` is used if it is None, and the
+            verification is skipped if it is not published either
+        """
         target_dir = Path(target_dir).expanduser()
         target_dir.mkdir(parents=True, exist_ok=True)
-        _target_file_name = datetime.now().strftime("%Y%m%d%H%M%S") + "_" + os.path.basename(file_name)
-        target_path = target_dir.joinpath(_target_file_name)
+        # a stable name is used, so the download can be resumed
+        target_path = target_dir.joinpath(os.path.basename(file_name))
 
         url = self.merge_remote_url(file_name)
-        resp = requests.get(url, stream=True, timeout=60)
-        resp.raise_for_status()
-        if resp.status_code != 200:
-            raise requests.exceptions.HTTPError()
-        
-        chunk_size = 1024
         logger.warning(f"The data for the example is collected from Yahoo Finance. Please be aware be aware that the quality of the data might not be perfect.")
         logger.info(f"{os.path.basename(file_name)} is downloading...")
-        with tqdm(total=int(resp.headers.get("content-length", 0))) as p_bar:
-            with open(target_path, "wb") as f:
-                for chunk in resp.iter_content(chunk_size=chunk_size):
-                    f.write(chunk)
-                    p_bar.update(chunk_size)
-        
+        self._download(url, target_path)
+
+        if checksum is None:
+            checksum = self._get_remote_checksum(file_name)
+        if checksum is None:
+            logger.warning(f"no checksum is published for {file_name}, the verification is skipped")
+        else:
+            actual = self._sha256(target_path)
+            if actual != checksum.lower():
+                target_path.unlink()
+                raise ValueError(f"the checksum of {file_name} is {actual} instead of {checksum}, please retry")
+
         self._unzip(target_path, target_dir, delete_old)
         if self.delete_zip_file:
             target_path.unlink()
-    
+
     def check_dataset(self, file_name: str):
         url = self.merge_remote_url(file_name)
         resp = requests.get(url, stream=True, timeout=60)
         status = True
         if resp.status_code == 404:
             status = False
+        resp.close()
         return status
 
+    def _get_remote_checksum(self, file_name: str) -> Optional[str]:
+        resp = requests.get(self.merge_remote_url(file_name + self.CHECKSUM_SUFFIX), timeout=60)
+        if resp.status_code != 200:
+            return None
+        return resp.text.split()[0].lower() if resp.text.strip() else None
+
     @staticmethod
-    def _unzip(file_path: Path, target_dir: Path, delete_old: bool = True):
-        if delete_old:
-            logger.warning(f"will delete the old qlib data directory(features, instruments, calendars, feature_cache, dataset_cache): {target_dir}")
-            GetData._delete_qlib_data(target_dir)
-        logger.info(f"{file_path} unzipping...  ")
+    def _sha256(file_path: Path) -> str:
+        sha = hashlib.sha256()
+        with file_path.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    ####################### download ######################
+    def _download(self, url: str, target_path: Path):
+        part_path = target_path.with_name(target_path.name + self.PART_SUFFIX)
+        progress_path = target_path.with_name(target_path.name + self.PROGRESS_SUFFIX)
+
+        resp = requests.head(url, timeout=60, allow_redirects=True)
+        resp.raise_for_status()
+        size = int(resp.headers.get("content-length", 0))
+        # the partial download is only resumed if the remote file is not changed
+        version = resp.headers.get("etag", resp.headers.get("last-modified", ""))
+        if size > 0 and resp.headers.get("accept-ranges", "").lower() == "bytes":
+            self._download_by_chunks(url, part_path, progress_path, size, version)
+        else:
+            self._download_stream(url, part_path)
+        os.replace(part_path, target_path)
+        if progress_path.exists():
+            progress_path.unlink()
+
+    def _load_progress(self, part_path: Path, progress_path: Path, size: int, version: str) -> set:
+        if part_path.exists() and progress_path.exists():
+            progress = json.loads(progress_path.read_text())
+            if (progress["size"], progress["version"], progress["chunk_size"]) == (size, version, self.chunk_size):
+                return set(progress["done"])
+        with part_path.open("wb") as f:
+            f.truncate(size)
+        return set()
+
+    def _save_progress(self, progress_path: Path, size: int, version: str, done: set):
+        tmp_path = progress_path.with_name(f".{progress_path.name}.{uuid.uuid4().hex}")
+        tmp_path.write_text(
+            json.dumps({"size": size, "version": version, "chunk_size": self.chunk_size, "done": sorted(done)})
+        )
+        os.replace(tmp_path, progress_path)
+
+    def _download_by_chunks(self, url: str, part_path: Path, progress_path: Path, size: int, version: str):
+        n_chunks = (size + self.chunk_size - 1) // self.chunk_size
+        done = self._load_progress(part_path, progress_path, size, version)
+        todo = [i for i in range(n_chunks) if i not in done]
+        if done:
+            logger.info(f"resume downloading: {len(done)}/{n_chunks} chunks are downloaded")
+
+        initial = size - sum(self._chunk_len(i, size) for i in todo)
+        with tqdm(total=size, initial=initial, unit="B", unit_scale=True) as p_bar:
+            with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+                futures = {executor.submit(self._download_chunk, url, part_path, i, size): i for i in todo}
+                try:
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        future.result()
+                        done.add(i)
+                        self._save_progress(progress_path, size, version, done)
+                        p_bar.update(self._chunk_len(i, size))
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+    def _chunk_len(self, i: int, size: int) -> int:
+        return min(self.chunk_size, size - i * self.chunk_size)
+
+    def _download_chunk(self, url: str, part_path: Path, i: int, size: int):
+        start = i * self.chunk_size
+        end = start + self._chunk_len(i, size) - 1
+        for retry in range(self.max_retries):
+            try:
+                resp = requests.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=60)
+                resp.raise_for_status()
+                if resp.status_code != 206:
+                    raise requests.exceptions.HTTPError(f"the range request is not supported by {url}")
+                written = 0
+                with part_path.open("r+b") as f:
+                    f.seek(start)
+                    for chunk in resp.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                        written += len(chunk)
+                if written != end - start + 1:
+                    raise requests.exceptions.ChunkedEncodingError(f"chunk {i} is incomplete")
+                return
+            except requests.exceptions.RequestException as e:
+                if retry == self.max_retries - 1:
+                    raise
+                logger.warning(f"failed to download chunk {i}, retry: {e}")
+
+    def _download_stream(self, url: str, part_path: Path):
+        # the server doesn't support range requests, so the file can't be resumed or split
+        resp = requests.get(url, stream=True, timeout=60)
+        resp.raise_for_status()
+        with tqdm(total=int(resp.headers.get("content-length", 0)), unit="B", unit_scale=True) as p_bar:
+            with part_path.open("wb") as f:
+                for chunk in resp.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+                    p_bar.update(len(chunk))
+
+    ####################### install ######################
+    def _unzip(self, file_path: Path, target_dir: Path, delete_old: bool = True):
+        staging_dir = target_dir.joinpath(f".staging_{uuid.uuid4().hex}")
+        staging_dir.mkdir()
+        try:
+            logger.info(f"{file_path} unzipping...  ")
+            self._extract(file_path, staging_dir)
+            if delete_old:
+                rm_dirs = [target_dir.joinpath(_name) for _name in self.QLIB_DATA_DIRS]
+                GetData._confirm_delete([_p for _p in rm_dirs if _p.exists()], target_dir)
+            self._swap(staging_dir, target_dir, delete_old)
+            # the manifest makes checking the data cheap, please refer to `exists_qlib_data`
+            write_data_manifest(target_dir)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def _extract(self, file_path: Path, staging_dir: Path):
         with zipfile.ZipFile(str(file_path.resolve()), "r") as zp:
-            for _file in tqdm(zp.namelist()):
-                zp.extract(_file, str(target_dir.resolve()))
-    
+            members = [info for info in zp.infolist() if not info.is_dir()]
+        # balance the uncompressed size of the threads
+        groups: List[List[zipfile.ZipInfo]] = [[] for _ in range(min(self.n_jobs, max(len(members), 1)))]
+        sizes = [0] * len(groups)
+        for info in sorted(members, key=lambda info: -info.file_size):
+            i = sizes.index(min(sizes))
+            groups[i].append(info)
+            sizes[i] += info.file_size
+        # `ZipFile.extract` creates the parent directories with a check-then-create, which races between the threads
+        parents = set()
+        for info in members:
+            parts = PurePosixPath(info.filename.replace("\\", "/")).parent.parts
+            parents.add(staging_dir.joinpath(*[part for part in parts if part not in ("", "/", ".", "..")]))
+        for _dir in sorted(parents):
+            _dir.mkdir(parents=True, exist_ok=True)
+
+        with tqdm(total=len(members)) as p_bar:
+
+            def _extract_group(group: List[zipfile.ZipInfo]):
+                # each thread has its own handle of the zip file; the CRC of each member is checked on reading
+                with zipfile.ZipFile(str(file_path.resolve()), "r") as zp:
+                    for info in group:
+                        zp.extract(info, str(staging_dir))
+                        p_bar.update(1)
+
+            with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+                list(executor.map(_extract_group, groups))
+
+    def _swap(self, staging_dir: Path, target_dir: Path, delete_old: bool):
+        """move the staged data into `target_dir`, the replaced data is restored if any renaming fails"""
+        backup_dir = target_dir.joinpath(f".old_{uuid.uuid4().hex}")
+        backup_dir.mkdir()
+        moved_old, moved_new = [], []
+        # the merged files and directories, with the backups of the replaced files
+        merged: List[Tuple[Path, Optional[Path]]] = []
+        try:
+            if delete_old:
+                for _name in self.QLIB_DATA_DIRS:
+                    if target_dir.joinpath(_name).exists():
+                        os.replace(target_dir.joinpath(_name), backup_dir.joinpath(_name))
+                        moved_old.append(_name)
+            for _p in staging_dir.iterdir():
+                dst = target_dir.joinpath(_p.name)
+                if dst.exists():
+                    if _p.is_dir() and dst.is_dir():
+                        self._merge_dir(_p, dst, backup_dir.joinpath(_p.name), merged)
+                        continue
+                    os.replace(dst, backup_dir.joinpath(_p.name))
+                    moved_old.append(_p.name)
+                os.replace(_p, dst)
+                moved_new.append(_p.name)
+        except BaseException:
+            logger.error(f"failed to install the data into {target_dir}, the old data is restored")
+            for _p, _backup in reversed(merged):
+                if _p.is_dir():
+                    _p.rmdir()
+                elif _p.exists():
+                    _p.unlink()
+                if _backup is not None:
+                    os.replace(_backup, _p)
+            for _name in moved_new:
+                _p = target_dir.joinpath(_name)
+                shutil.rmtree(_p) if _p.is_dir() else _p.unlink()
+            for _name in moved_old:
+                os.replace(backup_dir.joinpath(_name), target_dir.joinpath(_name))
+            raise
+        finally:
+            shutil.rmtree(backup_dir, ignore_errors=True)
+        for _name in moved_old:
+            logger.warning(f"delete: {target_dir.joinpath(_name)}")
+
+    @staticmethod
+    def _merge_dir(src: Path, dst: Path, backup_dir: Path, merged: List[Tuple[Path, Optional[Path]]]):
+        """
+        merge the staged directory into the existing one, each file is replaced atomically
+
+        The replaced files are moved to `backup_dir`. The created directories and the merged files are appended to
+        `merged` with their backups (None for the new ones) before they are changed, so `_swap` can undo the merge.
+        """
+        for root, _, files in os.walk(src):
+            _rel = Path(root).relative_to(src)
+            _dst_root = dst.joinpath(_rel)
+            if not _dst_root.exists():
+                merged.append((_dst_root, None))
+                _dst_root.mkdir()
+            for _file in files:
+                _dst, _backup = _dst_root.joinpath(_file), None
+                if _dst.exists():
+                    _backup = backup_dir.joinpath(_rel, _file)
+                    _backup.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(_dst, _backup)
+                merged.append((_dst, _backup))
+                os.replace(os.path.join(root, _file), _dst)
+
     @staticmethod
-    def _delete_qlib_data(file_dir: Path):
-        rm_dirs = []
-        for _name in ["features", "calendars", "instruments", "feature_cache", "dataset_cache"]:
-            _p = file_dir.joinpath(_name)
-            if _p.exists():
-                rm_dirs.append(_p)
+    def _confirm_delete(rm_dirs: List[Path], file_dir: Path):
         if rm_dirs:
             flag = input(
                 f"Will be deleted: "
@@ -92,10 +343,7 @@ class GetData:
             )
             if str(flag) not in ["Y", "y"]:
                 sys.exit()
-            for _p in rm_dirs:
-                logger.warning(f"delete: {_p}")
-                shutil.rmtree(_p)
-    
+
     def qlib_data(
             self,
             name="qlib_data",
@@ -118,9 +366,8 @@ class GetData:
             dataset_version = "v2" if dataset_version is None else dataset_version
             file_name_with_version = f"{dataset_version}/{name}_{region.lower()}_{interval.lower()}_{qlib_version}.zip"
             return file_name_with_version
-        
+
         file_name = _get_file_name_with_version(qlib_version, dataset_version=version)
         if not self.check_dataset(file_name):
             file_name = _get_file_name_with_version("latest", dataset_version=version)
         self.download_data(file_name.lower(), target_dir, delete_old)
-
@@ -0,0 +1,67 @@
+"""
+Measure the startup time of qlib
+
+It runs `python -X importtime -c "import qlib; qlib.init(...)"` in fresh processes and reports the wall time and the
+modules with the largest cumulative import time.
+
+Usage:
+    python -m tests.import_time_bench --provider_uri ~/.qlib/qlib_data/cn_data --repeat 5 --top 15
+"""
+import argparse
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_IMPORT_TIME_LINE = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+def parse_import_time(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """{module: (self time in us, cumulative time in us)} from the output of `-X importtime`"""
+    res = {}
+    for line in stderr.splitlines():
+        m = _IMPORT_TIME_LINE.match(line)
+        if m is not None:
+            res[m.group(4)] = int(m.group(1)), int(m.group(2))
+    return res
+
+
+def run_once(provider_uri: str, init: bool = True) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    code = "import qlib"
+    if init:
+        code += f"; qlib.init(provider_uri={provider_uri!r})"
+    start = time.perf_counter()
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return time.perf_counter() - start, parse_import_time(res.stderr)
+
+
+def main(args: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider_uri", default=None, help="a temporary empty directory by default")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--no_init", action="store_true", help="only `import qlib`")
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        provider_uri = tmp_dir if args.provider_uri is None else args.provider_uri
+        runs = [run_once(provider_uri, init=not args.no_init) for _ in range(args.repeat)]
+
+    walls = sorted(wall for wall, _ in runs)
+    print(f"wall time of {args.repeat} runs: min {walls[0]:.3f}s, median {walls[len(walls) // 2]:.3f}s")
+    # the cumulative import time of the top level modules of the fastest run
+    _, modules = min(runs, key=lambda run: run[0])
+    print(f"{'module':<50}{'self(ms)':>12}{'cumulative(ms)':>16}")
+    for name, (self_us, cum_us) in sorted(modules.items(), key=lambda item: -item[1][1])[: args.top]:
+        print(f"{name:<50}{self_us / 1000:>12.1f}{cum_us / 1000:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
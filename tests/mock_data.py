@@ -0,0 +1,61 @@
+"""
+Generate a small qlib-format dataset on disk for the tests
+
+    <qlib_dir>/calendars/<freq>.txt
+    <qlib_dir>/instruments/all.txt
+    <qlib_dir>/features/<instrument>/<field>.<freq>.bin
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from qlib.constant import REG_CN
+from qlib.utils.time import get_min_cal, concat_date_time
+
+MOCK_FIELDS = ["open", "high", "low", "close", "volume", "factor"]
+
+
+def mock_calendar(start_time="2020-01-02", end_time="2020-03-31", freq="day", region=REG_CN) -> pd.DatetimeIndex:
+    days = pd.bdate_range(start_time, end_time)
+    if freq == "day":
+        return days
+    return pd.DatetimeIndex([concat_date_time(d.date(), t) for d in days for t in get_min_cal(region=region)])
+
+
+def mock_features(calendar: pd.DatetimeIndex, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.RandomState(seed)
+    close = 10 * np.exp(np.cumsum(rng.randn(len(calendar)) * 0.01))
+    return pd.DataFrame(
+        {
+            "open": close * (1 + rng.randn(len(calendar)) * 0.001),
+            "high": close * 1.01,
+            "low": close * 0.99,
+            "close": close,
+            "volume": rng.randint(1000, 10000, len(calendar)).astype(float) * 100,
+            "factor": np.ones(len(calendar)),
+        },
+        index=calendar,
+    )
+
+
+def dump_mock_data(qlib_dir, instruments=("SH600000", "SH600001", "SH600002", "SH000300"), freq="day", **kwargs):
+    """dump the mock data and return the calendar and the features of each instrument"""
+    qlib_dir = Path(qlib_dir)
+    calendar = mock_calendar(freq=freq, **kwargs)
+    for _dir in ["calendars", "instruments", "features"]:
+        qlib_dir.joinpath(_dir).mkdir(parents=True, exist_ok=True)
+    fmt = "%Y-%m-%d" if freq == "day" else "%Y-%m-%d %H:%M:%S"
+    qlib_dir.joinpath("calendars", f"{freq}.txt").write_text("\n".join(calendar.strftime(fmt)) + "\n")
+    qlib_dir.joinpath("instruments", "all.txt").write_text(
+        "".join(f"{inst}\t{calendar[0]:%Y-%m-%d}\t{calendar[-1]:%Y-%m-%d}\n" for inst in instruments)
+    )
+    data = {}
+    for i, inst in enumerate(instruments):
+        df = mock_features(calendar, seed=i)
+        inst_dir = qlib_dir.joinpath("features", inst.lower())
+        inst_dir.mkdir(parents=True, exist_ok=True)
+        for field in df.columns:
+            np.hstack([0, df[field].values]).astype("<f").tofile(inst_dir.joinpath(f"{field}.{freq}.bin"))
+        data[inst] = df
+    return calendar, data
@@ -0,0 +1,531 @@
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.backtest import (
+    backtest,
+    backtest_loop,
+    backtest_sweep,
+    collect_data_loop,
+    get_exchange,
+    get_strategy_executor,
+)
+from qlib.backtest.account import Account
+from qlib.backtest.decision import EmptyTradeDecision, Order, OrderDir, TradeDecisionWO, TradeRangeByTime
+from qlib.backtest.position import Position
+from qlib.backtest import report
+from qlib.backtest.report import PortfolioMetrics, load_benchmark_return
+from qlib.backtest.utils import TradeCalendarManager
+from qlib.strategy.base import BaseStrategy
+
+from .mock_data import dump_mock_data
+
+
+class DailyStrategy(BaseStrategy):
+    """buy the stocks on the first day and sell them on the last day"""
+
+    def __init__(self, stock_ids, amount, **kwargs):
+        super().__init__(**kwargs)
+        self.stock_ids = stock_ids
+        self.amount = amount
+
+    def generate_trade_decision(self, execute_result=None):
+        step = self.trade_calendar.get_trade_step()
+        start_time, end_time = self.trade_calendar.get_step_time()
+        if step == 0:
+            direction = OrderDir.BUY
+        elif step == self.trade_calendar.get_trade_len() - 1:
+            direction = OrderDir.SELL
+        else:
+            return EmptyTradeDecision(self)
+        orders = [Order(code, self.amount, direction, start_time, end_time) for code in self.stock_ids]
+        return TradeDecisionWO(orders, self)
+
+
+class FirstBarStrategy(BaseStrategy):
+    """deal all the outer orders in the first inner bar"""
+
+    def generate_trade_decision(self, execute_result=None):
+        if self.trade_calendar.get_trade_step() != 0:
+            return EmptyTradeDecision(self)
+        start_time, end_time = self.trade_calendar.get_step_time()
+        orders = [
+            Order(order.stock_id, order.amount, order.direction, start_time, end_time)
+            for order in self.outer_trade_decision.get_decision()
+        ]
+        return TradeDecisionWO(orders, self)
+
+
+class TestBacktest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.qlib_dir = Path(tempfile.mkdtemp())
+        cls.calendar, cls.data = dump_mock_data(cls.qlib_dir)
+        cls.min_calendar, cls.min_data = dump_mock_data(
+            cls.qlib_dir, freq="1min", start_time="2020-02-03", end_time="2020-02-14"
+        )
+        qlib.init(provider_uri=str(cls.qlib_dir), kernels=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.qlib_dir, ignore_errors=True)
+
+    def test_step(self):
+        cal = TradeCalendarManager("day", start_time="2020-02-03", end_time="2020-02-07")
+        self.assertEqual(cal.get_trade_len(), 5)
+        steps = []
+        while not cal.finished():
+            steps.append(cal.get_step_time())
+            cal.step()
+        self.assertEqual([s for s, _ in steps], list(pd.bdate_range("2020-02-03", "2020-02-07")))
+        self.assertEqual(steps[0][1], pd.Timestamp("2020-02-03 23:59:59"))
+        with self.assertRaises(RuntimeError):
+            cal.step()
+
+    def test_range_idx(self):
+        cal = TradeCalendarManager("day", start_time="2020-02-03", end_time="2020-02-07")
+        self.assertEqual(cal.get_range_idx(pd.Timestamp("2020-02-04"), pd.Timestamp("2020-02-06")), (1, 3))
+        # both sides are clipped into the calendar
+        self.assertEqual(cal.get_range_idx(pd.Timestamp("2020-01-01"), pd.Timestamp("2020-01-02")), (0, 0))
+        self.assertEqual(cal.get_range_idx(pd.Timestamp("2020-03-01"), pd.Timestamp("2020-03-02")), (4, 4))
+        self.assertEqual(cal.get_range_idx(pd.Timestamp("2020-01-01"), pd.Timestamp("2020-03-02")), (0, 4))
+        self.assertEqual(cal.get_step_time(4), (pd.Timestamp("2020-02-07"), pd.Timestamp("2020-02-09 23:59:59")))
+
+    def test_order(self):
+        order = Order("SH600000", 100.0, OrderDir.SELL, pd.Timestamp("2020-02-03"), pd.Timestamp("2020-02-03"))
+        self.assertEqual(order.amount_delta, -100.0)
+        self.assertEqual(Order.parse_dir("buy"), OrderDir.BUY)
+        self.assertEqual(TradeRangeByTime("10:00", "11:00").start_time.hour, 10)
+
+    def test_account_fill_stock_value(self):
+        account = Account(
+            init_cash=1e6,
+            position_dict={"SH600000": 100, "SH600001": {"amount": 200, "price": 1.0}},
+            benchmark_config={"start_time": "2020-02-04"},
+        )
+        position = account.current_position
+        close = self.data["SH600000"]["close"]
+        self.assertAlmostEqual(position.get_stock_price("SH600000"), close.loc["2020-02-04"], places=4)
+        self.assertAlmostEqual(position.get_stock_price("SH600001"), 1.0)
+        value = 1e6 + 200 + 100 * close.loc["2020-02-04"]
+        self.assertAlmostEqual(position.position["now_account_value"], value, places=2)
+
+    def test_exchange(self):
+        exchange = get_exchange(freq="day", start_time="2020-02-03", end_time="2020-02-14", limit_threshold=0.095)
+        close = self.data["SH600000"]["close"]
+        start, end = pd.Timestamp("2020-02-04"), pd.Timestamp("2020-02-04 23:59:59")
+        self.assertAlmostEqual(exchange.get_close("SH600000", start, end), close.loc["2020-02-04"], places=4)
+        np.testing.assert_allclose(
+            exchange.get_close_array(["SH600001", "SH999999", "SH600000"], start, end),
+            [self.data["SH600001"]["close"].loc["2020-02-04"], np.nan, close.loc["2020-02-04"]],
+            rtol=1e-6,
+        )
+        self.assertTrue(exchange.check_stock_suspended("SH999999", start, end))
+        self.assertTrue(exchange.is_stock_tradable("SH600000", start, end))
+
+        position = Position(cash=1e6)
+        orders = [
+            Order("SH600000", 1050.0, OrderDir.BUY, start, end),
+            Order("SH999999", 100.0, OrderDir.BUY, start, end),
+            Order("SH600001", 1e8, OrderDir.BUY, start, end),
+        ]
+        (val0, cost0, price0), (val1, _, _), (val2, cost2, _) = exchange.deal_orders(orders, position=position)
+        # rounded by the trade unit
+        self.assertEqual(orders[0].deal_amount, 1000.0)
+        self.assertAlmostEqual(val0, 1000.0 * price0)
+        self.assertAlmostEqual(cost0, max(val0 * 0.0015, 5.0))
+        # not tradable
+        self.assertEqual(val1, 0.0)
+        # clipped by the cash
+        self.assertLess(orders[2].deal_amount, 1e8)
+        self.assertGreaterEqual(position.get_cash(), 0)
+        self.assertAlmostEqual(position.get_cash(), 1e6 - val0 - cost0 - val2 - cost2)
+
+        exchange = get_exchange(
+            freq="day", start_time="2020-02-03", end_time="2020-02-14", limit_threshold=None, volume_threshold=0.01
+        )
+        order = Order("SH600000", 1e8, OrderDir.BUY, start, end)
+        exchange.deal_order(order, dealt_order_amount={"SH600000": 100.0})
+        volume = self.data["SH600000"]["volume"].loc["2020-02-04"]
+        self.assertAlmostEqual(order.deal_amount, (volume * 0.01 - 100.0) // 100 * 100)
+
+        # the orders of the same stock in a step share the volume limitation, like the orders dealt one by one
+        orders = [Order("SH600000", 1e8, OrderDir.BUY, start, end) for _ in range(2)]
+        serial = [Order("SH600000", 1e8, OrderDir.BUY, start, end) for _ in range(2)]
+        results = exchange.deal_orders(orders, position=Position(cash=1e9), dealt_order_amount={"SH600000": 100.0})
+        position, dealt = Position(cash=1e9), {"SH600000": 100.0}
+        for order in serial:
+            exchange.deal_orders([order], position=position, dealt_order_amount=dealt)
+            dealt["SH600000"] += order.deal_amount
+        self.assertEqual([o.deal_amount for o in orders], [o.deal_amount for o in serial])
+        self.assertLessEqual(sum(o.deal_amount for o in orders), volume * 0.01 - 100.0)
+        self.assertEqual(orders[1].deal_amount, 0.0)
+        self.assertEqual(results[1], (0.0, 0.0, results[0][2]))
+
+        # the invalid deal prices fall back to the close price in both the single and the batch paths
+        exchange = get_exchange(
+            freq="day", start_time="2020-02-03", end_time="2020-02-14", limit_threshold=None, deal_price="$open * 0"
+        )
+        price = exchange.get_deal_price("SH600000", start, end, OrderDir.BUY)
+        self.assertAlmostEqual(price, close.loc["2020-02-04"], places=4)
+        orders = [Order(code, 100.0, OrderDir.BUY, start, end) for code in ["SH600000", "SH999999", "SH600001"]]
+        results = exchange.deal_orders(orders, position=Position(cash=1e6))
+        np.testing.assert_allclose(
+            [price for _, _, price in results],
+            [close.loc["2020-02-04"], np.nan, self.data["SH600001"]["close"].loc["2020-02-04"]],
+            rtol=1e-6,
+        )
+        self.assertEqual([o.deal_amount for o in orders], [100.0, 0.0, 100.0])
+
+    def test_quote(self):
+        exchange = get_exchange(freq="day", start_time="2020-02-03", end_time="2020-02-14", limit_threshold=0.005)
+        quote = exchange.quote
+        close = self.data["SH600001"]["close"]
+        change = (close / close.shift(1) - 1).loc["2020-02-03":"2020-02-14"]
+        inst_idx = quote.get_stock_idx("SH600001")
+        time_idx = np.arange(len(change))
+        np.testing.assert_array_equal(quote.get_data_by_idx(inst_idx, time_idx, "limit_buy"), change >= 0.005)
+        np.testing.assert_array_equal(quote.get_data_by_idx(inst_idx, time_idx, "limit_sell"), change <= -0.005)
+        self.assertEqual(quote.get_time_idx("2020-02-05 10:00"), 2)
+        self.assertAlmostEqual(
+            quote.get_data_by_idx(inst_idx, 2, "$open"), self.data["SH600001"]["open"].loc["2020-02-05"], places=4
+        )
+
+        cache_dir = self.qlib_dir / "quote_cache"
+        kwargs = dict(freq="day", start_time="2020-02-03", end_time="2020-02-14", quote_cache_dir=cache_dir)
+        first = get_exchange(**kwargs)
+        self.assertEqual(len(list(cache_dir.iterdir())), 1)
+        second = get_exchange(**kwargs)
+        self.assertIsInstance(second.quote.get_field_data("$close"), np.memmap)
+        self.assertEqual(second.trade_w_adj_price, first.trade_w_adj_price)
+        start, end = pd.Timestamp("2020-02-04"), pd.Timestamp("2020-02-07")
+        self.assertEqual(first.get_volume("SH600000", start, end), second.get_volume("SH600000", start, end))
+        get_exchange(**{**kwargs, "end_time": "2020-02-13"})
+        self.assertEqual(len(list(cache_dir.iterdir())), 2)
+
+    def test_nested_backtest(self):
+        stock_ids = ["SH600000", "SH600001"]
+        portfolio_dict = backtest(
+            start_time="2020-02-03",
+            end_time="2020-02-14",
+            strategy=DailyStrategy(stock_ids, amount=1000.0),
+            executor={
+                "class": "NestedExecutor",
+                "module_path": "qlib.backtest.executor",
+                "kwargs": {
+                    "time_per_step": "day",
+                    "inner_executor": {
+                        "class": "SimulatorExecutor",
+                        "module_path": "qlib.backtest.executor",
+                        "kwargs": {"time_per_step": "1min", "generate_portfolio_metrics": True},
+                    },
+                    "inner_strategy": FirstBarStrategy(),
+                    "generate_portfolio_metrics": True,
+                },
+            },
+            account=1e6,
+            exchange_kwargs={"freq": "1min", "limit_threshold": None},
+        )
+        self.assertEqual(set(portfolio_dict), {"1day", "1min"})
+        positions = portfolio_dict["1day"]["positions"]
+        self.assertEqual(len(positions), 10)
+        first = positions[pd.Timestamp("2020-02-03")]
+        self.assertEqual(first.get_stock_amount_dict(), {code: 1000.0 for code in stock_ids})
+        # the daily position is marked to the close of the last minute of the day
+        last_close = self.min_data["SH600000"]["close"].loc["2020-02-03 14:59"]
+        self.assertAlmostEqual(first.get_stock_price("SH600000"), last_close, places=4)
+        self.assertEqual(first.get_stock_count("SH600000", "day"), 1)
+        self.assertEqual(positions[pd.Timestamp("2020-02-14")].get_stock_list(), [])
+        # the minute level is skipped on the days without orders
+        self.assertEqual(len(portfolio_dict["1min"]["positions"]), 2 * 240)
+
+        pm = portfolio_dict["1day"]["portfolio_metrics"]
+        self.assertEqual(len(pm), 10)
+        np.testing.assert_allclose(pm["account"].values, [positions[t].calculate_value() for t in pm.index])
+        self.assertGreater(pm["total_cost"].iloc[-1], 0)
+        self.assertEqual(pm["turnover"].iloc[1:-1].abs().sum(), 0)
+        close = self.data["SH000300"]["close"]
+        bench = (close / close.shift(1) - 1).loc["2020-02-03":"2020-02-14"]
+        np.testing.assert_allclose(pm["bench"].values, bench.values, atol=1e-6)
+
+    def _nested_strategy_executor(self, track_data=False):
+        executor = {
+            "class": "NestedExecutor",
+            "module_path": "qlib.backtest.executor",
+            "kwargs": {
+                "time_per_step": "day",
+                "inner_executor": {
+                    "class": "SimulatorExecutor",
+                    "module_path": "qlib.backtest.executor",
+                    "kwargs": {"time_per_step": "1min", "generate_portfolio_metrics": True, "track_data": track_data},
+                },
+                "inner_strategy": FirstBarStrategy(),
+                "generate_portfolio_metrics": True,
+                "track_data": track_data,
+            },
+        }
+        return get_strategy_executor(
+            "2020-02-03",
+            "2020-02-14",
+            DailyStrategy(["SH600000"], amount=1000.0),
+            executor,
+            account=1e6,
+            exchange_kwargs={"freq": "1min", "limit_threshold": None},
+        )
+
+    def test_collect_data_loop(self):
+        strategy, executor = self._nested_strategy_executor(track_data=True)
+        return_value = {}
+        decisions = list(collect_data_loop("2020-02-03", "2020-02-14", strategy, executor, return_value))
+        self.assertTrue(executor.finished())
+        self.assertEqual(executor.inner_executor.trade_calendar.get_trade_len(), 240)
+        # the daily decisions of the 10 days and the minute decisions of the 2 days with orders
+        outer = [d for d in decisions if isinstance(d.strategy, DailyStrategy)]
+        inner = [d for d in decisions if isinstance(d.strategy, FirstBarStrategy)]
+        self.assertEqual(len(outer), 10)
+        self.assertEqual(len(inner), 2 * 240)
+        self.assertEqual([i for i, d in enumerate(outer) if isinstance(d, TradeDecisionWO)], [0, 9])
+        self.assertEqual(sum(isinstance(d, TradeDecisionWO) for d in inner), 2)
+        # the inner decisions of a day are yielded after the daily decision
+        self.assertIsInstance(decisions[1].strategy, FirstBarStrategy)
+        self.assertEqual(decisions[1].start_time, pd.Timestamp("2020-02-03 09:30"))
+
+        portfolio_dict = return_value["portfolio_dict"]
+        self.assertEqual(set(portfolio_dict), {"1day", "1min"})
+        expected = backtest_loop("2020-02-03", "2020-02-14", *self._nested_strategy_executor())
+        for freq in ["1day", "1min"]:
+            pd.testing.assert_frame_equal(
+                portfolio_dict[freq]["portfolio_metrics"], expected[freq]["portfolio_metrics"]
+            )
+
+    def test_benchmark(self):
+        closes = pd.DataFrame({code: self.data[code]["close"] for code in ["SH600000", "SH600001"]})
+        ret = (closes / closes.shift(1) - 1).loc["2020-02-03":"2020-02-14"]
+
+        bench = load_benchmark_return({"SH600000": 3, "SH600001": 1}, "day", "2020-02-03", "2020-02-14")
+        expected = ret["SH600000"] * 0.75 + ret["SH600001"] * 0.25
+        np.testing.assert_allclose(bench.to_series().values, expected.values, atol=1e-6)
+        # the return of a step is compounded over its bars
+        step = (1 + expected.loc["2020-02-04":"2020-02-06"]).prod() - 1
+        self.assertAlmostEqual(bench.get_return("2020-02-04", "2020-02-06 23:59:59"), step, places=6)
+        self.assertEqual(bench.get_return("2020-02-15", "2020-02-16"), 0.0)
+        self.assertIs(load_benchmark_return({"SH600001": 1, "SH600000": 3}, "day", "2020-02-03", "2020-02-14"), bench)
+
+        equal = load_benchmark_return(["SH600000", "SH600001"], "day", "2020-02-03", "2020-02-14")
+        np.testing.assert_allclose(equal.to_series().values, ret.mean(axis=1).values, atol=1e-6)
+
+        minute = load_benchmark_return("SH000300", "1min", "2020-02-03", "2020-02-14")
+        self.assertEqual(len(minute), len(self.min_calendar))
+
+    def test_backtest_sweep(self):
+        stock_ids = ["SH600000", "SH600001"]
+        executor = {
+            "class": "SimulatorExecutor",
+            "module_path": "qlib.backtest.executor",
+            "kwargs": {"time_per_step": "day", "generate_portfolio_metrics": True},
+        }
+        amounts = [100.0, 1000.0, 5000.0]
+        strategies = [
+            {
+                "class": "DailyStrategy",
+                "module_path": "tests.test_backtest",
+                "kwargs": {"stock_ids": stock_ids, "amount": amount},
+            }
+            for amount in amounts
+        ]
+        kwargs = dict(benchmark=None, account=1e6, exchange_kwargs={"freq": "day", "limit_threshold": None})
+        results = backtest_sweep(
+            "2020-02-03", "2020-02-14", strategies, executor, n_jobs=2, maxtasksperchild=1, **kwargs
+        )
+        self.assertEqual(len(results), len(amounts))
+        for amount, res in zip(amounts, results):
+            self.assertEqual(set(res), {"1day"})
+            fields = {"datetime", *PortfolioMetrics.RECORD_FIELDS, *PortfolioMetrics.RISK_FIELDS}
+            self.assertEqual(set(res["1day"]), fields)
+            expected = backtest(
+                "2020-02-03", "2020-02-14", DailyStrategy(stock_ids, amount=amount), executor, **kwargs
+            )["1day"]["portfolio_metrics"]
+            np.testing.assert_array_equal(res["1day"]["datetime"], expected.index.values)
+            for field in PortfolioMetrics.RECORD_FIELDS:
+                np.testing.assert_allclose(res["1day"][field], expected[field].values)
+        # the larger orders pay more
+        self.assertLess(results[0]["1day"]["total_cost"][-1], results[-1]["1day"]["total_cost"][-1])
+
+        # the benchmark is loaded in the parent, the workers (including the replacing ones) don't load it again
+        kwargs["benchmark"] = {"SH000300": 1, "SH600002": 1}
+        pid, create = os.getpid(), report.BenchmarkReturn
+
+        def _create(*args, **kw):
+            if os.getpid() != pid:
+                raise RuntimeError("the benchmark is loaded in a worker")
+            return create(*args, **kw)
+
+        with mock.patch.object(report, "BenchmarkReturn", side_effect=_create) as patched:
+            results = backtest_sweep(
+                "2020-02-03", "2020-02-14", strategies, executor, n_jobs=2, maxtasksperchild=1, **kwargs
+            )
+        self.assertEqual(patched.call_count, 1)
+        expected = backtest("2020-02-03", "2020-02-14", DailyStrategy(stock_ids, amount=100.0), executor, **kwargs)
+        np.testing.assert_allclose(results[0]["1day"]["bench"], expected["1day"]["portfolio_metrics"]["bench"].values)
+
+
+class TestPosition(unittest.TestCase):
+    @staticmethod
+    def _order(stock_id, direction):
+        return Order(stock_id, 0.0, direction, pd.Timestamp("2020-01-02"), pd.Timestamp("2020-01-02"))
+
+    def test_update_order(self):
+        position = Position(cash=1000, position_dict={"A": {"amount": 10, "price": 2.0}, "B": 5})
+        self.assertNotIn("now_account_value", position.position)
+        position.update_stock_price("B", 3.0)
+        self.assertEqual(position.calculate_value(), 1035.0)
+
+        position.update_order(self._order("A", OrderDir.SELL), trade_val=20, cost=1, trade_price=2.0)
+        self.assertFalse(position.check_stock("A"))
+        self.assertEqual(position.get_stock_amount_dict(), {"B": 5.0})
+        self.assertEqual(position.get_cash(), 1019)
+
+        for i in range(40):
+            position.update_order(self._order(f"S{i}", OrderDir.BUY), trade_val=10, cost=0, trade_price=2.0)
+        self.assertEqual(len(position.get_stock_list()), 41)
+        self.assertEqual(position.get_stock_amount("S39"), 5.0)
+        self.assertEqual(position.get_cash(), 619)
+
+    def test_vectorized_valuation(self):
+        position = Position(cash=100, position_dict={c: {"amount": 10, "price": 1.0} for c in "ABCD"})
+        position.update_stock_price_array(np.array([2.0, 3.0, 4.0, 5.0]), mask=np.array([True, True, False, True]))
+        self.assertEqual(position.calculate_value(), 100 + 10 * (2 + 3 + 1 + 5))
+        position.update_weight_all()
+        self.assertAlmostEqual(position.get_stock_weight("D"), 50 / 210)
+        position.add_count_all("day")
+        position.add_count_all("day")
+        self.assertEqual(position.get_stock_count("C", "day"), 2)
+        self.assertEqual(position.get_stock_count("C", "1min"), 0)
+
+        hist = copy.deepcopy(position)
+        position.update_stock_price("A", 100.0)
+        self.assertEqual(hist.get_stock_price("A"), 2.0)
+        hist.update_order(self._order("E", OrderDir.BUY), trade_val=10, cost=0, trade_price=1.0)
+        self.assertEqual(hist.get_stock_count("E", "day"), 0)
+
+    def test_fork(self):
+        position = Position(cash=100, position_dict={c: {"amount": 10, "price": 1.0} for c in "ABC"})
+        position.add_count_all("day")
+        branch = position.fork()
+        # the branch shares the arrays until it is updated
+        self.assertIs(branch._amount, position._amount)
+
+        branch.update_order(self._order("A", OrderDir.SELL), trade_val=10, cost=0, trade_price=1.0)
+        branch.update_order(self._order("D", OrderDir.BUY), trade_val=20, cost=0, trade_price=2.0)
+        branch.add_count_all("day")
+        self.assertEqual(branch.get_stock_amount_dict(), {"C": 10.0, "B": 10.0, "D": 10.0})
+        self.assertEqual(branch.get_cash(), 90)
+        self.assertEqual(branch.get_stock_count("B", "day"), 2)
+        self.assertEqual(position.get_stock_amount_dict(), {"A": 10.0, "B": 10.0, "C": 10.0})
+        self.assertEqual(position.get_cash(), 100)
+        self.assertEqual(position.get_stock_count("B", "day"), 1)
+
+        # the original position is copied before its update as well
+        snapshot = position.fork()
+        position.update_stock_price_array(np.array([2.0, 2.0, 2.0]))
+        self.assertEqual(snapshot.calculate_value(), 130)
+        self.assertEqual(position.calculate_value(), 160)
+
+    def test_account_fork(self):
+        account = Account(init_cash=1000, position_dict={"A": {"amount": 10, "price": 1.0}}, benchmark_config={})
+        account.current_position.update_weight_all()
+        branch = account.fork()
+        branch.update_order(self._order("A", OrderDir.SELL), trade_val=20, cost=1, trade_price=2.0)
+        self.assertFalse(branch.current_position.check_stock("A"))
+        self.assertEqual(branch.get_cash(), 1019)
+        self.assertEqual(branch.accum_info.get_cost, 1)
+        self.assertTrue(account.current_position.check_stock("A"))
+        self.assertEqual(account.get_cash(), 1000)
+        self.assertEqual(account.accum_info.get_cost, 0)
+
+        t = pd.Timestamp("2020-01-02")
+        branch.update_portfolio_metrics(t, t + pd.Timedelta(days=1) - pd.Timedelta(seconds=1))
+        self.assertEqual(len(branch.portfolio_metrics), 1)
+        self.assertTrue(account.portfolio_metrics.is_empty())
+
+    def test_settle(self):
+        position = Position(cash=100, position_dict={"A": {"amount": 10, "price": 1.0}})
+        position.settle_start(Position.ST_CASH)
+        position.update_order(self._order("A", OrderDir.SELL), trade_val=5, cost=0, trade_price=1.0)
+        self.assertEqual(position.get_cash(), 100)
+        self.assertEqual(position.get_cash(include_settle=True), 105)
+        position.settle_commit()
+        self.assertEqual(position.get_cash(), 105)
+
+
+class TestPortfolioMetrics(unittest.TestCase):
+    def _record(self, pm, returns, costs, benches):
+        account = 1e6
+        for t, (r, c, b) in zip(pd.bdate_range("2020-01-01", periods=len(returns)), zip(returns, costs, benches)):
+            account *= 1 + r - c
+            pm.update_portfolio_metrics_record(
+                trade_start_time=t,
+                account_value=account,
+                cash=0.0,
+                return_rate=r,
+                total_turnover=0.0,
+                turnover_rate=0.0,
+                total_cost=0.0,
+                cost_rate=c,
+                stock_value=account,
+                bench_value=b,
+            )
+
+    def test_risk_metrics(self):
+        rng = np.random.RandomState(0)
+        n = 600
+        returns, costs, benches = rng.randn(n) * 0.01, np.abs(rng.randn(n)) * 1e-4, rng.randn(n) * 0.01
+        pm = PortfolioMetrics(freq="day")
+        self._record(pm, returns, costs, benches)
+        self.assertEqual(len(pm), n)
+
+        df = pm.generate_portfolio_metrics_dataframe(with_risk=True)
+        net, excess = pd.Series(returns - costs), pd.Series(returns - costs - benches)
+        sharpe = net.expanding(2).mean() / net.expanding(2).std() * np.sqrt(238)
+        ir = excess.expanding(2).mean() / excess.expanding(2).std() * np.sqrt(238)
+        np.testing.assert_allclose(df["sharpe"].values, sharpe.values, rtol=1e-6)
+        np.testing.assert_allclose(df["information_ratio"].values, ir.values, rtol=1e-6)
+        account = df["account"]
+        drawdown = account / account.cummax() - 1
+        np.testing.assert_allclose(df["drawdown"].values, drawdown.values, atol=1e-12)
+        np.testing.assert_allclose(df["max_drawdown"].values, drawdown.cummin().values, atol=1e-12)
+        self.assertEqual(pm.get_risk_metrics()["max_drawdown"], drawdown.min())
+
+        rolling = PortfolioMetrics(freq="day", window=20)
+        self._record(rolling, returns, costs, benches)
+        sharpe = net.rolling(20, min_periods=2).mean() / net.rolling(20, min_periods=2).std() * np.sqrt(238)
+        np.testing.assert_allclose(rolling.get_record_array("sharpe"), sharpe.values, rtol=1e-5)
+
+    def test_benchmark_series(self):
+        bench = pd.Series([0.01, 0.02], index=pd.to_datetime(["2020-01-01", "2020-01-02"]))
+        pm = PortfolioMetrics(freq="day", benchmark_config={"benchmark": bench})
+        pm.update_portfolio_metrics_record(
+            trade_start_time=pd.Timestamp("2020-01-02"),
+            trade_end_time=pd.Timestamp("2020-01-02 23:59:59"),
+            account_value=1.0,
+            cash=1.0,
+            return_rate=0.0,
+            total_turnover=0.0,
+            turnover_rate=0.0,
+            total_cost=0.0,
+            cost_rate=0.0,
+            stock_value=0.0,
+        )
+        self.assertAlmostEqual(pm.get_record_array("bench")[0], 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.config import C
+from qlib.data.cache import H, CostAwarePolicy, MemCache, MemCacheLengthUnit, SpillCache, TwoQueuePolicy
+
+
+class TestMemCache(unittest.TestCase):
+    def test_stats(self):
+        unit = MemCacheLengthUnit(size_limit=2, name="f")
+        for key in ["a", "b", "c"]:
+            if key not in unit:
+                unit[key] = np.zeros(1000)
+        self.assertEqual("b" in unit and unit["b"].shape, (1000,))
+        with self.assertRaises(KeyError):
+            unit["a"]
+        unit["b"] = np.ones(10)
+
+        stats = unit.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 4))
+        self.assertEqual((stats["insertions"], stats["evictions"], stats["evicted_size"]), (3, 1, 1))
+        self.assertEqual((stats["length"], stats["total_size"], stats["size_limit"]), (2, 2, 2))
+        self.assertAlmostEqual(unit.hit_ratio, 0.2)
+        self.assertAlmostEqual(unit.eviction_rate, 1 / 3)
+        # the values are not shown
+        self.assertEqual(
+            repr(unit), "MemCacheLengthUnit<size_limit:2 total_size:2 length:2 hits:1 misses:4 evictions:1>"
+        )
+        unit.reset_stats()
+        self.assertEqual(unit.stats()["hits"], 0)
+
+    def test_mem_cache(self):
+        cache = MemCache(mem_cache_size_limit=1, limit_type="length")
+        events = []
+        callback = lambda *args: events.append(args)
+        cache.add_callback(callback)
+        "x" in cache["c"]
+        cache["f"]["x"] = 1
+        cache["f"]["y"] = 2
+        cache["f"]["y"]
+        self.assertEqual(
+            events,
+            [("c", "miss", "x"), ("f", "insert", "x"), ("f", "insert", "y"), ("f", "evict", "x"), ("f", "hit", "y")],
+        )
+        cache.remove_callback(callback)
+        cache["f"]["y"]
+        self.assertEqual(len(events), 5)
+
+        stats = cache.stats()
+        self.assertEqual(set(stats), {"c", "i", "f"})
+        self.assertEqual((stats["f"]["hits"], stats["f"]["evictions"], stats["c"]["misses"]), (2, 1, 1))
+
+        text = cache.to_prometheus()
+        self.assertIn("# TYPE qlib_mem_cache_hits_total counter", text)
+        self.assertIn('qlib_mem_cache_hits_total{unit="f"} 2', text)
+        self.assertIn('qlib_mem_cache_hit_ratio{unit="i"} 0.0', text)
+        self.assertIn('qlib_mem_cache_length{unit="f"} 1', text)
+
+    def test_threads(self):
+        for policy in ["lru", "lfu", "2q", "cost"]:
+            unit = MemCacheLengthUnit(size_limit=50, name="f", policy=policy)
+            errors, removed = [], []
+
+            def _run(seed):
+                rng = np.random.RandomState(seed)
+                try:
+                    for key in rng.randint(0, 200, 2000):
+                        if unit.get(key) is None:
+                            unit.set(key, key, cost=float(key))
+                        if key % 10 == 0:
+                            removed.append(unit.invalidate(lambda k, key=key: k == key + 1))
+                except Exception as e:  # pylint: disable=W0703
+                    errors.append(e)
+
+            switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+            try:
+                threads = [threading.Thread(target=_run, args=(i,)) for i in range(8)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+            finally:
+                sys.setswitchinterval(switch_interval)
+            self.assertEqual(errors, [], policy)
+            self.assertLessEqual(len(unit), 50)
+            self.assertEqual(unit.total_size, len(unit))
+            stats = unit.stats()
+            self.assertEqual(stats["hits"] + stats["misses"], 8 * 2000)
+            self.assertEqual(stats["insertions"], len(unit) + stats["evictions"] + sum(removed))
+
+
+class TestEvictionPolicy(unittest.TestCase):
+    def _scan(self, policy):
+        unit = MemCacheLengthUnit(size_limit=10, policy=policy)
+        for key in range(5):
+            unit[f"hot{key}"] = key
+            unit[f"hot{key}"]
+        # a scan of one-off items
+        for key in range(100):
+            unit[f"scan{key}"] = key
+            for hot in range(5):
+                if f"hot{hot}" in unit:
+                    unit[f"hot{hot}"]
+        return sum(f"hot{key}" in unit for key in range(5))
+
+    def test_scan_resistance(self):
+        self.assertEqual(self._scan("lfu"), 5)
+        self.assertEqual(self._scan("2q"), 5)
+        unit = MemCacheLengthUnit(size_limit=10, policy="lru")
+        for key in range(5):
+            unit[f"hot{key}"] = key
+        for key in range(10):
+            unit[f"scan{key}"] = key
+        self.assertFalse(any(f"hot{key}" in unit for key in range(5)))
+
+    def test_2q_ghost(self):
+        unit = MemCacheLengthUnit(size_limit=4, policy=TwoQueuePolicy())
+        for key in "abcde":
+            unit[key] = key
+        self.assertNotIn("a", unit)
+        # "a" is set again soon after being evicted, it is protected
+        unit["a"] = "a"
+        self.assertIn("a", unit.policy.protected)
+        self.assertEqual(len(unit), 4)
+
+    def test_cost(self):
+        unit = MemCacheLengthUnit(size_limit=3, policy=CostAwarePolicy())
+        unit.set("expensive", 1, cost=10.0)
+        for key in range(10):
+            unit.set(key, key, cost=0.1)
+        self.assertIn("expensive", unit)
+        self.assertEqual(len(unit), 3)
+        unit.pop("expensive")
+        unit.clear()
+        self.assertEqual((len(unit.policy.meta), len(unit.policy.heap)), (0, 0))
+
+    def test_config(self):
+        with self.assertRaises(ValueError):
+            MemCache(policy="fifo")
+        self.assertIsInstance(MemCache(policy="cost")["f"].policy, CostAwarePolicy)
+        try:
+            qlib.init(mem_cache_policy="2q")
+            self.assertIsInstance(H["f"].policy, TwoQueuePolicy)
+        finally:
+            C.mem_cache_policy = "lru"
+            H.reset()
+
+
+class TestSpillCache(unittest.TestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_spill(self):
+        spill = SpillCache(self.path, size_limit=2 * 100 * (4 + 8))
+        unit = MemCacheLengthUnit(size_limit=1, name="f", spill=spill)
+        series = {key: pd.Series(np.arange(100, dtype=np.float32) + i, name=key) for i, key in enumerate("abc")}
+        for key in "abc":
+            unit[key] = series[key]
+        self.assertEqual((len(unit), len(spill), unit.spills), (1, 2, 2))
+        # the spill tier keeps its budget
+        self.assertEqual(spill.total_size, 2 * 100 * 12)
+        self.assertEqual(len(list(spill.path.glob("*.npy"))), 4)
+
+        self.assertIn("a", unit)
+        res = unit["a"]
+        pd.testing.assert_series_equal(res, series["a"])
+        self.assertIsInstance(res.values.base, np.memmap)
+        stats = unit.stats()
+        self.assertEqual((stats["spill_hits"], stats["hits"], stats["misses"]), (1, 1, 0))
+        # "a" is restored and "c" is spilled, "b" is removed beyond the budget
+        unit["c"]
+        self.assertNotIn("b", unit)
+        self.assertEqual(unit.stats()["misses"], 1)
+
+        # the spilled value is out of date once the key is set again
+        unit["a"] = pd.Series([1.0], name="a")
+        unit["x"] = 1
+        pd.testing.assert_series_equal(unit["a"], pd.Series([1.0], name="a"))
+        # the values which are not spillable are dropped
+        self.assertNotIn("x", unit)
+
+        unit.clear()
+        self.assertEqual((len(spill), spill.total_size, spill.path.exists()), (0, 0, False))
+
+    def test_config(self):
+        try:
+            qlib.init(local_cache_path=str(self.path), mem_cache_spill_size_limit=1 << 20)
+            self.assertEqual(H["f"].spill.root, self.path.joinpath("mem_cache_spill"))
+            self.assertIsNone(H["c"].spill)
+        finally:
+            C.mem_cache_spill_size_limit = 0
+            H.reset()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.data import D
+from qlib.data.cache import H
+from qlib.data.storage import file_storage
+from qlib.data.storage.file_storage import (
+    CompressedFileFeatureStorage,
+    convert_to_compressed_feature_storage,
+)
+
+from .mock_data import dump_mock_data
+
+FIELDS = ["$close", "Mean($close, 5) / $close", "Ref($volume, 1)"]
+
+
+class TestCompressedStorage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.qlib_dir = Path(tempfile.mkdtemp())
+        dump_mock_data(cls.qlib_dir)
+        qlib.init(provider_uri=str(cls.qlib_dir), kernels=1)
+        cls.expected = D.features(["SH600000", "SH600001"], FIELDS)
+        cls.count = convert_to_compressed_feature_storage(cls.qlib_dir, chunk_size=16, remove_source=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.qlib_dir, ignore_errors=True)
+
+    def test_convert(self):
+        self.assertEqual(self.count, 4 * 6)
+        self.assertEqual(list(self.qlib_dir.joinpath("features").glob("*/*.bin")), [])
+        qlib.init(
+            provider_uri=str(self.qlib_dir),
+            kernels=1,
+            feature_provider={
+                "class": "LocalFeatureProvider",
+                "kwargs": {
+                    "backend": {
+                        "class": "CompressedFileFeatureStorage",
+                        "module_path": "qlib.data.storage.file_storage",
+                    }
+                },
+            },
+        )
+        H.clear()
+        pd.testing.assert_frame_equal(D.features(["SH600000", "SH600001"], FIELDS), self.expected)
+        df = D.features(["SH600000"], ["$close"], start_time="2020-02-03", end_time="2020-02-07")
+        expected = self.expected.loc[(["SH600000"], slice("2020-02-03", "2020-02-07")), ["$close"]]
+        pd.testing.assert_frame_equal(df, expected)
+
+    def test_write(self):
+        expected = pd.Series([1, np.nan, 0, 1, 9, 3, 4, 5, 0, 1, 2, np.nan, np.nan, 7], dtype=np.float32)
+        for codec in ["none", "zlib"]:
+            storage = CompressedFileFeatureStorage("SH600009", "close", "day", codec=codec, chunk_size=4)
+            # write, append (to a full chunk, a partial chunk), rewrite and rewrite before the start
+            for data, index in [(np.arange(6), 2), (np.arange(3), None), ([7.0], 13), ([np.nan, 9.0], 3), ([1.0], 0)]:
+                storage.write(data, index)
+            pd.testing.assert_series_equal(storage.data, expected)
+            self.assertEqual((storage.start_index, storage.end_index, len(storage)), (0, 13, 14))
+            self.assertEqual(storage[4], (4, 9.0))
+            pd.testing.assert_series_equal(storage[5:9], expected[5:9])
+            pd.testing.assert_series_equal(storage[12:20], expected[12:])
+            storage.clear()
+            self.assertEqual((storage.start_index, len(storage.data)), (None, 0))
+        with self.assertRaises(ValueError):
+            CompressedFileFeatureStorage("SH600009", "close", "day", codec="gzip")
+
+    def test_append_crash(self):
+        storage = CompressedFileFeatureStorage("SH600009", "open", "day", codec="none", chunk_size=4)
+        storage.write(np.arange(6), 0)
+        size = storage.uri.stat().st_size
+        # the file is not changed by an append failing after its first chunk
+        chunks = []
+
+        def _compress(b, level):
+            # the disk is full after the first chunk
+            if chunks:
+                raise OSError("disk full")
+            chunks.append(b)
+            return b
+
+        with mock.patch.object(file_storage, "_get_codec", return_value=(_compress, lambda b: b)):
+            with self.assertRaises(OSError):
+                storage.write(np.arange(3))
+        self.assertEqual(storage.uri.stat().st_size, size)
+        pd.testing.assert_series_equal(storage.data, pd.Series(np.arange(6), dtype=np.float32))
+
+        # the writers of other processes use their own temporary files
+        with mock.patch.object(file_storage.os, "replace", wraps=os.replace) as replace:
+            storage.write(np.arange(3))
+        self.assertEqual(Path(replace.call_args.args[0]).name, f".open.day.cbin.{os.getpid()}")
+        pd.testing.assert_series_equal(storage.data, pd.Series([0, 1, 2, 3, 4, 5, 0, 1, 2], dtype=np.float32))
+        # the chunks are contiguous, there is no garbage of the old last chunk
+        with storage.uri.open("rb") as fp:
+            header = storage._read_header(fp)  # pylint: disable=W0212
+        self.assertEqual(storage.uri.stat().st_size, header["table_offset"] + 8 * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
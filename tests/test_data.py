@@ -0,0 +1,54 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.data import D
+from qlib.data.storage.file_storage import FileFeatureStorage
+
+from .mock_data import dump_mock_data
+
+
+class TestData(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.qlib_dir = Path(tempfile.mkdtemp())
+        cls.calendar, cls.data = dump_mock_data(cls.qlib_dir)
+        qlib.init(provider_uri=str(cls.qlib_dir), kernels=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.qlib_dir, ignore_errors=True)
+
+    def test_calendar(self):
+        cal = D.calendar(start_time="2020-02-03", end_time="2020-02-07")
+        self.assertEqual(list(cal), list(pd.bdate_range("2020-02-03", "2020-02-07")))
+
+    def test_instruments(self):
+        insts = D.list_instruments(D.instruments("all"), as_list=True)
+        self.assertEqual(sorted(insts), sorted(self.data))
+
+    def test_features(self):
+        df = D.features(["SH600000"], ["$close", "Ref($close, 1)", "Mean($close, 5)"], freq="day")
+        close = self.data["SH600000"]["close"]
+        res = df.loc["SH600000"]
+        np.testing.assert_allclose(res["$close"].values, close.values, rtol=1e-6)
+        np.testing.assert_allclose(res["Ref($close, 1)"].values[1:], close.values[:-1], rtol=1e-6)
+        np.testing.assert_allclose(
+            res["Mean($close, 5)"].values[4:], close.rolling(5).mean().values[4:], rtol=1e-5
+        )
+
+    def test_feature_storage(self):
+        storage = FileFeatureStorage(instrument="SH600001", field="close", freq="day", provider_uri={"day": str(self.qlib_dir)})
+        self.assertEqual(storage.start_index, 0)
+        self.assertEqual(storage.end_index, len(self.calendar) - 1)
+        self.assertAlmostEqual(storage[3][1], self.data["SH600001"]["close"].iloc[3], places=4)
+        self.assertEqual(len(storage[2:6]), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.data import D
+from qlib.data import protocol
+from qlib.data.protocol import QlibServerException
+from qlib.data.server import DataServer, check_field
+
+from .mock_data import dump_mock_data
+
+
+class TestProtocol(unittest.TestCase):
+    def test_dataframe(self):
+        index = pd.MultiIndex.from_product(
+            [["SH600000", "SH600001"], pd.bdate_range("2020-01-02", periods=50)], names=("instrument", "datetime")
+        )
+        df = pd.DataFrame(np.random.rand(100, 3).astype(np.float32), index=index, columns=["$close", "$open", "a"])
+        left, right = socket.socketpair()
+        # the arrays are streamed in many chunks
+        with mock.patch.object(protocol, "CHUNK_SIZE", 64), left, right:
+            sender = threading.Thread(target=protocol.send_response, args=(left, *protocol.encode_dataframe(df)))
+            sender.start()
+            res = protocol.decode_dataframe(*protocol.recv_response(right))
+            sender.join()
+        pd.testing.assert_frame_equal(res, df)
+
+
+class TestDataServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.qlib_dir = Path(tempfile.mkdtemp())
+        cls.calendar, cls.data = dump_mock_data(cls.qlib_dir)
+        cls.server = subprocess.Popen(
+            [sys.executable, "-m", "qlib.data.server", "--provider_uri", str(cls.qlib_dir), "--port", "0"]
+            + ["--kernels", "1"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        line = cls.server.stdout.readline()
+        port = int(line.strip().rsplit(":", 1)[-1])
+        qlib.init(default_conf="remote", data_server_port=port, timeout=30)
+
+    @classmethod
+    def tearDownClass(cls):
+        D.client.disconnect()
+        cls.server.terminate()
+        cls.server.wait()
+        cls.server.stdout.close()
+        shutil.rmtree(cls.qlib_dir, ignore_errors=True)
+
+    def test_calendar(self):
+        cal = D.calendar(start_time="2020-02-03", end_time="2020-02-07")
+        self.assertEqual(list(cal), list(pd.bdate_range("2020-02-03", "2020-02-07")))
+        self.assertEqual(len(D.calendar()), len(self.calendar))
+
+    def test_instruments(self):
+        insts = D.list_instruments(D.instruments("all"), as_list=True)
+        self.assertEqual(sorted(insts), sorted(self.data))
+        spans = D.list_instruments(D.instruments("all"))
+        self.assertEqual(spans["SH600000"], [(self.calendar[0], self.calendar[-1])])
+
+    def test_features(self):
+        df = D.features(["SH600000", "SH600001"], ["$close", "Ref($close, 1)"], start_time="2020-01-10")
+        self.assertEqual(list(df.index.names), ["instrument", "datetime"])
+        self.assertEqual(df.index.get_level_values("datetime")[0], pd.Timestamp("2020-01-10"))
+        for inst in ["SH600000", "SH600001"]:
+            close = self.data[inst]["close"].loc["2020-01-10":]
+            np.testing.assert_allclose(df.loc[inst]["$close"].values, close.values, rtol=1e-6)
+            np.testing.assert_allclose(df.loc[inst]["Ref($close, 1)"].values[1:], close.values[:-1], rtol=1e-6)
+
+        df = D.features(D.instruments("all"), ["$close"], start_time="2021-01-01")
+        self.assertTrue(df.empty)
+
+    def test_error(self):
+        with self.assertRaises(QlibServerException):
+            D.features(["SH600000"], ["Foo($close)"])
+        # the client still works after an error
+        self.assertEqual(len(D.features(["SH600000"], ["$close"])), len(self.calendar))
+
+    def test_check_field(self):
+        # only the registered operators, the features and the literals are evaluated
+        fields = ["Ref($close, 1).__class__", "Ref($close, x)", "Ref($close, [1])", "Ref($close, (lambda: 1)())"]
+        for field in fields:
+            with self.assertRaisesRegex(QlibServerException, "ValueError"):
+                D.features(["SH600000"], ["$close", field])
+        check_field("If($close > Ref($close, 1), -1, 0.5) * $$roe_q")
+        with self.assertRaises(ValueError):
+            check_field("Ref($close, 1")
+
+    def test_bind(self):
+        with self.assertRaisesRegex(ValueError, "non-loopback"):
+            DataServer("0.0.0.0", 0)
+        for host, allow_remote in [("localhost", False), ("0.0.0.0", True)]:
+            with DataServer(host, 0, allow_remote=allow_remote) as server:
+                self.assertGreater(server.server_address[1], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
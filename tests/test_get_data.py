@@ -0,0 +1,261 @@
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from qlib.utils import exists_qlib_data, read_data_manifest, read_data_manifest_files, write_data_manifest
+
+from .data import GetData
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """serve `server.files` with HEAD and range requests; the ranges in `server.fail_ranges` fail once"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _get_file(self):
+        data = self.server.files.get(self.path.split("?")[0].lstrip("/"))
+        if data is None:
+            self.send_error(404)
+        return data
+
+    def do_HEAD(self):
+        data = self._get_file()
+        if data is not None:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", hashlib.md5(data).hexdigest())
+            self.end_headers()
+
+    def do_GET(self):
+        data = self._get_file()
+        if data is None:
+            return
+        m = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if m is None:
+            self.send_response(200)
+            body = data
+        else:
+            start, end = int(m.group(1)), int(m.group(2))
+            self.server.requested_ranges.append(start)
+            if start in self.server.fail_ranges:
+                self.server.fail_ranges.remove(start)
+                self.send_error(500)
+                return
+            self.send_response(206)
+            body = data[start : end + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalGetData(GetData):
+    def merge_remote_url(self, file_name: str):
+        return f"{self.REMOTE_URL}/{file_name}"
+
+
+class TestGetData(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.files = {}
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.target_dir = Path(tempfile.mkdtemp())
+        self.server.files.clear()
+        self.server.requested_ranges = []
+        self.server.fail_ranges = set()
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zp:
+            zp.writestr("calendars/day.txt", "2020-01-02\n2020-01-03\n")
+            zp.writestr("instruments/all.txt", "SH600000\t2020-01-02\t2020-01-03\n")
+            for i in range(20):
+                zp.writestr(f"features/sh6000{i:02d}/close.day.bin", bytes(range(256)) * 64)
+        self.zip_data = buf.getvalue()
+        self.server.files["v2/qlib_data.zip"] = self.zip_data
+
+    def tearDown(self):
+        shutil.rmtree(self.target_dir, ignore_errors=True)
+
+    def _get_data(self, **kwargs):
+        get_data = LocalGetData(chunk_size=4096, n_jobs=4, **kwargs)
+        get_data.REMOTE_URL = f"http://127.0.0.1:{self.server.server_port}"
+        return get_data
+
+    def test_download(self):
+        checksum = hashlib.sha256(self.zip_data).hexdigest()
+        self.server.files["v2/qlib_data.zip.sha256"] = f"{checksum}  qlib_data.zip\n".encode()
+        # a failed chunk is retried
+        self.server.fail_ranges = {4096}
+        self._get_data(delete_zip_file=True).download_data("v2/qlib_data.zip", self.target_dir, delete_old=False)
+        self.assertEqual(len(list(self.target_dir.joinpath("features").iterdir())), 20)
+        feature = self.target_dir.joinpath("features", "sh600007", "close.day.bin")
+        self.assertEqual(feature.read_bytes(), bytes(range(256)) * 64)
+        names = sorted(p.name for p in self.target_dir.iterdir())
+        self.assertEqual(names, ["calendars", "features", "instruments", "manifest.files.json", "manifest.json"])
+
+    def test_extract_threads(self):
+        # many members in each directory, the threads create the same parent directories
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zp:
+            for i in range(300):
+                for field in ["open", "close", "high", "low", "volume", "factor"]:
+                    zp.writestr(f"features/sh6{i:05d}/{field}.day.bin", b"0000")
+        zip_path = self.target_dir.joinpath("many.zip")
+        zip_path.write_bytes(buf.getvalue())
+        staging_dir = self.target_dir.joinpath("staging")
+        staging_dir.mkdir()
+        get_data = self._get_data()
+        get_data.n_jobs = 8
+        os_makedirs = os.makedirs
+
+        def _makedirs(*args, **kwargs):
+            # widen the window between the existence check and the creation of zipfile
+            time.sleep(0.01)
+            return os_makedirs(*args, **kwargs)
+
+        with mock.patch("os.makedirs", side_effect=_makedirs):
+            get_data._extract(zip_path, staging_dir)
+        self.assertEqual(len(list(staging_dir.joinpath("features").iterdir())), 300)
+        self.assertEqual(len(list(staging_dir.rglob("*.bin"))), 300 * 6)
+
+    def test_resume(self):
+        n_chunks = (len(self.zip_data) + 4095) // 4096
+        self.server.fail_ranges = {2 * 4096}
+        get_data = self._get_data(max_retries=1)
+        get_data.n_jobs = 1
+        with self.assertRaises(Exception):
+            get_data.download_data("v2/qlib_data.zip", self.target_dir, delete_old=False, checksum="0")
+        self.assertTrue(self.target_dir.joinpath("qlib_data.zip.part").exists())
+        self.assertFalse(self.target_dir.joinpath("features").exists())
+
+        # only the missing chunks are downloaded again
+        self.server.requested_ranges = []
+        checksum = hashlib.sha256(self.zip_data).hexdigest()
+        get_data.download_data("v2/qlib_data.zip", self.target_dir, delete_old=False, checksum=checksum)
+        self.assertEqual(sorted(self.server.requested_ranges), [i * 4096 for i in range(2, n_chunks)])
+        self.assertEqual(self.target_dir.joinpath("qlib_data.zip").read_bytes(), self.zip_data)
+        self.assertFalse(self.target_dir.joinpath("qlib_data.zip.part").exists())
+
+    def test_checksum(self):
+        with self.assertRaises(ValueError):
+            self._get_data().download_data("v2/qlib_data.zip", self.target_dir, delete_old=False, checksum="0" * 64)
+        self.assertFalse(self.target_dir.joinpath("features").exists())
+
+    def test_swap(self):
+        old_feature = self.target_dir.joinpath("features", "old", "close.day.bin")
+        old_feature.parent.mkdir(parents=True)
+        old_feature.write_bytes(b"old")
+        self.target_dir.joinpath("dataset_cache").mkdir()
+        with mock.patch("builtins.input", return_value="y"):
+            self._get_data().download_data("v2/qlib_data.zip", self.target_dir, delete_old=True)
+        self.assertFalse(old_feature.exists())
+        self.assertFalse(self.target_dir.joinpath("dataset_cache").exists())
+        self.assertEqual(len(list(self.target_dir.joinpath("features").iterdir())), 20)
+        self.assertEqual([p.name for p in self.target_dir.iterdir() if p.name.startswith(".")], [])
+
+        # the old data is restored if the installing fails
+        os_replace, calls = os.replace, []
+
+        def _replace(src, dst):
+            calls.append(src)
+            if len(calls) == 3:
+                raise OSError("disk failure")
+            return os_replace(src, dst)
+
+        with mock.patch("os.replace", side_effect=_replace), mock.patch("builtins.input", return_value="y"):
+            with self.assertRaises(OSError):
+                self._get_data()._unzip(self.target_dir.joinpath("qlib_data.zip"), self.target_dir)
+        dirs = sorted(p.name for p in self.target_dir.iterdir() if p.is_dir())
+        self.assertEqual(dirs, ["calendars", "features", "instruments"])
+        self.assertEqual(len(list(self.target_dir.joinpath("features").iterdir())), 20)
+
+    def test_merge_failure(self):
+        # the new data is merged into the existing features
+        old_feature = self.target_dir.joinpath("features", "sh600000", "close.day.bin")
+        old_feature.parent.mkdir(parents=True)
+        old_feature.write_bytes(b"old")
+        other_feature = self.target_dir.joinpath("features", "other", "close.day.bin")
+        other_feature.parent.mkdir(parents=True)
+        other_feature.write_bytes(b"other")
+        get_data = self._get_data()
+        get_data.download_data("v2/qlib_data.zip", self.target_dir, delete_old=False)
+        self.assertEqual(old_feature.read_bytes(), bytes(range(256)) * 64)
+        self.assertEqual(len(list(self.target_dir.joinpath("features").iterdir())), 21)
+        self.assertEqual([p.name for p in self.target_dir.iterdir() if p.name.startswith(".")], [])
+
+        # all the merged files are restored if the merging fails
+        old_feature.write_bytes(b"old")
+        shutil.rmtree(self.target_dir.joinpath("features", "sh600019"))
+        before = {p: p.read_bytes() for p in self.target_dir.joinpath("features").rglob("*") if p.is_file()}
+        os_replace, calls = os.replace, []
+
+        def _replace(src, dst):
+            calls.append(src)
+            if len(calls) == 30:
+                raise OSError("disk failure")
+            return os_replace(src, dst)
+
+        with mock.patch("os.replace", side_effect=_replace):
+            with self.assertRaises(OSError):
+                get_data._unzip(self.target_dir.joinpath("qlib_data.zip"), self.target_dir, delete_old=False)
+        after = {p: p.read_bytes() for p in self.target_dir.joinpath("features").rglob("*") if p.is_file()}
+        self.assertEqual(after, before)
+        self.assertFalse(self.target_dir.joinpath("features", "sh600019").exists())
+        self.assertEqual([p.name for p in self.target_dir.iterdir() if p.name.startswith(".")], [])
+
+    def test_manifest(self):
+        self._get_data().download_data("v2/qlib_data.zip", self.target_dir, delete_old=False)
+        manifest = read_data_manifest(self.target_dir)
+        self.assertEqual(manifest["codes"], ["SH600000"])
+        self.assertEqual((manifest["freqs"], manifest["fields"]), (["day"], ["close"]))
+        # only the names of the instrument directories are in the summary
+        self.assertEqual(manifest["features"], [f"sh6000{i:02d}" for i in range(20)])
+        files = read_data_manifest_files(self.target_dir)
+        self.assertEqual(set(files["sh600007"]), {"close.day.bin"})
+        self.assertTrue(exists_qlib_data(self.target_dir))
+        self.assertTrue(exists_qlib_data(self.target_dir, deep_verify=True))
+
+        # the listing of the files is only read by deep_verify
+        files_path = self.target_dir.joinpath("manifest.files.json")
+        files_path.rename(files_path.with_suffix(".bak"))
+        self.assertTrue(exists_qlib_data(self.target_dir))
+        self.assertFalse(exists_qlib_data(self.target_dir, deep_verify=True))
+        files_path.with_suffix(".bak").rename(files_path)
+
+        # the features are not scanned unless deep_verify is enabled
+        feature = self.target_dir.joinpath("features", "sh600007", "close.day.bin")
+        feature.write_bytes(b"broken")
+        self.assertTrue(exists_qlib_data(self.target_dir))
+        self.assertFalse(exists_qlib_data(self.target_dir, deep_verify=True))
+        write_data_manifest(self.target_dir)
+        self.assertTrue(exists_qlib_data(self.target_dir, deep_verify=True))
+
+        # the instruments are checked with the manifest
+        self.target_dir.joinpath("instruments", "all.txt").write_text("SH700000\t2020-01-02\t2020-01-03\n")
+        self.assertFalse(exists_qlib_data(self.target_dir))
+        write_data_manifest(self.target_dir)
+        self.assertFalse(exists_qlib_data(self.target_dir))
+        self.target_dir.joinpath("manifest.json").unlink()
+        self.assertFalse(exists_qlib_data(self.target_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# the optional dependencies which should not be imported until they are used
+LAZY_MODULES = ("redis", "joblib", "packaging", "cryptography")
+
+
+class TestImport(unittest.TestCase):
+    def _loaded_modules(self, code):
+        code = f"{code}\nimport sys\nprint('loaded:' + ','.join(m for m in {LAZY_MODULES + ('pandas',)!r} if m in sys.modules))"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            res = subprocess.run(
+                [sys.executable, "-c", code.replace("<provider_uri>", tmp_dir)],
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        line = [line for line in res.stdout.splitlines() if line.startswith("loaded:")][-1]
+        return set(filter(None, line[len("loaded:") :].split(",")))
+
+    def test_import(self):
+        self.assertEqual(self._loaded_modules("import qlib"), set())
+
+    def test_init(self):
+        loaded = self._loaded_modules("import qlib\nqlib.init(provider_uri='<provider_uri>')")
+        self.assertEqual(loaded & set(LAZY_MODULES), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
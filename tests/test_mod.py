@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from qlib.utils.mod import get_module_by_module_path, init_instance_by_config
+
+
+class TestMod(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.module_path = str(self.tmp_dir / "my_module.py")
+        self._write("class Model:\n    VERSION = 1\n\n    def __init__(self, n=0):\n        self.n = n\n", mtime=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self, code, mtime):
+        Path(self.module_path).write_text(code)
+        os.utime(self.module_path, (mtime, mtime))
+
+    def test_py_module_cache(self):
+        module = get_module_by_module_path(self.module_path)
+        # the file is not executed again if it is not modified
+        self.assertIs(get_module_by_module_path(self.module_path), module)
+        obj = init_instance_by_config({"class": "Model", "module_path": self.module_path, "kwargs": {"n": 3}})
+        self.assertIsInstance(obj, module.Model)
+        self.assertEqual(obj.n, 3)
+
+        self._write("class Model:\n    VERSION = 2\n", mtime=2)
+        self.assertEqual(get_module_by_module_path(self.module_path).Model.VERSION, 2)
+
+    def test_imported_module(self):
+        import qlib.utils.time  # pylint: disable=C0415
+
+        self.assertIs(get_module_by_module_path("qlib.utils.time"), qlib.utils.time)
+        freq = init_instance_by_config({"class": "Freq", "module_path": "qlib.utils.time", "kwargs": {"freq": "5min"}})
+        self.assertEqual(freq, qlib.utils.time.Freq("5min"))
+
+
+if __name__ == "__main__":
+    unittest.main()
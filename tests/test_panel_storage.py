@@ -0,0 +1,148 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.data import D
+from qlib.data.cache import H
+from qlib.data.storage import file_storage
+from qlib.data.storage.file_storage import (
+    FileFeatureStorage,
+    FilePanelFeatureStorage,
+    FilePanelStorage,
+    convert_to_panel_storage,
+)
+
+from .mock_data import dump_mock_data
+
+FIELDS = ["$close", "Mean($close, 5) / $close", "Ref($volume, 1)"]
+
+
+class TestPanelStorage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.qlib_dir = Path(tempfile.mkdtemp())
+        cls.calendar, cls.data = dump_mock_data(cls.qlib_dir)
+        qlib.init(provider_uri=str(cls.qlib_dir), kernels=1)
+        cls.expected = D.features(["SH600000", "SH600001"], FIELDS)
+        cls.count = convert_to_panel_storage(cls.qlib_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.qlib_dir, ignore_errors=True)
+
+    def test_convert(self):
+        self.assertEqual(self.count, 6)
+        panel = FilePanelStorage("close", "day")
+        self.assertEqual(panel.instruments, ["SH000300", "SH600000", "SH600001", "SH600002"])
+        self.assertEqual((panel.start_index, panel.end_index), (0, len(self.calendar) - 1))
+        self.assertEqual(panel.valid_range("sh600001"), (0, len(self.calendar) - 1))
+
+        df = panel.cross_section(3, 4, instruments=["SH600001", "SH600000", "SH600009"])
+        self.assertEqual(list(df.index), [3, 4])
+        np.testing.assert_allclose(df["SH600001"].values, self.data["SH600001"]["close"].values[3:5], rtol=1e-6)
+        self.assertTrue(df["SH600009"].isna().all())
+        self.assertEqual(panel.cross_section(7).shape, (1, 4))
+
+        qlib.init(
+            provider_uri=str(self.qlib_dir),
+            kernels=1,
+            feature_provider={
+                "class": "LocalFeatureProvider",
+                "kwargs": {
+                    "backend": {"class": "FilePanelFeatureStorage", "module_path": "qlib.data.storage.file_storage"}
+                },
+            },
+        )
+        H.clear()
+        pd.testing.assert_frame_equal(D.features(["SH600000", "SH600001"], FIELDS), self.expected)
+
+    def test_write(self):
+        panel = FilePanelStorage("roe", "day")
+        panel.write(pd.DataFrame({"SH600000": [1.0, np.nan, 3.0], "SH600001": [np.nan, 2.0, np.nan]}, index=[2, 3, 4]))
+        # the new non-NaN values override the old ones
+        panel.write(pd.DataFrame({"SH600001": [5.0, np.nan], "SH600002": [6.0, 7.0]}, index=[0, 3]))
+        self.assertEqual(panel.instruments, ["SH600000", "SH600001", "SH600002"])
+        self.assertEqual((panel.start_index, panel.end_index), (0, 4))
+        self.assertEqual([panel.valid_range(inst) for inst in panel.instruments], [(2, 4), (0, 3), (0, 3)])
+
+        storage = FilePanelFeatureStorage("SH600001", "roe", "day")
+        pd.testing.assert_series_equal(
+            storage.data, pd.Series([5.0, np.nan, np.nan, 2.0], index=pd.RangeIndex(0, 4), dtype=np.float32)
+        )
+        storage.write([8.0])
+        self.assertEqual((storage[4], len(storage)), ((4, 8.0), 5))
+        storage.clear()
+        self.assertEqual(panel.instruments, ["SH600000", "SH600002"])
+        self.assertEqual((storage.start_index, len(storage.data)), (None, 0))
+
+    def test_nan_spans(self):
+        # the leading and trailing NaN values are kept as in the `.bin` files, the appends go after them
+        cases = {
+            "SH600010": [
+                ([1.0, 2.0, np.nan, np.nan], 0),
+                ([5.0], None),
+                ([np.nan, 3.0], 8),
+                ([6.0], None),
+                ([np.nan], 2),
+            ],
+            "SH600011": [([np.nan, np.nan, 1.0], 3), ([2.0], None)],
+        }
+        for instrument, writes in cases.items():
+            panel_storage = FilePanelFeatureStorage(instrument, "pb", "day")
+            file_storage = FileFeatureStorage(instrument, "pb", "day")
+            for data, index in writes:
+                panel_storage.write(data, index)
+                file_storage.write(data, index)
+                self.assertEqual(
+                    (panel_storage.start_index, panel_storage.end_index, len(panel_storage)),
+                    (file_storage.start_index, file_storage.end_index, len(file_storage)),
+                )
+                pd.testing.assert_series_equal(panel_storage.data, file_storage.data)
+        self.assertEqual(FilePanelStorage("pb", "day").valid_range("SH600011"), (5, 6))
+
+    def test_generations(self):
+        panel = FilePanelStorage("pe", "day")
+        panel.write(pd.DataFrame({"SH600000": [1.0, 2.0]}, index=[0, 1]))
+        first = panel.meta
+        panel.write(pd.DataFrame({"SH600001": [3.0]}, index=[2]))
+        second = panel.meta
+        self.assertEqual((first["generation"], second["generation"]), (1, 2))
+        # the matrix of the previous generation is kept for the readers of the old metadata
+        self.assertEqual(panel.matrix(first).shape, (2, 1))
+        self.assertEqual(panel.matrix(second).shape, (3, 2))
+
+        # the writers of other processes use their own temporary files
+        with mock.patch.object(file_storage.os, "replace", wraps=os.replace) as replace:
+            panel.write(pd.DataFrame({"SH600002": [4.0]}, index=[3]))
+        tmp_files = [Path(call.args[0]).name for call in replace.call_args_list]
+        self.assertEqual(tmp_files, [f".pe.day.3.bin.{os.getpid()}", f".pe.day.json.{os.getpid()}"])
+        files = sorted(p.name for p in panel.uri.parent.glob("pe.day.*"))
+        self.assertEqual(files, ["pe.day.2.bin", "pe.day.3.bin", "pe.day.json"])
+        # the matrix of `first` is removed, the current one is read
+        self.assertEqual(panel.matrix(first).shape, (4, 3))
+        # the mappings of the removed matrices are released
+        cached = {Path(key).name for key in file_storage._MMAP_CACHE if Path(key).name.startswith("pe.day.")}
+        self.assertEqual(cached, {"pe.day.2.bin", "pe.day.3.bin"})
+        panel.clear()
+        self.assertEqual(list(panel.uri.parent.glob("pe.day.*")), [])
+        self.assertFalse(any(Path(key).name.startswith("pe.day.") for key in file_storage._MMAP_CACHE))
+
+        # the matrices removed by another process are released by the readers
+        other = FilePanelStorage("pe", "day")
+        for i in range(4):
+            with mock.patch.object(file_storage, "_unlink_mmap_file", side_effect=Path.unlink):
+                other.write(pd.DataFrame({"SH600000": [float(i)]}, index=[i]))
+            self.assertEqual(panel.matrix()[i, 0], i)
+        cached = {Path(key).name for key in file_storage._MMAP_CACHE if Path(key).name.startswith("pe.day.")}
+        self.assertEqual(cached, {"pe.day.3.bin", "pe.day.4.bin"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.data import D
+from qlib.data.data import PITD
+from qlib.data.storage.file_storage import FilePITStorage
+
+from .mock_data import dump_mock_data
+
+# (date, period, value)
+ROE_Q = [
+    (20190425, 201901, 0.1),
+    (20190815, 201902, 0.2),
+    (20190820, 201901, 0.11),
+    (20191025, 201903, 0.3),
+    (20200110, 201903, 0.31),
+    (20200228, 201904, 0.4),
+    (20200301, 201902, 0.21),
+]
+
+
+class TestPIT(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.qlib_dir = Path(tempfile.mkdtemp())
+        cls.calendar, _ = dump_mock_data(cls.qlib_dir)
+        qlib.init(provider_uri=str(cls.qlib_dir), kernels=1)
+        provider_uri = {"day": str(cls.qlib_dir)}
+        records = pd.DataFrame(ROE_Q, columns=["date", "period", "value"])
+        storage = FilePITStorage("SH600000", "roe_q", provider_uri=provider_uri)
+        # the records are merged with the existing ones
+        storage.write(records.iloc[:4])
+        storage.write(records.iloc[4:])
+
+        rng = np.random.RandomState(0)
+        dates = np.sort(rng.choice(pd.bdate_range("2015-01-01", "2020-03-31").strftime("%Y%m%d").astype(int), 200))
+        cls.random_records = pd.DataFrame(
+            {"date": dates, "period": rng.randint(2014, 2020, len(dates)), "value": rng.randn(len(dates))}
+        )
+        FilePITStorage("SH600001", "eps_a", provider_uri=provider_uri).write(cls.random_records)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.qlib_dir, ignore_errors=True)
+
+    def test_storage(self):
+        storage = FilePITStorage("SH600000", "roe_q")
+        self.assertEqual(len(storage), len(ROE_Q))
+        self.assertEqual(storage.period_index[0], 2019)
+        data = storage.data
+        self.assertEqual(list(data["value"][storage.revisions(201902)]), [0.2, 0.21])
+        self.assertEqual(list(data["value"][storage.revisions(201901)]), [0.1, 0.11])
+        self.assertEqual(len(storage.revisions(202001)), 0)
+
+        np.testing.assert_array_equal(storage.as_of([20190101, 20190816, 20200301], 201902), [np.nan, 0.2, 0.21])
+        np.testing.assert_array_equal(storage.as_of([20190101, 20190816, 20200229]), [np.nan, 0.2, 0.4])
+
+    def test_as_of(self):
+        storage = FilePITStorage("SH600001", "eps_a")
+        records = self.random_records
+        cur_dates = pd.bdate_range("2014-12-01", "2020-03-31").strftime("%Y%m%d").astype(int)
+
+        def _expected(cur_date, period=None):
+            known = records[records["date"] <= cur_date]
+            if period is None and len(known) > 0:
+                period = known["period"].max()
+            known = known[known["period"] == period]
+            return known["value"].iloc[-1] if len(known) > 0 else np.nan
+
+        np.testing.assert_array_equal(storage.as_of(cur_dates), [_expected(d) for d in cur_dates])
+        np.testing.assert_array_equal(storage.as_of(cur_dates, 2016), [_expected(d, 2016) for d in cur_dates])
+
+    def test_period_feature(self):
+        s = PITD.period_feature("SH600000", "$$roe_q", -3, 0, pd.Timestamp("2020-01-15"))
+        self.assertEqual(list(s.index), [201901, 201902, 201903])
+        np.testing.assert_allclose(s.values, [0.11, 0.2, 0.31])
+        s = PITD.period_feature("SH600000", "$$roe_q", 0, 0, pd.Timestamp("2019-01-01"))
+        self.assertTrue(s.empty)
+
+    def test_operator(self):
+        df = D.features(["SH600000"], ["P($$roe_q)", "PRef($$roe_q, 201902)", "P($$roe_q + 0)"])
+        df = df.loc["SH600000"]
+        expected = pd.Series(0.3, index=self.calendar)
+        expected[expected.index >= "2020-01-10"] = 0.31
+        expected[expected.index >= "2020-02-28"] = 0.4
+        np.testing.assert_allclose(df["P($$roe_q)"].values, expected.values, rtol=1e-6)
+        # the operator on the periods is computed date by date
+        np.testing.assert_allclose(df["P($$roe_q + 0)"].values, expected.values, rtol=1e-6)
+        expected = pd.Series(0.2, index=self.calendar)
+        expected[expected.index >= "2020-03-01"] = 0.21
+        np.testing.assert_allclose(df["PRef($$roe_q, 201902)"].values, expected.values, rtol=1e-6)
+
+        df = D.features(["SH600002"], ["P($$roe_q)"])
+        self.assertTrue(df.empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
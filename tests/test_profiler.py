@@ -0,0 +1,80 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import qlib
+from qlib.config import C
+from qlib.data import D
+from qlib.data.cache import H
+from qlib.data.profiler import get_profiler, profile
+
+from .mock_data import dump_mock_data
+
+FIELDS = ["Mean($close, 5) / $close", "Ref($volume, 1)"]
+
+
+class TestProfiler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.qlib_dir = Path(tempfile.mkdtemp())
+        cls.calendar, _ = dump_mock_data(cls.qlib_dir)
+        qlib.init(provider_uri=str(cls.qlib_dir), kernels=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.qlib_dir, ignore_errors=True)
+
+    def setUp(self):
+        H.clear()
+
+    def test_profile(self):
+        self.assertIsNone(get_profiler())
+        with profile() as prof:
+            D.features(["SH600000", "SH600001"], FIELDS)
+            D.features(["SH600000", "SH600001"], FIELDS)
+        self.assertIsNone(get_profiler())
+
+        report = prof.report(by="operator")
+        self.assertEqual(set(report.index), {"Mean", "Div", "Ref", "Feature"})
+        # 2 calls x 2 instruments, every node of the second call is a cache hit
+        self.assertEqual(report.loc["Div", "count"], 4)
+        self.assertEqual(report.loc["Div", "hits"], 2)
+        self.assertEqual(report.loc["Mean", "misses"], 2)
+        self.assertGreaterEqual(report.loc["Div", "total_time"], report.loc["Div", "self_time"])
+
+        report = prof.report(by="expression")
+        self.assertIn("Div(Mean($close,5),$close)", report.index)
+        # the float32 data of the 2 instruments is read once
+        self.assertEqual(report.loc["$volume", "bytes_read"], 4 * len(self.calendar) * 2)
+        caches = prof.cache_report()
+        self.assertEqual(caches.loc["f", "hits"] + caches.loc["f", "misses"], report["count"].sum())
+        self.assertGreater(caches.loc["c", "hits"], 0)
+
+        report = prof.report(by="instrument", kind="provider")
+        self.assertEqual(report.loc["SH600000", "count"], 2)
+
+        trace = prof.to_chrome_trace(self.qlib_dir.joinpath("trace.json"))
+        self.assertEqual(trace, json.loads(self.qlib_dir.joinpath("trace.json").read_text()))
+        names = {e["name"] for e in trace["traceEvents"]}
+        self.assertTrue({"dataset", "inst_calculator", "$close"} <= names)
+        self.assertTrue(all(e["ph"] == "X" and e["ts"] >= 0 for e in trace["traceEvents"]))
+
+    def test_workers(self):
+        C.kernels = 2
+        try:
+            with profile() as prof:
+                D.features(["SH600000", "SH600001"], FIELDS)
+        finally:
+            C.kernels = 1
+        # the loads in the worker processes are merged
+        report = prof.report(by="operator")
+        self.assertEqual(report.loc["Div", "count"], 2)
+        # Div, Mean, $close, Ref and $volume of each instrument
+        self.assertEqual(prof.cache_report().loc["f", "misses"], 5 * 2)
+        self.assertGreater(len({e["pid"] for e in prof.events}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.constant import REG_CN, REG_US
+from qlib.utils.time import get_min_cal, concat_date_time
+from qlib.utils.resam import get_resam_freq, get_resam_bar_index, resam_bars, resam_reduce
+
+
+def _min_calendar(dates, region):
+    return pd.DatetimeIndex(
+        [concat_date_time(pd.Timestamp(d).date(), t) for d in dates for t in get_min_cal(region=region)]
+    )
+
+
+class TestResam(unittest.TestCase):
+    def setUp(self):
+        self.calendar = _min_calendar(["2020-01-02", "2020-01-03"], REG_CN)
+        rng = np.random.RandomState(0)
+        close = 10 + rng.randn(len(self.calendar)).cumsum() * 0.01
+        self.df = pd.DataFrame(
+            {
+                "$open": close + 0.01,
+                "$high": close + 0.02,
+                "$low": close - 0.02,
+                "$close": close,
+                "$volume": rng.randint(1, 100, len(self.calendar)).astype(float),
+            },
+            index=pd.DatetimeIndex(self.calendar, name="datetime"),
+        )
+
+    def test_get_resam_freq(self):
+        self.assertEqual(str(get_resam_freq("5min")), "1min")
+        self.assertEqual(str(get_resam_freq("week")), "day")
+        self.assertEqual(str(get_resam_freq("30min", ["1min", "5min", "day"])), "5min")
+
+    def test_bar_index(self):
+        # a CN day has 240 minutes and the 30min bars do not cross the lunch break
+        self.assertEqual(len(get_resam_bar_index(self.calendar, "1min", "30min", REG_CN)), 16)
+        self.assertEqual(len(get_resam_bar_index(self.calendar, "1min", "day", REG_CN)), 2)
+        # the US session (390 minutes) ends with a shorter bar
+        us_cal = _min_calendar(["2020-01-02"], REG_US)
+        self.assertEqual(len(get_resam_bar_index(us_cal, "1min", "60min", REG_US)), 7)
+        with self.assertRaises(ValueError):
+            get_resam_bar_index(self.calendar, "day", "1min")
+
+    def test_resam_bars(self):
+        res = resam_bars(self.df, "1min", "5min", REG_CN)
+        self.assertEqual(len(res), 2 * 48)
+        # compare with the naive groupby implementation
+        key = self.df.index.floor("D").astype("int64") // 10**9 * 10**3 + np.tile(np.arange(240) // 5, 2)
+        exp = self.df.groupby(key).agg(
+            {"$open": "first", "$high": "max", "$low": "min", "$close": "last", "$volume": "sum"}
+        )
+        np.testing.assert_allclose(res.values, exp.values)
+        self.assertEqual(res.index[24], pd.Timestamp("2020-01-02 13:00"))
+
+        day = resam_bars(self.df, "1min", "day", REG_CN)
+        self.assertEqual(list(day.index), [pd.Timestamp("2020-01-02"), pd.Timestamp("2020-01-03")])
+        self.assertAlmostEqual(day["$volume"].iloc[0], self.df["$volume"].iloc[:240].sum())
+
+    def test_resam_panel(self):
+        df = pd.concat({"SH600000": self.df, "SH600001": self.df * 2}, names=["instrument"])
+        res = resam_bars(df, "1min", "30min", REG_CN)
+        self.assertEqual(res.index.names, ["instrument", "datetime"])
+        np.testing.assert_allclose(res.loc["SH600001"].values, 2 * res.loc["SH600000"].values)
+
+    def test_missing_value(self):
+        values = np.array([np.nan, 1.0, 2.0, np.nan, np.nan, np.nan])
+        bar_index = np.array([0, 3])
+        np.testing.assert_equal(resam_reduce(values, bar_index, "first"), [1.0, np.nan])
+        np.testing.assert_equal(resam_reduce(values, bar_index, "last"), [2.0, np.nan])
+        np.testing.assert_equal(resam_reduce(values, bar_index, "sum"), [3.0, np.nan])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+import qlib
+from qlib.data import D
+from qlib.data.task import TaskManager, collect_dataset_job, run_worker, submit_dataset_job
+
+from .mock_data import dump_mock_data
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+FIELDS = ["$close", "Mean($close, 5) / $close"]
+
+
+CALLS = {}
+
+
+def flaky(name):
+    CALLS[name] = CALLS.get(name, 0) + 1
+    if CALLS[name] < 2:
+        raise RuntimeError("flaky")
+    return CALLS[name]
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class TestTaskManager(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.qlib_dir = Path(tempfile.mkdtemp())
+        dump_mock_data(cls.qlib_dir)
+        qlib.init(provider_uri=str(cls.qlib_dir), kernels=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.qlib_dir, ignore_errors=True)
+
+    def setUp(self):
+        self.mongodb = mongomock.MongoClient()["qlib_test"]
+
+    def test_dataset_job(self):
+        tm = TaskManager("dataset", mongodb=self.mongodb)
+        instruments = ["SH600000", "SH600001", "SH600002"]
+        self.assertEqual(submit_dataset_job(tm, "job", instruments, FIELDS, inst_chunk_size=2, time_chunk_size=30), 6)
+        # the tasks are created once
+        self.assertEqual(submit_dataset_job(tm, "job", instruments, FIELDS, inst_chunk_size=2, time_chunk_size=30), 0)
+        self.assertEqual(run_worker(tm, job="job"), 6)
+        self.assertEqual(tm.wait("job", timeout=1), {"waiting": 0, "running": 0, "done": 6, "failed": 0})
+        pd.testing.assert_frame_equal(collect_dataset_job(tm, "job"), D.features(instruments, FIELDS))
+
+    def test_lease_and_retry(self):
+        tm = TaskManager("task", lease=10, max_retries=2, mongodb=self.mongodb)
+        tm.create_task("job", [{"func": "tests.test_task.flaky", "kwargs": {"name": "lease"}}])
+        task = tm.claim("job")
+        self.assertEqual((task["status"], task["attempts"]), ("running", 1))
+        self.assertIsNone(tm.claim("job"))
+        self.assertTrue(tm.renew(task))
+
+        # the lease of the dead worker is expired, the task is claimed again and the old worker loses it
+        other = TaskManager("task", lease=10, max_retries=2, mongodb=self.mongodb)
+        self.mongodb["task"].update_one({"_id": task["_id"]}, {"$set": {"lease_until": 0}})
+        claimed = other.claim("job")
+        self.assertEqual(claimed["attempts"], 2)
+        self.assertFalse(tm.commit(task, 1))
+        # it has been tried max_retries times
+        self.assertTrue(other.fail(claimed, "error"))
+        self.assertEqual(tm.errors("job"), [(claimed["def"], "error")])
+
+        self.assertEqual(tm.reset("job"), 1)
+        # the first run fails and the task is retried
+        self.assertEqual(run_worker(tm, job="job"), 1)
+        self.assertEqual(tm.results("job"), [(claimed["def"], 2)])
+        self.assertEqual(tm.remove("job"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
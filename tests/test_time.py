@@ -0,0 +1,99 @@
+
+import pickle
+import threading
+import unittest
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+from qlib.constant import REG_CN, REG_TW, REG_US
+from qlib.utils.time import (
+    Freq,
+    get_min_cal,
+    get_day_min_idx_range,
+    is_single_value,
+    is_single_value_array,
+    time_to_day_index,
+    time_to_day_index_array,
+)
+
+
+class TestTime(unittest.TestCase):
+    def test_min_cal(self):
+        cal = get_min_cal(region=REG_CN)
+        self.assertEqual(len(cal), 240)
+        self.assertEqual((cal[0], cal[119], cal[120], cal[-1]), (time(9, 30), time(11, 29), time(13, 0), time(14, 59)))
+        self.assertEqual(get_min_cal(shift=1, region=REG_CN)[0], time(9, 29))
+        self.assertEqual(len(get_min_cal(region=REG_US)), 390)
+        self.assertEqual(len(get_min_cal(region=REG_TW)), 270)
+
+    def test_time_to_day_index(self):
+        self.assertEqual(time_to_day_index("9:30"), 0)
+        self.assertEqual(time_to_day_index("13:00"), 120)
+        self.assertEqual(time_to_day_index(pd.Timestamp("2020-01-02 14:59")), 239)
+        with self.assertRaises(ValueError):
+            time_to_day_index("12:00")
+        times = pd.DatetimeIndex(["2020-01-02 09:30", "2020-01-02 12:00", "2020-01-03 13:01"])
+        np.testing.assert_equal(time_to_day_index_array(times, REG_CN), [0, -1, 121])
+
+    def test_is_single_value(self):
+        freq = pd.Timedelta("1min")
+        self.assertTrue(is_single_value(pd.Timestamp("2020-01-02 11:29"), pd.Timestamp("2020-01-02 13:05"), freq))
+        self.assertFalse(is_single_value(pd.Timestamp("2020-01-02 11:28"), pd.Timestamp("2020-01-02 13:05"), freq))
+        start = pd.DatetimeIndex(["2020-01-02 11:29", "2020-01-02 11:28", "2020-01-02 10:00"])
+        end = pd.DatetimeIndex(["2020-01-02 13:05", "2020-01-02 13:05", "2020-01-02 10:00:30"])
+        np.testing.assert_equal(is_single_value_array(start, end, freq, REG_CN), [True, False, True])
+
+    def test_day_min_idx_range(self):
+        self.assertEqual(get_day_min_idx_range("9:30", "14:59", "1min", REG_CN), (0, 239))
+        self.assertEqual(get_day_min_idx_range("9:35", "10:00", "5min", REG_CN), (1, 6))
+        self.assertEqual(get_day_min_idx_range("9:30:30", "9:40", "1min", REG_CN), (1, 10))
+
+    def test_freq(self):
+        self.assertEqual(Freq("5min"), "5min")
+        self.assertEqual(str(Freq("1d")), "day")
+        self.assertEqual(Freq.get_recent_freq("5min", ["1min", "day"]), "1min")
+
+    def test_freq_interned(self):
+        self.assertIs(Freq("5min"), Freq("5MINUTE"))
+        self.assertIs(Freq("d"), Freq("day"))
+        self.assertIs(Freq(Freq("day")), Freq("day"))
+        self.assertEqual(len({Freq("1min"), Freq("min"), Freq("day")}), 2)
+        self.assertIs(pickle.loads(pickle.dumps(Freq("30min"))), Freq("30min"))
+        with self.assertRaises(AttributeError):
+            Freq("day").count = 2
+
+    def test_freq_mixed_keys(self):
+        self.assertIn("day", {Freq("day")})
+        self.assertIn(Freq("1d"), {"day", "5min"})
+        self.assertEqual(len({Freq("5min"), "5min", Freq("day"), "day"}), 2)
+        self.assertEqual({Freq("day"): 1}.get("day"), 1)
+        self.assertEqual({"5min": 1}[Freq("5minute")], 1)
+        self.assertEqual({str(Freq(freq)): freq for freq in ["1d", "day", "d"]}.keys(), {"day"})
+        # the other spellings are equal, but only the normalized one has the same hash
+        self.assertEqual(Freq("day"), "1d")
+        self.assertNotIn(Freq("day"), {"1d"})
+        self.assertIn(str(Freq("1d")), {Freq("day")})
+
+    def test_freq_threads(self):
+        # the threads creating the same new freq get one instance, which equals all the spellings
+        spellings = ["17min", "17MIN", "17minute", "17Minute"] * 4
+        barrier = threading.Barrier(len(spellings))
+        res = [None] * len(spellings)
+
+        def _create(i):
+            barrier.wait()
+            res[i] = Freq(spellings[i])
+
+        threads = [threading.Thread(target=_create, args=(i,)) for i in range(len(spellings))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len({id(freq) for freq in res}), 1)
+        self.assertTrue(all(freq == spelling for freq, spelling in zip(res, spellings)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.data import D
+from qlib.data.cache import H
+from qlib.data.storage.file_storage import FilePanelFeatureStorage, FilePanelStorage, convert_to_panel_storage
+from qlib.data.updater import DataUpdater
+from qlib.utils import exists_qlib_data, write_data_manifest
+
+from .mock_data import dump_mock_data, mock_calendar, mock_features
+
+FIELDS = ["$close", "Ref($close, 1)", "$volume"]
+
+
+class TestDataUpdater(unittest.TestCase):
+    def setUp(self):
+        self.qlib_dir = Path(tempfile.mkdtemp())
+        self.calendar = mock_calendar()
+        dump_mock_data(self.qlib_dir, instruments=("SH600000", "SH600001"), end_time="2020-03-25")
+        write_data_manifest(self.qlib_dir)
+        qlib.init(provider_uri=str(self.qlib_dir), kernels=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.qlib_dir, ignore_errors=True)
+
+    def _bars(self, instrument, seed, start_time, end_time=None):
+        df = mock_features(self.calendar, seed=seed).loc[start_time:end_time]
+        return pd.concat({instrument: df}, names=["instrument", "datetime"])
+
+    def test_update(self):
+        old = D.features(["SH600000", "SH600001"], FIELDS)
+        D.features(["SH600001"], FIELDS)
+        self.assertEqual(len(old), 2 * 60)
+
+        # the new bars of SH600000, a new instrument and a correction of an old bar
+        data = pd.concat(
+            [
+                self._bars("SH600000", 0, "2020-03-26"),
+                self._bars("SH600003", 3, "2020-03-30"),
+                self._bars("SH600001", 1, "2020-03-25", "2020-03-25") * 2,
+            ]
+        )
+        res = DataUpdater(self.qlib_dir).update(data)
+        self.assertEqual(res["calendar"], list(self.calendar[-4:]))
+        self.assertEqual(res["instruments"], ["SH600000", "SH600001", "SH600003"])
+        self.assertGreater(res["invalidated"], 0)
+        self.assertFalse(any(key[1] in res["instruments"] for key in H["f"].od))
+        self.assertTrue(exists_qlib_data(self.qlib_dir))
+
+        self.assertEqual(list(D.calendar()), list(self.calendar))
+        spans = D.list_instruments(D.instruments("all"), as_list=False)
+        self.assertEqual(spans["SH600000"], [(self.calendar[0], self.calendar[-1])])
+        self.assertEqual(spans["SH600003"], [(self.calendar[-2], self.calendar[-1])])
+
+        df = D.features(["SH600000", "SH600001", "SH600003"], ["$close"])
+        expected = mock_features(self.calendar, seed=0)["close"].values.astype(np.float32)
+        np.testing.assert_array_equal(df.loc["SH600000", "$close"].values, expected)
+        # SH600001 has no new bars, its corrected bar is the last one
+        close = df.loc["SH600001", "$close"]
+        self.assertEqual(close.index[-1], pd.Timestamp("2020-03-25"))
+        self.assertAlmostEqual(close.iloc[-1], 2 * mock_features(self.calendar, seed=1).loc["2020-03-25", "close"], 3)
+        self.assertEqual(len(df.loc["SH600003"]), 2)
+
+    def test_update_panel(self):
+        convert_to_panel_storage(self.qlib_dir)
+        backend = {"class": "FilePanelFeatureStorage", "module_path": "qlib.data.storage.file_storage"}
+        generation = FilePanelStorage("close", "day").meta["generation"]
+        data = pd.concat([self._bars("SH600000", 0, "2020-03-26"), self._bars("SH600003", 3, "2020-03-30")])
+        DataUpdater(self.qlib_dir, backend=backend).update(data)
+
+        # the panel is written once for all the instruments
+        panel = FilePanelStorage("close", "day")
+        self.assertEqual(panel.meta["generation"], generation + 1)
+        self.assertEqual(panel.instruments, ["SH600000", "SH600001", "SH600003"])
+        self.assertEqual(panel.valid_range("SH600003"), (len(self.calendar) - 2, len(self.calendar) - 1))
+        expected = mock_features(self.calendar, seed=0)["close"].values.astype(np.float32)
+        np.testing.assert_array_equal(FilePanelFeatureStorage("SH600000", "close", "day").data.values, expected)
+
+    def test_invalid_date(self):
+        data = self._bars("SH600000", 0, "2020-03-26")
+        data = data.rename(index={pd.Timestamp("2020-03-26"): pd.Timestamp("2020-03-22")})
+        with self.assertRaises(ValueError):
+            DataUpdater(self.qlib_dir).update(data)
+
+
+if __name__ == "__main__":
+    unittest.main()